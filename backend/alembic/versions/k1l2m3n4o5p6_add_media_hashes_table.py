@@ -0,0 +1,43 @@
+"""add media_hashes table
+
+Revision ID: k1l2m3n4o5p6
+Revises: add_category_support
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'k1l2m3n4o5p6'
+down_revision = 'add_category_support'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'media_hashes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('url_key', sa.String(), nullable=False),
+        sa.Column('hash_kind', sa.String(50), nullable=False),
+        sa.Column('etag', sa.String(), nullable=True),
+        sa.Column('content_length', sa.BigInteger(), nullable=True),
+        sa.Column('hashes', postgresql.JSON(astext_type=sa.Text()), nullable=False),
+        sa.Column('hit_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('last_used_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('url_key', 'hash_kind', name='uq_media_hashes_url_key_kind')
+    )
+    op.create_index(op.f('ix_media_hashes_id'), 'media_hashes', ['id'], unique=False)
+    op.create_index(op.f('ix_media_hashes_url_key'), 'media_hashes', ['url_key'], unique=False)
+    op.create_index('ix_media_hashes_etag_kind', 'media_hashes', ['etag', 'hash_kind'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_media_hashes_etag_kind', table_name='media_hashes')
+    op.drop_index(op.f('ix_media_hashes_url_key'), table_name='media_hashes')
+    op.drop_index(op.f('ix_media_hashes_id'), table_name='media_hashes')
+    op.drop_table('media_hashes')
@@ -0,0 +1,39 @@
+"""add signature_hash to ad_sets
+
+Revision ID: l2m3n4o5p6q7
+Revises: k1l2m3n4o5p6
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'l2m3n4o5p6q7'
+down_revision = 'k1l2m3n4o5p6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('ad_sets', sa.Column('signature_hash', sa.BigInteger(), nullable=True))
+    op.create_index(op.f('ix_ad_sets_signature_hash'), 'ad_sets', ['signature_hash'], unique=False)
+
+    # Backfill from 64-bit hex perceptual hashes; fallback signatures (ad ids) stay NULL
+    op.execute(
+        "UPDATE ad_sets SET signature_hash = ('x' || lower(content_signature))::bit(64)::bigint "
+        "WHERE content_signature ~* '^[0-9a-f]{16}$'"
+    )
+
+    # Candidate lookup no longer uses trigram similarity on the hex string
+    op.execute("DROP INDEX IF EXISTS ix_ad_sets_content_signature_gin;")
+
+
+def downgrade():
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_ad_sets_content_signature_gin "
+        "ON ad_sets USING gin (content_signature gin_trgm_ops);"
+    )
+    op.drop_index(op.f('ix_ad_sets_signature_hash'), table_name='ad_sets')
+    op.drop_column('ad_sets', 'signature_hash')
@@ -0,0 +1,65 @@
+"""promote hot ad JSON fields to indexed columns
+
+Revision ID: m3n4o5p6q7r8
+Revises: l2m3n4o5p6q7
+Create Date: 2026-10-16 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'm3n4o5p6q7r8'
+down_revision = 'l2m3n4o5p6q7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('ads', sa.Column('is_active', sa.Boolean(), nullable=True))
+    op.add_column('ads', sa.Column('start_date', sa.Date(), nullable=True))
+    op.add_column('ads', sa.Column('end_date', sa.Date(), nullable=True))
+    op.add_column('ads', sa.Column('media_type', sa.String(20), nullable=True))
+    op.add_column('ads', sa.Column('page_id', sa.String(), nullable=True))
+    op.add_column('ads', sa.Column('cta_type', sa.String(50), nullable=True))
+    op.add_column('ads', sa.Column('primary_media_url', sa.Text(), nullable=True))
+
+    # Plain meta fields can be backfilled in SQL. media_type and primary_media_url
+    # need the creative parsing rules and are filled by the
+    # ads.backfill_promoted_columns task (rows with media_type IS NULL).
+    op.execute("""
+        UPDATE ads SET
+            is_active = COALESCE(lower(meta->>'is_active') = 'true', false),
+            start_date = CASE WHEN meta->>'start_date' ~ '^\\d{4}-\\d{2}-\\d{2}'
+                              THEN substring(meta->>'start_date' from 1 for 10)::date END,
+            end_date = CASE WHEN meta->>'end_date' ~ '^\\d{4}-\\d{2}-\\d{2}'
+                            THEN substring(meta->>'end_date' from 1 for 10)::date END,
+            page_id = NULLIF(meta->>'page_id', ''),
+            cta_type = NULLIF(meta->>'cta_type', '')
+        WHERE meta IS NOT NULL
+    """)
+
+    op.create_index(op.f('ix_ads_is_active'), 'ads', ['is_active'], unique=False)
+    op.create_index(op.f('ix_ads_start_date'), 'ads', ['start_date'], unique=False)
+    op.create_index(op.f('ix_ads_end_date'), 'ads', ['end_date'], unique=False)
+    op.create_index(op.f('ix_ads_media_type'), 'ads', ['media_type'], unique=False)
+    op.create_index(op.f('ix_ads_page_id'), 'ads', ['page_id'], unique=False)
+    op.create_index(op.f('ix_ads_cta_type'), 'ads', ['cta_type'], unique=False)
+    op.create_index('ix_ads_competitor_id_start_date', 'ads', ['competitor_id', 'start_date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_ads_competitor_id_start_date', table_name='ads')
+    op.drop_index(op.f('ix_ads_cta_type'), table_name='ads')
+    op.drop_index(op.f('ix_ads_page_id'), table_name='ads')
+    op.drop_index(op.f('ix_ads_media_type'), table_name='ads')
+    op.drop_index(op.f('ix_ads_end_date'), table_name='ads')
+    op.drop_index(op.f('ix_ads_start_date'), table_name='ads')
+    op.drop_index(op.f('ix_ads_is_active'), table_name='ads')
+    op.drop_column('ads', 'primary_media_url')
+    op.drop_column('ads', 'cta_type')
+    op.drop_column('ads', 'page_id')
+    op.drop_column('ads', 'media_type')
+    op.drop_column('ads', 'end_date')
+    op.drop_column('ads', 'start_date')
+    op.drop_column('ads', 'is_active')
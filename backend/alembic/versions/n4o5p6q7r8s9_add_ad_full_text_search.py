@@ -0,0 +1,35 @@
+"""add full-text search columns to ads
+
+Revision ID: n4o5p6q7r8s9
+Revises: m3n4o5p6q7r8
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'n4o5p6q7r8s9'
+down_revision = 'm3n4o5p6q7r8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('ads', sa.Column('search_text', sa.Text(), nullable=True))
+    op.add_column('ads', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.create_index('ix_ads_search_vector', 'ads', ['search_vector'], unique=False, postgresql_using='gin')
+
+    # Trigram index for the typo fallback (word_similarity / <% operator)
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_ads_search_text_trgm ON ads USING gin (search_text gin_trgm_ops);")
+
+    # Existing rows are indexed by: python backfill_ad_search.py
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_ads_search_text_trgm;")
+    op.drop_index('ix_ads_search_vector', table_name='ads')
+    op.drop_column('ads', 'search_vector')
+    op.drop_column('ads', 'search_text')
@@ -0,0 +1,25 @@
+"""add precomputed ad card
+
+Revision ID: o5p6q7r8s9t0
+Revises: n4o5p6q7r8s9
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'o5p6q7r8s9t0'
+down_revision = 'n4o5p6q7r8s9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled on write; existing rows are built on read until the
+    # ads.backfill_cards task has run
+    op.add_column('ads', sa.Column('card', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('ads', 'card')
@@ -0,0 +1,26 @@
+"""add competitor scrape stats
+
+Revision ID: p6q7r8s9t0u1
+Revises: o5p6q7r8s9t0
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'p6q7r8s9t0u1'
+down_revision = 'o5p6q7r8s9t0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Written by the scrape scheduler's aggregation step; NULL = never scheduled
+    op.add_column('competitors', sa.Column('last_scraped_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('competitors', sa.Column('last_scrape_yield', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('competitors', 'last_scrape_yield')
+    op.drop_column('competitors', 'last_scraped_at')
@@ -0,0 +1,45 @@
+"""add scrape checkpoints
+
+Revision ID: q7r8s9t0u1v2
+Revises: p6q7r8s9t0u1
+Create Date: 2026-10-16 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'q7r8s9t0u1v2'
+down_revision = 'p6q7r8s9t0u1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'scrape_checkpoints',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('competitor_id', sa.Integer(), nullable=False),
+        sa.Column('country', sa.String(length=64), nullable=False),
+        sa.Column('active_status', sa.String(length=20), nullable=False),
+        sa.Column('last_cursor', sa.Text(), nullable=True),
+        sa.Column('seen_filter', sa.LargeBinary(), nullable=True),
+        sa.Column('seen_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('max_start_date', sa.Date(), nullable=True),
+        sa.Column('last_run_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_run_pages', sa.Integer(), nullable=True),
+        sa.Column('last_run_new_ads', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['competitor_id'], ['competitors.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('competitor_id', 'country', 'active_status', name='uq_scrape_checkpoints_scope'),
+    )
+    op.create_index(op.f('ix_scrape_checkpoints_id'), 'scrape_checkpoints', ['id'], unique=False)
+    op.create_index(op.f('ix_scrape_checkpoints_competitor_id'), 'scrape_checkpoints', ['competitor_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_scrape_checkpoints_competitor_id'), table_name='scrape_checkpoints')
+    op.drop_index(op.f('ix_scrape_checkpoints_id'), table_name='scrape_checkpoints')
+    op.drop_table('scrape_checkpoints')
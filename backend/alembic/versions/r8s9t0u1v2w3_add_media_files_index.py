@@ -0,0 +1,57 @@
+"""add media files index
+
+Revision ID: r8s9t0u1v2w3
+Revises: q7r8s9t0u1v2
+Create Date: 2026-10-16 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'r8s9t0u1v2w3'
+down_revision = 'q7r8s9t0u1v2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'media_files',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('local_path', sa.String(), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=True),
+        sa.Column('media_type', sa.String(length=10), nullable=False),
+        sa.Column('file_size', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('mtime', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('local_path'),
+    )
+    op.create_index(op.f('ix_media_files_id'), 'media_files', ['id'], unique=False)
+    op.create_index(op.f('ix_media_files_sha256'), 'media_files', ['sha256'], unique=False)
+    op.create_index('ix_media_files_mtime', 'media_files', ['mtime'], unique=False)
+
+    op.create_table(
+        'media_file_refs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('media_file_id', sa.Integer(), nullable=False),
+        sa.Column('ad_id', sa.BigInteger(), nullable=False),
+        sa.Column('role', sa.String(length=10), nullable=False),
+        sa.ForeignKeyConstraint(['media_file_id'], ['media_files.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['ad_id'], ['ads.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('media_file_id', 'ad_id', 'role', name='uq_media_file_refs_file_ad_role'),
+    )
+    op.create_index(op.f('ix_media_file_refs_id'), 'media_file_refs', ['id'], unique=False)
+    op.create_index(op.f('ix_media_file_refs_ad_id'), 'media_file_refs', ['ad_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_media_file_refs_ad_id'), table_name='media_file_refs')
+    op.drop_index(op.f('ix_media_file_refs_id'), table_name='media_file_refs')
+    op.drop_table('media_file_refs')
+    op.drop_index('ix_media_files_mtime', table_name='media_files')
+    op.drop_index(op.f('ix_media_files_sha256'), table_name='media_files')
+    op.drop_index(op.f('ix_media_files_id'), table_name='media_files')
+    op.drop_table('media_files')
@@ -0,0 +1,46 @@
+"""add gemini assets registry
+
+Revision ID: s9t0u1v2w3x4
+Revises: r8s9t0u1v2w3
+Create Date: 2026-10-16 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 's9t0u1v2w3x4'
+down_revision = 'r8s9t0u1v2w3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'gemini_assets',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('content_sha256', sa.String(length=64), nullable=False),
+        sa.Column('url_key', sa.String(), nullable=True),
+        sa.Column('instruction_hash', sa.String(length=64), nullable=False, server_default=''),
+        sa.Column('api_key_index', sa.Integer(), nullable=False),
+        sa.Column('file_uri', sa.String(), nullable=False),
+        sa.Column('file_expires_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('model', sa.String(length=100), nullable=True),
+        sa.Column('cache_name', sa.String(), nullable=True),
+        sa.Column('cache_expires_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('hit_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_used_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('content_sha256', 'api_key_index', 'instruction_hash', name='uq_gemini_assets_content_key_instruction'),
+    )
+    op.create_index(op.f('ix_gemini_assets_id'), 'gemini_assets', ['id'], unique=False)
+    op.create_index('ix_gemini_assets_content_instruction', 'gemini_assets', ['content_sha256', 'instruction_hash'], unique=False)
+    op.create_index('ix_gemini_assets_url_key_instruction', 'gemini_assets', ['url_key', 'instruction_hash'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_gemini_assets_url_key_instruction', table_name='gemini_assets')
+    op.drop_index('ix_gemini_assets_content_instruction', table_name='gemini_assets')
+    op.drop_index(op.f('ix_gemini_assets_id'), table_name='gemini_assets')
+    op.drop_table('gemini_assets')
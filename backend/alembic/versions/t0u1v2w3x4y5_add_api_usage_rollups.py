@@ -0,0 +1,70 @@
+"""add api usage rollups
+
+Revision ID: t0u1v2w3x4y5
+Revises: s9t0u1v2w3x4
+Create Date: 2026-10-16 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 't0u1v2w3x4y5'
+down_revision = 's9t0u1v2w3x4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'api_usage_rollups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('granularity', sa.String(length=10), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('model_name', sa.String(length=255), nullable=False),
+        sa.Column('provider', sa.String(length=50), nullable=False),
+        sa.Column('api_key_index', sa.Integer(), nullable=False, server_default='-1'),
+        sa.Column('request_type', sa.String(length=100), nullable=False, server_default=''),
+        sa.Column('requests', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('prompt_tokens', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('cached_tokens', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('completion_tokens', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('total_tokens', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('estimated_cost_usd', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('last_used_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint(
+            'granularity', 'bucket_start', 'model_name', 'provider', 'api_key_index', 'request_type',
+            name='uq_api_usage_rollups_bucket',
+        ),
+    )
+    op.create_index(op.f('ix_api_usage_rollups_id'), 'api_usage_rollups', ['id'], unique=False)
+    op.create_index('ix_api_usage_rollups_granularity_bucket', 'api_usage_rollups', ['granularity', 'bucket_start'], unique=False)
+
+    # Backfill from the existing raw rows
+    for granularity, bucket in (
+        ('hour', "date_trunc('hour', created_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'"),
+        ('day', "date_trunc('day', created_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'"),
+        ('total', "TIMESTAMPTZ '1970-01-01 00:00:00+00'"),
+    ):
+        op.execute(f"""
+            INSERT INTO api_usage_rollups (
+                granularity, bucket_start, model_name, provider, api_key_index, request_type,
+                requests, prompt_tokens, cached_tokens, completion_tokens, total_tokens,
+                estimated_cost_usd, last_used_at
+            )
+            SELECT '{granularity}', {bucket}, model_name, provider,
+                   COALESCE(api_key_index, -1), COALESCE(request_type, ''),
+                   COUNT(*), COALESCE(SUM(prompt_tokens), 0), COALESCE(SUM(cached_tokens), 0),
+                   COALESCE(SUM(completion_tokens), 0), COALESCE(SUM(total_tokens), 0),
+                   COALESCE(SUM(estimated_cost_usd), 0), MAX(created_at)
+            FROM api_usage
+            WHERE created_at IS NOT NULL
+            GROUP BY 2, model_name, provider, COALESCE(api_key_index, -1), COALESCE(request_type, '')
+        """)
+
+
+def downgrade():
+    op.drop_index('ix_api_usage_rollups_granularity_bucket', table_name='api_usage_rollups')
+    op.drop_index(op.f('ix_api_usage_rollups_id'), table_name='api_usage_rollups')
+    op.drop_table('api_usage_rollups')
@@ -1,4 +1,5 @@
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
 from app.core.config import settings
 import logging
 
@@ -16,7 +17,9 @@ celery_app = Celery(
         "app.tasks.ai_analysis_tasks", 
         "app.tasks.facebook_ads_scraper_task",
         "app.tasks.daily_ads_scraper",
-        "app.tasks.veo_generation_tasks"
+        "app.tasks.veo_generation_tasks",
+        "app.tasks.ad_set_tasks",
+        "app.tasks.ad_maintenance_tasks"
     ]
 )
 
@@ -60,7 +63,15 @@ celery_app.conf.beat_schedule = {
     'batch-ai-analysis': {
         'task': 'app.tasks.ai_analysis_tasks.batch_ai_analysis_task',
         'schedule': 21600.0,  # Run every 6 hours
-        'kwargs': {'ad_ids': []}  # Empty list as default
+        'kwargs': {'limit': settings.BATCH_ANALYSIS_MAX_CREATIVES}  # Unanalyzed ads, once per creative
+    },
+    'extend-hot-gemini-caches': {
+        'task': 'app.tasks.ai_analysis_tasks.extend_hot_gemini_caches_task',
+        'schedule': 1800.0,  # Every 30 minutes (well inside GEMINI_CACHE_EXTEND_WITHIN_SECONDS)
+    },
+    'compact-api-usage': {
+        'task': 'app.tasks.ai_analysis_tasks.compact_api_usage_task',
+        'schedule': 86400.0,  # Once daily (USAGE_RAW_RETENTION_DAYS / USAGE_HOURLY_RETENTION_DAYS)
     },
 }
 
@@ -71,6 +82,34 @@ celery_app.conf.broker_transport_options = {
     'fanout_patterns': True
 }
 
+
+@worker_process_init.connect
+def preload_ad_set_signature_index(**kwargs):
+    """Load the AdSet Hamming index once per worker process instead of on the first scrape."""
+    from app.database import SessionLocal
+    from app.services.hamming_index import ad_set_signature_index
+
+    db = SessionLocal()
+    try:
+        ad_set_signature_index.ensure_loaded(db)
+    except Exception as e:
+        logger.warning(f"Could not preload AdSet signature index: {e}")
+    finally:
+        db.close()
+
+
+@worker_process_shutdown.connect
+def flush_usage_records(**kwargs):
+    """Write buffered ApiUsage rows before the worker process exits (atexit may not run)."""
+    from app.services.usage_recorder import usage_recorder
+
+    written = usage_recorder.flush()
+    if usage_recorder.pending():
+        logger.error(f"Worker exiting with {usage_recorder.pending()} unwritten ApiUsage rows")
+    elif written:
+        logger.info(f"Flushed {written} ApiUsage rows on shutdown")
+
+
 if __name__ == "__main__":
     logger.info("Starting Celery worker...")
     celery_app.start() 
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from typing import List
 
 
@@ -37,6 +38,79 @@ class Settings:
     CELERY_TASK_TIME_LIMIT: int = 30 * 60  # 30 minutes
     CELERY_TASK_SOFT_TIME_LIMIT: int = 25 * 60  # 25 minutes
     
+    # Facebook Ad Library GraphQL fetching
+    FACEBOOK_GRAPHQL_MAX_CONCURRENCY: int = int(os.getenv("FACEBOOK_GRAPHQL_MAX_CONCURRENCY", "4"))  # in-flight requests per host
+    FACEBOOK_GRAPHQL_TIMEOUT: float = float(os.getenv("FACEBOOK_GRAPHQL_TIMEOUT", "30"))
+    FACEBOOK_GRAPHQL_MAX_RETRIES: int = int(os.getenv("FACEBOOK_GRAPHQL_MAX_RETRIES", "4"))
+    # Shared across all workers (Redis token bucket): sustained requests/sec and burst size
+    FACEBOOK_GRAPHQL_RATE_PER_SECOND: float = float(os.getenv("FACEBOOK_GRAPHQL_RATE_PER_SECOND", "2"))
+    FACEBOOK_GRAPHQL_BURST: int = int(os.getenv("FACEBOOK_GRAPHQL_BURST", "10"))
+
+    # Streaming extraction: ads per upsert batch, media hashing threads, items buffered between stages
+    EXTRACTION_BATCH_SIZE: int = int(os.getenv("EXTRACTION_BATCH_SIZE", "100"))
+    EXTRACTION_HASH_WORKERS: int = int(os.getenv("EXTRACTION_HASH_WORKERS", "4"))
+    EXTRACTION_QUEUE_SIZE: int = int(os.getenv("EXTRACTION_QUEUE_SIZE", "2"))
+
+    # Threads per lane for blocking work called from async routes, and requests allowed to wait for one
+    OFFLOAD_AD_LIBRARY_CONCURRENCY: int = int(os.getenv("OFFLOAD_AD_LIBRARY_CONCURRENCY", "4"))
+    OFFLOAD_MEDIA_CONCURRENCY: int = int(os.getenv("OFFLOAD_MEDIA_CONCURRENCY", "4"))
+    OFFLOAD_SCRAPE_CONCURRENCY: int = int(os.getenv("OFFLOAD_SCRAPE_CONCURRENCY", "2"))
+    OFFLOAD_MAX_WAITING: int = int(os.getenv("OFFLOAD_MAX_WAITING", "32"))
+
+    # Media downloads: parallel downloads per save, per-request timeout (seconds)
+    MEDIA_DOWNLOAD_WORKERS: int = int(os.getenv("MEDIA_DOWNLOAD_WORKERS", "8"))
+    MEDIA_DOWNLOAD_TIMEOUT: float = float(os.getenv("MEDIA_DOWNLOAD_TIMEOUT", "30"))
+
+    # Bulk media URL refresh: parallel Ad Library lookups, result pages read per advertiser
+    MEDIA_REFRESH_WORKERS: int = int(os.getenv("MEDIA_REFRESH_WORKERS", "4"))
+    MEDIA_REFRESH_PAGE_SCAN_PAGES: int = int(os.getenv("MEDIA_REFRESH_PAGE_SCAN_PAGES", "10"))
+
+    # Gemini file/cache reuse: skip assets expiring within the margin; caches with this many
+    # hits get their TTL extended once they are within the window of expiring (seconds)
+    GEMINI_ASSET_EXPIRY_MARGIN_SECONDS: int = int(os.getenv("GEMINI_ASSET_EXPIRY_MARGIN_SECONDS", "600"))
+    GEMINI_CACHE_HOT_HITS: int = int(os.getenv("GEMINI_CACHE_HOT_HITS", "2"))
+    GEMINI_CACHE_EXTEND_WITHIN_SECONDS: int = int(os.getenv("GEMINI_CACHE_EXTEND_WITHIN_SECONDS", "7200"))
+    # Gemini Files API uploads: bytes per resumable chunk, resumes per file, parallel uploads
+    GEMINI_UPLOAD_CHUNK_BYTES: int = int(os.getenv("GEMINI_UPLOAD_CHUNK_BYTES", str(8 * 1024 * 1024)))
+    GEMINI_UPLOAD_MAX_RETRIES: int = int(os.getenv("GEMINI_UPLOAD_MAX_RETRIES", "5"))
+    GEMINI_UPLOAD_WORKERS: int = int(os.getenv("GEMINI_UPLOAD_WORKERS", "3"))
+
+    # Gemini key scheduling: per-key requests and tokens per minute (0 = unlimited), base
+    # cooldown after a 429 (doubles while they repeat), longest wait for a free key (seconds)
+    GEMINI_KEY_RPM: int = int(os.getenv("GEMINI_KEY_RPM", "60"))
+    GEMINI_KEY_TPM: int = int(os.getenv("GEMINI_KEY_TPM", "1000000"))
+    GEMINI_KEY_COOLDOWN_SECONDS: float = float(os.getenv("GEMINI_KEY_COOLDOWN_SECONDS", "30"))
+    GEMINI_KEY_MAX_WAIT_SECONDS: float = float(os.getenv("GEMINI_KEY_MAX_WAIT_SECONDS", "120"))
+
+    # Batch analysis: creatives in flight per ready Gemini key, seconds between orchestration
+    # steps, creatives per scheduled (beat) batch
+    BATCH_ANALYSIS_PER_KEY_CONCURRENCY: int = int(os.getenv("BATCH_ANALYSIS_PER_KEY_CONCURRENCY", "2"))
+    BATCH_ANALYSIS_POLL_SECONDS: int = int(os.getenv("BATCH_ANALYSIS_POLL_SECONDS", "15"))
+    BATCH_ANALYSIS_MAX_CREATIVES: int = int(os.getenv("BATCH_ANALYSIS_MAX_CREATIVES", "200"))
+
+    # ApiUsage rows are buffered and written in batches: rows per insert, seconds between
+    # flushes, rows kept in memory while the database is unreachable
+    USAGE_FLUSH_BATCH: int = int(os.getenv("USAGE_FLUSH_BATCH", "50"))
+    USAGE_FLUSH_SECONDS: float = float(os.getenv("USAGE_FLUSH_SECONDS", "2"))
+    USAGE_BUFFER_LIMIT: int = int(os.getenv("USAGE_BUFFER_LIMIT", "10000"))
+    # Days to keep raw api_usage rows and hourly rollups (daily and all-time rollups are kept)
+    USAGE_RAW_RETENTION_DAYS: int = int(os.getenv("USAGE_RAW_RETENTION_DAYS", "30"))
+    USAGE_HOURLY_RETENTION_DAYS: int = int(os.getenv("USAGE_HOURLY_RETENTION_DAYS", "90"))
+
+    # Downloaded videos shared by analysis, merging and hashing: directory, size bound (LRU
+    # eviction), seconds a fetched file stays pinned against eviction unless released sooner
+    VIDEO_CACHE_DIR: str = os.getenv("VIDEO_CACHE_DIR", os.path.join(tempfile.gettempdir(), "admind_video_cache"))
+    VIDEO_CACHE_MAX_BYTES: int = int(os.getenv("VIDEO_CACHE_MAX_BYTES", str(10 * 1024 ** 3)))
+    VIDEO_CACHE_PIN_SECONDS: float = float(os.getenv("VIDEO_CACHE_PIN_SECONDS", "3600"))
+
+    # In-memory AppSetting snapshot: seconds between version checks, forced reload age
+    APP_SETTINGS_CHECK_SECONDS: float = float(os.getenv("APP_SETTINGS_CHECK_SECONDS", "5"))
+    APP_SETTINGS_MAX_AGE_SECONDS: float = float(os.getenv("APP_SETTINGS_MAX_AGE_SECONDS", "300"))
+
+    # In-process AdSet Hamming index: seconds between version checks, forced full reload age
+    AD_SET_INDEX_CHECK_SECONDS: float = float(os.getenv("AD_SET_INDEX_CHECK_SECONDS", "5"))
+    AD_SET_INDEX_MAX_AGE_SECONDS: float = float(os.getenv("AD_SET_INDEX_MAX_AGE_SECONDS", "600"))
+    
     # AI Service Configuration
     GOOGLE_AI_API_KEY: str = os.getenv("GOOGLE_AI_API_KEY", "")
     GOOGLE_AI_MODEL: str = os.getenv("GOOGLE_AI_MODEL", "gemini-pro")
@@ -17,6 +17,7 @@ from app.core.config import settings
 # Import routers
 from app.routers import health, ads, competitors, categories, daily_scraping, favorites, settings as settings_router
 from app.api import internal_router
+from app.services.offload import LaneFullError
 
 # Database imports
 from app.database import engine, Base
@@ -79,6 +80,15 @@ async def root():
         "health": f"{settings.API_V1_PREFIX}/health"
     }
 
+# A blocking-work lane is saturated: ask the client to retry instead of queueing without bound
+@app.exception_handler(LaneFullError)
+async def lane_full_exception_handler(request, exc):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"}
+    )
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
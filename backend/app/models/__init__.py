@@ -8,15 +8,21 @@ from .app_setting import AppSetting
 from .veo_generation import VeoGeneration
 from .merged_video import MergedVideo
 from .api_usage import ApiUsage
+from .api_usage_rollup import ApiUsageRollup
 from .video_style_template import VideoStyleTemplate
 from .veo_script_session import VeoScriptSession
 from .veo_creative_brief import VeoCreativeBrief
 from .veo_prompt_segment import VeoPromptSegment
 from .veo_video_generation import VeoVideoGeneration
 from .saved_image import SavedImage
+from .media_hash import MediaHash
+from .scrape_checkpoint import ScrapeCheckpoint
+from .media_file import MediaFile, MediaFileRef
+from .gemini_asset import GeminiAsset
 
 __all__ = [
     "Category", "Competitor", "Ad", "AdAnalysis", "TaskStatus", "AdSet", "AppSetting", 
     "VeoGeneration", "MergedVideo", "ApiUsage", "VideoStyleTemplate",
-    "VeoScriptSession", "VeoCreativeBrief", "VeoPromptSegment", "VeoVideoGeneration", "SavedImage"
+    "VeoScriptSession", "VeoCreativeBrief", "VeoPromptSegment", "VeoVideoGeneration", "SavedImage",
+    "MediaHash", "ScrapeCheckpoint", "MediaFile", "MediaFileRef", "GeminiAsset", "ApiUsageRollup"
 ]
@@ -1,7 +1,12 @@
-from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, ForeignKey, JSON, Boolean, func, Float, ARRAY
+import logging
+
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Date, DateTime, ForeignKey, JSON, Boolean, func, Float, ARRAY, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import relationship
 from app.database import Base
 
+logger = logging.getLogger(__name__)
+
 
 class Ad(Base):
     __tablename__ = "ads"
@@ -38,26 +43,44 @@ class Ad(Base):
     targeting = Column(JSON, nullable=True)
     lead_form = Column(JSON, nullable=True)
     creatives = Column(JSON, nullable=True)
+    
+    # Hot fields promoted out of meta/creatives so filters and sorts can use indexes
+    # (written by extraction, see app.services.ad_columns)
+    is_active = Column(Boolean, nullable=True, index=True)
+    start_date = Column(Date, nullable=True, index=True)
+    end_date = Column(Date, nullable=True, index=True)
+    media_type = Column(String(20), nullable=True, index=True)  # carousel / video / image / text / unknown
+    page_id = Column(String, nullable=True, index=True)
+    cta_type = Column(String(50), nullable=True, index=True)
+    primary_media_url = Column(Text, nullable=True)
+    
+    # Full-text search over ad copy (app.services.ad_search); search_text also backs the
+    # trigram typo fallback, whose GIN index is created by migration (needs pg_trgm)
+    search_text = Column(Text, nullable=True)
+    search_vector = Column(TSVECTOR, nullable=True)
+    
+    # Precomputed listing card (app.services.ad_card), refreshed whenever the content above changes
+    # none_as_null: a cleared card is SQL NULL, which the backfill looks for
+    card = Column(JSON(none_as_null=True), nullable=True)
+    
+    __table_args__ = (
+        Index("ix_ads_competitor_id_start_date", "competitor_id", "start_date"),
+        Index("ix_ads_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
     def __repr__(self):
         return f"<Ad(id={self.id}, ad_archive_id='{self.ad_archive_id}')>"
     
-    def to_dict(self):
-        """Convert Ad instance to dictionary for JSON serialization"""
-        date_found_iso = None
-        if hasattr(self, 'date_found') and self.date_found is not None:
-            date_found_iso = self.date_found.isoformat()
-            
-        created_at_iso = None
-        if hasattr(self, 'created_at') and self.created_at is not None:
-            created_at_iso = self.created_at.isoformat()
-            
-        updated_at_iso = None
-        if hasattr(self, 'updated_at') and self.updated_at is not None:
-            updated_at_iso = self.updated_at.isoformat()
-        
+    def content_fields(self):
+        """
+        Card content merged from raw_data, creatives, meta and the legacy snapshot.
+
+        Returns ``(raw, creatives)``: the flattened display fields and the creatives
+        list, synthesized from raw data when the ad has none. Only column data is
+        read, so this is safe on transient instances.
+        """
         # Extract data from raw_data if available
-        raw = self.raw_data or {}
+        raw = dict(self.raw_data or {})
         
         # If raw_data is empty or missing key fields, try to extract from creatives
         if (not raw or not raw.get("main_title")) and self.creatives and len(self.creatives) > 0:
@@ -172,32 +195,6 @@ class Ad(Base):
                         raw["media_type"] = "image"
                         raw["media_url"] = image_urls[0]
         
-        # Get competitor data
-        competitor_data = None
-        if hasattr(self, 'competitor') and self.competitor:
-            competitor_data = {
-                "id": self.competitor.id,
-                "name": self.competitor.name,
-                "page_id": self.competitor.page_id,
-                "is_active": self.competitor.is_active
-            }
-        
-        # Get analysis data
-        analysis_data = None
-        if hasattr(self, 'analysis') and self.analysis:
-            analysis_data = {
-                "id": self.analysis.id,
-                "summary": self.analysis.summary,
-                "hook_score": self.analysis.hook_score,
-                "overall_score": self.analysis.overall_score,
-                "confidence_score": self.analysis.confidence_score,
-                "target_audience": self.analysis.target_audience,
-                "content_themes": self.analysis.content_themes,
-                "analysis_version": self.analysis.analysis_version,
-                "created_at": self.analysis.created_at.isoformat() if self.analysis.created_at else None,
-                "updated_at": self.analysis.updated_at.isoformat() if self.analysis.updated_at else None
-            }
-        
         # Build creatives array from raw_data if not already populated
         creatives_data = self.creatives if self.creatives else []
         
@@ -211,9 +208,7 @@ class Ad(Base):
             has_media = raw.get("main_image_urls") or raw.get("main_video_urls")
             has_content = raw.get("main_title") or raw.get("main_body_text")
             
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.info(f"Ad {self.id}: Building creatives - has_media={bool(has_media)}, has_content={bool(has_content)}, video_urls={raw.get('main_video_urls')}, image_urls={raw.get('main_image_urls')}")
+            logger.debug(f"Ad {self.id}: Building creatives - has_media={bool(has_media)}, has_content={bool(has_content)}, video_urls={raw.get('main_video_urls')}, image_urls={raw.get('main_image_urls')}")
             
             if has_media or has_content:
                 # Build a single creative from the extracted data
@@ -246,7 +241,51 @@ class Ad(Base):
                 }
                 
                 creatives_data = [creative]
-                logger.info(f"Ad {self.id}: Built creatives_data with {len(creatives_data)} creative(s), media count: {len(media_list)}")
+                logger.debug(f"Ad {self.id}: Built creatives_data with {len(creatives_data)} creative(s), media count: {len(media_list)}")
+        
+        return raw, creatives_data
+    
+    def to_dict(self):
+        """Convert Ad instance to dictionary for JSON serialization"""
+        date_found_iso = None
+        if hasattr(self, 'date_found') and self.date_found is not None:
+            date_found_iso = self.date_found.isoformat()
+            
+        created_at_iso = None
+        if hasattr(self, 'created_at') and self.created_at is not None:
+            created_at_iso = self.created_at.isoformat()
+            
+        updated_at_iso = None
+        if hasattr(self, 'updated_at') and self.updated_at is not None:
+            updated_at_iso = self.updated_at.isoformat()
+        
+        raw, creatives_data = self.content_fields()
+        
+        # Get competitor data
+        competitor_data = None
+        if hasattr(self, 'competitor') and self.competitor:
+            competitor_data = {
+                "id": self.competitor.id,
+                "name": self.competitor.name,
+                "page_id": self.competitor.page_id,
+                "is_active": self.competitor.is_active
+            }
+        
+        # Get analysis data
+        analysis_data = None
+        if hasattr(self, 'analysis') and self.analysis:
+            analysis_data = {
+                "id": self.analysis.id,
+                "summary": self.analysis.summary,
+                "hook_score": self.analysis.hook_score,
+                "overall_score": self.analysis.overall_score,
+                "confidence_score": self.analysis.confidence_score,
+                "target_audience": self.analysis.target_audience,
+                "content_themes": self.analysis.content_themes,
+                "analysis_version": self.analysis.analysis_version,
+                "created_at": self.analysis.created_at.isoformat() if self.analysis.created_at else None,
+                "updated_at": self.analysis.updated_at.isoformat() if self.analysis.updated_at else None
+            }
         
         # Get ad_set data for date range
         ad_set_first_seen_date = None
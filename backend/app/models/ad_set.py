@@ -11,6 +11,10 @@ class AdSet(Base):
     
     # Content signature - perceptual hash of the representative ad's media (stable visual identifier)
     content_signature = Column(String, unique=True, nullable=False, index=True)
+
+    # content_signature as a signed 64-bit integer (NULL for non-hash fallback signatures),
+    # used by the in-memory Hamming index for candidate lookup
+    signature_hash = Column(BigInteger, nullable=True, index=True)
     
     # Count of ad variants in this set
     variant_count = Column(Integer, default=0, nullable=False)
@@ -0,0 +1,40 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Float, UniqueConstraint, Index
+from app.database import Base
+
+
+class ApiUsageRollup(Base):
+    """ApiUsage totals per time bucket, model, provider, API key index and request type.
+
+    ``granularity`` is "hour", "day" or "total" (one all-time bucket starting at
+    the epoch), so dashboards read a handful of rows however long the history is.
+    Rows are incremented in the same transaction that inserts the raw
+    ``api_usage`` rows; a missing key index is stored as -1 and a missing
+    request type as "" so the unique key covers them.
+    """
+    __tablename__ = "api_usage_rollups"
+    __table_args__ = (
+        UniqueConstraint(
+            "granularity", "bucket_start", "model_name", "provider", "api_key_index", "request_type",
+            name="uq_api_usage_rollups_bucket",
+        ),
+        Index("ix_api_usage_rollups_granularity_bucket", "granularity", "bucket_start"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    granularity = Column(String(10), nullable=False)
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    model_name = Column(String(255), nullable=False)
+    provider = Column(String(50), nullable=False)
+    api_key_index = Column(Integer, nullable=False, default=-1)
+    request_type = Column(String(100), nullable=False, default="")
+
+    requests = Column(BigInteger, nullable=False, default=0)
+    prompt_tokens = Column(BigInteger, nullable=False, default=0)
+    cached_tokens = Column(BigInteger, nullable=False, default=0)
+    completion_tokens = Column(BigInteger, nullable=False, default=0)
+    total_tokens = Column(BigInteger, nullable=False, default=0)
+    estimated_cost_usd = Column(Float, nullable=False, default=0.0)
+    last_used_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<ApiUsageRollup({self.granularity} {self.bucket_start}, model={self.model_name}, requests={self.requests})>"
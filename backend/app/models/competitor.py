@@ -14,6 +14,9 @@ class Competitor(Base):
     category_id = Column(Integer, ForeignKey("categories.id", ondelete="SET NULL"), nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Outcome of the last scheduled scrape; orders the next run (stalest, highest yield first)
+    last_scraped_at = Column(DateTime(timezone=True), nullable=True)
+    last_scrape_yield = Column(Integer, nullable=True)  # new ads found by that scrape
 
     # Relationships
     ads = relationship("Ad", back_populates="competitor")
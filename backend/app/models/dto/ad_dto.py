@@ -198,6 +198,7 @@ class AdFilterParams(BaseModel):
     search: Optional[str] = None
     sort_by: Optional[str] = "date_found"
     sort_order: Optional[str] = "desc"
+    cursor: Optional[str] = None  # Keyset cursor from a previous page (overrides page)
     
     # Additional fields referenced in code
     campaign_id: Optional[int] = None
@@ -447,6 +448,7 @@ class PaginationMetadata(BaseModel):
     total_pages: int = Field(..., description="Total number of pages")
     has_next: bool = Field(..., description="Whether there's a next page")
     has_previous: bool = Field(..., description="Whether there's a previous page")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page (keyset pagination)")
 
 
 class PaginatedAdResponseDTO(BaseModel):
@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, String, DateTime, UniqueConstraint, Index, func
+from app.database import Base
+
+
+class GeminiAsset(Base):
+    """An uploaded Gemini file, and optionally an explicit cache over it, for one creative.
+
+    Rows are keyed by the SHA-256 of the media bytes, so the same creative behind
+    another CDN URL or ad reuses them; ``url_key`` (see ``cache_url``: signed CDN
+    URLs without their query, other URLs in full) lets a known URL hit without
+    downloading. Files and caches belong to the API key that
+    created them (``api_key_index``). A row with an empty ``instruction_hash`` only
+    records the upload; cache rows carry the hash of system instruction + model.
+    """
+    __tablename__ = "gemini_assets"
+    __table_args__ = (
+        UniqueConstraint("content_sha256", "api_key_index", "instruction_hash", name="uq_gemini_assets_content_key_instruction"),
+        Index("ix_gemini_assets_content_instruction", "content_sha256", "instruction_hash"),
+        Index("ix_gemini_assets_url_key_instruction", "url_key", "instruction_hash"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_sha256 = Column(String(64), nullable=False)
+    url_key = Column(String, nullable=True)
+    instruction_hash = Column(String(64), nullable=False, default="")
+    api_key_index = Column(Integer, nullable=False)
+
+    file_uri = Column(String, nullable=False)
+    file_expires_at = Column(DateTime(timezone=True), nullable=True)
+    model = Column(String(100), nullable=True)
+    cache_name = Column(String, nullable=True)
+    cache_expires_at = Column(DateTime(timezone=True), nullable=True)
+
+    hit_count = Column(Integer, default=0, nullable=False)
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<GeminiAsset(id={self.id}, sha256='{self.content_sha256[:12]}', key={self.api_key_index}, cache='{self.cache_name}')>"
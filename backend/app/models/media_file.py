@@ -0,0 +1,49 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, UniqueConstraint, Index, func
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+
+class MediaFile(Base):
+    """A saved media file under the storage root (one row per competitor-folder link).
+
+    ``local_path`` is the path stored in ``Ad.raw_data['local_media']``; several
+    rows may share a ``sha256`` when the same creative is linked into more than
+    one competitor folder. Ads referencing the file are ``MediaFileRef`` rows, so
+    unreferenced files are found with one indexed query.
+    """
+    __tablename__ = "media_files"
+    __table_args__ = (
+        Index("ix_media_files_mtime", "mtime"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    local_path = Column(String, unique=True, nullable=False)
+    sha256 = Column(String(64), nullable=True, index=True)
+    media_type = Column(String(10), nullable=False)  # "image" or "video"
+    file_size = Column(BigInteger, nullable=False, default=0)
+    mtime = Column(DateTime(timezone=True), nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    refs = relationship("MediaFileRef", back_populates="media_file", cascade="all, delete-orphan", passive_deletes=True)
+
+    def __repr__(self):
+        return f"<MediaFile(id={self.id}, local_path='{self.local_path}')>"
+
+
+class MediaFileRef(Base):
+    """An ad referencing a saved media file as one of its images or videos."""
+    __tablename__ = "media_file_refs"
+    __table_args__ = (
+        UniqueConstraint("media_file_id", "ad_id", "role", name="uq_media_file_refs_file_ad_role"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    media_file_id = Column(Integer, ForeignKey("media_files.id", ondelete="CASCADE"), nullable=False)
+    ad_id = Column(BigInteger, ForeignKey("ads.id", ondelete="CASCADE"), nullable=False, index=True)
+    role = Column(String(10), nullable=False)  # "image" or "video"
+
+    media_file = relationship("MediaFile", back_populates="refs")
+
+    def __repr__(self):
+        return f"<MediaFileRef(media_file_id={self.media_file_id}, ad_id={self.ad_id}, role='{self.role}')>"
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, JSON, UniqueConstraint, Index, func
+from app.database import Base
+
+
+class MediaHash(Base):
+    """Persisted perceptual hashes for remote media, keyed by normalized URL.
+
+    Facebook CDN URLs rotate their query strings on every fetch, so rows are
+    keyed by ``netloc + path`` (see ``normalize_media_url``) and, when the CDN
+    reports them, by ETag/Content-Length as a secondary content digest.
+    """
+    __tablename__ = "media_hashes"
+    __table_args__ = (
+        UniqueConstraint("url_key", "hash_kind", name="uq_media_hashes_url_key_kind"),
+        Index("ix_media_hashes_etag_kind", "etag", "hash_kind"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    url_key = Column(String, nullable=False, index=True)  # Normalized netloc+path
+    hash_kind = Column(String(50), nullable=False)  # e.g. "image:ahash8", "video:ahash8:s6"
+
+    # Optional content digest reported by the CDN
+    etag = Column(String, nullable=True)
+    content_length = Column(BigInteger, nullable=True)
+
+    # Hex-encoded hashes; a single entry for images, one per sampled frame for videos
+    hashes = Column(JSON, nullable=False)
+
+    hit_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<MediaHash(id={self.id}, url_key='{self.url_key[:40]}', kind='{self.hash_kind}')>"
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, LargeBinary, ForeignKey, UniqueConstraint, func
+from app.database import Base
+
+
+class ScrapeCheckpoint(Base):
+    """High-water mark of incremental scraping for one (competitor, country, active_status).
+
+    ``seen_filter`` is a Bloom filter over the ad_archive_ids seen for the
+    competitor (see ``AdIdBloomFilter``); ``max_start_date`` is the newest ad
+    start date seen and ``last_cursor`` the cursor after the last page fetched.
+    """
+    __tablename__ = "scrape_checkpoints"
+    __table_args__ = (
+        UniqueConstraint("competitor_id", "country", "active_status", name="uq_scrape_checkpoints_scope"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    competitor_id = Column(Integer, ForeignKey("competitors.id", ondelete="CASCADE"), nullable=False, index=True)
+    country = Column(String(64), nullable=False)  # Sorted, comma-joined country codes of the search
+    active_status = Column(String(20), nullable=False)
+
+    last_cursor = Column(Text, nullable=True)
+    seen_filter = Column(LargeBinary, nullable=True)
+    seen_count = Column(Integer, default=0, nullable=False)
+    max_start_date = Column(Date, nullable=True)
+
+    last_run_at = Column(DateTime(timezone=True), nullable=True)
+    last_run_pages = Column(Integer, nullable=True)
+    last_run_new_ads = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<ScrapeCheckpoint(competitor_id={self.competitor_id}, country='{self.country}', active_status='{self.active_status}')>"
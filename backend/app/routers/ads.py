@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
 from typing import List, Optional, TYPE_CHECKING, Dict, Any
 from datetime import datetime
@@ -12,7 +13,7 @@ from app.models.dto.ad_dto import (
     PaginatedAdResponseDTO,
     AdDetailResponseDTO,
     AdFilterParams,
-    AdStatsResponseDTO,
+    AdStats,
     AdResponseDTO,
     AnalyzeVideoRequest,
     AnalyzeVideoResponse
@@ -21,6 +22,9 @@ from app.models import Ad, TaskStatus, Competitor
 from app.services.facebook_ads_scraper import FacebookAdsScraperService, FacebookAdsScraperConfig
 from app.services.ingestion_service import DataIngestionService
 from app.services.enhanced_ad_extraction import EnhancedAdExtractionService
+from app.services.ad_pagination import InvalidCursorError
+from app.services.response_cache import TAG_ADS, TAG_ANALYSIS, TAG_COMPETITORS, cached_response
+from app.services.offload import ad_library_lane, media_lane
 from app.services.unified_analysis_service import UnifiedAnalysisService
 
 # Import Celery tasks
@@ -125,6 +129,20 @@ def get_ad_service_dependency(db: Session = Depends(get_db)) -> "AdService":
 # Main Dashboard API Endpoints
 # ========================================
 
+# Read-through cached loaders (app.services.response_cache); listings change with
+# ingestion, favorites, analyses and competitor edits
+_LISTING_TAGS = (TAG_ADS, TAG_ANALYSIS, TAG_COMPETITORS)
+
+@cached_response("ads:list", tags=_LISTING_TAGS, fresh_ttl=15, stale_ttl=120)
+def _cached_ads_listing(db: Session, **filters) -> Dict[str, Any]:
+    from app.services.ad_service import AdService
+    return AdService(db).get_ads_payload(AdFilterParams(**filters))
+
+@cached_response("ad_sets:list", tags=_LISTING_TAGS, fresh_ttl=15, stale_ttl=120)
+def _cached_ad_sets(db: Session, page: int, page_size: int, sort_by: str, sort_order: str) -> Dict[str, Any]:
+    from app.services.ad_service import AdService
+    return AdService(db).get_ad_sets_payload(page, page_size, sort_by, sort_order)
+
 @router.get("/ads", response_model=PaginatedAdResponseDTO)
 async def get_ads(
     page: int = Query(1, ge=1, description="Page number"),
@@ -144,9 +162,10 @@ async def get_ads(
     date_to: Optional[datetime] = Query(None, description="Filter ads to this date"),
     is_active: Optional[bool] = Query(None, description="Filter by active status"),
     is_favorite: Optional[bool] = Query(None, description="Filter by favorite status"),
-    search: Optional[str] = Query(None, description="Search in ad copy and titles"),
-    sort_by: Optional[str] = Query("created_at", description="Sort by field (created_at, date_found, updated_at, variant_count, hook_score, overall_score)"),
+    search: Optional[str] = Query(None, description="Full-text search in ad copy, titles and page names (\"quoted\" for phrases)"),
+    sort_by: Optional[str] = Query("created_at", description="Sort by field (created_at, date_found, updated_at, variant_count, duration_days, hook_score, overall_score, relevance)"),
     sort_order: Optional[str] = Query("desc", description="Sort order (asc/desc)"),
+    cursor: Optional[str] = Query(None, description="Cursor from pagination.next_cursor; fetches the following page without OFFSET"),
     ad_service: "AdService" = Depends(get_ad_service_dependency)
 ) -> PaginatedAdResponseDTO:
     """
@@ -177,15 +196,16 @@ async def get_ads(
             is_favorite=is_favorite,
             search=search,
             sort_by=sort_by,
-            sort_order=sort_order
+            sort_order=sort_order,
+            cursor=cursor
         )
         
-        # Get ads using service
-        result = ad_service.get_ads(filters)
-        
-        logger.info(f"Retrieved {len(result.data)} ads for page {page}")
-        return result
+        # Cards are precomputed and already response-shaped; the serialized page is cached
+        body = _cached_ads_listing(ad_service.db, **filters.model_dump())
+        return Response(content=body, media_type="application/json")
         
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching ads: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error fetching ads: {str(e)}")
@@ -536,6 +556,10 @@ async def refresh_media_from_facebook(
     
     No manual URL input required - everything is automatic!
     """
+    return await media_lane.run(_refresh_media_from_facebook, ad_id, db)
+
+
+def _refresh_media_from_facebook(ad_id: int, db: Session):
     try:
         from app.services.media_refresh_service import MediaRefreshService
         
@@ -588,6 +612,10 @@ async def refresh_all_favorites(
     
     Useful when you want to refresh all your favorite ads' media links at once!
     """
+    return await media_lane.run(_refresh_all_favorites, db)
+
+
+def _refresh_all_favorites(db: Session):
     try:
         from app.services.media_refresh_service import MediaRefreshService
         
@@ -641,6 +669,10 @@ async def refresh_ad_set_media(
     
     Useful when you want to refresh all variants of an ad!
     """
+    return await media_lane.run(_refresh_ad_set_media, ad_set_id, db)
+
+
+def _refresh_ad_set_media(ad_set_id: int, db: Session):
     try:
         from app.services.media_refresh_service import MediaRefreshService
         from app.models.ad_set import AdSet
@@ -687,6 +719,50 @@ async def refresh_ad_set_media(
         logger.error(f"Error refreshing ad set {ad_set_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error refreshing ad set: {str(e)}")
 
+
+class BulkRefreshRequest(BaseModel):
+    """Request model for a background bulk media refresh"""
+    ad_ids: Optional[List[int]] = None
+    ad_set_id: Optional[int] = None
+    favorites: bool = False
+
+
+@router.post("/ads/media/refresh-bulk")
+async def refresh_media_bulk(
+    request: BulkRefreshRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Refresh media URLs for many ads in the background.
+    
+    Targets the given ``ad_ids``, every ad of ``ad_set_id`` and/or all favorites.
+    Ads of the same advertiser share one page search; poll
+    ``/tasks/{task_id}/status`` for progress.
+    """
+    try:
+        ad_ids = list(request.ad_ids or [])
+        if request.ad_set_id is not None:
+            ad_ids += [ad_id for (ad_id,) in db.query(Ad.id).filter(Ad.ad_set_id == request.ad_set_id).all()]
+        if request.favorites:
+            ad_ids += [ad_id for (ad_id,) in db.query(Ad.id).filter(Ad.is_favorite == True).all()]
+        ad_ids = list(dict.fromkeys(ad_ids))
+        if not ad_ids:
+            raise HTTPException(status_code=400, detail="No ads to refresh")
+        
+        task = celery_app.send_task('ads.refresh_media_bulk', args=[ad_ids])
+        
+        return {
+            "message": f"Media refresh started for {len(ad_ids)} ads",
+            "task_id": task.id,
+            "total": len(ad_ids)
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error starting bulk media refresh: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error starting bulk media refresh: {str(e)}")
+
 # ========================================
 # Search Facebook Ad Library directly
 # ========================================
@@ -739,6 +815,10 @@ async def search_ad_library(
     - Keyword search: {"query_string": "real estate", "countries": ["AE", "US"]}
     - Page search: {"page_id": "123456789", "countries": ["AE"]}
     """
+    return await ad_library_lane.run(_search_ad_library, request, db)
+
+
+def _search_ad_library(request: AdLibrarySearchRequest, db: Session):
     try:
         from datetime import datetime
         start_time = datetime.utcnow()
@@ -950,7 +1030,7 @@ async def search_ad_library(
             total_ads_found=total_ads_found,
             total_ads_saved=total_ads_saved,
             total_unique_ads=total_unique_ads,
-            pages_scraped=len(all_json_responses),
+            pages_scraped=stats.get("pages_scraped", len(all_json_responses)),
             stats=stats,
             ads_preview=ads_preview,
             message=" | ".join(message_parts),
@@ -995,6 +1075,10 @@ async def save_selected_ads(
     2. Select which ads they want to save
     3. Save only the selected ads to the database
     """
+    return await ad_library_lane.run(_save_selected_ads, request, db)
+
+
+def _save_selected_ads(request: SaveSelectedAdsRequest, db: Session):
     try:
         if not request.ad_archive_ids:
             raise HTTPException(status_code=400, detail="No ad archive IDs provided")
@@ -1103,6 +1187,10 @@ async def download_from_ad_library(
     Examples of accepted URL:
     - https://www.facebook.com/ads/library/?id=1165490822069878
     """
+    return await ad_library_lane.run(_download_from_ad_library, request, db)
+
+
+def _download_from_ad_library(request: DownloadFromLibraryRequest, db: Session):
     try:
         # Determine ad_archive_id
         ad_archive_id = request.ad_archive_id
@@ -1205,12 +1293,8 @@ async def download_from_ad_library(
                 from app.services.media_storage_service import MediaStorageService
                 storage = MediaStorageService(db)
 
-                for item in selected_urls:
-                    file_info = storage.download_and_save_file(
-                        item["url"],
-                        'video' if item["type"] == 'video' else 'image',
-                        competitor_name=competitor_name
-                    )
+                files = [(item["url"], 'video' if item["type"] == 'video' else 'image') for item in selected_urls]
+                for item, file_info in zip(selected_urls, storage.download_files(files, competitor_name=competitor_name)):
                     if file_info:
                         downloaded.append(
                             DownloadedFile(
@@ -2331,7 +2415,12 @@ async def analyze_video_from_library(
         logger.error(f"Error analyzing video: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error analyzing video: {str(e)}")
 
-@router.get("/ads/stats/overview", response_model=AdStatsResponseDTO)
+@cached_response("ads:stats", tags=(TAG_ADS,), fresh_ttl=60, stale_ttl=600)
+def _cached_ad_stats(db: Session):
+    from app.services.ad_service import AdService
+    return AdService(db).get_ad_stats()
+
+@router.get("/ads/stats/overview", response_model=AdStats)
 async def get_ads_stats(
     ad_service: "AdService" = Depends(get_ad_service_dependency)
 ):
@@ -2339,8 +2428,7 @@ async def get_ads_stats(
     Get comprehensive statistics about ads and analysis for the dashboard.
     """
     try:
-        stats = ad_service.get_ad_stats()
-        return stats
+        return Response(content=_cached_ad_stats(ad_service.db), media_type="application/json")
         
     except Exception as e:
         logger.error(f"Error fetching ad stats: {str(e)}")
@@ -2348,15 +2436,16 @@ async def get_ads_stats(
 
 @router.get("/ads/search", response_model=List[AdResponseDTO])
 async def search_ads(
-    q: str = Query(..., description="Search query"),
+    q: str = Query(..., description="Search query (\"quoted\" text matches as a phrase)"),
     limit: int = Query(50, ge=1, le=100, description="Maximum number of results"),
+    fuzzy: bool = Query(True, description="Fall back to typo-tolerant matching when nothing matches exactly"),
     ad_service: "AdService" = Depends(get_ad_service_dependency)
 ):
     """
-    Search ads by text content in ad copy, titles, and page names.
+    Search ads by text content in ad copy, titles, and page names, best matches first.
     """
     try:
-        results = ad_service.search_ads(q, limit)
+        results = ad_service.search_ads(q, limit, fuzzy=fuzzy)
         return results
         
     except Exception as e:
@@ -3373,22 +3462,8 @@ async def get_ad_sets(
     Each ad set is represented by its best/representative ad.
     """
     try:
-        result = ad_service.get_ad_sets(page, page_size, sort_by, sort_order)
-        
-        if not result:
-            return PaginatedAdResponseDTO(
-                data=[], 
-                pagination=PaginationMetadata(
-                    page=page, 
-                    page_size=page_size,
-                    total_items=0,
-                    total_pages=0,
-                    has_next=False,
-                    has_previous=False
-                )
-            )
-        
-        return result
+        body = _cached_ad_sets(ad_service.db, page=page, page_size=page_size, sort_by=sort_by, sort_order=sort_order)
+        return Response(content=body, media_type="application/json")
         
     except Exception as e:
         logger.error(f"Error fetching ad sets: {str(e)}")
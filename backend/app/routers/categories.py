@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
 from typing import List
 import logging
@@ -11,6 +12,7 @@ from app.models.dto.category_dto import (
     CategoryWithStatsDTO
 )
 from app.services.category_service import CategoryService
+from app.services.response_cache import TAG_ADS, TAG_CATEGORIES, TAG_COMPETITORS, cached_response
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -115,6 +117,11 @@ async def delete_category(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@cached_response("categories:stats", tags=(TAG_CATEGORIES, TAG_COMPETITORS, TAG_ADS), fresh_ttl=60, stale_ttl=600)
+def _cached_category_stats(db: Session):
+    return CategoryService(db).get_category_stats()
+
+
 @router.get("/stats/overview", response_model=List[CategoryWithStatsDTO])
 async def get_category_stats(
     category_service: CategoryService = Depends(get_category_service)
@@ -125,7 +132,7 @@ async def get_category_stats(
     Returns detailed stats including competitor count, total ads, and active ads for each category.
     """
     try:
-        return category_service.get_category_stats()
+        return Response(content=_cached_category_stats(category_service.db), media_type="application/json")
     except Exception as e:
         logger.error(f"Error in get_category_stats endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
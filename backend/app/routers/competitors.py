@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
 from typing import List, Optional, TYPE_CHECKING
 import logging
 from pydantic import BaseModel
 
 from app.database import get_db
+from app.services.response_cache import TAG_ADS, TAG_COMPETITORS, cached_response
+from app.services.offload import scrape_lane
 from app.models.dto.competitor_dto import (
     CompetitorCreateDTO,
     CompetitorUpdateDTO,
@@ -116,6 +119,10 @@ async def bulk_scrape_competitors(
     3. Return task IDs for monitoring progress
     4. Handle errors gracefully with retry logic
     """
+    return await scrape_lane.run(_bulk_scrape_competitors, scrape_request, competitor_service)
+
+
+def _bulk_scrape_competitors(scrape_request: BulkScrapeRequest, competitor_service: "CompetitorService") -> BulkTaskResponse:
     try:
         task_ids = []
         successful_starts = 0
@@ -434,6 +441,11 @@ async def delete_competitor(
 # Competitors Statistics & Search
 # ========================================
 
+@cached_response("competitors:stats", tags=(TAG_COMPETITORS, TAG_ADS), fresh_ttl=60, stale_ttl=600)
+def _cached_competitor_stats(db: Session):
+    from app.services.competitor_service import CompetitorService
+    return CompetitorService(db).get_competitor_stats()
+
 @router.get("/stats/overview", response_model=CompetitorStatsResponseDTO)
 async def get_competitor_stats(
     competitor_service: "CompetitorService" = Depends(get_competitor_service_dependency)
@@ -449,8 +461,7 @@ async def get_competitor_stats(
     - Average ads per competitor
     """
     try:
-        stats = competitor_service.get_competitor_stats()
-        return stats
+        return Response(content=_cached_competitor_stats(competitor_service.db), media_type="application/json")
         
     except Exception as e:
         logger.error(f"Error fetching competitor stats: {str(e)}")
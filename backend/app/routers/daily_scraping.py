@@ -280,6 +280,7 @@ async def get_active_scraping_tasks():
             for task in tasks:
                 if task['name'] in ['daily_ads_scraper.scrape_new_ads_daily', 
                                    'daily_ads_scraper.scrape_specific_competitors',
+                                   'daily_ads_scraper.scrape_competitor_country',
                                    'facebook_ads_scraper.scrape_competitor_ads']:
                     scraping_tasks.append({
                         "task_id": task['id'],
@@ -79,4 +79,16 @@ async def detailed_health_check(db: Session = Depends(get_db)):
     if health_status["status"] == "error":
         raise HTTPException(status_code=503, detail=health_status)
     
-    return health_status 
\ No newline at end of file
+    return health_status 
+
+@router.get("/health/media-hash-cache")
+async def media_hash_cache_stats():
+    """Hit/miss counters for the perceptual hash cache of this process"""
+    from app.services.media_hash_cache import media_hash_cache
+    return media_hash_cache.get_stats()
+
+@router.get("/health/offload")
+async def offload_lane_stats():
+    """Threads in use, queued requests and recent queue/run times of the blocking-work lanes of this process"""
+    from app.services.offload import lane_stats
+    return lane_stats()
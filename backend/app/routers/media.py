@@ -8,6 +8,7 @@ import logging
 
 from app.database import get_db
 from app.services.media_storage_service import MediaStorageService
+from app.services.offload import media_lane
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -47,6 +48,10 @@ async def save_ad_media(
     
     This makes the media available even when Facebook URLs expire.
     """
+    return await media_lane.run(_save_ad_media, ad_id, db)
+
+
+def _save_ad_media(ad_id: int, db: Session):
     try:
         storage_service = MediaStorageService(db)
         result = storage_service.save_ad_media(ad_id)
@@ -81,6 +86,10 @@ async def save_adset_media(
     
     This makes all media available even when Facebook URLs expire.
     """
+    return await media_lane.run(_save_adset_media, ad_set_id, db)
+
+
+def _save_adset_media(ad_set_id: int, db: Session):
     try:
         storage_service = MediaStorageService(db)
         result = storage_service.save_adset_media(ad_set_id)
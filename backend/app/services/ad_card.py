@@ -0,0 +1,183 @@
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.models import Ad, AdSet
+from app.models.dto.ad_dto import AdMeta, AdTargeting, Creative, LeadForm
+
+logger = logging.getLogger(__name__)
+
+# Bump when the card layout changes; older cards are rebuilt on read until
+# the ads.backfill_cards task rewrites them
+CARD_VERSION = 1
+
+
+def _json_field(ad: Ad, name: str) -> Any:
+    value = getattr(ad, name)
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            logger.error(f"Failed to parse {name} JSON for ad {ad.id}")
+            return {}
+    return value or {}
+
+
+def build_ad_card(ad: Ad) -> Dict[str, Any]:
+    """
+    JSON-ready content of an ad's listing card (the ``AdResponseDTO`` fields that
+    only depend on the ad's own columns).
+
+    Computed when the ad is written and stored in ``ads.card``, so listings skip
+    the raw_data/creatives/meta/snapshot merge. Raises if the ad content does not
+    fit the response DTOs.
+    """
+    _, creatives = ad.content_fields()
+    if isinstance(creatives, dict):
+        creatives = [creatives]
+
+    main_title = main_body_text = main_caption = None
+    media_type = media_url = cta_text = cta_type = None
+    image_urls: List[str] = []
+    video_urls: List[str] = []
+    for creative in creatives:
+        if not creative or not isinstance(creative, dict):
+            continue
+        for media in creative.get("media") or []:
+            if not media or not isinstance(media, dict):
+                continue
+            if media.get("type") == "Video":
+                video_urls.append(media.get("url"))
+                if not media_type:
+                    media_type, media_url = "Video", media.get("url")
+            elif media.get("type") == "Image":
+                image_urls.append(media.get("url"))
+                if not media_type and not video_urls:
+                    media_type, media_url = "Image", media.get("url")
+        main_title = main_title or creative.get("headline")
+        main_body_text = main_body_text or creative.get("body")
+        link = creative.get("link")
+        if isinstance(link, dict):
+            main_caption = main_caption or link.get("caption")
+        cta = creative.get("cta")
+        if isinstance(cta, dict):
+            cta_text = cta_text or cta.get("text")
+            cta_type = cta_type or cta.get("type")
+
+    meta = _json_field(ad, "meta")
+    targeting = _json_field(ad, "targeting")
+    lead_form = _json_field(ad, "lead_form")
+    meta_dict = meta if isinstance(meta, dict) else {}
+
+    return {
+        "v": CARD_VERSION,
+        "ad_copy": " ".join(t for t in (main_title, main_body_text, main_caption) if t),
+        "main_title": main_title,
+        "main_body_text": main_body_text,
+        "main_caption": main_caption,
+        "media_type": media_type,
+        "media_url": media_url,
+        "main_image_urls": image_urls,
+        "main_video_urls": video_urls,
+        "publisher_platform": [],
+        "targeted_countries": targeting.get("locations", []) if isinstance(targeting, dict) else [],
+        "impressions_text": None,
+        "spend": None,
+        "cta_text": cta_text,
+        "cta_type": cta_type,
+        "start_date": meta_dict.get("start_date"),
+        "end_date": meta_dict.get("end_date"),
+        "is_active": meta_dict.get("is_active", False),
+        "meta": AdMeta.model_validate(meta).model_dump(mode="json"),
+        "targeting": AdTargeting.model_validate(targeting).model_dump(mode="json"),
+        "lead_form": LeadForm.model_validate(lead_form).model_dump(mode="json"),
+        "creatives": [Creative.model_validate(c).model_dump(mode="json") for c in creatives],
+    }
+
+
+def refresh_ad_card(ad: Ad) -> None:
+    """Recompute ``ad.card`` after the ad's content changed (None if it can't be built)."""
+    try:
+        ad.card = build_ad_card(ad)
+    except Exception as e:
+        logger.warning(f"Could not build card for ad {ad.ad_archive_id}: {e}")
+        ad.card = None
+
+
+def _competitor_payload(ad: Ad) -> Optional[Dict[str, Any]]:
+    competitor = ad.competitor
+    if not competitor:
+        return None
+    return {
+        "id": competitor.id,
+        "name": competitor.name,
+        "page_id": competitor.page_id,
+        "page_url": None,
+        "is_active": competitor.is_active,
+        "category_id": None,
+        "category_name": None,
+        "ads_count": 0,
+        "created_at": None,
+        "updated_at": None,
+    }
+
+
+def _analysis_payload(ad: Ad) -> Optional[Dict[str, Any]]:
+    analysis = ad.analysis
+    if not analysis:
+        return None
+    return {
+        "id": analysis.id,
+        "summary": analysis.summary,
+        "hook_score": analysis.hook_score,
+        "overall_score": analysis.overall_score,
+        "confidence_score": analysis.confidence_score,
+        "target_audience": analysis.target_audience,
+        "content_themes": analysis.content_themes,
+        "analysis_version": analysis.analysis_version,
+        "created_at": analysis.created_at,
+        "updated_at": analysis.updated_at,
+    }
+
+
+def ad_card_payload(ad: Ad, ad_set: Optional[AdSet] = None) -> Dict[str, Any]:
+    """
+    ``AdResponseDTO``-shaped dict for an ad: the stored card plus the fields that
+    change independently of the ad content (competitor, analysis, favorites, ad set).
+
+    Values are plain Python objects, ready for orjson or DTO validation.
+    """
+    card = ad.card
+    if not isinstance(card, dict) or card.get("v") != CARD_VERSION:
+        card = build_ad_card(ad)
+    payload = {key: value for key, value in card.items() if key != "v"}
+
+    competitor = payload["competitor"] = _competitor_payload(ad)
+    analysis = payload["analysis"] = _analysis_payload(ad)
+    payload.update(
+        id=ad.id,
+        ad_archive_id=ad.ad_archive_id,
+        page_name=competitor["name"] if competitor else None,
+        page_id=competitor["page_id"] if competitor else None,
+        date_found=ad.date_found,
+        duration_days=ad.duration_days,
+        is_favorite=ad.is_favorite if ad.is_favorite is not None else False,
+        created_at=ad.created_at,
+        updated_at=ad.updated_at,
+        is_analyzed=analysis is not None,
+        analysis_summary=analysis["summary"] if analysis and analysis["summary"] else None,
+        ad_set_id=ad.ad_set_id,
+        variant_count=None,
+        ad_set_created_at=None,
+        ad_set_first_seen_date=None,
+        ad_set_last_seen_date=None,
+    )
+    if ad_set is not None:
+        payload.update(
+            ad_set_id=ad_set.id,
+            variant_count=ad_set.variant_count,
+            ad_set_created_at=ad_set.created_at,
+            ad_set_first_seen_date=ad_set.first_seen_date,
+            ad_set_last_seen_date=ad_set.last_seen_date,
+        )
+    return payload
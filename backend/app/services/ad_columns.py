@@ -0,0 +1,101 @@
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+# Ad attributes promoted out of the meta/creatives JSON into indexed columns
+PROMOTED_AD_COLUMNS = (
+    "is_active",
+    "start_date",
+    "end_date",
+    "media_type",
+    "page_id",
+    "cta_type",
+    "primary_media_url",
+)
+
+
+def parse_meta_date(value: Any) -> Optional[date]:
+    """``meta.start_date``/``end_date`` ('YYYY-MM-DD') as a date."""
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        return datetime.strptime(value[:10], '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def detect_media_type(snapshot: Optional[Dict], creatives: Optional[List[Dict]]) -> str:
+    """
+    Primary media type of an ad: 'carousel', 'video', 'image', 'text' or 'unknown'.
+
+    Works on the raw snapshot when it is available and falls back to the
+    processed creatives (whose media items are typed 'Video'/'Image').
+    """
+    snapshot = snapshot or {}
+    creatives = creatives or []
+
+    if snapshot.get("cards") and len(snapshot["cards"]) > 1:
+        return "carousel"
+    if snapshot.get("videos"):
+        return "video"
+    if snapshot.get("images"):
+        return "image"
+
+    media_types = {
+        (media_item.get("type") or "").lower()
+        for creative in creatives if isinstance(creative, dict)
+        for media_item in (creative.get("media") or []) if isinstance(media_item, dict)
+    }
+    if "video" in media_types:
+        return "video"
+    if "image" in media_types:
+        return "image"
+
+    if (snapshot.get("title") or snapshot.get("body") or
+            any(isinstance(c, dict) and (c.get("body") or c.get("headline")) for c in creatives)):
+        return "text"
+    return "unknown"
+
+
+def primary_media_url(creatives: Optional[List[Dict]]) -> Optional[str]:
+    """URL of the first media item of the first creative that has one."""
+    for creative in creatives or []:
+        if not isinstance(creative, dict):
+            continue
+        for media_item in creative.get("media") or []:
+            if isinstance(media_item, dict) and media_item.get("url"):
+                return media_item["url"]
+    return None
+
+
+def _primary_cta_type(meta: Dict, creatives: Optional[List[Dict]]) -> Optional[str]:
+    if meta.get("cta_type"):
+        return meta["cta_type"]
+    for creative in creatives or []:
+        cta = creative.get("cta") if isinstance(creative, dict) else None
+        if isinstance(cta, dict) and cta.get("type"):
+            return cta["type"]
+    return None
+
+
+def promoted_ad_columns(
+    meta: Optional[Dict[str, Any]],
+    creatives: Optional[List[Dict]],
+    media_type: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Values of ``PROMOTED_AD_COLUMNS`` derived from an ad's meta and creatives.
+
+    ``media_type`` is the extractor's own detection when available; otherwise
+    it is re-detected from the snapshot stored in meta.
+    """
+    meta = meta or {}
+    page_id = meta.get("page_id")
+    return {
+        "is_active": bool(meta.get("is_active", False)),
+        "start_date": parse_meta_date(meta.get("start_date")),
+        "end_date": parse_meta_date(meta.get("end_date")),
+        "media_type": media_type or detect_media_type(meta.get("snapshot") or meta, creatives),
+        "page_id": str(page_id) if page_id else None,
+        "cta_type": _primary_cta_type(meta, creatives),
+        "primary_media_url": primary_media_url(creatives),
+    }
@@ -0,0 +1,138 @@
+import base64
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import func, literal, tuple_
+
+from app.models import Ad, AdAnalysis, AdSet
+from app.services.response_cache import TAG_ADS, TAG_ANALYSIS, TAG_COMPETITORS, response_cache
+
+# Sentinel that orders "no value" below every real value (scores are 0-10, durations >= 0)
+_MISSING = -1
+
+
+def _analysis_value(field: str) -> Callable[[AdSet], Any]:
+    def value(ad_set: AdSet):
+        analysis = ad_set.best_ad.analysis if ad_set.best_ad else None
+        score = getattr(analysis, field, None) if analysis else None
+        return _MISSING if score is None else score
+    return value
+
+
+def _ad_value(field: str, missing: Any = None) -> Callable[[AdSet], Any]:
+    def value(ad_set: AdSet):
+        current = getattr(ad_set.best_ad, field, None)
+        return missing if current is None else current
+    return value
+
+
+# sort_by -> (SQL sort expression, value of a loaded AdSet, is_datetime, join)
+# join is None (AdSet column), "ad" (best ad) or "analysis" (best ad + its analysis).
+# Nullable keys are coalesced so (key, id) row comparisons never meet a NULL.
+KEYSET_SORTS: Dict[str, Tuple[Any, Callable[[AdSet], Any], bool, Optional[str]]] = {
+    "created_at": (Ad.created_at, _ad_value("created_at"), True, "ad"),
+    "date_found": (Ad.date_found, _ad_value("date_found"), True, "ad"),
+    "updated_at": (Ad.updated_at, _ad_value("updated_at"), True, "ad"),
+    "variant_count": (AdSet.variant_count, lambda ad_set: ad_set.variant_count, False, None),
+    "duration_days": (func.coalesce(Ad.duration_days, _MISSING), _ad_value("duration_days", _MISSING), False, "ad"),
+    "hook_score": (func.coalesce(AdAnalysis.hook_score, _MISSING), _analysis_value("hook_score"), False, "analysis"),
+    "overall_score": (func.coalesce(AdAnalysis.overall_score, _MISSING), _analysis_value("overall_score"), False, "analysis"),
+}
+
+# Filter fields that do not change which ad sets match (and so not the total)
+_NON_COUNT_FIELDS = {"page", "page_size", "limit", "cursor", "sort_by", "sort_order"}
+
+
+class InvalidCursorError(ValueError):
+    """Raised for a cursor that is garbled or was issued for a different sort."""
+
+
+def encode_cursor(sort_by: str, sort_order: str, ad_set: AdSet) -> str:
+    """Opaque cursor pointing just past ``ad_set`` in the given ordering."""
+    _, value_of, is_datetime, _ = KEYSET_SORTS[sort_by]
+    value = value_of(ad_set)
+    if is_datetime and value is not None:
+        value = value.isoformat()
+    payload = {"s": sort_by, "o": sort_order, "v": value, "id": ad_set.id}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, sort_order: str) -> Tuple[Any, int]:
+    """``(last sort value, last ad set id)`` of a cursor issued for this sort."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        value, last_id = payload["v"], int(payload["id"])
+        if payload["s"] != sort_by or payload["o"] != sort_order:
+            raise InvalidCursorError("Cursor was issued for a different sort order")
+        if KEYSET_SORTS[sort_by][2] and value is not None:
+            value = datetime.fromisoformat(value)
+    except InvalidCursorError:
+        raise
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {e}") from e
+    return value, last_id
+
+
+def keyset_condition(sort_by: str, sort_order: str, cursor: str):
+    """WHERE clause selecting the rows after ``cursor`` (id breaks ties in the same direction)."""
+    value, last_id = decode_cursor(cursor, sort_by, sort_order)
+    key = tuple_(KEYSET_SORTS[sort_by][0], AdSet.id)
+    after = tuple_(literal(value), literal(last_id))
+    return key < after if sort_order == "desc" else key > after
+
+
+def count_cache_key(filters) -> str:
+    """Stable digest of the filters that affect the total (paging and sort excluded)."""
+    fields = {
+        name: value for name, value in filters.model_dump().items()
+        if name not in _NON_COUNT_FIELDS and value is not None
+    }
+    if isinstance(fields.get("media_type"), str):
+        fields["media_type"] = fields["media_type"].lower()
+    if isinstance(fields.get("search"), str):
+        fields["search"] = " ".join(fields["search"].lower().split())
+    raw = json.dumps(fields, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class AdSetCountCache:
+    """
+    Short-lived in-process cache of ad-set listing totals, keyed by normalized filters.
+
+    The versions of the response-cache tags the listing depends on are part of
+    every key, so ingestion, favorite toggles and analysis writes in any worker
+    invalidate the totals everywhere; the TTL bounds staleness otherwise.
+    """
+
+    TAGS = (TAG_ADS, TAG_ANALYSIS, TAG_COMPETITORS)
+
+    def __init__(self, ttl_seconds: float = 60.0, max_entries: int = 2048):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], Tuple[float, int]] = {}
+
+    def get_or_compute(self, key: str, compute: Callable[[], int]) -> int:
+        cache_key = (response_cache.tag_versions(self.TAGS), key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry and entry[0] > now:
+                return entry[1]
+        total = compute()
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[cache_key] = (now + self.ttl_seconds, total)
+        return total
+
+
+ad_set_count_cache = AdSetCountCache()
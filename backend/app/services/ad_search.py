@@ -0,0 +1,160 @@
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, literal, literal_column, update
+from sqlalchemy.orm import Session
+
+from app.models import Ad
+
+logger = logging.getLogger(__name__)
+
+# 'simple' keeps the index language-agnostic (ads are English and Arabic); no stemming,
+# which prefix matching covers for typeahead-style queries
+SEARCH_CONFIG = literal_column("'simple'::regconfig")
+
+# Cap on indexed text per weight class; ad copy is short, this only guards odd payloads
+MAX_FIELD_CHARS = 20000
+
+# Only letters and digits reach to_tsquery, so user input can never break its syntax
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+_PHRASE_RE = re.compile(r'"([^"]*)"')
+
+
+def _text(value: Any) -> Optional[str]:
+    if isinstance(value, dict):
+        value = value.get("text")
+    if isinstance(value, str) and value.strip():
+        return value.strip()
+    return None
+
+
+def search_fields(meta: Optional[Dict[str, Any]], creatives: Optional[List[Dict]]) -> Dict[str, str]:
+    """
+    Ad copy grouped by ranking weight.
+
+    A: titles/headlines and page name, B: body copy,
+    C: captions, link descriptions and call to action.
+    """
+    meta = meta or {}
+    groups: Dict[str, List[str]] = {"A": [], "B": [], "C": []}
+
+    def add(weight: str, value: Any) -> None:
+        text = _text(value)
+        if text and text not in groups[weight]:
+            groups[weight].append(text)
+
+    add("A", meta.get("title"))
+    add("A", meta.get("page_name"))
+    add("B", meta.get("body"))
+    add("C", meta.get("caption"))
+    add("C", meta.get("link_description"))
+    add("C", meta.get("cta_type"))
+    for creative in creatives or []:
+        if not isinstance(creative, dict):
+            continue
+        add("A", creative.get("headline"))
+        add("B", creative.get("body"))
+        link = creative.get("link") if isinstance(creative.get("link"), dict) else {}
+        add("C", link.get("caption"))
+        cta = creative.get("cta") if isinstance(creative.get("cta"), dict) else {}
+        add("C", cta.get("text"))
+        add("C", cta.get("type"))
+    return {weight: " ".join(parts)[:MAX_FIELD_CHARS] for weight, parts in groups.items()}
+
+
+def search_vector_expr(title: Any, body: Any, extra: Any):
+    """Weighted ``tsvector`` SQL expression; arguments may be strings or bind params."""
+    def weighted(value, weight):
+        return func.setweight(func.to_tsvector(SEARCH_CONFIG, func.coalesce(value, "")), weight)
+
+    return weighted(title, "A").op("||")(weighted(body, "B")).op("||")(weighted(extra, "C"))
+
+
+def _search_text(fields: Dict[str, str]) -> Optional[str]:
+    return " ".join(v for v in fields.values() if v) or None
+
+
+def search_columns(meta: Optional[Dict[str, Any]], creatives: Optional[List[Dict]]) -> Dict[str, Any]:
+    """``search_text``/``search_vector`` values for an ad, for ORM assignment or inserts."""
+    fields = search_fields(meta, creatives)
+    return {
+        "search_text": _search_text(fields),
+        "search_vector": search_vector_expr(fields["A"], fields["B"], fields["C"]),
+    }
+
+
+def build_tsquery(text: Optional[str]) -> Optional[str]:
+    """
+    Translate user input into ``to_tsquery`` syntax.
+
+    Quoted parts become phrase queries (``a <-> b``); every other word is a
+    prefix match (``word:*``); all clauses are AND-ed.
+    """
+    if not text:
+        return None
+    clauses = []
+    for phrase in _PHRASE_RE.findall(text):
+        words = _WORD_RE.findall(phrase.lower())
+        if words:
+            clauses.append("(" + " <-> ".join(words) + ")" if len(words) > 1 else words[0])
+    for word in _WORD_RE.findall(_PHRASE_RE.sub(" ", text).lower()):
+        clauses.append(f"{word}:*")
+    return " & ".join(clauses) or None
+
+
+def search_condition(text: Optional[str]) -> Optional[Tuple[Any, Any]]:
+    """``(WHERE clause, rank expression)`` for a full-text search, or None for empty input."""
+    query = build_tsquery(text)
+    if not query:
+        return None
+    tsquery = func.to_tsquery(SEARCH_CONFIG, query)
+    return Ad.search_vector.op("@@")(tsquery), func.ts_rank_cd(Ad.search_vector, tsquery)
+
+
+def fuzzy_condition(text: str) -> Tuple[Any, Any]:
+    """Trigram fallback for typos: word similarity of ``text`` against the ad copy."""
+    term = literal(text.strip())
+    return term.op("<%")(Ad.search_text), func.word_similarity(term, Ad.search_text)
+
+
+def backfill_search_columns(db: Session, batch_size: int = 1000, only_missing: bool = True) -> int:
+    """
+    (Re)build ``search_text``/``search_vector`` in keyset batches, committing per batch.
+
+    Returns the number of ads updated.
+    """
+    ads = Ad.__table__
+    stmt = (
+        update(ads)
+        .where(ads.c.id == bindparam("b_id"))
+        .values(
+            search_text=bindparam("b_text"),
+            search_vector=search_vector_expr(bindparam("b_a"), bindparam("b_b"), bindparam("b_c")),
+        )
+    )
+    last_id = 0
+    updated = 0
+    while True:
+        query = db.query(Ad.id, Ad.meta, Ad.creatives).filter(Ad.id > last_id)
+        if only_missing:
+            query = query.filter(Ad.search_vector.is_(None))
+        rows = query.order_by(Ad.id).limit(batch_size).all()
+        if not rows:
+            break
+        params = []
+        for ad_id, meta, creatives in rows:
+            fields = search_fields(meta, creatives)
+            params.append({
+                "b_id": ad_id,
+                "b_text": _search_text(fields),
+                "b_a": fields["A"],
+                "b_b": fields["B"],
+                "b_c": fields["C"],
+            })
+        db.connection().execute(stmt, params)
+        db.commit()
+        last_id = rows[-1].id
+        updated += len(rows)
+        logger.info(f"Search backfill: {updated} ads indexed (last id {last_id})")
+    return updated
@@ -1,7 +1,8 @@
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, and_, or_, desc, asc, cast, String as SQLAString, literal, case
+from sqlalchemy import func, and_, or_, desc, asc, cast, String as SQLAString, literal, case, select
 from typing import List, Optional, Dict, Any, Tuple, Union, Sequence
 from datetime import datetime, timedelta
+import json
 import logging
 
 from app.models import Ad, Competitor, AdAnalysis, AdSet
@@ -20,6 +21,17 @@ from app.models.dto.ad_dto import (
     AdAnalysisResponseDTO
 )
 from app.models.dto.competitor_dto import CompetitorResponseDTO
+from app.services.ad_set_aggregates import remove_variants, schedule_signature_refresh
+from app.services.ad_search import fuzzy_condition, search_condition
+from app.services.ad_card import ad_card_payload
+from app.services.response_cache import TAG_ADS, TAG_ANALYSIS, invalidate_tags
+from app.services.ad_pagination import (
+    KEYSET_SORTS,
+    ad_set_count_cache,
+    count_cache_key,
+    encode_cursor,
+    keyset_condition,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +56,13 @@ class AdService:
         Returns:
             PaginatedAdResponseDTO with the best ad from each set and pagination metadata
         """
+        return PaginatedAdResponseDTO.model_validate(self.get_ads_payload(filters))
+    
+    def get_ads_payload(self, filters: AdFilterParams) -> Dict[str, Any]:
+        """
+        Same listing as ``get_ads`` as plain dicts built from the stored ad cards,
+        for endpoints that serialize directly (no per-ad DTO validation).
+        """
         try:
             # Build base query on AdSet model
             query = self.db.query(AdSet).options(
@@ -56,36 +75,41 @@ class AdService:
             
             # Apply sorting
             sort_by = filters.sort_by or "created_at"
-            sort_order = filters.sort_order or "desc"
-            query = self._apply_adset_sorting(query, sort_by, sort_order)
-            
-            # Get total count before pagination
-            # Use subquery to ensure joins are respected in count
-            from sqlalchemy import select
-            subquery = query.statement.alias()
-            count_query = select(func.count()).select_from(subquery)
-            total_items = self.db.execute(count_query).scalar()
+            sort_order = (filters.sort_order or "desc").lower()
+            ranked = sort_by == "relevance" and search_condition(filters.search) is not None
+            if not ranked and sort_by not in KEYSET_SORTS:
+                sort_by, sort_order = "created_at", "desc"
+
+            query = self._apply_adset_sorting(query, sort_by, sort_order, search=filters.search)
+
+            # Total is cached per filter set and invalidated on ingestion, so paging
+            # through a listing does not re-run the full count every request
+            count_query = select(func.count()).select_from(query.order_by(None).statement.alias())
+            total_items = ad_set_count_cache.get_or_compute(
+                count_cache_key(filters), lambda: self.db.execute(count_query).scalar()
+            )
             logger.info(f"📊 Total items after filtering: {total_items} (category_id={filters.category_id})")
-            
-            # Apply pagination
-            offset = (filters.page - 1) * filters.page_size
-            ad_sets = query.offset(offset).limit(filters.page_size).all()
-            
-            # Convert to DTOs with AdSet information
-            ad_dtos = []
+
+            # Keyset pagination when a cursor is given (relevance ranks can't be keyed,
+            # so that sort always pages by offset); one extra row tells whether there is more
+            keyset = sort_by in KEYSET_SORTS
+            if filters.cursor and keyset:
+                query = query.filter(keyset_condition(sort_by, sort_order, filters.cursor))
+            else:
+                query = query.offset((filters.page - 1) * filters.page_size)
+            ad_sets = query.limit(filters.page_size + 1).all()
+            has_next = len(ad_sets) > filters.page_size
+            ad_sets = ad_sets[:filters.page_size]
+            next_cursor = encode_cursor(sort_by, sort_order, ad_sets[-1]) if has_next and keyset else None
+            
+            # Best ad card of each set, augmented with the set's metadata
+            items = []
             for ad_set in ad_sets:
                 if ad_set.best_ad:
-                    # Convert the best ad to DTO and add AdSet information
-                    ad_dto = self._convert_to_dto(ad_set.best_ad)
-                    # Augment the Ad DTO with metadata from its parent AdSet
-                    ad_dto.ad_set_id = ad_set.id
-                    ad_dto.variant_count = ad_set.variant_count
-                    ad_dto.ad_set_created_at = ad_set.created_at
-                    ad_dto.ad_set_first_seen_date = ad_set.first_seen_date
-                    ad_dto.ad_set_last_seen_date = ad_set.last_seen_date
+                    item = ad_card_payload(ad_set.best_ad, ad_set)
                     # Set favorite status from AdSet, not individual Ad
-                    ad_dto.is_favorite = getattr(ad_set, 'is_favorite', False)
-                    ad_dtos.append(ad_dto)
+                    item["is_favorite"] = bool(getattr(ad_set, 'is_favorite', False))
+                    items.append(item)
                 # Skip ad sets without best_ad to avoid N+1 queries
                 # These should be rare and can be handled by data cleanup
             
@@ -96,14 +120,12 @@ class AdService:
                 page_size=filters.page_size,
                 total_items=total_items,
                 total_pages=total_pages,
-                has_next=filters.page < total_pages,
-                has_previous=filters.page > 1
+                has_next=has_next,
+                has_previous=filters.page > 1 or bool(filters.cursor),
+                next_cursor=next_cursor
             )
             
-            return PaginatedAdResponseDTO(
-                data=ad_dtos,
-                pagination=pagination
-            )
+            return {"data": items, "pagination": pagination.model_dump()}
             
         except Exception as e:
             logger.error(f"Error fetching ad sets: {str(e)}")
@@ -121,8 +143,10 @@ class AdService:
             needs_analysis_join = False
             
             # Check which joins we need
+            has_media_type = bool(filters.media_type and filters.media_type.lower() != 'all')
             if (filters.competitor_id or filters.competitor_name or filters.category_id or 
-                filters.min_duration_days or filters.max_duration_days or filters.is_active or filters.search):
+                filters.min_duration_days or filters.max_duration_days or filters.is_active is not None or
+                filters.search or has_media_type):
                 needs_ad_join = True
                 
             if filters.competitor_name or filters.category_id:
@@ -197,90 +221,54 @@ class AdService:
             
             # Active status filter
             if filters.is_active is not None:
-                query = query.filter(Ad.meta['is_active'].as_string() == str(filters.is_active).lower())
+                query = query.filter(Ad.is_active == filters.is_active)
             
             # Favorite status (AdSet level - no join needed)
             if filters.is_favorite is not None:
                 query = query.filter(AdSet.is_favorite == filters.is_favorite)
             
-            # Search filter (optimized to avoid expensive JSON operations when possible)
+            # Full-text search over the ad copy (GIN-indexed search_vector)
             if filters.search:
-                search_term = f"%{filters.search}%"
-                # Use simpler text search when possible
-                query = query.filter(
-                    or_(
-                        cast(Ad.creatives, SQLAString).ilike(search_term),
-                        cast(Ad.meta, SQLAString).ilike(search_term)
-                    )
-                )
+                search = search_condition(filters.search)
+                if search is not None:
+                    query = query.filter(search[0])
                 
-            # Filter by media type
-            if filters.media_type and filters.media_type.lower() != 'all':
-                mt_map = {'video': 'Video', 'image': 'Image', 'carousel': 'Carousel'}
-                mt_norm = mt_map.get(filters.media_type.lower(), filters.media_type)
-                query = query.join(AdSet.best_ad).filter(
-                    cast(Ad.creatives, SQLAString).ilike(f'%"type": "{mt_norm}"%')
-                )
+            # Filter by media type (best ad already joined above)
+            if has_media_type:
+                query = query.filter(Ad.media_type == filters.media_type.lower())
                 
             return query
         except Exception as e:
             logger.error(f"Error applying filters to AdSet query: {str(e)}")
             raise
     
-    def _apply_adset_sorting(self, query, sort_by: str, sort_order: str):
+    def _apply_adset_sorting(self, query, sort_by: str, sort_order: str, search: Optional[str] = None):
         """
         Apply sorting to AdSet query.
-        Sorting is based on the properties of the best ad in each set.
+        Sorting is based on the properties of the best ad in each set; every
+        ordering ends with AdSet.id so keyset cursors see a stable total order.
         """
         try:
             # Determine sort direction
             direction = desc if sort_order.lower() == "desc" else asc
             
-            # Apply sorting based on different fields
-            if sort_by == "created_at":
-                # Sort by Ad creation date (default)
-                query = query.join(AdSet.best_ad).order_by(direction(Ad.created_at))
-            elif sort_by == "date_found":
-                # Sort by date the ad was first found
-                query = query.join(AdSet.best_ad).order_by(direction(Ad.date_found))
-            elif sort_by == "updated_at":
-                # Sort by last update date
-                query = query.join(AdSet.best_ad).order_by(direction(Ad.updated_at))
-            elif sort_by == "variant_count":
-                # Sort directly by AdSet's variant_count
-                query = query.order_by(direction(AdSet.variant_count))
-            elif sort_by == "duration_days":
-                # Sort by duration in days
-                query = query.join(AdSet.best_ad).order_by(direction(Ad.duration_days))
-            elif sort_by == "hook_score":
-                # Sort by hook score with null values last
-                if sort_order.lower() == "desc":
-                    query = query.join(AdSet.best_ad).join(Ad.analysis, isouter=True).order_by(
-                        AdAnalysis.hook_score.desc().nullslast(),
-                        desc(Ad.created_at)
-                    )
-                else:
-                    query = query.join(AdSet.best_ad).join(Ad.analysis, isouter=True).order_by(
-                        AdAnalysis.hook_score.asc().nullsfirst(),
-                        desc(Ad.created_at)
-                    )
-            elif sort_by == "overall_score":
-                # Sort by overall score with null values last
-                if sort_order.lower() == "desc":
-                    query = query.join(AdSet.best_ad).join(Ad.analysis, isouter=True).order_by(
-                        AdAnalysis.overall_score.desc().nullslast(),
-                        desc(Ad.created_at)
-                    )
-                else:
-                    query = query.join(AdSet.best_ad).join(Ad.analysis, isouter=True).order_by(
-                        AdAnalysis.overall_score.asc().nullsfirst(),
-                        desc(Ad.created_at)
-                    )
-            else:
+            search_rank = search_condition(search) if sort_by == "relevance" else None
+            if search_rank is not None:
+                # Best-matching copy first; the search filter has already joined the best ad
+                return query.order_by(search_rank[1].desc(), desc(Ad.created_at), desc(AdSet.id))
+
+            if sort_by not in KEYSET_SORTS:
                 # Default to sorting by Ad creation date (most recent first)
-                query = query.join(AdSet.best_ad).order_by(desc(Ad.created_at))
-                
-            return query
+                sort_by, direction = "created_at", desc
+
+            # Scores and durations are coalesced to -1, which keeps missing values
+            # last when descending and first when ascending
+            key, _, _, join = KEYSET_SORTS[sort_by]
+            if join:
+                query = query.join(AdSet.best_ad)
+            if join == "analysis":
+                query = query.join(Ad.analysis, isouter=True)
+            return query.order_by(direction(key), direction(AdSet.id))
         except Exception as e:
             logger.error(f"Error applying sorting to AdSet query: {str(e)}")
             raise
@@ -310,7 +298,7 @@ class AdService:
             query = query.filter(Ad.campaign_id == filters.campaign_id)
         
         if filters.is_active is not None:
-            query = query.filter(Ad.meta_is_active == filters.is_active)
+            query = query.filter(Ad.is_active == filters.is_active)
             
         if filters.has_lead_form is not None:
             if filters.has_lead_form:
@@ -334,21 +322,13 @@ class AdService:
             query = query.filter(Ad.platforms.contains([filters.platform]))
         
         if filters.media_type:
-            # Check in creatives array for media type
-            query = query.filter(
-                cast(Ad.creatives, SQLAString).like(f'%"type": "{filters.media_type}"%')
-            )
+            query = query.filter(Ad.media_type == filters.media_type.lower())
         
         if filters.query:
-            # Search in various text fields
-            search_term = f"%{filters.query}%"
-            query = query.filter(
-                or_(
-                    cast(Ad.creatives, SQLAString).ilike(search_term),
-                    # Check for page name within the meta JSON
-                    Ad.meta.op('->>')('page_name').ilike(search_term)
-                )
-            )
+            # Full-text search (page name is part of the indexed copy)
+            search = search_condition(filters.query)
+            if search is not None:
+                query = query.filter(search[0])
         
         # Count total results for pagination
         total = query.count()
@@ -404,41 +384,33 @@ class AdService:
     
     def get_ad_stats(self) -> AdStats:
         """Get ad statistics"""
-        total_ads = self.db.query(func.count(Ad.id)).scalar() or 0
-        active_ads = self.db.query(func.count(Ad.id)).filter(Ad.meta_is_active == True).scalar() or 0
+        total_ads, active_ads = self.db.query(
+            func.count(Ad.id),
+            func.count(Ad.id).filter(Ad.is_active == True),
+        ).one()
         
-        # Count ads with lead forms
+        # Count ads with lead forms (empty forms are stored as {} or with no questions/fields)
         with_lead_form = self.db.query(func.count(Ad.id)).filter(
-            or_(
-                cast(Ad.lead_form_standalone_fields, SQLAString) != '[]',
-                cast(Ad.lead_form_questions, SQLAString) != '{}'
-            )
+            Ad.lead_form.isnot(None),
+            cast(Ad.lead_form, SQLAString).notin_(['{}', 'null', '{"questions": {}, "standalone_fields": []}'])
         ).scalar() or 0
         
-        # Get platform stats
+        # Get platform stats; meta.publisher_platform has few distinct combinations, so group by its text
         platforms_stats = {}
-        for ad in self.db.query(Ad.platforms).all():
-            platforms = []
-            if hasattr(ad, 'platforms') and ad.platforms is not None:
-                platforms = ad.platforms
-                
-            for platform in platforms:
-                    platforms_stats[platform] = platforms_stats.get(platform, 0) + 1
+        platforms_json = cast(Ad.meta['publisher_platform'], SQLAString)
+        for platforms_text, count in self.db.query(platforms_json, func.count(Ad.id)).group_by(platforms_json).all():
+            try:
+                platforms = json.loads(platforms_text) if platforms_text else []
+            except ValueError:
+                continue
+            for platform in platforms if isinstance(platforms, list) else []:
+                platforms_stats[platform] = platforms_stats.get(platform, 0) + count
         
-        # Get media type stats
-        # This is more complex with JSON array, using a simplified approach
-        media_types = {
-            "Image": self.db.query(func.count(Ad.id)).filter(cast(Ad.creatives, SQLAString).like('%"type": "Image"%')).scalar() or 0,
-            "Video": self.db.query(func.count(Ad.id)).filter(cast(Ad.creatives, SQLAString).like('%"type": "Video"%')).scalar() or 0,
-            "Carousel": self.db.query(func.count(Ad.id)).filter(cast(Ad.creatives, SQLAString).like('%"type": "Carousel"%')).scalar() or 0,
-            "Other": self.db.query(func.count(Ad.id)).filter(
-                and_(
-                    ~cast(Ad.creatives, SQLAString).like('%"type": "Image"%'),
-                    ~cast(Ad.creatives, SQLAString).like('%"type": "Video"%'),
-                    ~cast(Ad.creatives, SQLAString).like('%"type": "Carousel"%')
-                )
-            ).scalar() or 0
-        }
+        # Get media type stats in one grouped pass over the indexed media_type column
+        media_types = {"Image": 0, "Video": 0, "Carousel": 0, "Other": 0}
+        labels = {"image": "Image", "video": "Video", "carousel": "Carousel"}
+        for media_type, count in self.db.query(Ad.media_type, func.count(Ad.id)).group_by(Ad.media_type).all():
+            media_types[labels.get(media_type, "Other")] += count
         
         return AdStats(
             total_ads=total_ads,
@@ -448,18 +420,29 @@ class AdService:
             media_types=media_types
         )
     
-    def search_ads(self, query: str, limit: int = 50) -> List[AdResponseDTO]:
-        """Search ads by text content."""
+    def search_ads(self, query: str, limit: int = 50, fuzzy: bool = True) -> List[AdResponseDTO]:
+        """
+        Ranked full-text search over ad copy.
+        
+        Words are prefix-matched and quoted text is matched as a phrase. When
+        nothing matches and ``fuzzy`` is set, falls back to trigram word
+        similarity so small typos still find results.
+        """
         try:
-            search_filter = or_(
-                cast(Ad.creatives, SQLAString).ilike(f'%{query}%'),
-                cast(Ad.meta, SQLAString).ilike(f'%{query}%')
-            )
+            search = search_condition(query)
+            if search is None:
+                return []
             
-            ads = self.db.query(Ad).options(
+            base = self.db.query(Ad).options(
                 joinedload(Ad.competitor),
                 joinedload(Ad.analysis)
-            ).join(Ad.competitor).filter(search_filter).limit(limit).all()
+            )
+            condition, rank = search
+            ads = base.filter(condition).order_by(rank.desc(), desc(Ad.date_found)).limit(limit).all()
+            
+            if not ads and fuzzy:
+                condition, rank = fuzzy_condition(query)
+                ads = base.filter(condition).order_by(rank.desc(), desc(Ad.date_found)).limit(limit).all()
             
             return [self._convert_to_dto(ad) for ad in ads]
             
@@ -530,13 +513,21 @@ class AdService:
             if not ad:
                 return False
             
+            removed = [(ad.ad_set_id, ad.id, ad.meta)]
+            self.db.query(AdSet).filter(AdSet.best_ad_id == ad.id).update(
+                {"best_ad_id": None}, synchronize_session=False
+            )
+            
             # Delete associated analysis first (if any)
             if ad.analysis:
                 self.db.delete(ad.analysis)
             
             # Delete the ad
             self.db.delete(ad)
+            self.db.flush()
+            changed_sets = remove_variants(self.db, removed)
             self.db.commit()
+            schedule_signature_refresh(changed_sets)
             
             logger.info(f"Successfully deleted ad {ad_id}")
             return True
@@ -560,6 +551,8 @@ class AdService:
             from app.models.veo_generation import VeoGeneration
             from app.models.merged_video import MergedVideo
             
+            removed = self.db.query(Ad.ad_set_id, Ad.id, Ad.meta).filter(Ad.id.in_(ad_ids)).all()
+            
             # Unset best_ad_id in AdSets where it's one of the ads being deleted
             self.db.query(AdSet).filter(
                 AdSet.best_ad_id.in_(ad_ids)
@@ -587,7 +580,13 @@ class AdService:
                 Ad.id.in_(ad_ids)
             ).delete(synchronize_session=False)
             
+            # 5. Keep variant counts, date range and best ad of the affected AdSets current
+            changed_sets = remove_variants(self.db, removed)
+            
             self.db.commit()
+            schedule_signature_refresh(changed_sets)
+            # Bulk deletes bypass the ORM commit hook
+            invalidate_tags(TAG_ADS, TAG_ANALYSIS)
             
             logger.info(
                 f"Successfully deleted {ads_deleted} ads with "
@@ -744,10 +743,10 @@ class AdService:
             query = query.join(Ad.competitor).filter(Competitor.name.ilike(f"%{filters.competitor_name}%"))
         
         if filters.media_type and filters.media_type != 'all':
-            query = query.filter(cast(Ad.creatives, SQLAString).ilike(f'%"type": "{filters.media_type}"%'))
+            query = query.filter(Ad.media_type == filters.media_type.lower())
         
         if filters.is_active is not None:
-            query = query.filter(cast(Ad.meta['is_active'], SQLAString) == str(filters.is_active).lower())
+            query = query.filter(Ad.is_active == filters.is_active)
         
         if filters.is_favorite is not None:
             query = query.filter(Ad.is_favorite == filters.is_favorite)
@@ -771,10 +770,11 @@ class AdService:
             query = query.filter(Ad.date_found <= filters.date_to)
         
         if filters.search:
+            search = search_condition(filters.search)
             search_query = f"%{filters.search}%"
             query = query.join(Ad.competitor).filter(
                 or_(
-                    cast(Ad.creatives, SQLAString).ilike(search_query),
+                    search[0] if search is not None else literal(False),
                     Competitor.name.ilike(search_query)
                 )
             )
@@ -805,255 +805,13 @@ class AdService:
     
     def _convert_to_dto(self, ad: Ad) -> AdResponseDTO:
         """
-        Convert Ad entity to AdResponseDTO.
+        Convert Ad entity to AdResponseDTO (from its precomputed card).
         """
         if not ad:
             return None  # type: ignore
             
         try:
-            import json
-            
-            competitor_dto = None
-            if ad.competitor:
-                competitor_dto = CompetitorResponseDTO(
-                    id=ad.competitor.id,
-                    name=ad.competitor.name,
-                    page_id=ad.competitor.page_id,
-                    is_active=ad.competitor.is_active,
-                    ads_count=0  # Will be calculated later if needed
-                )
-            
-            # Extract media information
-            media_type = None
-            media_url = None
-            main_image_urls = []
-            main_video_urls = []
-            
-            # Initialize text content variables
-            ad_copy = None
-            main_title = None
-            main_body_text = None
-            main_caption = None
-            
-            # Use ad.to_dict() to get dynamically built creatives
-            ad_dict = ad.to_dict()
-            creatives_data = ad_dict.get('creatives', [])
-            
-            # If creatives_data is a dict, convert to list for consistency
-            if isinstance(creatives_data, dict):
-                creatives_data = [creatives_data]
-                
-                # Process each creative
-                if isinstance(creatives_data, list):
-                    for creative in creatives_data:
-                        # Skip if creative is None or not a dict
-                        if not creative or not isinstance(creative, dict):
-                            continue
-                            
-                        # Extract media information
-                        media_list = creative.get('media')
-                        if media_list and isinstance(media_list, list):
-                            for media in media_list:
-                                if not media or not isinstance(media, dict):
-                                    continue
-                                if media.get('type') == 'Video':
-                                    main_video_urls.append(media.get('url'))
-                                    if not media_type:
-                                        media_type = 'Video'
-                                        media_url = media.get('url')
-                                elif media.get('type') == 'Image':
-                                    main_image_urls.append(media.get('url'))
-                                    if not media_type and not main_video_urls:
-                                        media_type = 'Image'
-                                        media_url = media.get('url')
-                        
-                        # Extract text content
-                        if creative.get('headline') and not main_title:
-                            main_title = creative.get('headline')
-                        if creative.get('body') and not main_body_text:
-                            main_body_text = creative.get('body')
-                        link = creative.get('link')
-                        if link and isinstance(link, dict) and link.get('caption') and not main_caption:
-                            main_caption = link.get('caption')
-            
-            # Combine text fields for ad_copy
-            all_text = [main_title, main_body_text, main_caption]
-            ad_copy = " ".join([t for t in all_text if t])
-            
-            # Extract page info
-            page_name = None
-            page_id = None
-            
-            if ad.competitor:
-                page_name = ad.competitor.name
-                page_id = ad.competitor.page_id
-                
-            # Extract dates and status
-            start_date = None
-            end_date = None
-            is_active = False
-            
-            # Parse meta data
-            meta_data = {}
-            if ad.meta:
-                # Handle the case when meta is a string (JSON string)
-                if isinstance(ad.meta, str):
-                    try:
-                        meta_data = json.loads(ad.meta)
-                    except json.JSONDecodeError:
-                        logger.error(f"Failed to parse meta JSON for ad {ad.id}")
-                        meta_data = {}
-                else:
-                    meta_data = ad.meta
-                
-                if isinstance(meta_data, dict):
-                    if 'start_date' in meta_data:
-                        start_date = meta_data.get('start_date')
-                    if 'end_date' in meta_data:
-                        end_date = meta_data.get('end_date')
-                    if 'is_active' in meta_data:
-                        is_active = meta_data.get('is_active', False)
-            
-            # Extract CTA info
-            cta_text = None
-            cta_type = None
-            
-            if isinstance(creatives_data, list):
-                for creative in creatives_data:
-                    # Skip if creative is None or not a dict
-                    if not creative or not isinstance(creative, dict):
-                        continue
-                    cta = creative.get('cta')
-                    if cta and isinstance(cta, dict):
-                        if cta.get('text') and not cta_text:
-                            cta_text = cta.get('text')
-                        if cta.get('type') and not cta_type:
-                            cta_type = cta.get('type')
-            
-            # Parse targeting data
-            targeting_data = {}
-            targeted_countries = []
-            if ad.targeting:
-                # Handle the case when targeting is a string (JSON string)
-                if isinstance(ad.targeting, str):
-                    try:
-                        targeting_data = json.loads(ad.targeting)
-                    except json.JSONDecodeError:
-                        logger.error(f"Failed to parse targeting JSON for ad {ad.id}")
-                        targeting_data = {}
-                else:
-                    targeting_data = ad.targeting
-                
-                if isinstance(targeting_data, dict) and 'locations' in targeting_data:
-                    targeted_countries = targeting_data.get('locations', [])
-            
-            # Parse lead form data
-            lead_form_data = {}
-            if ad.lead_form:
-                # Handle the case when lead_form is a string (JSON string)
-                if isinstance(ad.lead_form, str):
-                    try:
-                        lead_form_data = json.loads(ad.lead_form)
-                    except json.JSONDecodeError:
-                        logger.error(f"Failed to parse lead_form JSON for ad {ad.id}")
-                        lead_form_data = {}
-                else:
-                    lead_form_data = ad.lead_form
-            
-            # Extract publisher platforms - using empty list as default since we don't have this data
-            publisher_platform = []
-            
-            # Create the analysis DTO if analysis exists
-            analysis_dto = None
-            try:
-                current_analysis = ad.analysis
-                if current_analysis is None:
-                    from app.models.ad_analysis import AdAnalysis
-                    current_analysis = self.db.query(AdAnalysis).filter(AdAnalysis.ad_id == ad.id, AdAnalysis.is_current == 1).first()
-                if current_analysis:
-                    analysis_dto = AdAnalysisResponseDTO(
-                        id=current_analysis.id,
-                        summary=current_analysis.summary,
-                        hook_score=current_analysis.hook_score,
-                        overall_score=current_analysis.overall_score,
-                        confidence_score=current_analysis.confidence_score,
-                        target_audience=current_analysis.target_audience,
-                        content_themes=current_analysis.content_themes,
-                        analysis_version=current_analysis.analysis_version,
-                        created_at=current_analysis.created_at,
-                        updated_at=current_analysis.updated_at
-                    )
-            except Exception:
-                analysis_dto = None
-            
-            # Create the ad response DTO
-            return AdResponseDTO(
-                id=ad.id,
-                ad_archive_id=ad.ad_archive_id,
-                competitor=competitor_dto,
-                
-                # Content fields
-                ad_copy=ad_copy,
-                main_title=main_title,
-                main_body_text=main_body_text,
-                main_caption=main_caption,
-                
-                # Media fields
-                media_type=media_type,
-                media_url=media_url,
-                main_image_urls=main_image_urls,
-                main_video_urls=main_video_urls,
-                
-                # Page info
-                page_name=page_name,
-                page_id=page_id,
-                
-                # Platform and targeting
-                publisher_platform=publisher_platform,
-                targeted_countries=targeted_countries,
-                
-                # Performance indicators - these are placeholder values
-                impressions_text=None,
-                spend=None,
-                
-                # CTA fields
-                cta_text=cta_text,
-                cta_type=cta_type,
-                
-                # Dates and status
-                date_found=ad.date_found,
-                start_date=start_date,
-                end_date=end_date,
-                is_active=is_active,
-                duration_days=ad.duration_days,
-                
-                # User preferences
-                is_favorite=ad.is_favorite if hasattr(ad, 'is_favorite') else False,
-                
-                # Timestamps
-                created_at=ad.created_at,
-                updated_at=ad.updated_at,
-                
-                # Analysis data
-                analysis=analysis_dto,
-                # Convenience flags
-                is_analyzed=True if analysis_dto is not None else False,
-                analysis_summary=analysis_dto.summary if analysis_dto and analysis_dto.summary else None,
-                
-                # Raw data fields - use the parsed dictionaries
-                meta=meta_data,
-                targeting=targeting_data,
-                lead_form=lead_form_data,
-                creatives=creatives_data,
-                
-                # AdSet fields - will be populated later when needed
-                ad_set_id=ad.ad_set_id,
-                variant_count=None,  # This will be set separately when needed
-                ad_set_created_at=None,
-                ad_set_first_seen_date=None,
-                ad_set_last_seen_date=None
-            )
-            
+            return AdResponseDTO.model_validate(ad_card_payload(ad))
         except Exception as e:
             logger.error(f"Error converting ad to DTO: {str(e)}")
             raise
@@ -1173,6 +931,8 @@ class AdService:
                 ads_deleted = self.db.query(Ad).delete(synchronize_session=False)
             
             self.db.commit()
+            # Bulk deletes bypass the ORM commit hook
+            invalidate_tags(TAG_ADS, TAG_ANALYSIS)
             
             logger.info(f"Successfully deleted {ads_deleted} ads and {analyses_deleted} analyses (Protected {len(safe_ad_ids)} favorites)")
             return ads_deleted
@@ -1262,6 +1022,10 @@ class AdService:
         Returns:
             PaginatedAdResponseDTO with the best ad from each set and pagination metadata
         """
+        return PaginatedAdResponseDTO.model_validate(self.get_ad_sets_payload(page, page_size, sort_by, sort_order))
+    
+    def get_ad_sets_payload(self, page: int = 1, page_size: int = 20, sort_by: str = "created_at", sort_order: str = "desc") -> Dict[str, Any]:
+        """``get_ad_sets`` as plain dicts built from the stored ad cards."""
         try:
             # Build base query on AdSet model
             query = self.db.query(AdSet).options(
@@ -1290,30 +1054,16 @@ class AdService:
             offset = (page - 1) * page_size
             ad_sets = query.offset(offset).limit(page_size).all()
             
-            # Convert to DTOs with AdSet information
-            ad_dtos = []
+            # Best ad card of each set, augmented with the set's metadata
+            items = []
             for ad_set in ad_sets:
                 if ad_set.best_ad:
-                    # Convert the best ad to DTO and add AdSet information
-                    ad_dto = self._convert_to_dto(ad_set.best_ad)
-                    # Augment the Ad DTO with metadata from its parent AdSet
-                    ad_dto.ad_set_id = ad_set.id
-                    ad_dto.variant_count = ad_set.variant_count
-                    ad_dto.ad_set_created_at = ad_set.created_at
-                    ad_dto.ad_set_first_seen_date = ad_set.first_seen_date
-                    ad_dto.ad_set_last_seen_date = ad_set.last_seen_date
-                    ad_dtos.append(ad_dto)
+                    items.append(ad_card_payload(ad_set.best_ad, ad_set))
                 else:
                     # If there's no best_ad, fetch the first ad in the set
                     first_ad = self.db.query(Ad).filter(Ad.ad_set_id == ad_set.id).first()
                     if first_ad:
-                        ad_dto = self._convert_to_dto(first_ad)
-                        ad_dto.ad_set_id = ad_set.id
-                        ad_dto.variant_count = ad_set.variant_count
-                        ad_dto.ad_set_created_at = ad_set.created_at
-                        ad_dto.ad_set_first_seen_date = ad_set.first_seen_date
-                        ad_dto.ad_set_last_seen_date = ad_set.last_seen_date
-                        ad_dtos.append(ad_dto)
+                        items.append(ad_card_payload(first_ad, ad_set))
             
             # Calculate pagination metadata
             total_pages = (total_items + page_size - 1) // page_size
@@ -1326,10 +1076,7 @@ class AdService:
                 has_previous=page > 1
             )
             
-            return PaginatedAdResponseDTO(
-                data=ad_dtos,
-                pagination=pagination
-            )
+            return {"data": items, "pagination": pagination.model_dump()}
             
         except Exception as e:
             logger.error(f"Error fetching ad sets: {str(e)}")
@@ -0,0 +1,171 @@
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models import Ad, AdSet
+
+logger = logging.getLogger(__name__)
+
+
+def ad_start_date(meta: Optional[Dict[str, Any]]) -> Optional[datetime]:
+    """``meta.start_date`` as a UTC datetime (the unit of first/last_seen_date)."""
+    start_date_str = meta.get("start_date") if meta else None
+    if not start_date_str:
+        return None
+    try:
+        return datetime.strptime(start_date_str, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    except (ValueError, TypeError):
+        return None
+
+
+def ad_duration_score(meta: Optional[Dict[str, Any]]) -> float:
+    """
+    Running duration in days used to pick an AdSet's best ad.
+
+    Ads that run longer typically perform better (Facebook keeps showing
+    winners); active ads get a 0.1 day bonus to break ties.
+    """
+    if not meta:
+        return 0
+    start_date_str = meta.get("start_date")
+    end_date_str = meta.get("end_date")
+    if not start_date_str:
+        return 0
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
+        # If still active, use current date
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d') if end_date_str else datetime.now()
+        duration = (end_date - start_date).days
+        if meta.get("is_active", False):
+            duration += 0.1
+        return duration
+    except (ValueError, TypeError):
+        return 0
+
+
+def recompute_ad_set(ad_set: AdSet, ads_in_set: List[Ad]) -> bool:
+    """
+    Full recompute of variant_count, first/last_seen_date and best_ad_id.
+
+    Returns True when best_ad_id changed.
+    """
+    previous_best_ad_id = ad_set.best_ad_id
+    ad_set.variant_count = len(ads_in_set)
+    start_dates = [d for d in (ad_start_date(ad.meta) for ad in ads_in_set) if d is not None]
+    ad_set.first_seen_date = min(start_dates, default=None)
+    # The 'last_seen_date' should reflect the latest start date of a variant
+    ad_set.last_seen_date = max(start_dates, default=None)
+    best_ad = max(ads_in_set, key=lambda ad: ad_duration_score(ad.meta), default=None)
+    ad_set.best_ad_id = best_ad.id if best_ad else None
+    ad_set.updated_at = datetime.utcnow()
+    return ad_set.best_ad_id != previous_best_ad_id
+
+
+def _recompute_from_db(db: Session, ad_set: AdSet) -> bool:
+    ads_in_set = db.query(Ad).filter(Ad.ad_set_id == ad_set.id).all()
+    return recompute_ad_set(ad_set, ads_in_set)
+
+
+def apply_variant(
+    db: Session,
+    ad_set: AdSet,
+    ad_id: int,
+    meta: Optional[Dict[str, Any]],
+    old_meta: Optional[Dict[str, Any]] = None,
+    is_new: bool = True,
+    best_meta: Optional[Dict[str, Any]] = None,
+) -> bool:
+    """
+    Fold one added or updated variant into the set's aggregates in O(1).
+
+    Falls back to a full recompute only when the change can invalidate an
+    aggregate: the current best ad scoring lower than before, or an existing
+    variant moving its start date off the set's first/last_seen boundary.
+    ``best_meta`` is the current best ad's meta when the caller already has it;
+    otherwise the best ad is loaded by primary key. Returns True when
+    best_ad_id changed.
+    """
+    start = ad_start_date(meta)
+    if not is_new and old_meta is not None:
+        old_start = ad_start_date(old_meta)
+        if old_start is not None and old_start != start and old_start in (ad_set.first_seen_date, ad_set.last_seen_date):
+            return _recompute_from_db(db, ad_set)
+        if ad_id == ad_set.best_ad_id and ad_duration_score(meta) < ad_duration_score(old_meta):
+            # Best ad demoted: another variant may now run longer
+            return _recompute_from_db(db, ad_set)
+
+    if is_new:
+        ad_set.variant_count = (ad_set.variant_count or 0) + 1
+    if start is not None:
+        if ad_set.first_seen_date is None or start < ad_set.first_seen_date:
+            ad_set.first_seen_date = start
+        if ad_set.last_seen_date is None or start > ad_set.last_seen_date:
+            ad_set.last_seen_date = start
+    ad_set.updated_at = datetime.utcnow()
+
+    if ad_set.best_ad_id == ad_id:
+        return False
+    if ad_set.best_ad_id is None:
+        ad_set.best_ad_id = ad_id
+        return True
+    if best_meta is None:
+        best_ad = db.get(Ad, ad_set.best_ad_id)
+        if best_ad is None:
+            return _recompute_from_db(db, ad_set)
+        best_meta = best_ad.meta
+    if ad_duration_score(meta) > ad_duration_score(best_meta):
+        ad_set.best_ad_id = ad_id
+        return True
+    return False
+
+
+def remove_variants(db: Session, removed: Iterable[Tuple[int, int, Optional[Dict[str, Any]]]]) -> List[int]:
+    """
+    Update aggregates after ads were deleted (call after the delete is flushed).
+
+    ``removed`` holds ``(ad_set_id, ad_id, meta)`` of the deleted ads. Sets that
+    lost their best ad or a boundary start date are recomputed; the rest only
+    have their count decremented. Returns ids of sets whose best ad changed.
+    """
+    by_set: Dict[int, List[Tuple[int, Optional[Dict[str, Any]]]]] = {}
+    for ad_set_id, ad_id, meta in removed:
+        if ad_set_id:
+            by_set.setdefault(ad_set_id, []).append((ad_id, meta))
+    if not by_set:
+        return []
+
+    changed = []
+    for ad_set in db.query(AdSet).filter(AdSet.id.in_(list(by_set.keys()))).all():
+        variants = by_set[ad_set.id]
+        boundaries = (ad_set.first_seen_date, ad_set.last_seen_date)
+        needs_recompute = ad_set.best_ad_id is None or any(
+            ad_id == ad_set.best_ad_id or ad_start_date(meta) in boundaries
+            for ad_id, meta in variants
+        )
+        if needs_recompute:
+            if _recompute_from_db(db, ad_set):
+                changed.append(ad_set.id)
+        else:
+            ad_set.variant_count = max((ad_set.variant_count or 0) - len(variants), 0)
+            ad_set.updated_at = datetime.utcnow()
+    return changed
+
+
+def schedule_signature_refresh(ad_set_ids: Iterable[int]) -> None:
+    """
+    Queue a deferred ``content_signature`` re-hash for AdSets whose best ad changed.
+
+    Call after the new best_ad_id is committed. If the broker is unreachable the
+    signature simply stays on the previous representative until the next change.
+    """
+    ad_set_ids = sorted({int(i) for i in ad_set_ids if i})
+    if not ad_set_ids:
+        return
+    try:
+        from app.tasks.ad_set_tasks import refresh_ad_set_signatures_task
+
+        refresh_ad_set_signatures_task.delay(ad_set_ids)
+    except Exception as e:
+        logger.warning(f"Could not queue content_signature refresh for AdSets {ad_set_ids}: {e}")
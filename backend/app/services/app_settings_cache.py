@@ -0,0 +1,147 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database import SessionLocal
+from app.models import AppSetting
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "app_settings:version"
+
+
+class AppSettingsSnapshot:
+    """
+    In-memory copy of every ``AppSetting`` row, for hot paths that read settings.
+
+    The first read loads the table; after that reads never touch the database.
+    Committing a change to ``app_settings`` through the ORM bumps a version stamp
+    in Redis (and invalidates this process's copy at once). Readers compare the
+    stamp at most every ``APP_SETTINGS_CHECK_SECONDS`` and reload in the
+    background when it moved, or when the copy is older than
+    ``APP_SETTINGS_MAX_AGE_SECONDS`` (edits made outside the ORM).
+    """
+
+    def __init__(self, session_factory: Callable = SessionLocal, check_interval: float = None, max_age: float = None):
+        self.session_factory = session_factory
+        self.check_interval = settings.APP_SETTINGS_CHECK_SECONDS if check_interval is None else check_interval
+        self.max_age = settings.APP_SETTINGS_MAX_AGE_SECONDS if max_age is None else max_age
+        self._values: Optional[Dict[str, Optional[str]]] = None
+        self._version: Optional[bytes] = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._redis = None
+        self._redis_disabled_until = 0.0
+
+    def _client(self):
+        if time.monotonic() < self._redis_disabled_until:
+            return None
+        if self._redis is None:
+            try:
+                import redis
+                self._redis = redis.from_url(settings.REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+            except Exception as e:
+                self._redis_failed(e)
+        return self._redis
+
+    def _redis_failed(self, error: Exception) -> None:
+        logger.warning(f"App settings snapshot: Redis unavailable, relying on max age ({error})")
+        self._redis_disabled_until = time.monotonic() + 30.0
+
+    def _remote_version(self) -> Optional[bytes]:
+        client = self._client()
+        if client is None:
+            return None
+        try:
+            return client.get(VERSION_KEY)
+        except Exception as e:
+            self._redis_failed(e)
+            return None
+
+    def _load(self) -> Dict[str, Optional[str]]:
+        version = self._remote_version()
+        db = self.session_factory()
+        try:
+            values = {key: value for key, value in db.query(AppSetting.key, AppSetting.value)}
+        finally:
+            db.close()
+        with self._lock:
+            self._values = values
+            self._version = version
+            self._loaded_at = self._checked_at = time.monotonic()
+        return values
+
+    def _reload_in_background(self) -> None:
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+
+        def run():
+            try:
+                self._load()
+            except Exception as e:
+                logger.warning(f"Failed to reload app settings, keeping the previous snapshot: {e}")
+            finally:
+                self._reloading = False
+
+        threading.Thread(target=run, name="app-settings-reload", daemon=True).start()
+
+    def values(self) -> Dict[str, Optional[str]]:
+        values = self._values
+        if values is None:
+            return self._load()
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            version = self._remote_version()
+            if (version is not None and version != self._version) or now - self._loaded_at >= self.max_age:
+                self._reload_in_background()
+        return values
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """The raw ``AppSetting.value`` for ``key`` (as stored), or ``default``."""
+        value = self.values().get(key)
+        return default if value is None else value
+
+    def invalidate(self) -> None:
+        """Drop this process's copy and bump the version other processes compare."""
+        with self._lock:
+            self._values = None
+        client = self._client()
+        if client is not None:
+            try:
+                client.incr(VERSION_KEY)
+            except Exception as e:
+                self._redis_failed(e)
+
+
+app_settings = AppSettingsSnapshot()
+
+
+@event.listens_for(AppSetting, "after_insert")
+@event.listens_for(AppSetting, "after_update")
+@event.listens_for(AppSetting, "after_delete")
+def _mark_app_settings_changed(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        session.info["app_settings_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_app_settings_change(session):
+    # After commit, so other processes never reload ahead of the new values
+    if session.info.pop("app_settings_changed", False):
+        app_settings.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_app_settings_change(session):
+    session.info.pop("app_settings_changed", None)
@@ -0,0 +1,179 @@
+import logging
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import or_
+
+from app.models import Ad, AdAnalysis, AdSet, MediaFile, MediaFileRef
+
+logger = logging.getLogger(__name__)
+
+# (group) -> child task id
+Dispatch = Callable[[Dict], str]
+# (child task id) -> None while running, else {"success": bool, "result": ..., "error": ...}
+Poll = Callable[[str], Optional[Dict]]
+
+
+def select_unanalyzed_ads(
+    db,
+    ad_ids: Optional[Iterable[int]] = None,
+    competitor_id: Optional[int] = None,
+    reanalyze: bool = False,
+) -> List[Ad]:
+    """
+    Ads without a current ``AdAnalysis`` (any matching ad with ``reanalyze``),
+    skipping image/text ads, newest first.
+    """
+    query = db.query(Ad).filter(or_(Ad.media_type.is_(None), Ad.media_type.notin_(("image", "text"))))
+    if not reanalyze:
+        has_current = (
+            db.query(AdAnalysis.id)
+            .filter(AdAnalysis.ad_id == Ad.id, AdAnalysis.is_current == 1)
+            .exists()
+        )
+        query = query.filter(~has_current)
+    if ad_ids is not None:
+        query = query.filter(Ad.id.in_(list(ad_ids)))
+    if competitor_id is not None:
+        query = query.filter(Ad.competitor_id == competitor_id)
+    return query.order_by(Ad.date_found.desc(), Ad.id.desc()).all()
+
+
+def group_creatives(db, ads: List[Ad], video_url_for: Callable[[Ad], Optional[str]]) -> Tuple[List[Dict], List[int]]:
+    """
+    Collapse ``ads`` into creatives: ads sharing an ad set or a saved video's
+    SHA-256 (``media_files``) are one creative, analyzed once.
+
+    Returns (groups, ad ids without a video URL). Each group is
+    ``{"representative_ad_id", "ad_ids"}``, largest first; the representative is
+    the ad set's best ad when it is in the group, else the newest ad with a video.
+    """
+    with_video = {}
+    skipped = []
+    for ad in ads:
+        if video_url_for(ad):
+            with_video[ad.id] = ad
+        else:
+            skipped.append(ad.id)
+
+    # Union-find over ads, joined through ad set ids and video content hashes
+    parent = {ad_id: ad_id for ad_id in with_video}
+
+    def find(ad_id):
+        while parent[ad_id] != ad_id:
+            parent[ad_id] = parent[parent[ad_id]]
+            ad_id = parent[ad_id]
+        return ad_id
+
+    def join(ad_ids):
+        ad_ids = list(ad_ids)
+        for other in ad_ids[1:]:
+            parent[find(other)] = find(ad_ids[0])
+
+    by_key: Dict[Tuple, List[int]] = {}
+    for ad in with_video.values():
+        if ad.ad_set_id:
+            by_key.setdefault(("set", ad.ad_set_id), []).append(ad.id)
+    if with_video:
+        rows = (
+            db.query(MediaFileRef.ad_id, MediaFile.sha256)
+            .join(MediaFile, MediaFile.id == MediaFileRef.media_file_id)
+            .filter(MediaFileRef.ad_id.in_(list(with_video)), MediaFileRef.role == "video", MediaFile.sha256.isnot(None))
+            .all()
+        )
+        for ad_id, sha256 in rows:
+            by_key.setdefault(("sha", sha256), []).append(ad_id)
+    for members in by_key.values():
+        join(members)
+
+    components: Dict[int, List[int]] = {}
+    for ad_id in with_video:  # Keeps the newest-first order within each group
+        components.setdefault(find(ad_id), []).append(ad_id)
+
+    set_ids = {ad.ad_set_id for ad in with_video.values() if ad.ad_set_id}
+    best_ads = {
+        best_ad_id
+        for (best_ad_id,) in db.query(AdSet.best_ad_id).filter(AdSet.id.in_(set_ids), AdSet.best_ad_id.isnot(None))
+    } if set_ids else set()
+
+    groups = []
+    for members in components.values():
+        representative = next((ad_id for ad_id in members if ad_id in best_ads), members[0])
+        groups.append({"representative_ad_id": representative, "ad_ids": members})
+    groups.sort(key=lambda group: len(group["ad_ids"]), reverse=True)
+    return groups, skipped
+
+
+def plan_batch(
+    db,
+    video_url_for: Callable[[Ad], Optional[str]],
+    ad_ids: Optional[Iterable[int]] = None,
+    competitor_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    reanalyze: bool = False,
+) -> Dict:
+    """
+    Initial batch state: the creatives to analyze (at most ``limit``) and counters.
+    With ``reanalyze`` ads are included (and re-analyzed) even if they have a current analysis.
+    """
+    ads = select_unanalyzed_ads(db, ad_ids, competitor_id, reanalyze)
+    groups, skipped = group_creatives(db, ads, video_url_for)
+    if limit:
+        groups = groups[:limit]
+    return {
+        "kind": "batch_analysis",
+        "reanalyze": reanalyze,
+        "total_ads": sum(len(group["ad_ids"]) for group in groups),
+        "creatives": len(groups),
+        "skipped_no_video": len(skipped),
+        "pending": groups,
+        "running": {},
+        "completed": 0,
+        "failed": 0,
+        "analyzed_ads": 0,
+        "failures": [],
+        "progress": 0 if groups else 100,
+    }
+
+
+def advance_batch(state: Dict, dispatch: Dispatch, poll: Poll, capacity: int, stale_after: float) -> Dict:
+    """
+    One orchestration step: collect finished child tasks, then dispatch pending
+    creatives until ``capacity`` are running. Children running for longer than
+    ``stale_after`` seconds are counted as failed.
+    """
+    now = time.time()
+    for task_id, entry in list(state["running"].items()):
+        outcome = poll(task_id)
+        if outcome is None and now - entry["dispatched_at"] > stale_after:
+            outcome = {"success": False, "error": "timed out"}
+        if outcome is None:
+            continue
+        del state["running"][task_id]
+        if outcome["success"]:
+            state["completed"] += 1
+            state["analyzed_ads"] += len((outcome.get("result") or {}).get("applied_to_ads") or entry["ad_ids"])
+        else:
+            state["failed"] += 1
+            state["failures"].append({"representative_ad_id": entry["representative_ad_id"], "error": str(outcome.get("error"))[:300]})
+
+    while state["pending"] and len(state["running"]) < capacity:
+        group = state["pending"].pop(0)
+        try:
+            task_id = dispatch(group)
+        except Exception as e:
+            logger.error(f"Failed to dispatch analysis for ad {group['representative_ad_id']}: {e}")
+            state["failed"] += 1
+            state["failures"].append({"representative_ad_id": group["representative_ad_id"], "error": str(e)[:300]})
+            continue
+        state["running"][task_id] = {**group, "dispatched_at": now}
+
+    finished = state["completed"] + state["failed"]
+    state["progress"] = int(100 * finished / state["creatives"]) if state["creatives"] else 100
+    return state
+
+
+def key_capacity(scheduler, per_key: int) -> int:
+    """Creatives to keep in flight: ``per_key`` for each Gemini key that is ready now."""
+    ready = sum(1 for stat in scheduler.snapshot() if stat["available_in"] <= 0)
+    return max(1, ready * per_key)
@@ -0,0 +1,160 @@
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy.orm import joinedload
+
+from app.core.config import settings
+from app.models import Ad
+from app.services.media_refresh_service import MediaRefreshService
+from app.services.rate_limiter import TokenBucket, ad_library_bucket
+
+logger = logging.getLogger(__name__)
+
+
+class BulkMediaRefresher:
+    """
+    Refresh the media URLs of many ads with shared advertiser lookups.
+
+    Ads are grouped by ``page_id`` and each advertiser's ads are paged through
+    once (``MediaRefreshService.fetch_page_ads``); only the ads that search misses
+    (and ads without a page) fall back to the per-ad keyword/deeplink/direct
+    lookups. Lookups run on ``max_workers`` threads, each with its own HTTP
+    session, and every request takes a token from the shared Ad Library bucket.
+    Fetched ads are written on the calling thread, through ``service.db``.
+    """
+
+    def __init__(
+        self,
+        service: MediaRefreshService,
+        max_workers: Optional[int] = None,
+        max_pages_per_page: Optional[int] = None,
+        rate_limiter: TokenBucket = ad_library_bucket,
+    ):
+        self.service = service
+        self.db = service.db
+        self.max_workers = max_workers or settings.MEDIA_REFRESH_WORKERS
+        self.max_pages_per_page = max_pages_per_page or settings.MEDIA_REFRESH_PAGE_SCAN_PAGES
+        self.rate_limiter = rate_limiter
+        self._local = threading.local()
+
+    def _fetcher(self) -> MediaRefreshService:
+        # requests sessions are not thread-safe: one fetch-only service per worker
+        fetcher = getattr(self._local, "fetcher", None)
+        if fetcher is None:
+            fetcher = self._local.fetcher = MediaRefreshService(None, rate_limiter=self.rate_limiter)
+        return fetcher
+
+    def _scan_page(self, page_id: str, ad_archive_ids: List[str]) -> Dict[str, Dict]:
+        return self._fetcher().fetch_page_ads(page_id, set(ad_archive_ids), self.max_pages_per_page)
+
+    def _lookup(self, ad_archive_id: str) -> Optional[Dict]:
+        # The advertiser's page was already searched: skip that method
+        return self._fetcher().fetch_ad_from_facebook(ad_archive_id, page_id=None)
+
+    def run(self, ad_ids: List[int], progress_callback: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Refresh ``ad_ids``; returns the ``refresh_multiple_ads`` result shape.
+
+        ``progress_callback`` is called after each ad with total, processed,
+        successful, failed, progress (percent), page_searches and fallback_lookups.
+        """
+        ad_ids = list(dict.fromkeys(ad_ids))
+        ads = (
+            self.db.query(Ad)
+            .options(joinedload(Ad.competitor))
+            .filter(Ad.id.in_(ad_ids))
+            .all()
+        )
+        by_id = {ad.id: ad for ad in ads}
+        details: Dict[int, Dict] = {}
+        stats = {
+            'total': len(ad_ids),
+            'processed': 0,
+            'successful': 0,
+            'failed': 0,
+            'progress': 0,
+            'page_searches': 0,
+            'fallback_lookups': 0,
+        }
+
+        def finish(ad_id: int, result: Dict) -> None:
+            details[ad_id] = {'ad_id': ad_id, **result}
+            stats['processed'] += 1
+            stats['successful' if result['success'] else 'failed'] += 1
+            stats['progress'] = int(100 * stats['processed'] / stats['total']) if stats['total'] else 100
+            if progress_callback:
+                progress_callback(dict(stats))
+
+        def apply(ad: Ad, ad_data: Optional[Dict]) -> None:
+            if ad_data:
+                finish(ad.id, self.service.apply_ad_data(ad, ad_data))
+            else:
+                finish(ad.id, {
+                    'success': False,
+                    'error': f'Ad {ad.ad_archive_id} not found in Facebook Ad Library. The ad may have been deleted or is no longer available.'
+                })
+
+        for ad_id in ad_ids:
+            if ad_id not in by_id:
+                finish(ad_id, {'success': False, 'error': 'Ad not found'})
+
+        by_page: Dict[str, List[Ad]] = defaultdict(list)
+        without_page: List[Ad] = []
+        for ad in by_id.values():
+            page_id = ad.page_id or (ad.competitor.page_id if ad.competitor else None)
+            if page_id:
+                by_page[page_id].append(ad)
+            else:
+                without_page.append(ad)
+        logger.info(
+            f"Refreshing media for {len(by_id)} ads: {len(by_page)} advertiser pages, "
+            f"{len(without_page)} ads without a page"
+        )
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="media-refresh") as pool:
+            pending = {}
+
+            def lookup(ad: Ad) -> None:
+                stats['fallback_lookups'] += 1
+                pending[pool.submit(self._lookup, ad.ad_archive_id)] = ('ad', ad)
+
+            for page_id, page_ads in by_page.items():
+                stats['page_searches'] += 1
+                pending[pool.submit(self._scan_page, page_id, [ad.ad_archive_id for ad in page_ads])] = ('page', page_id)
+            for ad in without_page:
+                lookup(ad)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, target = pending.pop(future)
+                    try:
+                        fetched = future.result()
+                    except Exception as e:
+                        logger.error(f"Media refresh lookup failed for {kind} {getattr(target, 'id', target)}: {e}")
+                        fetched = None
+                    if kind == 'page':
+                        found = fetched or {}
+                        for ad in by_page[target]:
+                            if ad.ad_archive_id in found:
+                                apply(ad, found[ad.ad_archive_id])
+                            else:
+                                lookup(ad)
+                    else:
+                        apply(target, fetched)
+
+        logger.info(
+            f"Refreshed {stats['successful']}/{stats['total']} ads with {stats['page_searches']} page searches "
+            f"and {stats['fallback_lookups']} per-ad lookups"
+        )
+        return {
+            'total': stats['total'],
+            'successful': stats['successful'],
+            'failed': stats['failed'],
+            'page_searches': stats['page_searches'],
+            'fallback_lookups': stats['fallback_lookups'],
+            'details': [details[ad_id] for ad_id in ad_ids],
+        }
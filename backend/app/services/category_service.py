@@ -112,7 +112,7 @@ class CategoryService:
             # Get active ads count
             active_ads = self.db.query(Ad).join(Competitor).filter(
                 Competitor.category_id == category_id,
-                Ad.meta['is_active'].as_boolean() == True
+                Ad.is_active == True
             ).count()
             
             # Create DTO
@@ -230,7 +230,7 @@ class CategoryService:
                 # Get active ads count
                 active_ads = self.db.query(Ad).join(Competitor).filter(
                     Competitor.category_id == category.id,
-                    Ad.meta['is_active'].as_boolean() == True
+                    Ad.is_active == True
                 ).count()
                 
                 # Create DTO
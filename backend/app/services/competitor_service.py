@@ -177,7 +177,7 @@ class CompetitorService:
             total_ads = self.db.query(Ad).filter(Ad.competitor_id == competitor_id).count()
             active_ads = self.db.query(Ad).filter(
                 Ad.competitor_id == competitor_id,
-                Ad.meta['is_active'].as_boolean() == True
+                Ad.is_active == True
             ).count()
             
             # Get analyzed ads count
@@ -10,6 +10,14 @@ from PIL import Image
 import imagehash
 from sqlalchemy.orm import Session
 
+from app.services.media_hash_cache import (
+    media_hash_cache,
+    normalize_media_url,
+    image_hash_kind,
+    video_hash_kind,
+)
+from app.services.video_artifact_cache import http_fetch, video_artifacts
+
 logger = logging.getLogger(__name__)
 
 class CreativeComparisonService:
@@ -27,14 +35,28 @@ class CreativeComparisonService:
     # ===============================================================
     
     def _download_and_hash_image(self, url: str) -> Optional[imagehash.ImageHash]:
-        """Download an image via streaming and return its perceptual hash."""
+        """Download an image via streaming and return its perceptual hash (cached by normalized URL)."""
+        kind = image_hash_kind()
+        # The miss is counted by the ETag probe below
+        cached = media_hash_cache.get(url, kind, count_miss=False)
+        if cached:
+            return imagehash.hex_to_hash(cached[0])
         try:
             self.logger.debug(f"Downloading image: {url[:60]}...")
             resp = requests.get(url, stream=True, timeout=10)
             resp.raise_for_status()
+            etag = resp.headers.get("ETag")
+            content_length = resp.headers.get("Content-Length")
+            # Same bytes under a different CDN path – reuse without decoding
+            cached = media_hash_cache.get(url, kind, etag=etag, content_length=content_length)
+            if cached:
+                resp.close()
+                return imagehash.hex_to_hash(cached[0])
             # Read raw bytes in chunks then hash
             img = Image.open(resp.raw)
-            return imagehash.average_hash(img)  # average_hash is faster than phash
+            image_hash = imagehash.average_hash(img)  # average_hash is faster than phash
+            media_hash_cache.put(url, kind, [str(image_hash)], etag=etag, content_length=content_length)
+            return image_hash
         except Exception as e:
             self.logger.error(f"Failed to process image {url[:60]}... – {e}")
             return None
@@ -89,18 +111,39 @@ class CreativeComparisonService:
             return float(container.duration / 1_000_000)
         return None
 
-    def _sample_video_hashes(self, url: str, samples: int = 6, resize: int = 8) -> List[imagehash.ImageHash]:
+    def _sample_video_hashes(
+        self,
+        url: str,
+        samples: int = 6,
+        resize: int = 8,
+        etag: Optional[str] = None,
+        content_length: Optional[str] = None,
+    ) -> List[imagehash.ImageHash]:
         """
         Return a list of perceptual hashes sampled from the remote video.
         
         It seeks to *samples* evenly spaced timestamps to avoid decoding the entire
         video. Falls back to sequential reading if seeking isn't supported.
+        Results are cached by normalized URL (and ETag/Content-Length when known).
         """
+        kind = video_hash_kind(samples, resize)
+        cached = media_hash_cache.get(url, kind, etag=etag, content_length=content_length)
+        if cached:
+            return [imagehash.hex_to_hash(h) for h in cached]
+
         self.logger.debug(f"Sampling video hashes from: {url[:60]}...")
         hashes = []
         
+        # Read from the shared video cache (so analysis and merging reuse the download);
+        # stream the URL directly only when the download fails
+        artifact = None
         try:
-            container = av.open(url, timeout=15)
+            artifact = video_artifacts.fetch(url, lambda u, path: http_fetch(u, path, timeout=15))
+        except Exception as e:
+            self.logger.debug(f"Video cache download failed, streaming instead: {e}")
+
+        try:
+            container = av.open(artifact.path if artifact else url, timeout=15)
             video_stream = next(s for s in container.streams if s.type == "video")
             dur_s = self._duration_seconds(video_stream, container)
 
@@ -131,11 +174,16 @@ class CreativeComparisonService:
                         break
 
             container.close()
+            if hashes:
+                media_hash_cache.put(url, kind, [str(h) for h in hashes], etag=etag, content_length=content_length)
             return hashes
             
         except Exception as e:
             self.logger.error(f"Error sampling video hashes: {e}")
             return []
+        finally:
+            if artifact:
+                artifact.release()
 
     def compare_videos(
         self, 
@@ -188,8 +236,8 @@ class CreativeComparisonService:
         # Collect hashes in parallel to overlap network I/O
         try:
             with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-                fut1 = executor.submit(self._sample_video_hashes, url1, samples)
-                fut2 = executor.submit(self._sample_video_hashes, url2, samples)
+                fut1 = executor.submit(self._sample_video_hashes, url1, samples, 8, etag1, length1)
+                fut2 = executor.submit(self._sample_video_hashes, url2, samples, 8, etag2, length2)
                 hashes1 = fut1.result()
                 hashes2 = fut2.result()
                 
@@ -608,14 +656,8 @@ class CreativeComparisonService:
         self.logger.info(f"Ad {ad1_id} has {len(creatives1)} creative(s)")
         self.logger.info(f"Ad {ad2_id} has {len(creatives2)} creative(s)")
         
-        # Helper function to normalize URL for comparison
-        def normalize_url(url):
-            if not url:
-                return ""
-            # Parse URL and remove query parameters for more robust comparison
-            parsed = urlparse(url)
-            # Return just the path part of the URL for comparison
-            return f"{parsed.netloc}{parsed.path}".lower()
+        # Normalize URLs (netloc+path) so rotated CDN query params don't matter
+        normalize_url = normalize_media_url
         
         # Perform efficient checks first - check for direct URL matches
         if media_type1 == "image" and media_type2 == "image":
@@ -1,16 +1,25 @@
 import json
 import hashlib
 from datetime import datetime, date, timezone
-from typing import Dict, List, Optional, Any, Tuple, cast
+from typing import Dict, List, Optional, Any, Set, Tuple, cast
 import logging
 import threading
+import numpy as np
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import text
+from sqlalchemy import text, func, null
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError
 
 from app.models import Ad, Competitor, AdSet
 from app.database import get_db
 from app.services.creative_comparison_service import CreativeComparisonService
+from app.services.hamming_index import ad_set_signature_index, hex_to_uint64, signature_to_int64
+from app.services.hash_clustering import cluster_hashes, group_by_labels
+from app.services.ad_set_aggregates import apply_variant, recompute_ad_set, schedule_signature_refresh
+from app.services.ad_columns import PROMOTED_AD_COLUMNS, detect_media_type, promoted_ad_columns
+from app.services.ad_search import search_columns
+from app.services.response_cache import TAG_ADS, invalidate_tags
+from app.services.ad_card import refresh_ad_card
 
 logger = logging.getLogger(__name__)
 
@@ -20,11 +29,30 @@ class EnhancedAdExtractionService:
     
     EXTRACTION_VERSION = "1.0.0"
     
+    # Max Hamming distance (of 64 bits) for an AdSet to be a grouping candidate; keeping it
+    # below 8 lets the 4-band index probe only 1-bit neighbours per band
+    AD_SET_CANDIDATE_DISTANCE = 7
+    AD_SET_CANDIDATE_LIMIT = 20
+    
+    # Max Hamming distance for two signature groups to be verified for merging during
+    # batch grouping (about the old "at most 2 of 16 hex chars differ" tolerance)
+    GROUPING_HASH_DISTANCE = 8
+    
+    # Rows per INSERT ... ON CONFLICT statement in the bulk ingestion path
+    BULK_UPSERT_CHUNK_SIZE = 500
+    
     def __init__(self, db: Session, min_duration_days: Optional[int] = None):
         self.db = db
         self.logger = logging.getLogger(__name__)
         self.creative_comparison_service = CreativeComparisonService(db)
         self.min_duration_days = min_duration_days
+        # AdSets created during a bulk batch have no best_ad until the batch is written;
+        # their first ad stands in as representative for later ads of the same batch
+        self._pending_set_representatives: Dict[int, Dict] = {}
+        # AdSets whose best ad changed; their signatures are re-hashed after commit
+        self._pending_signature_refresh = set()
+        # Perceptual hashes computed ahead of the save (extraction pipeline), by ad_archive_id
+        self._precomputed_hashes: Dict[str, Optional[str]] = {}
     
     def convert_timestamp_to_date(self, ts: Any) -> Optional[str]:
         """Converts a UNIX timestamp to a 'YYYY-MM-DD' formatted string."""
@@ -105,6 +133,8 @@ class EnhancedAdExtractionService:
         """
         try:
             ad_id = ad_data.get("ad_archive_id", "unknown")
+            if str(ad_id) in self._precomputed_hashes:
+                return self._precomputed_hashes[str(ad_id)]
             self.logger.info(f"Calculating perceptual hash for ad {ad_id}")
             
             # Try to find primary media URL
@@ -159,11 +189,12 @@ class EnhancedAdExtractionService:
     
     def _update_ad_set_metadata(self, ad_set_id: int) -> None:
         """
-        Update metadata for an AdSet including:
+        Fully recompute metadata for an AdSet:
         - variant_count: Count of ads in the set
-        - best_ad_id: ID of the ad with highest overall_score
+        - best_ad_id: ID of the longest-running ad
         - first_seen_date / last_seen_date: The min/max start_date of all ads in the set.
-        - content_signature: Perceptual hash of the best ad's media
+        
+        A changed best ad queues a deferred content_signature re-hash.
         
         Args:
             ad_set_id: ID of the AdSet to update
@@ -174,96 +205,73 @@ class EnhancedAdExtractionService:
                 self.logger.warning(f"AdSet not found for updating metadata: {ad_set_id}")
                 return
             
-            # --- FIX: Query all ads in the set to calculate date range and best ad ---
             ads_in_set = self.db.query(Ad).filter(Ad.ad_set_id == ad_set_id).all()
-            if not ads_in_set:
-                ad_set.variant_count = 0
-                self.db.commit()
-                return
-
-            ad_set.variant_count = len(ads_in_set)
-            
-            # Find min and max start_date from all variants
-            min_date = None
-            max_date = None
-            for ad in ads_in_set:
-                # The start_date is stored inside the meta JSONB field
-                ad_start_date_str = ad.meta.get("start_date") if ad.meta else None
-                if ad_start_date_str:
-                    try:
-                        ad_start_date = datetime.strptime(ad_start_date_str, '%Y-%m-%d').replace(tzinfo=timezone.utc)
-                        if min_date is None or ad_start_date < min_date:
-                            min_date = ad_start_date
-                        if max_date is None or ad_start_date > max_date:
-                            max_date = ad_start_date
-                    except (ValueError, TypeError):
-                        continue  # Ignore ads with invalid date formats
-            
-            ad_set.first_seen_date = min_date
-            # The 'last_seen_date' should reflect the latest start date of a variant
-            ad_set.last_seen_date = max_date 
-
-            # Select best ad based on longest running duration
-            # Ads that run longer typically perform better (Facebook keeps showing winners)
-            def get_ad_duration(ad):
-                """Calculate duration in days for an ad"""
-                if not ad.meta:
-                    return 0
-                
-                start_date_str = ad.meta.get("start_date")
-                end_date_str = ad.meta.get("end_date")
-                is_active = ad.meta.get("is_active", False)
-                
-                if not start_date_str:
-                    return 0
-                
-                try:
-                    start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-                    
-                    if end_date_str:
-                        end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
-                    else:
-                        # If still active, use current date
-                        end_date = datetime.now()
-                    
-                    duration = (end_date - start_date).days
-                    
-                    # Prefer active ads over inactive ones with same duration
-                    # Add a bonus of 0.1 day for active ads to break ties
-                    if is_active:
-                        duration += 0.1
-                    
-                    return duration
-                except (ValueError, TypeError):
-                    return 0
-            
-            best_ad = max(ads_in_set, key=get_ad_duration, default=None)
-
-            if best_ad:
-                previous_best_ad_id = ad_set.best_ad_id
-                ad_set.best_ad_id = best_ad.id
-            
-                if (previous_best_ad_id != best_ad.id or not ad_set.content_signature):
-                    self.logger.info(f"Best ad changed or content_signature missing for AdSet {ad_set.id}, updating content_signature")
-                    try:
-                        best_ad_data = best_ad.to_enhanced_format()
-                        if best_ad_data:
-                            new_signature = self._generate_content_signature(best_ad_data)
-                            if new_signature:
-                                ad_set.content_signature = new_signature
-                                self.logger.info(f"Updated content_signature for AdSet {ad_set.id}: {new_signature}")
-                    except Exception as e:
-                        self.logger.error(f"Error updating content_signature for AdSet {ad_set.id}: {e}")
-            # --- END FIX ---
-            
-            ad_set.updated_at = datetime.utcnow()
+            if recompute_ad_set(ad_set, ads_in_set):
+                self._pending_signature_refresh.add(ad_set.id)
             self.db.commit()  # Commit the changes for this ad set
+            self._flush_signature_refreshes()
             self.logger.info(f"Updated AdSet metadata: id={ad_set_id}, variants={ad_set.variant_count}, best_ad_id={ad_set.best_ad_id}, first_seen={ad_set.first_seen_date}, last_seen={ad_set.last_seen_date}")
             
         except Exception as e:
             self.logger.error(f"Error updating AdSet metadata for ID {ad_set_id}: {e}")
             self.db.rollback()
     
+    def _record_ad_set_variant(
+        self,
+        ad_set_id: int,
+        ad_id: int,
+        meta: Optional[Dict[str, Any]],
+        old_meta: Optional[Dict[str, Any]] = None,
+        is_new: bool = True,
+    ) -> None:
+        """Incrementally fold one added/updated ad into its AdSet's metadata and commit."""
+        try:
+            ad_set = self.db.query(AdSet).filter(AdSet.id == ad_set_id).first()
+            if not ad_set:
+                self.logger.warning(f"AdSet not found for updating metadata: {ad_set_id}")
+                return
+            if apply_variant(self.db, ad_set, ad_id, meta, old_meta=old_meta, is_new=is_new):
+                self._pending_signature_refresh.add(ad_set.id)
+            self.db.commit()
+            self._flush_signature_refreshes()
+        except Exception as e:
+            self.logger.error(f"Error updating AdSet metadata for ID {ad_set_id}: {e}")
+            self.db.rollback()
+    
+    def _flush_signature_refreshes(self) -> None:
+        """Queue content_signature re-hashes collected since the last commit."""
+        pending, self._pending_signature_refresh = self._pending_signature_refresh, set()
+        schedule_signature_refresh(pending)
+    
+    def refresh_content_signature(self, ad_set_id: int) -> bool:
+        """
+        Re-hash an AdSet's content_signature from its current best ad.
+        Runs in the deferred ``ad_sets.refresh_signatures`` task.
+        """
+        try:
+            ad_set = (
+                self.db.query(AdSet)
+                .options(joinedload(AdSet.best_ad))
+                .filter(AdSet.id == ad_set_id)
+                .first()
+            )
+            if not ad_set or not ad_set.best_ad:
+                return False
+            best_ad_data = ad_set.best_ad.to_enhanced_format()
+            new_signature = self._generate_content_signature(best_ad_data) if best_ad_data else None
+            if not new_signature or new_signature == ad_set.content_signature:
+                return False
+            ad_set.content_signature = new_signature
+            ad_set.signature_hash = signature_to_int64(new_signature)
+            self.db.commit()
+            ad_set_signature_index.track(ad_set.id, new_signature, existing=True)
+            self.logger.info(f"Updated content_signature for AdSet {ad_set.id}: {new_signature}")
+            return True
+        except Exception as e:
+            self.logger.error(f"Error updating content_signature for AdSet {ad_set_id}: {e}")
+            self.db.rollback()
+            return False
+    
     def parse_dynamic_lead_form(self, extra_texts: List[Dict]) -> Dict:
         """
         Dynamically parses lead form questions and options from extra_texts.
@@ -641,6 +649,26 @@ class EnhancedAdExtractionService:
         
         return ad_object
     
+    def build_known_ad_update(self, ad_data: Dict) -> Optional[Dict]:
+        """
+        Meta-only update for an ad that is already stored: status, dates and page.
+        
+        Skips creatives, targeting and lead form parsing; the bulk save merges this
+        meta into the stored one and never hashes media for it (``"known": True``).
+        """
+        snapshot = ad_data.get("snapshot") or {}
+        return {
+            "ad_archive_id": ad_data.get("ad_archive_id"),
+            "known": True,
+            "meta": {
+                "is_active": ad_data.get("is_active", False),
+                "page_id": ad_data.get("page_id"),
+                "page_name": ad_data.get("page_name") or snapshot.get("page_name"),
+                "start_date": self.convert_timestamp_to_date(ad_data.get("start_date")),
+                "end_date": self.convert_timestamp_to_date(ad_data.get("end_date")),
+            },
+        }
+    
     def _detect_ad_media_type(self, snapshot: Dict, creatives: List[Dict]) -> str:
         """
         Detect the primary media type for an ad based on snapshot and creatives content.
@@ -650,59 +678,23 @@ class EnhancedAdExtractionService:
             creatives: List of processed creative objects
             
         Returns:
-            Media type string: 'carousel', 'video', 'image', or 'text'
+            Media type string: 'carousel', 'video', 'image', 'text' or 'unknown'
         """
         try:
-            # Check for carousel (multiple cards)
-            if snapshot.get("cards") and len(snapshot["cards"]) > 1:
-                return "carousel"
-                
-            # Check for videos in snapshot
-            if snapshot.get("videos"):
-                return "video"
-                
-            # Check for images in snapshot
-            if snapshot.get("images"):
-                return "image"
-                
-            # Check creatives for media content
-            if creatives:
-                has_video = False
-                has_image = False
-                
-                for creative in creatives:
-                    if creative.get("media"):
-                        for media_item in creative["media"]:
-                            media_type = media_item.get("type", "").lower()
-                            if media_type == "video":
-                                has_video = True
-                            elif media_type == "image":
-                                has_image = True
-                
-                if has_video:
-                    return "video"
-                elif has_image:
-                    return "image"
-                    
-            # Check if there's any text content
-            if (snapshot.get("title") or snapshot.get("body") or 
-                any(creative.get("body") or creative.get("headline") for creative in creatives)):
-                return "text"
-                
-            return "unknown"
-            
+            return detect_media_type(snapshot, creatives)
         except Exception as e:
             self.logger.error(f"Error detecting media type: {e}")
             return "unknown"
     
     def _group_ads_into_sets(self, ads_data: List[Dict]) -> Dict[str, List[Dict]]:
         """
-        Group similar ads using OPTIMAL multi-stage clustering:
+        Group similar ads using multi-stage clustering:
         1. Fast signature generation (parallel)
-        2. Hamming distance bucketing (LSH-inspired)
-        3. Smart comparison within buckets only
+        2. Bit-level band/multi-probe candidate generation over uint64 hashes
+        3. Full verification of candidate pairs, merged with union-find
         
-        This achieves both SPEED (O(n) average) and ACCURACY (perceptual hash + full verification)
+        Candidate generation is exact for the configured Hamming radius, so
+        near-duplicates are found even when they differ in every band.
         """
         import time
         from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -738,141 +730,64 @@ class EnhancedAdExtractionService:
         phase1_time = time.time() - phase1_start
         self.logger.info(f"✅ Phase 1 (signatures): {phase1_time:.2f}s → {len(ad_groups)} unique")
         
-        # Early exit if all ads are unique
-        if len(ad_groups) == num_ads:
+        # Early exit if all ads share one signature
+        if len(ad_groups) <= 1:
             total_time = time.time() - start_time
-            self.logger.info(f"🎯 Complete: {total_time:.2f}s ({num_ads / total_time:.0f} ads/s)")
+            self.logger.info(f"🎯 Complete: {total_time:.2f}s ({num_ads / max(total_time, 1e-6):.0f} ads/s)")
             return ad_groups
         
         # === PHASE 2: HAMMING DISTANCE CLUSTERING ===
         phase2_start = time.time()
-        signatures = list(ad_groups.keys())
-        num_groups = len(signatures)
         
-        # Skip if too few groups
-        if num_groups <= 2:
-            total_time = time.time() - start_time
-            self.logger.info(f"🎯 Complete: {total_time:.2f}s ({num_ads / total_time:.0f} ads/s)")
-            return ad_groups
-        
-        # Union-Find for efficient merging
-        parent = {sig: sig for sig in signatures}
-        rank = {sig: 0 for sig in signatures}
-        
-        def find_root(sig):
-            if parent[sig] != sig:
-                parent[sig] = find_root(parent[sig])
-            return parent[sig]
-        
-        def union(sig1, sig2):
-            root1, root2 = find_root(sig1), find_root(sig2)
-            if root1 == root2:
-                return False
-            if rank[root1] < rank[root2]:
-                parent[root1] = root2
-            elif rank[root1] > rank[root2]:
-                parent[root2] = root1
+        # Only 64-bit perceptual hashes are clustered; fallback signatures (ad ids) stay as-is
+        final_groups: Dict[str, List[Dict]] = {}
+        hashed_signatures: List[str] = []
+        hash_values: List[int] = []
+        for sig, ads in ad_groups.items():
+            value = hex_to_uint64(sig)
+            if value is None:
+                final_groups[sig] = ads
             else:
-                parent[root2] = root1
-                rank[root1] += 1
-            return True
+                hashed_signatures.append(sig)
+                hash_values.append(value)
         
-        # SMART BUCKETING: Use Hamming distance bands (LSH-inspired)
-        # Group signatures by multiple hash bands for better recall
-        def get_hash_bands(sig, num_bands=4, band_size=4):
-            """Split signature into bands for LSH-style bucketing"""
-            bands = []
-            sig_len = len(sig)
-            for i in range(num_bands):
-                start = (i * sig_len) // num_bands
-                end = ((i + 1) * sig_len) // num_bands
-                bands.append(sig[start:end])
-            return bands
-        
-        # Build candidate pairs using multiple hash bands
-        candidate_pairs = set()
-        for band_idx in range(4):  # Use 4 bands for good recall
-            band_buckets = defaultdict(list)
-            for i, sig in enumerate(signatures):
-                bands = get_hash_bands(sig)
-                if band_idx < len(bands):
-                    band_buckets[bands[band_idx]].append(i)
-            
-            # Add pairs from same bucket
-            for bucket_indices in band_buckets.values():
-                if len(bucket_indices) > 1:
-                    for i in range(len(bucket_indices)):
-                        for j in range(i + 1, len(bucket_indices)):
-                            candidate_pairs.add((bucket_indices[i], bucket_indices[j]))
-        
-        self.logger.info(f"   Generated {len(candidate_pairs)} candidate pairs from {num_groups} groups")
-        
-        # === PHASE 3: PARALLEL VERIFICATION ===
         def verify_pair(i, j):
-            """Verify if two groups should be merged"""
-            sig1, sig2 = signatures[i], signatures[j]
-            
-            # Quick Hamming distance check
-            if len(sig1) == len(sig2):
-                hamming_dist = sum(c1 != c2 for c1, c2 in zip(sig1, sig2))
-                similarity = 1.0 - (hamming_dist / len(sig1))
-                
-                # High similarity = likely match, verify with full check
-                if similarity > 0.85:
-                    if self._are_ad_groups_similar(ad_groups[sig1], ad_groups[sig2]):
-                        return (sig1, sig2)
-            
-            return None
-        
-        # Parallel verification with adaptive workers
-        max_workers_verify = min(8 if num_groups > 200 else 16, multiprocessing.cpu_count() or 1)
-        merge_count = 0
+            """Verify if two signature groups should be merged"""
+            try:
+                return self._are_ad_groups_similar(
+                    ad_groups[hashed_signatures[i]], ad_groups[hashed_signatures[j]]
+                )
+            except Exception as e:
+                self.logger.warning(f"Verification error: {e}")
+                return False
         
-        if candidate_pairs:
-            with ThreadPoolExecutor(max_workers=max_workers_verify) as executor:
-                futures = [executor.submit(verify_pair, i, j) for i, j in candidate_pairs]
-                for future in as_completed(futures):
-                    try:
-                        result = future.result()
-                        if result:
-                            sig1, sig2 = result
-                            if union(sig1, sig2):
-                                merge_count += 1
-                    except Exception as e:
-                        self.logger.warning(f"Verification error: {e}")
-        
-        # === PHASE 4: MERGE GROUPS ===
-        roots = {find_root(sig) for sig in signatures}
-        final_groups = {root: [] for root in roots}
-        
-        for sig in signatures:
-            root = find_root(sig)
-            final_groups[root].extend(ad_groups[sig])
+        # Verification is network-bound (media comparison), so it runs in a small pool
+        max_workers_verify = min(8 if len(hashed_signatures) > 200 else 16, multiprocessing.cpu_count() or 1)
+        labels = cluster_hashes(
+            np.array(hash_values, dtype=np.uint64),
+            self.GROUPING_HASH_DISTANCE,
+            verify=verify_pair,
+            max_workers=max_workers_verify,
+        )
+        
+        # === PHASE 3: MERGE GROUPS ===
+        clusters = group_by_labels(labels)
+        for root, members in clusters.items():
+            merged: List[Dict] = []
+            for member in members:
+                merged.extend(ad_groups[hashed_signatures[member]])
+            final_groups[hashed_signatures[root]] = merged
+        merge_count = len(hashed_signatures) - len(clusters)
         
         phase2_time = time.time() - phase2_start
         self.logger.info(f"✅ Phase 2 (clustering): {phase2_time:.2f}s → merged {merge_count} groups")
         
         total_time = time.time() - start_time
-        throughput = num_ads / total_time
+        throughput = num_ads / max(total_time, 1e-6)
         self.logger.info(f"🎯 OPTIMAL complete: {total_time:.2f}s ({throughput:.0f} ads/s) → {len(final_groups)} final groups")
         
         return final_groups
     
-    def _quick_signature_similarity(self, sig1: str, sig2: str) -> float:
-        """
-        Quick similarity check between two signatures using string comparison
-        Returns similarity score between 0 and 1
-        """
-        if sig1 == sig2:
-            return 1.0
-        
-        # Simple character-level similarity
-        if len(sig1) != len(sig2):
-            return 0.0
-        
-        matches = sum(c1 == c2 for c1, c2 in zip(sig1, sig2))
-        return matches / len(sig1)
-    
     def _are_ad_groups_similar(self, group1: List[Dict], group2: List[Dict]) -> bool:
         """
         Check if two ad groups are similar by comparing their representative ads
@@ -969,12 +884,14 @@ class EnhancedAdExtractionService:
         try:
             new_ad_set = AdSet(
                 content_signature=content_signature,
+                signature_hash=signature_to_int64(content_signature),
                 variant_count=0,  # Initial count is 0, will be incremented when ad is added
                 created_at=datetime.utcnow(),
                 updated_at=datetime.utcnow()
             )
             self.db.add(new_ad_set)
             self.db.flush()  # Get the ID without committing
+            ad_set_signature_index.track(new_ad_set.id, content_signature)
             self.logger.info(f"Created new AdSet {new_ad_set.id} for content signature: {content_signature}")
             return new_ad_set
         except Exception as e:
@@ -1002,21 +919,22 @@ class EnhancedAdExtractionService:
                 self.logger.info(f"Exact content_signature match found – using existing AdSet {exact_match.id}.")
                 return exact_match
 
-            # 3. Use pg_trgm similarity to fetch top candidate AdSets
-            candidate_query = text(
-                """
-                SELECT id FROM ad_sets
-                WHERE similarity(content_signature, :hash) > 0.8
-                ORDER BY similarity(content_signature, :hash) DESC
-                LIMIT 20
-                """
-            )
-            try:
-                result = self.db.execute(candidate_query, {"hash": new_hash})
-                candidate_ids = [row[0] for row in result]
-            except Exception as e:
-                self.logger.error(f"pg_trgm similarity query failed: {e}. Falling back to new AdSet.")
-                return self._create_new_ad_set(new_hash)
+            # 3. Fetch candidate AdSets within Hamming distance from the in-memory index
+            hash_value = hex_to_uint64(new_hash)
+            candidate_ids: List[int] = []
+            if hash_value is not None:
+                try:
+                    # Picks up AdSets created by other workers since the last lookup
+                    ad_set_signature_index.refresh(self.db)
+                    matches = ad_set_signature_index.query(
+                        hash_value,
+                        self.AD_SET_CANDIDATE_DISTANCE,
+                        limit=self.AD_SET_CANDIDATE_LIMIT,
+                    )
+                    candidate_ids = [ad_set_id for ad_set_id, _ in matches]
+                except Exception as e:
+                    self.logger.error(f"Hamming index lookup failed: {e}. Falling back to new AdSet.")
+                    return self._create_new_ad_set(new_hash)
 
             self.logger.info(f"{len(candidate_ids)} candidate AdSets retrieved for visual hash {new_hash}.")
 
@@ -1028,10 +946,22 @@ class EnhancedAdExtractionService:
                     .filter(AdSet.id.in_(candidate_ids))
                     .all()
                 )
+                for gone in set(candidate_ids) - {c.id for c in candidates}:
+                    ad_set_signature_index.remove(gone)  # Deleted (or rolled back) since it was indexed
+                # Preserve nearest-first order from the index
+                candidates.sort(key=lambda c: candidate_ids.index(c.id))
                 for ad_set in candidates:
-                    if not ad_set.best_ad:
+                    # The index may predate a re-hash made by another worker: trust the row
+                    stored = hex_to_uint64(ad_set.content_signature)
+                    if stored is None or bin(stored ^ hash_value).count("1") > self.AD_SET_CANDIDATE_DISTANCE:
+                        ad_set_signature_index.track(ad_set.id, ad_set.content_signature)
+                        continue
+                    if ad_set.best_ad:
+                        rep_ad_data = ad_set.best_ad.to_enhanced_format()
+                    elif ad_set.id in self._pending_set_representatives:
+                        rep_ad_data = self._pending_set_representatives[ad_set.id]
+                    else:
                         continue
-                    rep_ad_data = ad_set.best_ad.to_enhanced_format()
                     if self.creative_comparison_service.should_group_ads(ad_data, rep_ad_data):
                         self.logger.info(f"Grouping ad {ad_id} with existing AdSet {ad_set.id} (hash match).")
                         return ad_set
@@ -1118,14 +1048,17 @@ class EnhancedAdExtractionService:
                     targeting=ad_data.get("targeting", {}),
                     lead_form=ad_data.get("lead_form", {}),
                     creatives=ad_data.get("creatives", []),
-                    duration_days=duration_days  # Use calculated duration
+                    duration_days=duration_days,  # Use calculated duration
+                    **promoted_ad_columns(base_meta, ad_data.get("creatives", []), ad_data.get("media_type")),
+                    **search_columns(base_meta, ad_data.get("creatives", []))
                 )
+                refresh_ad_card(new_ad)
                 
                 self.db.add(new_ad)
                 self.db.flush()
                 
-                # Update the ad set's metadata
-                self._update_ad_set_metadata(ad_set.id)  # Call the updated metadata function
+                # Fold the new variant into the ad set's metadata
+                self._record_ad_set_variant(ad_set.id, new_ad.id, base_meta, is_new=True)
                 
                 return new_ad, True
                 
@@ -1137,7 +1070,8 @@ class EnhancedAdExtractionService:
                 existing_ad.updated_at = datetime.utcnow()
                 existing_ad.duration_days = duration_days  # Update duration
                 
-                current_meta: Dict[str, Any] = cast(Dict[str, Any], existing_ad.meta or {})
+                previous_meta: Dict[str, Any] = dict(existing_ad.meta or {})
+                current_meta: Dict[str, Any] = dict(previous_meta)
                 current_meta.update(base_meta)  # Update with new meta info
                 existing_ad.meta = current_meta
                 
@@ -1145,6 +1079,11 @@ class EnhancedAdExtractionService:
                 
                 if ad_data.get("creatives"):
                     existing_ad.creatives = ad_data.get("creatives")
+                for column, value in promoted_ad_columns(current_meta, existing_ad.creatives, ad_data.get("media_type")).items():
+                    setattr(existing_ad, column, value)
+                for column, value in search_columns(current_meta, existing_ad.creatives).items():
+                    setattr(existing_ad, column, value)
+                refresh_ad_card(existing_ad)
                 
                 # IMMEDIATE COMMIT: Force the meta data to be saved immediately
                 self.db.flush()
@@ -1153,7 +1092,9 @@ class EnhancedAdExtractionService:
 
                 # Also update ad set metadata if an existing ad is updated
                 if existing_ad.ad_set_id:
-                    self._update_ad_set_metadata(existing_ad.ad_set_id)
+                    self._record_ad_set_variant(
+                        existing_ad.ad_set_id, existing_ad.id, current_meta, old_meta=previous_meta, is_new=False
+                    )
                 
                 return existing_ad, False
                 
@@ -1162,12 +1103,13 @@ class EnhancedAdExtractionService:
             self.db.rollback()
             return None, False
     
-    def process_raw_responses(self, raw_responses: List[Dict]) -> Tuple[Dict, Dict]:
+    def process_raw_responses(self, raw_responses: List[Dict], known_ids: Optional[Set[str]] = None) -> Tuple[Dict, Dict]:
         """
         Process raw JSON responses from Facebook Ads Library and save to database
         
         Args:
             raw_responses: List of raw JSON responses from Facebook Ads Library
+            known_ids: ad_archive_ids already stored; these only get a meta update
             
         Returns:
             Tuple of (enhanced_data, stats)
@@ -1175,19 +1117,21 @@ class EnhancedAdExtractionService:
         self.logger.info(f"Processing {len(raw_responses)} raw responses with enhanced extraction")
         
         # Transform raw data to enhanced format
-        enhanced_data = self.transform_raw_data_to_enhanced_format(raw_responses)
+        enhanced_data = self.transform_raw_data_to_enhanced_format(raw_responses, known_ids=known_ids)
         
         # Save enhanced data to database
         stats = self.save_enhanced_ads_to_database(enhanced_data)
         
         return enhanced_data, stats 
 
-    def transform_raw_data_to_enhanced_format(self, raw_responses: List[Dict]) -> Dict[str, List[Dict]]:
+    def transform_raw_data_to_enhanced_format(self, raw_responses: List[Dict], known_ids: Optional[Set[str]] = None) -> Dict[str, List[Dict]]:
         """
         Transform raw JSON responses into enhanced format grouped by competitor
         
         Args:
             raw_responses: List of raw JSON responses from Facebook Ads Library
+            known_ids: ad_archive_ids already stored; these get ``build_known_ad_update``
+                instead of the full ``build_clean_ad_object``
             
         Returns:
             Dictionary mapping competitor names to lists of enhanced ad data
@@ -1268,7 +1212,10 @@ class EnhancedAdExtractionService:
                     ad_id = ad_data.get("ad_archive_id", "unknown")
                     print(f"TRACE: About to call build_clean_ad_object for {ad_id}")
                     
-                    clean_ad = self.build_clean_ad_object(ad_data)
+                    if known_ids and str(ad_id) in known_ids:
+                        clean_ad = self.build_known_ad_update(ad_data)
+                    else:
+                        clean_ad = self.build_clean_ad_object(ad_data)
                     
                     print(f"TRACE: build_clean_ad_object returned: {clean_ad is not None}")
                     if not clean_ad:
@@ -1308,16 +1255,34 @@ class EnhancedAdExtractionService:
         self.logger.info(f"Transformed {len(raw_responses)} responses into {len(enhanced_data)} competitor groups")
         return enhanced_data
 
-    def save_enhanced_ads_to_database(self, enhanced_data: Dict[str, List[Dict]]) -> Dict[str, int]:
+    def save_enhanced_ads_to_database(
+        self,
+        enhanced_data: Dict[str, List[Dict]],
+        bulk: bool = True,
+        media_hashes: Optional[Dict[str, Optional[str]]] = None,
+    ) -> Dict[str, int]:
         """
         Save enhanced ad data to database
         
         Args:
             enhanced_data: Dictionary mapping competitor names to ad data lists
+            bulk: Use batched upserts (default); False keeps the per-ad path
+            media_hashes: Perceptual hashes already computed for new ads, by ad_archive_id
+                (None for ads without hashable media); these are not downloaded again
             
         Returns:
             Dictionary with processing statistics
         """
+        if media_hashes:
+            self._precomputed_hashes = media_hashes
+            try:
+                return self.save_enhanced_ads_to_database(enhanced_data, bulk=bulk)
+            finally:
+                self._precomputed_hashes = {}
+        
+        if bulk:
+            return self._bulk_save_enhanced_ads(enhanced_data)
+        
         stats = {
             "total_ads_processed": 0,
             "new_ads_created": 0,
@@ -1418,6 +1383,215 @@ class EnhancedAdExtractionService:
             
         return stats
 
+    def _bulk_save_enhanced_ads(self, enhanced_data: Dict[str, List[Dict]]) -> Dict[str, int]:
+        """
+        Batched variant of ``save_enhanced_ads_to_database``.
+        
+        Competitors and existing ads are prefetched with one ``IN`` query each, rows
+        are written with ``INSERT ... ON CONFLICT (ad_archive_id) DO UPDATE`` in chunks
+        of ``BULK_UPSERT_CHUNK_SIZE``, and AdSet metadata is recomputed once per touched
+        set before a single commit.
+        """
+        stats = {
+            "total_ads_processed": 0,
+            "new_ads_created": 0,
+            "existing_ads_updated": 0,
+            "errors": 0,
+            "competitors_processed": 0,
+            "ads_filtered_by_duration": 0
+        }
+        
+        try:
+            competitors = {
+                c.name: c.id
+                for c in self.db.query(Competitor.id, Competitor.name)
+                .filter(Competitor.name.in_(list(enhanced_data.keys())))
+                .all()
+            } if enhanced_data else {}
+            
+            # Flatten, filter by duration and de-duplicate (last occurrence wins, as before)
+            batch: Dict[str, Tuple[Dict, int]] = {}
+            for competitor_name, ads_list in enhanced_data.items():
+                stats["competitors_processed"] += 1
+                competitor_id = competitors.get(competitor_name)
+                if competitor_id is None:
+                    self.logger.warning(f"Competitor '{competitor_name}' not found in database. Skipping {len(ads_list)} ads.")
+                    continue
+                for ad_data in ads_list:
+                    stats["total_ads_processed"] += 1
+                    ad_id = ad_data.get("ad_archive_id")
+                    if not ad_id:
+                        self.logger.error("Ad data missing ad_archive_id, cannot process")
+                        stats["errors"] += 1
+                        continue
+                    meta = ad_data.get("meta") or {}
+                    if not self.meets_duration_requirement(meta.get("start_date"), meta.get("end_date"), meta.get("is_active", False)):
+                        stats["ads_filtered_by_duration"] += 1
+                        continue
+                    batch[str(ad_id)] = (ad_data, competitor_id)
+            
+            if not batch:
+                self.logger.info(f"Bulk database save completed: {stats}")
+                return stats
+            
+            existing = {
+                row.ad_archive_id: row
+                for row in self.db.query(
+                    Ad.ad_archive_id, Ad.ad_set_id, Ad.meta, Ad.creatives, Ad.targeting, Ad.lead_form, Ad.raw_data
+                )
+                .filter(Ad.ad_archive_id.in_(list(batch.keys())))
+                .all()
+            }
+            
+            now = datetime.utcnow()
+            rows: List[Dict[str, Any]] = []
+            # (ad_set_id, merged meta, previous meta or None for new ads) aligned with rows
+            variants: List[Tuple[Optional[int], Dict[str, Any], Optional[Dict[str, Any]]]] = []
+            self._pending_set_representatives = {}
+            for ad_id, (ad_data, competitor_id) in batch.items():
+                try:
+                    base_meta: Dict[str, Any] = dict(ad_data.get("meta") or {})
+                    duration_days = self.calculate_duration_days(
+                        base_meta.get("start_date"), base_meta.get("end_date"), base_meta.get("is_active", False)
+                    )
+                    current = existing.get(ad_id)
+                    if current is None and ad_data.get("known"):
+                        # Deleted since it was looked up; a meta-only update can't recreate it
+                        self.logger.warning(f"Known ad {ad_id} is no longer stored, skipping")
+                        continue
+                    if current is None:
+                        ad_set = self.find_or_create_ad_set_for_ad(ad_data)
+                        if not ad_set:
+                            self.logger.error(f"Failed to find or create AdSet for ad {ad_id}")
+                            stats["errors"] += 1
+                            continue
+                        if not ad_set.best_ad_id:
+                            self._pending_set_representatives.setdefault(ad_set.id, ad_data)
+                        ad_set_id = ad_set.id
+                        meta = base_meta
+                        creatives = ad_data.get("creatives", [])
+                        card_ad = Ad(
+                            ad_archive_id=ad_id, meta=meta, creatives=creatives,
+                            targeting=ad_data.get("targeting", {}), lead_form=ad_data.get("lead_form", {}),
+                        )
+                    else:
+                        ad_set_id = current.ad_set_id
+                        meta = dict(current.meta or {})
+                        meta.update(base_meta)
+                        # Existing creatives are only replaced by a non-empty list
+                        creatives = ad_data.get("creatives") or current.creatives
+                        # Targeting, lead form and raw data are kept on conflict, so the card uses the stored ones
+                        card_ad = Ad(
+                            ad_archive_id=ad_id, meta=meta, creatives=creatives, targeting=current.targeting,
+                            lead_form=current.lead_form, raw_data=current.raw_data,
+                        )
+                    refresh_ad_card(card_ad)
+                    variants.append((ad_set_id, meta, None if current is None else dict(current.meta or {})))
+                    rows.append({
+                        "ad_archive_id": ad_id,
+                        "competitor_id": competitor_id,
+                        "ad_set_id": ad_set_id,
+                        "date_found": now,
+                        "updated_at": now,
+                        "meta": meta,
+                        "targeting": ad_data.get("targeting", {}),
+                        "lead_form": ad_data.get("lead_form", {}),
+                        "creatives": creatives if creatives is not None else null(),
+                        "duration_days": duration_days,
+                        **promoted_ad_columns(meta, creatives, ad_data.get("media_type")),
+                        **search_columns(meta, creatives),
+                        "card": card_ad.card if card_ad.card is not None else null(),
+                    })
+                except Exception as e:
+                    self.logger.error(f"Error preparing ad {ad_id}: {e}")
+                    stats["errors"] += 1
+            
+            saved: Dict[str, int] = {}  # ad_archive_id -> ads.id of rows actually written
+            for start in range(0, len(rows), self.BULK_UPSERT_CHUNK_SIZE):
+                chunk = rows[start:start + self.BULK_UPSERT_CHUNK_SIZE]
+                stmt = pg_insert(Ad).values(chunk)
+                # Existing ads keep their competitor, ad set, targeting and date_found
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[Ad.ad_archive_id],
+                    set_={
+                        "updated_at": stmt.excluded.updated_at,
+                        "duration_days": stmt.excluded.duration_days,
+                        "meta": stmt.excluded.meta,
+                        "creatives": func.coalesce(stmt.excluded.creatives, Ad.creatives),
+                        **{column: getattr(stmt.excluded, column) for column in PROMOTED_AD_COLUMNS},
+                        "search_text": stmt.excluded.search_text,
+                        "search_vector": stmt.excluded.search_vector,
+                        "card": stmt.excluded.card,
+                    },
+                ).returning(Ad.ad_archive_id, Ad.id)
+                try:
+                    with self.db.begin_nested():
+                        saved.update({archive_id: ad_pk for archive_id, ad_pk in self.db.execute(stmt)})
+                    created = sum(1 for _, _, old_meta in variants[start:start + len(chunk)] if old_meta is None)
+                    stats["new_ads_created"] += created
+                    stats["existing_ads_updated"] += len(chunk) - created
+                except Exception as e:
+                    self.logger.error(f"Error upserting ads {start}-{start + len(chunk)}: {e}")
+                    stats["errors"] += len(chunk)
+            
+            touched_sets = self._apply_ad_set_variants_bulk([
+                (ad_set_id, saved[row["ad_archive_id"]], meta, old_meta)
+                for row, (ad_set_id, meta, old_meta) in zip(rows, variants)
+                if ad_set_id and row["ad_archive_id"] in saved
+            ])
+            self.db.commit()
+            self._flush_signature_refreshes()
+            # The upserts are Core statements, which the ORM commit hook doesn't see
+            invalidate_tags(TAG_ADS)
+            self.logger.info(
+                f"Bulk database save completed: {stats} "
+                f"({len(rows)} rows in {(len(rows) + self.BULK_UPSERT_CHUNK_SIZE - 1) // self.BULK_UPSERT_CHUNK_SIZE} upserts, "
+                f"{touched_sets} ad sets updated)"
+            )
+        except Exception as e:
+            self.logger.error(f"Error saving to database: {e}")
+            self.db.rollback()
+            stats["errors"] += 1
+        finally:
+            self._pending_set_representatives = {}
+            self._pending_signature_refresh = set()
+        
+        return stats
+    
+    def _apply_ad_set_variants_bulk(self, variants: List[Tuple[int, int, Dict[str, Any], Optional[Dict[str, Any]]]]) -> int:
+        """
+        Fold a batch of ``(ad_set_id, ad_id, meta, old_meta)`` variants into their AdSets.
+        
+        Sets and their current best ads are loaded with one query each; every
+        variant is then an O(1) ``apply_variant`` step. Returns the number of sets touched.
+        """
+        ad_set_ids = {ad_set_id for ad_set_id, _, _, _ in variants}
+        if not ad_set_ids:
+            return 0
+        ad_sets = {s.id: s for s in self.db.query(AdSet).filter(AdSet.id.in_(list(ad_set_ids))).all()}
+        best_ids = [s.best_ad_id for s in ad_sets.values() if s.best_ad_id]
+        # Metas as they are after this batch's upserts, for best-ad comparisons
+        metas: Dict[int, Dict[str, Any]] = {}
+        if best_ids:
+            metas.update({ad_pk: meta for ad_pk, meta in self.db.query(Ad.id, Ad.meta).filter(Ad.id.in_(best_ids)).all()})
+        metas.update({ad_id: meta for _, ad_id, meta, _ in variants})
+        for ad_set_id, ad_id, meta, old_meta in variants:
+            ad_set = ad_sets.get(ad_set_id)
+            if ad_set is None:
+                continue
+            try:
+                best_changed = apply_variant(
+                    self.db, ad_set, ad_id, meta,
+                    old_meta=old_meta,
+                    is_new=old_meta is None,
+                    best_meta=metas.get(ad_set.best_ad_id),
+                )
+                if best_changed:
+                    self._pending_signature_refresh.add(ad_set.id)
+            except Exception as e:
+                self.logger.error(f"Error updating AdSet metadata for ID {ad_set_id}: {e}")
+        return len(ad_sets)
+
     def _extract_enhanced_ad_data(self, ad_data: Dict) -> Dict:
         """
         Extract enhanced ad data from ad_data into a format suitable for storage.
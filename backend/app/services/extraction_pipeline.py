@@ -0,0 +1,273 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from app.core.config import settings
+from app.services.enhanced_ad_extraction import EnhancedAdExtractionService
+from app.services.scrape_checkpoints import CheckpointTracker, page_ad_archive_ids
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("fetch", "parse", "hash", "upsert")
+
+# End-of-stream marker sent down a queue when a stage finishes
+_DONE = object()
+# How often blocked stages wake up to check for an abort
+_POLL_INTERVAL = 0.1
+
+
+class _Batch:
+    """Parsed ads on their way to one upsert, grouped by competitor name like ``enhanced_data``."""
+
+    def __init__(self):
+        self.ads: Dict[str, List[Dict]] = {}
+        self.size = 0
+        # New ads whose media still has to be hashed, by ad_archive_id
+        self.to_hash: Dict[str, Dict] = {}
+        self.media_hashes: Dict[str, Optional[str]] = {}
+
+    def add(self, competitor_name: str, ad: Dict, new: bool) -> None:
+        self.ads.setdefault(competitor_name, []).append(ad)
+        self.size += 1
+        if new and ad.get("ad_archive_id"):
+            self.to_hash[str(ad["ad_archive_id"])] = ad
+
+
+class ExtractionPipeline:
+    """
+    Streams search result pages through fetch -> parse -> hash -> upsert.
+
+    Fetch, parse and hash each run on their own thread; upsert runs on the calling
+    thread, which owns the extractor's session. Stages hand work on through bounded
+    queues, so a slow stage blocks the ones before it instead of letting pages pile
+    up: memory stays at a few pages plus a few batches of ``batch_size`` ads however
+    many pages are scraped. Media of new ads is hashed by a worker pool while the
+    previous batch is written, and the upsert reuses those hashes.
+
+    ``existing_ids`` (or ``tracker.known_ids`` for incremental scrapes) runs on the
+    parse thread and must not use the extractor's session.
+    """
+
+    def __init__(
+        self,
+        extractor: EnhancedAdExtractionService,
+        existing_ids: Optional[Callable[[List[str]], Set[str]]] = None,
+        tracker: Optional[CheckpointTracker] = None,
+        batch_size: Optional[int] = None,
+        hash_workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        keep_responses: bool = False,
+    ):
+        self.extractor = extractor
+        self.existing_ids = existing_ids
+        self.tracker = tracker
+        self.batch_size = batch_size or settings.EXTRACTION_BATCH_SIZE
+        self.hash_workers = hash_workers or settings.EXTRACTION_HASH_WORKERS
+        self.queue_size = queue_size or settings.EXTRACTION_QUEUE_SIZE
+        self.keep_responses = keep_responses
+        self.responses: List[Dict] = []
+        self.enhanced_data: Dict[str, List[Dict]] = {}
+        self.timings: Dict[str, Dict[str, float]] = {}
+
+    def run(self, pages: Iterable[Dict]) -> Dict[str, Any]:
+        """
+        Process ``pages`` (usually a generator that fetches them) and return scrape stats.
+
+        ``stats["pages_scraped"]`` counts the pages parsed (including error pages) and
+        ``stats["pipeline"]`` holds per-stage timings: items produced, seconds busy,
+        idle (waiting for input) and blocked (waiting for room downstream).
+        """
+        self.timings = {
+            stage: {"items": 0, "busy_seconds": 0.0, "idle_seconds": 0.0, "blocked_seconds": 0.0}
+            for stage in STAGES
+        }
+        self.responses = []
+        self.enhanced_data = {}
+        self.stats: Dict[str, Any] = {
+            "total_processed": 0,
+            "created": 0,
+            "updated": 0,
+            "errors": 0,
+            "competitors_created": 0,
+            "competitors_updated": 0,
+            "campaigns_processed": 0,
+            "ads_filtered_by_duration": 0,
+        }
+        self._pages = 0
+        self._page_errors = 0
+        self._known_ads = 0
+        self._stopped_early = False
+        self._stop_fetch = threading.Event()
+        self._abort = threading.Event()
+        self._error: Optional[BaseException] = None
+
+        pages_q, batches_q, ready_q = (queue.Queue(maxsize=self.queue_size) for _ in range(3))
+        threads = [
+            threading.Thread(
+                target=self._run_stage, args=("fetch", lambda _: iter(pages), None, pages_q, self._stop_fetch),
+                name="extraction-fetch", daemon=True,
+            ),
+            threading.Thread(
+                target=self._run_stage, args=("parse", self._parse, pages_q, batches_q),
+                name="extraction-parse", daemon=True,
+            ),
+            threading.Thread(
+                target=self._run_stage, args=("hash", self._hash, batches_q, ready_q),
+                name="extraction-hash", daemon=True,
+            ),
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            self._run_stage("upsert", self._upsert, ready_q, None)
+        finally:
+            if self._error is not None:
+                self._abort.set()
+            for thread in threads:
+                thread.join()
+
+        if self._error is not None:
+            raise self._error
+        self.stats["errors"] += self._page_errors
+        self.stats["pages_scraped"] = self._pages
+        if self.tracker is not None:
+            self.stats["known_ads"] = self._known_ads
+            self.stats["stopped_early"] = self._stopped_early
+        self.stats["pipeline"] = self.timings
+        logger.info(
+            "Extraction pipeline timings: "
+            + ", ".join(
+                f"{stage} {t['items']} items busy {t['busy_seconds']:.2f}s "
+                f"idle {t['idle_seconds']:.2f}s blocked {t['blocked_seconds']:.2f}s"
+                for stage, t in self.timings.items()
+            )
+        )
+        return self.stats
+
+    # Stage plumbing
+
+    def _run_stage(self, name: str, stage: Callable, inbox: Optional[queue.Queue], outbox: Optional[queue.Queue], stop: Optional[threading.Event] = None) -> None:
+        timing = self.timings[name]
+        items = stage(self._drain(timing, inbox) if inbox is not None else None)
+        try:
+            while not self._abort.is_set() and not (stop is not None and stop.is_set()):
+                started, idle_before = time.monotonic(), timing["idle_seconds"]
+                try:
+                    item = next(items, _DONE)
+                finally:
+                    timing["busy_seconds"] += time.monotonic() - started - (timing["idle_seconds"] - idle_before)
+                if item is _DONE:
+                    break
+                timing["items"] += 1
+                if outbox is not None and not self._put(timing, outbox, item, stop):
+                    break
+        except BaseException as e:
+            logger.error(f"Extraction pipeline stage '{name}' failed: {e}", exc_info=True)
+            if self._error is None:
+                self._error = e
+            self._abort.set()
+        finally:
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+            if outbox is not None:
+                self._put(timing, outbox, _DONE, stop)
+
+    def _drain(self, timing: Dict[str, float], inbox: queue.Queue) -> Iterator[Any]:
+        while True:
+            started = time.monotonic()
+            try:
+                item = inbox.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                if self._abort.is_set():
+                    return
+                continue
+            finally:
+                timing["idle_seconds"] += time.monotonic() - started
+            if item is _DONE:
+                return
+            yield item
+
+    def _put(self, timing: Dict[str, float], outbox: queue.Queue, item: Any, stop: Optional[threading.Event]) -> bool:
+        started = time.monotonic()
+        try:
+            while not self._abort.is_set() and not (stop is not None and stop.is_set()):
+                try:
+                    outbox.put(item, timeout=_POLL_INTERVAL)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            timing["blocked_seconds"] += time.monotonic() - started
+
+    # Stages
+
+    def _parse(self, pages: Iterator[Dict]) -> Iterator[_Batch]:
+        batch = _Batch()
+        for page in pages:
+            self._pages += 1
+            if self.keep_responses:
+                self.responses.append(page)
+            if "errors" in page:
+                error = (page["errors"] or [{}])[0]
+                logger.error(f"Facebook API Error: {error.get('message', 'Unknown Facebook API error')} (Code: {error.get('code', 'N/A')})")
+                self._page_errors += 1
+                continue
+
+            page_ids = page_ad_archive_ids(page)
+            if not page_ids:
+                existing = set()
+            elif self.tracker is not None:
+                existing = self.tracker.known_ids(page_ids)
+            elif self.existing_ids is not None:
+                existing = self.existing_ids(page_ids)
+            else:
+                existing = set()
+
+            grouped = self.extractor.transform_raw_data_to_enhanced_format(
+                [page], known_ids=existing if self.tracker is not None else None
+            )
+            for competitor_name, ads in grouped.items():
+                for ad in ads:
+                    batch.add(competitor_name, ad, new=str(ad.get("ad_archive_id")) not in existing)
+            if batch.size >= self.batch_size:
+                yield batch
+                batch = _Batch()
+
+            if self.tracker is not None:
+                self.tracker.observe_page(page, page_ids, existing)
+                self._known_ads += len(existing)
+                if self.tracker.has_history and page_ids and existing.issuperset(page_ids):
+                    logger.info("Page contains only known ads. Stopping incremental scrape.")
+                    self._stopped_early = True
+                    self._stop_fetch.set()
+                    break
+        if batch.size:
+            yield batch
+
+    def _hash(self, batches: Iterator[_Batch]) -> Iterator[_Batch]:
+        with ThreadPoolExecutor(max_workers=self.hash_workers, thread_name_prefix="extraction-hash") as pool:
+            for batch in batches:
+                futures = {
+                    ad_id: pool.submit(self.extractor._calculate_perceptual_hash_for_ad, ad)
+                    for ad_id, ad in batch.to_hash.items()
+                }
+                batch.media_hashes = {ad_id: future.result() for ad_id, future in futures.items()}
+                batch.to_hash = {}
+                yield batch
+
+    def _upsert(self, batches: Iterator[_Batch]) -> Iterator[Dict[str, int]]:
+        for batch in batches:
+            result = self.extractor.save_enhanced_ads_to_database(batch.ads, media_hashes=batch.media_hashes)
+            self.stats["total_processed"] += result.get("total_ads_processed", 0)
+            self.stats["created"] += result.get("new_ads_created", 0)
+            self.stats["updated"] += result.get("existing_ads_updated", 0)
+            self.stats["errors"] += result.get("errors", 0)
+            self.stats["competitors_updated"] += result.get("competitors_processed", 0)
+            self.stats["ads_filtered_by_duration"] += result.get("ads_filtered_by_duration", 0)
+            self.enhanced_data = batch.ads
+            yield result
@@ -1,12 +1,14 @@
-import requests
+import asyncio
+import copy
 import json
 import csv
 import time
 import uuid
 import os
+import queue
 from urllib.parse import urlencode
 from datetime import datetime
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Any, Set, Tuple
 import logging
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
@@ -16,8 +18,11 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 
 from app.models import Ad, Competitor
-from app.database import get_db
+from app.database import SessionLocal, get_db
 from app.services.enhanced_ad_extraction import EnhancedAdExtractionService
+from app.services.extraction_pipeline import ExtractionPipeline
+from app.services.graphql_fetch_engine import GraphQLFetchEngine, GraphQLFetchError, graphql_engine
+from app.services.scrape_checkpoints import CheckpointTracker
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
@@ -143,8 +148,11 @@ class FacebookAdsScraperConfig:
 class FacebookAdsScraperService:
     """Service for scraping Facebook Ads Library data"""
     
-    def __init__(self, db: Session, min_duration_days: Optional[int] = None):
+    GRAPHQL_URL = "https://www.facebook.com/api/graphql/"
+
+    def __init__(self, db: Session, min_duration_days: Optional[int] = None, engine: Optional[GraphQLFetchEngine] = None):
         self.db = db
+        self.engine = engine or graphql_engine
         self.enhanced_extractor = EnhancedAdExtractionService(db, min_duration_days)
 
     def build_variables(self, config: FacebookAdsScraperConfig) -> str:
@@ -240,6 +248,22 @@ class FacebookAdsScraperService:
         query_string = urlencode(params)
         return f"https://www.facebook.com/ads/library/?{query_string}"
 
+    def _build_request(self, config: FacebookAdsScraperConfig) -> Tuple[Dict[str, str], str]:
+        headers = config.headers.copy()
+        headers['referer'] = self.build_referer_url(config)
+        headers['Cookie'] = config.cookie
+        headers['x-fb-lsd'] = config.lsd_token
+        return headers, self.build_dynamic_payload(config)
+
+    async def fetch_ads_page_async(self, config: FacebookAdsScraperConfig) -> Optional[Dict]:
+        """Async ``fetch_ads_page`` on the shared fetch engine (pooled, throttled, retried)."""
+        headers, payload = self._build_request(config)
+        try:
+            return await self.engine.post(self.GRAPHQL_URL, headers, payload)
+        except GraphQLFetchError as e:
+            logger.error(f"Request error: {e}")
+            return None
+
     def fetch_ads_page(self, config: FacebookAdsScraperConfig) -> Optional[Dict]:
         """
         Fetch a single page of ads data using the Facebook Ads Library API
@@ -248,30 +272,47 @@ class FacebookAdsScraperService:
             config: Scraper configuration
             
         Returns:
-            Dictionary containing the response data
+            Dictionary containing the response data, or None if the request failed
         """
-        url = "https://www.facebook.com/api/graphql/"
-        
-        payload = self.build_dynamic_payload(config)
-        
-        headers = config.headers.copy()
-        headers['referer'] = self.build_referer_url(config)
-        headers['Cookie'] = config.cookie
-        headers['x-fb-lsd'] = config.lsd_token
-        
-        try:
-            response = requests.post(url, headers=headers, data=payload)
-            response.raise_for_status()
-            
-            data = response.json()
-            return data
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Request error: {e}")
-            return None
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON decode error: {e}")
-            logger.error(f"Response text that failed to parse: {response.text[:1000]}")
-            return None
+        return self.engine.run(self.fetch_ads_page_async(config))
+
+    async def _fetch_cursor_chain(self, config: FacebookAdsScraperConfig, on_page: Optional[Callable[[Dict], Any]] = None) -> List[Dict]:
+        # Works on a copy: the caller's config keeps its starting cursor
+        config = copy.copy(config)
+        responses = []
+        while not config.max_pages or len(responses) < config.max_pages:
+            if responses and config.delay_between_requests > 0:
+                await asyncio.sleep(config.delay_between_requests)
+            response_data = await self.fetch_ads_page_async(config)
+            if not response_data:
+                break
+            responses.append(response_data)
+            if on_page:
+                on_page(response_data)
+            try:
+                search_results = response_data['data']['ad_library_main']['search_results_connection']
+                page_info = search_results.get('page_info', {})
+                if not search_results.get('edges') or not page_info.get('has_next_page'):
+                    break
+                config.cursor = page_info.get('end_cursor')
+            except (KeyError, TypeError):
+                # Error payloads are kept so the scrape loop can report them
+                break
+        return responses
+
+    def fetch_cursor_chains(self, configs: Iterable[FacebookAdsScraperConfig]) -> List[List[Dict]]:
+        """
+        Fetch the raw pages of several searches (competitors, countries, queries) concurrently.
+
+        Each config's cursor chain is followed sequentially, as every page needs the
+        previous page's cursor; different chains share the engine's connection pool
+        and per-host limit. Returns the responses of each config in the same order,
+        ready for ``scrape_ads(config, pages=...)``.
+        """
+        async def fetch_all():
+            return await asyncio.gather(*(self._fetch_cursor_chain(config) for config in configs))
+
+        return list(self.engine.run(fetch_all()))
 
     def scrape_ads_with_progress(self, config: FacebookAdsScraperConfig, progress_callback=None) -> Tuple[List[Dict], List[Dict], Dict, Dict]:
         """
@@ -397,9 +438,8 @@ class FacebookAdsScraperService:
                             f"🔍 Processing {len(edges)} ads from page {page_count}..."
                         )
 
-                    enhanced_data, _ = self.enhanced_extractor.process_raw_responses([response_data])
-                    
-                    extraction_stats = self.enhanced_extractor.save_enhanced_ads_to_database(enhanced_data)
+                    # process_raw_responses already saves the page; reuse its stats
+                    enhanced_data, extraction_stats = self.enhanced_extractor.process_raw_responses([response_data])
                     
                     # Update cumulative stats
                     cumulative_stats['total_processed'] += extraction_stats.get('total_ads_processed', 0)
@@ -481,136 +521,107 @@ class FacebookAdsScraperService:
                 )
             raise
 
-    def scrape_ads(self, config: FacebookAdsScraperConfig) -> Tuple[List[Dict], List[Dict], Dict, Dict]:
+    def iter_pages(self, config: FacebookAdsScraperConfig, pages: Optional[Iterable[Dict]] = None) -> Iterator[Dict]:
+        """
+        Yield the raw search pages of ``config``, following its cursor.
+
+        Stops after ``max_pages``, a missing response, an error payload (yielded so
+        it gets reported), a page without ads or the last page. With ``pages`` the
+        prefetched responses are replayed instead of making requests.
+        """
+        prefetched = iter(pages) if pages is not None else None
+        page_count = 0
+        while not config.max_pages or page_count < config.max_pages:
+            page_count += 1
+            logger.info(f"Scraping page {page_count}")
+            response_data = next(prefetched, None) if prefetched is not None else self.fetch_ads_page(config)
+            if not response_data:
+                logger.warning(f"No response data on page {page_count}. Stopping scrape.")
+                return
+            if 'errors' in response_data:
+                yield response_data
+                return
+            try:
+                search_results = response_data['data']['ad_library_main']['search_results_connection']
+                edges = search_results.get('edges', [])
+                page_info = search_results.get('page_info') or {}
+            except (KeyError, TypeError) as e:
+                logger.error(f"Error parsing response data on page {page_count}: {e}")
+                yield {'errors': [{'message': f"Malformed response: {e}"}]}
+                return
+            if not edges:
+                logger.info("No ads found on this page. Stopping scrape.")
+                return
+            logger.info(f"Page {page_count}: Found {len(edges)} ad groups.")
+            yield response_data
+            if not page_info.get('has_next_page', False):
+                logger.info("No more pages available. Finished.")
+                return
+            config.cursor = page_info.get('end_cursor')
+            if prefetched is None and config.delay_between_requests > 0 and (not config.max_pages or page_count < config.max_pages):
+                logger.info(f"Waiting {config.delay_between_requests} seconds...")
+                time.sleep(config.delay_between_requests)
+        logger.info(f"Reached max pages limit of {config.max_pages}.")
+
+    def scrape_ads(
+        self,
+        config: FacebookAdsScraperConfig,
+        pages: Optional[Iterable[Dict]] = None,
+        incremental: bool = False,
+    ) -> Tuple[List[Dict], List[Dict], Dict, Dict]:
         """
         Scrape Facebook Ads and process them with enhanced extraction
         
+        Pages stream through an ExtractionPipeline (fetch, parse, media hashing and
+        upserts overlap, memory stays bounded by the batch size). Raw responses are
+        only kept when ``config.save_json`` is set, and ``enhanced_data`` is the last
+        saved batch.
+        
         Args:
             config: Scraper configuration
+            pages: Responses already fetched for this config (see fetch_cursor_chains);
+                when given, no requests are made
+            incremental: Use the competitor's scrape checkpoint: already stored ads only
+                get a meta update, and pagination stops at the first page made up
+                entirely of stored ads
         
         Returns:
             Tuple of (all_ads_data, all_json_responses, enhanced_data, stats)
         """
         logger.info(f"Starting data collection for {config.view_all_page_id} using enhanced extraction")
         
+        # Lookups run on the pipeline's parse thread, so they get their own session
+        lookup_db = SessionLocal()
         try:
-            all_json_responses = []
-            page_count = 0
-            enhanced_data = {}  # Initialize enhanced_data to avoid reference errors
-            
-            stats = {
-                "total_processed": 0,
-                "created": 0,
-                "updated": 0,
-                "errors": 0,
-                'competitors_created': 0,
-                'competitors_updated': 0,
-                'campaigns_processed': 0
-            }
-            
-            while True:
-                page_count += 1
-                if config.max_pages and page_count > config.max_pages:
-                    logger.info(f"Reached max pages limit of {config.max_pages}.")
-                    break
-
-                logger.info(f"Scraping page {page_count}")
-                
-                response_data = self.fetch_ads_page(config)
-
-                if not response_data:
-                    logger.warning(f"No response data on page {page_count}. Stopping scrape.")
-                    break
-                
-                all_json_responses.append(response_data)
-                
-                try:
-                    # Check if response contains errors instead of data
-                    if 'errors' in response_data:
-                        error_details = response_data['errors'][0] if response_data['errors'] else {}
-                        error_msg = error_details.get('message', 'Unknown Facebook API error')
-                        error_code = error_details.get('code', 'N/A')
-                        logger.error(f"Facebook API Error on page {page_count}: {error_msg} (Code: {error_code})")
-                        logger.error(f"This might be due to invalid search parameters, rate limiting, or Facebook server issues.")
-                        stats['errors'] += 1
-                        break
-                    
-                    search_results = response_data['data']['ad_library_main']['search_results_connection']
-                    edges = search_results.get('edges', [])
-                    page_info = search_results.get('page_info', {})
-
-                    if not edges:
-                        logger.info("No ads found on this page. Stopping scrape.")
-                        break
-                    
-                    logger.info(f"Page {page_count}: Found {len(edges)} ad groups. Processing with enhanced extraction.")
-                    
-                    # Debug logging for page searches to understand the issue
-                    if config.search_type == "page":
-                        logger.info(f"DEBUG - Page search results:")
-                        logger.info(f"  - Requested 'first': {config.first}")
-                        logger.info(f"  - Actual edges returned: {len(edges)}")
-                        logger.info(f"  - Page info: {page_info}")
-                        
-                        # Log first few ad archive IDs to verify we're getting different ads
-                        if edges:
-                            ad_ids = []
-                            for i, edge in enumerate(edges[:5]):  # First 5 ads
-                                try:
-                                    ad_archive_id = edge.get('node', {}).get('ad_archive_id')
-                                    if ad_archive_id:
-                                        ad_ids.append(ad_archive_id)
-                                except:
-                                    pass
-                            logger.info(f"  - Sample ad archive IDs: {ad_ids}")
-                        
-                        # Check if we're getting the same ad repeated
-                        unique_ad_ids = set()
-                        for edge in edges:
-                            try:
-                                ad_archive_id = edge.get('node', {}).get('ad_archive_id')
-                                if ad_archive_id:
-                                    unique_ad_ids.add(ad_archive_id)
-                            except:
-                                pass
-                        logger.info(f"  - Unique ads in this page: {len(unique_ad_ids)} out of {len(edges)} total")
-
-                    enhanced_data, _ = self.enhanced_extractor.process_raw_responses([response_data])
-                    
-                    extraction_stats = self.enhanced_extractor.save_enhanced_ads_to_database(enhanced_data)
-                    
-                    # Map the returned stats to our expected format
-                    stats['total_processed'] += extraction_stats.get('total_ads_processed', 0)
-                    stats['created'] += extraction_stats.get('new_ads_created', 0)
-                    stats['updated'] += extraction_stats.get('existing_ads_updated', 0)
-                    stats['errors'] += extraction_stats.get('errors', 0)
-                    stats['competitors_updated'] += extraction_stats.get('competitors_processed', 0)
-                    
-                    has_next_page = page_info.get('has_next_page', False)
-                    end_cursor = page_info.get('end_cursor')
-
-                    if not has_next_page:
-                        logger.info("No more pages available. Finished.")
-                        break
-                    
-                    config.cursor = end_cursor
-                    
-                    if config.delay_between_requests > 0:
-                        logger.info(f"Waiting {config.delay_between_requests} seconds...")
-                        time.sleep(config.delay_between_requests)
-
-                except (KeyError, TypeError) as e:
-                    logger.error(f"Error parsing response data on page {page_count}: {e}")
-                    logger.error(f"Response data that caused error: {response_data}")
-                    stats['errors'] += 1
-                    break
-            
+            tracker = None
+            if incremental:
+                competitor = lookup_db.query(Competitor).filter(Competitor.page_id == config.view_all_page_id).first()
+                if competitor:
+                    tracker = CheckpointTracker(lookup_db, competitor.id, config.countries, config.active_status)
+                else:
+                    logger.info(f"No competitor for page {config.view_all_page_id}; scraping without a checkpoint")
+
+            def existing_ids(ad_ids: List[str]) -> Set[str]:
+                rows = lookup_db.query(Ad.ad_archive_id).filter(Ad.ad_archive_id.in_(ad_ids))
+                return {row.ad_archive_id for row in rows}
+
+            pipeline = ExtractionPipeline(
+                self.enhanced_extractor,
+                existing_ids=existing_ids,
+                tracker=tracker,
+                keep_responses=config.save_json,
+            )
+            stats = pipeline.run(self.iter_pages(config, pages))
+            if tracker:
+                tracker.save()
             logger.info(f"Scraping complete. Final stats: {stats}")
-            return [], all_json_responses, enhanced_data, stats
+            return [], pipeline.responses, pipeline.enhanced_data, stats
         
         except Exception as e:
             logger.error(f"Error in ads scraping: {str(e)}")
-            raise 
+            raise
+        finally:
+            lookup_db.close()
 
     def scrape_ads_preview_only(self, config: FacebookAdsScraperConfig, use_parallel: bool = True) -> Tuple[List[Dict], List[Dict], Dict, Dict, Optional[str], bool]:
         """
@@ -634,14 +645,14 @@ class FacebookAdsScraperService:
     
     def _scrape_ads_preview_parallel(self, config: FacebookAdsScraperConfig) -> Tuple[List[Dict], List[Dict], Dict, Dict, Optional[str], bool]:
         """
-        Parallel version of preview scraping - fetches multiple pages concurrently
+        Pipelined version of preview scraping: the cursor chain is fetched on the
+        engine loop while pages that already arrived are transformed here
         """
-        logger.info(f"Starting PARALLEL preview scraping for {config.view_all_page_id} (max {config.max_pages} pages)")
+        logger.info(f"Starting PIPELINED preview scraping for {config.view_all_page_id} (max {config.max_pages} pages)")
         
         try:
             all_json_responses = []
             enhanced_data = {}
-            response_lock = threading.Lock()
             
             stats = {
                 "total_processed": 0,
@@ -653,91 +664,46 @@ class FacebookAdsScraperService:
                 'campaigns_processed': 0
             }
             
-            # First, fetch the first page to get the initial cursor
-            logger.info("Fetching first page to establish pagination...")
-            first_response = self.fetch_ads_page(config)
-            
-            if not first_response:
-                logger.error("Failed to fetch first page - no response")
-                return [], [], {}, stats, None, False
-            
-            if 'errors' in first_response:
-                logger.error(f"Failed to fetch first page - API errors: {first_response.get('errors')}")
-                return [], [], {}, stats, None, False
-            
-            logger.info("First page fetched successfully, adding to responses")
-            all_json_responses.append(first_response)
-            
-            # Get cursors for parallel fetching
-            cursors = [None]  # First page has no cursor
-            try:
-                search_results = first_response['data']['ad_library_main']['search_results_connection']
-                page_info = search_results.get('page_info', {})
-                
-                # Collect cursors by fetching pages sequentially until we have enough
-                current_cursor = page_info.get('end_cursor')
-                has_next = page_info.get('has_next_page', False)
-                
-                # Collect cursors for remaining pages (up to max_pages - 1)
-                # Create a copy of config by copying its attributes manually (can't use __dict__ due to headers)
-                temp_config = config
-                for i in range(1, config.max_pages):  # Fetch all requested pages
-                    if not has_next or not current_cursor:
-                        logger.info(f"No more pages available after page {i}")
-                        break
-                    
-                    cursors.append(current_cursor)
-                    
-                    # Fetch next page to get next cursor
-                    temp_config.cursor = current_cursor
-                    temp_response = self.fetch_ads_page(temp_config)
-                    if not temp_response or 'errors' in temp_response:
-                        logger.warning(f"Failed to fetch page {i+1}")
-                        break
-                    
-                    all_json_responses.append(temp_response)
-                    
-                    # Check if response has data
-                    try:
-                        search_results = temp_response['data']['ad_library_main']['search_results_connection']
-                        edges = search_results.get('edges', [])
-                        page_info = search_results.get('page_info', {})
-                        current_cursor = page_info.get('end_cursor')
-                        has_next = page_info.get('has_next_page', False)
-                        
-                        logger.info(f"Fetched page {i+1}/{config.max_pages}: {len(edges)} raw ads from Facebook")
-                    except (KeyError, TypeError) as e:
-                        logger.error(f"Error parsing page {i+1}: {e}")
-                        break
-                    
-                    # Small delay to avoid rate limiting
-                    if i < config.max_pages - 1 and has_next:
-                        time.sleep(0.5)
-                
-                logger.info(f"Collected {len(all_json_responses)} pages total from Facebook")
-                
-            except (KeyError, TypeError) as e:
-                logger.error(f"Error collecting cursors: {e}")
+            # Throttling is handled by the engine's backoff, so no fixed delay between pages
+            chain_config = copy.copy(config)
+            chain_config.delay_between_requests = 0
+            arrived: "queue.Queue[Optional[Dict]]" = queue.Queue()
+
+            async def fetch_chain():
+                try:
+                    return await self._fetch_cursor_chain(chain_config, on_page=arrived.put)
+                finally:
+                    arrived.put(None)
+
+            chain = self.engine.submit(fetch_chain())
             
-            # Process all collected responses
-            for response_data in all_json_responses:
+            while True:
+                response_data = arrived.get()
+                if response_data is None:
+                    break
+                all_json_responses.append(response_data)
+                if 'errors' in response_data:
+                    logger.error(f"Facebook API errors on page {len(all_json_responses)}: {response_data.get('errors')}")
+                    stats['errors'] += 1
+                    continue
                 try:
                     page_enhanced_data = self.enhanced_extractor.transform_raw_data_to_enhanced_format([response_data])
                     
-                    with response_lock:
-                        for competitor_name, ads_list in page_enhanced_data.items():
-                            if competitor_name not in enhanced_data:
-                                enhanced_data[competitor_name] = []
-                            enhanced_data[competitor_name].extend(ads_list)
-                        
-                        page_ad_count = sum(len(ads_list) for ads_list in page_enhanced_data.values())
-                        stats['total_processed'] += page_ad_count
-                        stats['competitors_updated'] += len(page_enhanced_data)
+                    for competitor_name, ads_list in page_enhanced_data.items():
+                        if competitor_name not in enhanced_data:
+                            enhanced_data[competitor_name] = []
+                        enhanced_data[competitor_name].extend(ads_list)
+                    
+                    page_ad_count = sum(len(ads_list) for ads_list in page_enhanced_data.values())
+                    stats['total_processed'] += page_ad_count
+                    stats['competitors_updated'] += len(page_enhanced_data)
+                    logger.info(f"Processed page {len(all_json_responses)}/{config.max_pages}: {page_ad_count} ads")
                 except Exception as e:
                     logger.error(f"Error processing response: {e}")
                     stats['errors'] += 1
+            chain.result()
             
-            logger.info(f"Parallel preview scraping complete. Final stats: {stats}")
+            logger.info(f"Pipelined preview scraping complete ({len(all_json_responses)} pages). Final stats: {stats}")
             
             # Extract pagination info from the last response
             next_cursor = None
@@ -0,0 +1,237 @@
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.database import SessionLocal
+from app.models import GeminiAsset
+
+logger = logging.getLogger(__name__)
+
+# (api_key_index, cache_name, ttl_seconds) -> new expireTime (ISO 8601)
+ExtendCache = Callable[[int, str, int], Optional[str]]
+
+
+def instruction_hash(system_instruction: str, model: str) -> str:
+    """Identity of an explicit cache's non-media content: system instruction + model."""
+    return hashlib.sha256(f"{model}\n{system_instruction}".encode()).hexdigest()
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def parse_expiry(value: Optional[str]) -> Optional[datetime]:
+    """Parse a Gemini ``expirationTime``/``expireTime`` (RFC 3339, nanosecond precision)."""
+    if not value:
+        return None
+    try:
+        value = value.replace("Z", "+00:00")
+        if "." in value:
+            # fromisoformat takes at most microseconds
+            head, tail = value.split(".", 1)
+            digits = len(tail) - len(tail.lstrip("0123456789"))
+            value = f"{head}.{tail[:min(digits, 6)]}{tail[digits:]}"
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _aware(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite hands back naive datetimes
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class GeminiAssetRegistry:
+    """
+    Lookup and bookkeeping for ``gemini_assets``.
+
+    ``find`` returns the best reusable asset for a creative (by normalized URL or
+    content hash): an unexpired explicit cache for the same instruction and model
+    if there is one, else an unexpired uploaded file. Cache hits are counted, and
+    caches that are hit often get their TTL extended before they lapse, on hit
+    and from ``extend_hot_caches``.
+    """
+
+    def __init__(self, session_factory: Callable = SessionLocal):
+        self.session_factory = session_factory
+        self.margin = timedelta(seconds=settings.GEMINI_ASSET_EXPIRY_MARGIN_SECONDS)
+
+    def find(
+        self,
+        instruction: str,
+        key_count: int,
+        url_key: Optional[str] = None,
+        content_sha256: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Best reusable asset for ``url_key`` or ``content_sha256``.
+
+        Returns id, content_sha256, api_key_index, file_uri and cache_name (None
+        unless an explicit cache for ``instruction`` is usable), or None.
+        """
+        if not url_key and not content_sha256:
+            return None
+        now = datetime.now(timezone.utc)
+        db = self.session_factory()
+        try:
+            # Every row of the content a known URL resolved to, whichever URL recorded it
+            contents = db.query(GeminiAsset.content_sha256).filter(GeminiAsset.url_key == url_key)
+            rows = (
+                db.query(GeminiAsset)
+                .filter(
+                    or_(
+                        GeminiAsset.content_sha256.in_(contents.scalar_subquery()) if url_key else False,
+                        GeminiAsset.content_sha256 == content_sha256 if content_sha256 else False,
+                    ),
+                    GeminiAsset.api_key_index < key_count,
+                )
+                .all()
+            )
+        finally:
+            db.close()
+
+        caches = [
+            row for row in rows
+            if row.instruction_hash == instruction and row.cache_name
+            and _aware(row.cache_expires_at) and _aware(row.cache_expires_at) > now + self.margin
+        ]
+        if caches:
+            row = max(caches, key=lambda r: _aware(r.cache_expires_at))
+            return self._match(row, cache_name=row.cache_name)
+        files = [row for row in rows if _aware(row.file_expires_at) and _aware(row.file_expires_at) > now + self.margin]
+        if files:
+            return self._match(max(files, key=lambda r: _aware(r.file_expires_at)))
+        return None
+
+    @staticmethod
+    def _match(row: GeminiAsset, cache_name: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "id": row.id,
+            "content_sha256": row.content_sha256,
+            "api_key_index": row.api_key_index,
+            "file_uri": row.file_uri,
+            "cache_name": cache_name,
+        }
+
+    def _upsert(self, content_sha256: str, api_key_index: int, instruction: str, **values) -> None:
+        for attempt in range(2):
+            db = self.session_factory()
+            try:
+                row = (
+                    db.query(GeminiAsset)
+                    .filter_by(content_sha256=content_sha256, api_key_index=api_key_index, instruction_hash=instruction)
+                    .first()
+                )
+                if row is None:
+                    row = GeminiAsset(content_sha256=content_sha256, api_key_index=api_key_index, instruction_hash=instruction)
+                    db.add(row)
+                for column, value in values.items():
+                    if value is not None:
+                        setattr(row, column, value)
+                row.last_used_at = datetime.now(timezone.utc)
+                db.commit()
+                return
+            except IntegrityError:
+                # Another worker inserted the same asset: update theirs
+                db.rollback()
+                if attempt:
+                    raise
+            finally:
+                db.close()
+
+    def record_upload(self, content_sha256: str, api_key_index: int, file_uri: str, file_expires_at: Optional[datetime], url_key: Optional[str] = None) -> None:
+        self._upsert(content_sha256, api_key_index, "", file_uri=file_uri, file_expires_at=file_expires_at, url_key=url_key)
+
+    def record_cache(
+        self,
+        content_sha256: str,
+        api_key_index: int,
+        file_uri: str,
+        instruction: str,
+        model: str,
+        cache_name: str,
+        cache_expires_at: Optional[datetime],
+        file_expires_at: Optional[datetime] = None,
+        url_key: Optional[str] = None,
+    ) -> None:
+        self._upsert(
+            content_sha256, api_key_index, instruction,
+            file_uri=file_uri, file_expires_at=file_expires_at, url_key=url_key,
+            model=model, cache_name=cache_name, cache_expires_at=cache_expires_at,
+        )
+
+    def forget_cache(self, asset_id: int) -> None:
+        db = self.session_factory()
+        try:
+            db.query(GeminiAsset).filter(GeminiAsset.id == asset_id).update(
+                {"cache_name": None, "cache_expires_at": None}, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _is_hot(self, row: GeminiAsset, now: datetime) -> bool:
+        expires = _aware(row.cache_expires_at)
+        return bool(
+            row.cache_name and expires
+            and row.hit_count >= settings.GEMINI_CACHE_HOT_HITS
+            and now < expires < now + timedelta(seconds=settings.GEMINI_CACHE_EXTEND_WITHIN_SECONDS)
+        )
+
+    def _extend(self, row: GeminiAsset, extend: ExtendCache, ttl_seconds: int) -> bool:
+        try:
+            expire_time = parse_expiry(extend(row.api_key_index, row.cache_name, ttl_seconds))
+        except Exception as e:
+            logger.warning(f"Failed to extend Gemini cache {row.cache_name}: {e}")
+            return False
+        row.cache_expires_at = expire_time or datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)
+        return True
+
+    def touch(self, asset_id: int, extend: Optional[ExtendCache] = None, ttl_seconds: int = 86400) -> None:
+        """Count a hit; a hot cache close to expiry gets ``ttl_seconds`` more."""
+        now = datetime.now(timezone.utc)
+        db = self.session_factory()
+        try:
+            row = db.query(GeminiAsset).filter(GeminiAsset.id == asset_id).first()
+            if row is None:
+                return
+            row.hit_count = (row.hit_count or 0) + 1
+            row.last_used_at = now
+            if extend and self._is_hot(row, now) and self._extend(row, extend, ttl_seconds):
+                logger.info(f"Extended hot Gemini cache {row.cache_name} ({row.hit_count} hits)")
+            db.commit()
+        finally:
+            db.close()
+
+    def extend_hot_caches(self, extend: ExtendCache, ttl_seconds: int, key_count: int) -> int:
+        """Extend every hot cache expiring within ``GEMINI_CACHE_EXTEND_WITHIN_SECONDS``; returns how many."""
+        now = datetime.now(timezone.utc)
+        db = self.session_factory()
+        try:
+            rows = (
+                db.query(GeminiAsset)
+                .filter(
+                    GeminiAsset.cache_name.isnot(None),
+                    GeminiAsset.cache_expires_at > now,
+                    GeminiAsset.cache_expires_at < now + timedelta(seconds=settings.GEMINI_CACHE_EXTEND_WITHIN_SECONDS),
+                    GeminiAsset.hit_count >= settings.GEMINI_CACHE_HOT_HITS,
+                    GeminiAsset.api_key_index < key_count,
+                )
+                .all()
+            )
+            extended = sum(1 for row in rows if self._extend(row, extend, ttl_seconds))
+            db.commit()
+            return extended
+        finally:
+            db.close()
@@ -0,0 +1,320 @@
+import hashlib
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+
+from app.core.config import settings
+from app.database import SessionLocal
+from app.models import ApiUsage
+
+logger = logging.getLogger(__name__)
+
+# Statuses that put a key on cooldown: quota exhausted, and overloaded (shorter)
+QUOTA_STATUS = 429
+OVERLOADED_STATUS = 503
+OVERLOADED_COOLDOWN_SECONDS = 5.0
+MAX_COOLDOWN_SECONDS = 300.0
+
+
+class _LocalStore:
+    """Expiring counters in process memory: the fallback when Redis is unreachable."""
+
+    def __init__(self):
+        self._data: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str, now: float) -> Optional[list]:
+        entry = self._data.get(key)
+        if entry and entry[1] <= now:
+            del self._data[key]
+            return None
+        return entry
+
+    def get_many(self, keys: List[str]) -> List[Optional[float]]:
+        now = time.time()
+        with self._lock:
+            return [entry[0] if entry else None for entry in (self._live(key, now) for key in keys)]
+
+    def incr(self, key: str, amount: float, ttl: float) -> float:
+        now = time.time()
+        with self._lock:
+            entry = self._live(key, now)
+            value = (entry[0] if entry else 0) + amount
+            self._data[key] = [value, now + ttl]
+            return value
+
+    def set(self, key: str, value: float, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = [value, time.time() + ttl]
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def add(self, key: str, ttl: float, value: float = 1) -> bool:
+        now = time.time()
+        with self._lock:
+            if self._live(key, now):
+                return False
+            self._data[key] = [value, now + ttl]
+            return True
+
+
+class _RedisStore:
+    """``_LocalStore`` operations on Redis, falling back to a local store on errors."""
+
+    REDIS_RETRY_INTERVAL = 30.0
+
+    def __init__(self):
+        self.local = _LocalStore()
+        self._redis = None
+        self._disabled_until = 0.0
+
+    def _client(self):
+        if time.monotonic() < self._disabled_until:
+            return None
+        if self._redis is None:
+            try:
+                import redis
+                self._redis = redis.from_url(settings.REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+            except Exception as e:
+                self._failed(e)
+        return self._redis
+
+    def _failed(self, error: Exception) -> None:
+        logger.warning(f"Gemini key scheduler: Redis unavailable, using local state ({error})")
+        self._disabled_until = time.monotonic() + self.REDIS_RETRY_INTERVAL
+
+    def _run(self, name: str, *args):
+        client = self._client()
+        if client is not None:
+            try:
+                return getattr(self, f"_redis_{name}")(client, *args)
+            except Exception as e:
+                self._failed(e)
+        return getattr(self.local, name)(*args)
+
+    @staticmethod
+    def _redis_get_many(client, keys):
+        return [float(value) if value is not None else None for value in client.mget(keys)]
+
+    @staticmethod
+    def _redis_incr(client, key, amount, ttl):
+        pipe = client.pipeline()
+        pipe.incrbyfloat(key, amount)
+        pipe.expire(key, int(ttl) + 1)
+        return float(pipe.execute()[0])
+
+    @staticmethod
+    def _redis_set(client, key, value, ttl):
+        client.set(key, value, px=max(1, int(ttl * 1000)))
+
+    @staticmethod
+    def _redis_delete(client, key):
+        client.delete(key)
+
+    @staticmethod
+    def _redis_add(client, key, ttl, value=1):
+        return bool(client.set(key, value, nx=True, ex=int(ttl) + 1))
+
+    def get_many(self, keys):
+        return self._run("get_many", keys)
+
+    def incr(self, key, amount, ttl):
+        return self._run("incr", key, amount, ttl)
+
+    def set(self, key, value, ttl):
+        self._run("set", key, value, ttl)
+
+    def delete(self, key):
+        self._run("delete", key)
+
+    def add(self, key, ttl, value=1):
+        return self._run("add", key, ttl, value)
+
+
+shared_store = _RedisStore()
+
+
+class GeminiKeyScheduler:
+    """
+    Spreads Gemini requests over the configured API keys.
+
+    Per-key state lives in Redis (keyed by a fingerprint of the key, so it is
+    shared by every worker and survives reordering the key list): requests and
+    tokens in the current minute, requests in flight, and a cooldown set after
+    429s (escalating while they repeat) and 503s. ``pick`` chooses among keys
+    that are off cooldown and under ``GEMINI_KEY_RPM``/``GEMINI_KEY_TPM``,
+    weighted by their remaining headroom and in-flight requests. Requests bound
+    to a key (an uploaded file or explicit cache) use ``lease(index)``, which
+    waits for that key instead of moving elsewhere. Token counts come from
+    ``record_tokens`` (the ``ApiUsage`` logging path). Counters missing from the
+    store (cold start, Redis flush) are seeded from this minute's ``ApiUsage`` rows.
+    """
+
+    PREFIX = "gemini_keys"
+    _seeded_minute: Optional[int] = None
+
+    def __init__(
+        self,
+        api_keys: List[str],
+        store=None,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+        cooldown_seconds: Optional[float] = None,
+        max_wait_seconds: Optional[float] = None,
+        session_factory: Optional[Callable] = SessionLocal,
+        rng: Optional[random.Random] = None,
+    ):
+        self.fingerprints = [hashlib.sha256(str(key).encode()).hexdigest()[:16] for key in api_keys]
+        self.store = store or shared_store
+        self.rpm = settings.GEMINI_KEY_RPM if rpm is None else rpm
+        self.tpm = settings.GEMINI_KEY_TPM if tpm is None else tpm
+        self.cooldown_seconds = settings.GEMINI_KEY_COOLDOWN_SECONDS if cooldown_seconds is None else cooldown_seconds
+        self.max_wait_seconds = settings.GEMINI_KEY_MAX_WAIT_SECONDS if max_wait_seconds is None else max_wait_seconds
+        self.session_factory = session_factory
+        self.rng = rng or random.Random()
+
+    def _key(self, index: int, name: str) -> str:
+        return f"{self.PREFIX}:{self.fingerprints[index]}:{name}"
+
+    @staticmethod
+    def _minute(now: float) -> int:
+        return int(now // 60)
+
+    def seed_from_usage(self, now: Optional[float] = None) -> None:
+        """
+        Seed this minute's counters from ``ApiUsage`` when they do not exist yet,
+        once per minute across workers. Counters already there were counted live
+        by ``lease``/``record_tokens`` and are left alone.
+        """
+        now = now or time.time()
+        minute = self._minute(now)
+        if self.session_factory is None or GeminiKeyScheduler._seeded_minute == minute:
+            return
+        GeminiKeyScheduler._seeded_minute = minute
+        if not self.store.add(f"{self.PREFIX}:seeded:{minute}", 120):
+            return
+        try:
+            db = self.session_factory()
+            try:
+                since = datetime.fromtimestamp(minute * 60, timezone.utc)
+                rows = (
+                    db.query(ApiUsage.api_key_index, func.count(ApiUsage.id), func.coalesce(func.sum(ApiUsage.total_tokens), 0))
+                    .filter(ApiUsage.provider == "gemini", ApiUsage.created_at >= since, ApiUsage.api_key_index.isnot(None))
+                    .group_by(ApiUsage.api_key_index)
+                    .all()
+                )
+            finally:
+                db.close()
+        except Exception as e:
+            logger.warning(f"Failed to seed Gemini key usage from api_usage: {e}")
+            return
+        for index, requests_made, tokens in rows:
+            if 0 <= index < len(self.fingerprints):
+                self.store.add(self._key(index, f"rpm:{minute}"), 120, requests_made)
+                self.store.add(self._key(index, f"tpm:{minute}"), 120, tokens)
+
+    def snapshot(self, now: Optional[float] = None) -> List[Dict]:
+        """Per key: index, cooldown (seconds left), inflight, requests and tokens this minute, available_in."""
+        now = now or time.time()
+        minute = self._minute(now)
+        names = ("cooldown", "inflight", f"rpm:{minute}", f"tpm:{minute}")
+        values = self.store.get_many([self._key(i, name) for i in range(len(self.fingerprints)) for name in names])
+        stats = []
+        for index in range(len(self.fingerprints)):
+            cooldown_until, inflight, used_requests, used_tokens = (v or 0 for v in values[index * 4:index * 4 + 4])
+            cooldown = max(0.0, cooldown_until - now)
+            over_budget = (self.rpm and used_requests >= self.rpm) or (self.tpm and used_tokens >= self.tpm)
+            stats.append({
+                "index": index,
+                "cooldown": round(cooldown, 3),
+                "inflight": int(max(0, inflight)),
+                "requests": int(used_requests),
+                "tokens": int(used_tokens),
+                "available_in": max(cooldown, (60 - now % 60) if over_budget else 0.0),
+            })
+        return stats
+
+    def _weight(self, stat: Dict) -> float:
+        used = max(
+            stat["requests"] / self.rpm if self.rpm else 0.0,
+            stat["tokens"] / self.tpm if self.tpm else 0.0,
+        )
+        return max(0.05, 1.0 - used) / (1 + stat["inflight"])
+
+    def pick(self, exclude: Iterable[int] = (), wait: bool = True) -> Optional[int]:
+        """
+        A key index to start new work on, or None if every key is excluded.
+
+        Waits (up to ``GEMINI_KEY_MAX_WAIT_SECONDS``) while all candidates are
+        cooling down or over budget, then settles for the one free soonest.
+        """
+        exclude = set(exclude)
+        self.seed_from_usage()
+        deadline = time.monotonic() + self.max_wait_seconds
+        while True:
+            candidates = [s for s in self.snapshot() if s["index"] not in exclude]
+            if not candidates:
+                return None
+            ready = [s for s in candidates if s["available_in"] <= 0]
+            if ready:
+                choice = self.rng.choices(ready, weights=[self._weight(s) for s in ready])[0]
+                return choice["index"]
+            soonest = min(candidates, key=lambda s: s["available_in"])
+            if not wait or time.monotonic() + soonest["available_in"] > deadline:
+                logger.warning(f"All Gemini keys are cooling down or over budget; using key #{soonest['index'] + 1}")
+                return soonest["index"]
+            time.sleep(min(soonest["available_in"], 5.0))
+
+    def wait_for(self, index: int) -> None:
+        """Wait (bounded) until ``index`` is off cooldown and under budget."""
+        deadline = time.monotonic() + self.max_wait_seconds
+        while True:
+            available_in = self.snapshot()[index]["available_in"]
+            if available_in <= 0:
+                return
+            if time.monotonic() + available_in > deadline:
+                logger.warning(f"Gemini key #{index + 1} still unavailable for {available_in:.0f}s; sending anyway")
+                return
+            time.sleep(min(available_in, 5.0))
+
+    @contextmanager
+    def lease(self, index: int):
+        """
+        Count one request on ``index`` (after waiting for it). Set ``lease["status"]``
+        to the HTTP status so 429/503 put the key on cooldown.
+        """
+        self.wait_for(index)
+        minute = self._minute(time.time())
+        self.store.incr(self._key(index, f"rpm:{minute}"), 1, 120)
+        self.store.incr(self._key(index, "inflight"), 1, 900)
+        lease = {"index": index, "status": None}
+        try:
+            yield lease
+        finally:
+            self.store.incr(self._key(index, "inflight"), -1, 900)
+            self.report(index, lease["status"])
+
+    def report(self, index: int, status: Optional[int]) -> None:
+        if status == QUOTA_STATUS:
+            strikes = self.store.incr(self._key(index, "strikes"), 1, MAX_COOLDOWN_SECONDS * 2)
+            self.cool_down(index, min(MAX_COOLDOWN_SECONDS, self.cooldown_seconds * 2 ** (strikes - 1)))
+        elif status == OVERLOADED_STATUS:
+            self.cool_down(index, OVERLOADED_COOLDOWN_SECONDS)
+        elif status is not None and status < 400:
+            self.store.delete(self._key(index, "strikes"))
+
+    def cool_down(self, index: int, seconds: float) -> None:
+        logger.warning(f"Gemini key #{index + 1} cooling down for {seconds:.0f}s")
+        self.store.set(self._key(index, "cooldown"), time.time() + seconds, seconds)
+
+    def record_tokens(self, index: int, tokens: int) -> None:
+        if 0 <= index < len(self.fingerprints) and tokens:
+            self.store.incr(self._key(index, f"tpm:{self._minute(time.time())}"), tokens, 120)
@@ -0,0 +1,210 @@
+import logging
+import mimetypes
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+GEMINI_UPLOAD_URL = "https://generativelanguage.googleapis.com/upload/v1beta/files"
+# Chunks other than the last must be a multiple of the server's granularity
+DEFAULT_GRANULARITY = 256 * 1024
+# Failures after which the server is asked how much it has and the upload resumes
+RESUMABLE_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class UploadInterrupted(Exception):
+    """A chunk was not accepted; the upload can resume from the server's offset."""
+
+
+class ResumableUploader:
+    """
+    Streaming uploads to the Gemini Files API (resumable protocol).
+
+    The file is read from disk one chunk at a time (``GEMINI_UPLOAD_CHUNK_BYTES``,
+    rounded down to the server's chunk granularity) and each chunk is sent with
+    ``upload``; the last one with ``upload, finalize``. After a connection error
+    or a retryable status the server is asked (``query``) how many bytes it has
+    and the upload continues from there, so a network blip costs at most one
+    chunk. Each thread keeps its own pooled session, and ``upload_many`` uploads
+    several files in parallel.
+    """
+
+    def __init__(
+        self,
+        chunk_size: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        timeout: Tuple[float, float] = (30, 300),
+        retry_delay: float = 1.0,
+        upload_url: str = GEMINI_UPLOAD_URL,
+    ):
+        self.chunk_size = chunk_size or settings.GEMINI_UPLOAD_CHUNK_BYTES
+        self.max_retries = settings.GEMINI_UPLOAD_MAX_RETRIES if max_retries is None else max_retries
+        self.max_workers = max_workers or settings.GEMINI_UPLOAD_WORKERS
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.upload_url = upload_url
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        # One pooled session per thread (requests.Session is not thread-safe)
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.max_workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+        return session
+
+    def start(self, params: Dict[str, str], file_size: int, mime_type: str, display_name: str) -> Tuple[str, int]:
+        """Open an upload session; returns (session URL, chunk size to use)."""
+        resp = self._session().post(
+            self.upload_url,
+            params=params,
+            headers={
+                "X-Goog-Upload-Protocol": "resumable",
+                "X-Goog-Upload-Command": "start",
+                "X-Goog-Upload-Header-Content-Length": str(file_size),
+                "X-Goog-Upload-Header-Content-Type": mime_type,
+                "Content-Type": "application/json",
+            },
+            json={"file": {"display_name": display_name}},
+            timeout=self.timeout,
+        )
+        resp.raise_for_status()
+        session_url = resp.headers.get("X-Goog-Upload-URL")
+        if not session_url:
+            raise RuntimeError("No upload URL returned from Gemini Files API")
+        granularity = int(resp.headers.get("X-Goog-Upload-Chunk-Granularity") or DEFAULT_GRANULARITY)
+        return session_url, max(granularity, self.chunk_size // granularity * granularity)
+
+    def query(self, session_url: str) -> Tuple[str, int]:
+        """Ask the server for the session's (status, bytes received)."""
+        try:
+            resp = self._session().post(
+                session_url,
+                headers={"X-Goog-Upload-Command": "query", "Content-Length": "0"},
+                timeout=self.timeout,
+            )
+        except RESUMABLE_ERRORS as e:
+            raise UploadInterrupted(f"{type(e).__name__}: {e}") from e
+        if resp.status_code in RETRYABLE_STATUSES:
+            raise UploadInterrupted(f"HTTP {resp.status_code}")
+        resp.raise_for_status()
+        return (
+            resp.headers.get("X-Goog-Upload-Status", "active"),
+            int(resp.headers.get("X-Goog-Upload-Size-Received") or 0),
+        )
+
+    def _send(self, session_url: str, offset: int, chunk: bytes, final: bool) -> requests.Response:
+        try:
+            resp = self._session().post(
+                session_url,
+                headers={
+                    "Content-Length": str(len(chunk)),
+                    "X-Goog-Upload-Offset": str(offset),
+                    "X-Goog-Upload-Command": "upload, finalize" if final else "upload",
+                },
+                data=chunk,
+                timeout=self.timeout,
+            )
+        except RESUMABLE_ERRORS as e:
+            raise UploadInterrupted(f"{type(e).__name__}: {e}") from e
+        if resp.status_code in RETRYABLE_STATUSES:
+            raise UploadInterrupted(f"HTTP {resp.status_code}")
+        resp.raise_for_status()
+        return resp
+
+    def upload(self, file_path: str, params: Dict[str, str], display_name: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Upload ``file_path``; returns (file resource JSON, stats).
+
+        Stats are bytes, seconds, mb_per_s, chunks (sent, including resent ones)
+        and retries.
+        """
+        mime_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+        file_size = os.path.getsize(file_path)
+        display = display_name or os.path.basename(file_path)
+        started = time.monotonic()
+        session_url, chunk_size = self.start(params, file_size, mime_type, display)
+
+        offset, chunks, retries = 0, 0, 0
+        with open(file_path, "rb") as f:
+            while True:
+                f.seek(offset)
+                chunk = f.read(chunk_size)
+                final = offset + len(chunk) >= file_size
+                try:
+                    resp = self._send(session_url, offset, chunk, final)
+                    chunks += 1
+                    if final:
+                        result = resp.json()
+                        break
+                    offset += len(chunk)
+                except UploadInterrupted as e:
+                    error = e
+                    # A failed query is retried too, from the same budget
+                    while True:
+                        retries += 1
+                        if retries > self.max_retries:
+                            raise RuntimeError(f"Upload of {display} failed after {self.max_retries} retries: {error}") from error
+                        time.sleep(self.retry_delay * 2 ** (retries - 1))
+                        try:
+                            status, received = self.query(session_url)
+                            break
+                        except UploadInterrupted as query_error:
+                            logger.warning(f"Querying upload of {display} failed ({query_error}); retrying")
+                            error = query_error
+                    if status == "final":
+                        raise RuntimeError(f"Upload of {display} was finalized but its response was lost")
+                    logger.warning(f"Upload of {display} interrupted at byte {offset} ({e}); resuming at {received}")
+                    offset = received
+
+        seconds = time.monotonic() - started
+        stats = {
+            "bytes": file_size,
+            "seconds": round(seconds, 3),
+            "mb_per_s": round(file_size / 1e6 / seconds, 2) if seconds else None,
+            "chunks": chunks,
+            "retries": retries,
+        }
+        logger.info(
+            f"Uploaded {display} to Gemini: {file_size / 1e6:.1f} MB in {seconds:.1f}s "
+            f"({stats['mb_per_s']} MB/s, {chunks} chunks, {retries} retries)"
+        )
+        return result, stats
+
+    def upload_many(
+        self,
+        file_paths: List[str],
+        params: Dict[str, str],
+    ) -> List[Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]]:
+        """Upload files in parallel; results in input order, (None, None) for failures."""
+        def run(path):
+            try:
+                return self.upload(path, params)
+            except Exception as e:
+                logger.error(f"Failed to upload {path} to Gemini: {e}")
+                return None, None
+
+        if not file_paths:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(file_paths)), thread_name_prefix="gemini-upload") as pool:
+            results = list(pool.map(run, file_paths))
+        done = [stats for _, stats in results if stats]
+        total_bytes = sum(s["bytes"] for s in done)
+        logger.info(f"Uploaded {len(done)}/{len(file_paths)} files to Gemini ({total_bytes / 1e6:.1f} MB)")
+        return results
+
+
+gemini_uploader = ResumableUploader()
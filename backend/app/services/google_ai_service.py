@@ -1,6 +1,5 @@
 import os
 import json
-import mimetypes
 import logging
 import time
 import uuid
@@ -9,12 +8,19 @@ import tempfile
 import subprocess
 import shutil
 import hashlib
+from datetime import datetime, timezone
 from pathlib import Path
 from urllib.parse import urlparse
 import requests
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from app.database import SessionLocal
-from app.models import AppSetting, ApiUsage
+from app.models import AppSetting
+from app.services.app_settings_cache import app_settings
+from app.services.gemini_assets import GeminiAssetRegistry, file_sha256, instruction_hash, parse_expiry
+from app.services.gemini_key_scheduler import GeminiKeyScheduler
+from app.services.gemini_upload import gemini_uploader
+from app.services.usage_recorder import usage_recorder
+from app.services.video_artifact_cache import cache_url, http_fetch, video_artifacts
 
 logger = logging.getLogger(__name__)
 
@@ -186,18 +192,14 @@ class GoogleAIService:
         else:
             # Try to load from database settings first
             try:
-                db = SessionLocal()
-                try:
-                    setting = db.query(AppSetting).filter(AppSetting.key == "gemini_api_keys").first()
-                    if setting and setting.value:
-                        keys_data = json.loads(setting.value) if isinstance(setting.value, str) else setting.value
-                        self.api_keys = keys_data if isinstance(keys_data, list) else [keys_data]
-                    else:
-                        # Fallback to env var
-                        env_key = os.getenv("GOOGLE_API_KEY")
-                        self.api_keys = [env_key] if env_key else []
-                finally:
-                    db.close()
+                raw = app_settings.get("gemini_api_keys")
+                if raw:
+                    keys_data = json.loads(raw) if isinstance(raw, str) else raw
+                    self.api_keys = keys_data if isinstance(keys_data, list) else [keys_data]
+                else:
+                    # Fallback to env var
+                    env_key = os.getenv("GOOGLE_API_KEY")
+                    self.api_keys = [env_key] if env_key else []
             except Exception as e:
                 logger.warning(f"Failed to load API keys from database: {e}")
                 env_key = os.getenv("GOOGLE_API_KEY")
@@ -208,37 +210,45 @@ class GoogleAIService:
         
         self.current_key_index = 0
         self.api_key = self.api_keys[0]
+        self.key_scheduler = GeminiKeyScheduler(self.api_keys)
+        self._tried_keys = set()
 
     def _auth_params(self) -> Dict[str, str]:
         return {"key": str(self.api_key)}
+
+    def _use_key(self, index: int) -> None:
+        self.current_key_index = index
+        self.api_key = self.api_keys[index]
+
+    def _pick_key(self) -> None:
+        """Start new (not key-bound) work on the key the scheduler picks."""
+        self._tried_keys = set()
+        self._use_key(self.key_scheduler.pick())
+        logger.info(f"Using API key #{self.current_key_index + 1}")
     
     def _rotate_key(self) -> bool:
-        """Rotate to next API key. Returns True if rotated, False if no more keys."""
-        self.current_key_index += 1
-        if self.current_key_index < len(self.api_keys):
-            self.api_key = self.api_keys[self.current_key_index]
-            logger.info(f"Rotated to API key #{self.current_key_index + 1}")
-            return True
-        return False
+        """Rotate to the best key not yet tried. Returns True if rotated, False if no more keys."""
+        self._tried_keys.add(self.current_key_index)
+        index = self.key_scheduler.pick(exclude=self._tried_keys)
+        if index is None:
+            return False
+        self._use_key(index)
+        logger.info(f"Rotated to API key #{self.current_key_index + 1}")
+        return True
     
     def _is_cache_enabled(self) -> bool:
         """Check if Gemini caching is enabled in settings (default: True)."""
         try:
-            db = SessionLocal()
-            try:
-                setting = db.query(AppSetting).filter(AppSetting.key == "gemini_cache_enabled").first()
-                if setting and setting.value:
-                    raw = setting.value
-                    if isinstance(raw, str):
-                        data = json.loads(raw)
-                    else:
-                        data = raw
-                    if isinstance(data, dict):
-                        return bool(data.get("enabled", True))
-                    elif isinstance(data, bool):
-                        return data
-            finally:
-                db.close()
+            raw = app_settings.get("gemini_cache_enabled")
+            if raw:
+                if isinstance(raw, str):
+                    data = json.loads(raw)
+                else:
+                    data = raw
+                if isinstance(data, dict):
+                    return bool(data.get("enabled", True))
+                elif isinstance(data, bool):
+                    return data
         except Exception as e:
             logger.warning(f"Failed to check cache_enabled setting: {e}")
         return True  # Default to enabled
@@ -246,138 +256,85 @@ class GoogleAIService:
     def _get_cache_ttl_seconds(self) -> int:
         """Get cache TTL in seconds from settings (default: 24 hours = 86400 seconds)."""
         try:
-            db = SessionLocal()
-            try:
-                setting = db.query(AppSetting).filter(AppSetting.key == "gemini_cache_ttl_hours").first()
-                if setting and setting.value:
-                    raw = setting.value
-                    if isinstance(raw, str):
-                        data = json.loads(raw)
-                    else:
-                        data = raw
-                    if isinstance(data, dict):
-                        ttl_hours = int(data.get("ttl_hours", 24))
-                    elif isinstance(data, int):
-                        ttl_hours = data
-                    else:
-                        ttl_hours = 24
-                    return ttl_hours * 3600  # Convert hours to seconds
-            finally:
-                db.close()
+            raw = app_settings.get("gemini_cache_ttl_hours")
+            if raw:
+                if isinstance(raw, str):
+                    data = json.loads(raw)
+                else:
+                    data = raw
+                if isinstance(data, dict):
+                    ttl_hours = int(data.get("ttl_hours", 24))
+                elif isinstance(data, int):
+                    ttl_hours = data
+                else:
+                    ttl_hours = 24
+                return ttl_hours * 3600  # Convert hours to seconds
         except Exception as e:
             logger.warning(f"Failed to get cache_ttl setting: {e}")
         return 86400  # Default to 24 hours in seconds
     
     def _log_usage(self, model_name: str, usage_metadata: Dict[str, Any], request_type: str = "analysis", ad_id: Optional[int] = None):
-        """Log API usage to database for tracking and billing."""
+        """Queue API usage for tracking and billing (written in batches by ``usage_recorder``)."""
         try:
-            db = SessionLocal()
-            try:
-                # Extract token counts
-                prompt_tokens = usage_metadata.get("prompt_token_count", 0) or usage_metadata.get("promptTokenCount", 0) or 0
-                cached_tokens = usage_metadata.get("cached_content_token_count", 0) or usage_metadata.get("cachedContentTokenCount", 0) or 0
-                completion_tokens = usage_metadata.get("candidates_token_count", 0) or usage_metadata.get("candidatesTokenCount", 0) or 0
-                total_tokens = prompt_tokens + cached_tokens + completion_tokens
-                
-                # Calculate cost based on model
-                # Gemini pricing per 1M tokens (USD)
-                pricing_map = {
-                    "gemini-2.5-flash-lite": {"prompt": 0.10, "cached_prompt": 0.01, "completion": 0.40},
-                    "gemini-2.5-flash-lite-preview-09-2025": {"prompt": 0.10, "cached_prompt": 0.01, "completion": 0.40},
-                    "gemini-2.0-flash": {"prompt": 0.10, "cached_prompt": 0.025, "completion": 0.40},
-                    "gemini-2.0-flash-001": {"prompt": 0.10, "cached_prompt": 0.025, "completion": 0.40},
-                    "gemini-2.0-flash-lite": {"prompt": 0.075, "cached_prompt": 0.075, "completion": 0.30},
-                }
-                
-                # Normalize model name
-                normalized_model = model_name.replace("models/", "")
-                pricing = pricing_map.get(normalized_model, {"prompt": 0.10, "cached_prompt": 0.025, "completion": 0.40})
-                
-                prompt_cost = (prompt_tokens / 1_000_000) * pricing["prompt"]
-                cached_cost = (cached_tokens / 1_000_000) * pricing["cached_prompt"]
-                completion_cost = (completion_tokens / 1_000_000) * pricing["completion"]
-                estimated_cost = prompt_cost + cached_cost + completion_cost
-                
-                # Create usage record
-                usage_record = ApiUsage(
-                    model_name=normalized_model,
-                    provider="gemini",
-                    api_key_index=self.current_key_index,
-                    prompt_tokens=prompt_tokens,
-                    cached_tokens=cached_tokens,
-                    completion_tokens=completion_tokens,
-                    total_tokens=total_tokens,
-                    estimated_cost_usd=estimated_cost,
-                    request_type=request_type,
-                    ad_id=ad_id,
-                    raw_metadata=json.dumps(usage_metadata)
-                )
-                
-                db.add(usage_record)
-                db.commit()
-                logger.info(f"Logged usage: {total_tokens} tokens, ${estimated_cost:.6f} for {normalized_model}")
-                
-            finally:
-                db.close()
+            # Extract token counts
+            prompt_tokens = usage_metadata.get("prompt_token_count", 0) or usage_metadata.get("promptTokenCount", 0) or 0
+            cached_tokens = usage_metadata.get("cached_content_token_count", 0) or usage_metadata.get("cachedContentTokenCount", 0) or 0
+            completion_tokens = usage_metadata.get("candidates_token_count", 0) or usage_metadata.get("candidatesTokenCount", 0) or 0
+            total_tokens = prompt_tokens + cached_tokens + completion_tokens
+            
+            # Calculate cost based on model
+            # Gemini pricing per 1M tokens (USD)
+            pricing_map = {
+                "gemini-2.5-flash-lite": {"prompt": 0.10, "cached_prompt": 0.01, "completion": 0.40},
+                "gemini-2.5-flash-lite-preview-09-2025": {"prompt": 0.10, "cached_prompt": 0.01, "completion": 0.40},
+                "gemini-2.0-flash": {"prompt": 0.10, "cached_prompt": 0.025, "completion": 0.40},
+                "gemini-2.0-flash-001": {"prompt": 0.10, "cached_prompt": 0.025, "completion": 0.40},
+                "gemini-2.0-flash-lite": {"prompt": 0.075, "cached_prompt": 0.075, "completion": 0.30},
+            }
+            
+            # Normalize model name
+            normalized_model = model_name.replace("models/", "")
+            pricing = pricing_map.get(normalized_model, {"prompt": 0.10, "cached_prompt": 0.025, "completion": 0.40})
+            
+            prompt_cost = (prompt_tokens / 1_000_000) * pricing["prompt"]
+            cached_cost = (cached_tokens / 1_000_000) * pricing["cached_prompt"]
+            completion_cost = (completion_tokens / 1_000_000) * pricing["completion"]
+            estimated_cost = prompt_cost + cached_cost + completion_cost
+            
+            # Queue usage record
+            usage_recorder.record({
+                "model_name": normalized_model,
+                "provider": "gemini",
+                "api_key_index": self.current_key_index,
+                "prompt_tokens": prompt_tokens,
+                "cached_tokens": cached_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": total_tokens,
+                "estimated_cost_usd": estimated_cost,
+                "request_type": request_type,
+                "ad_id": ad_id,
+                "raw_metadata": json.dumps(usage_metadata),
+                "created_at": datetime.now(timezone.utc),
+            })
+            self.key_scheduler.record_tokens(self.current_key_index, total_tokens)
+            logger.info(f"Logged usage: {total_tokens} tokens, ${estimated_cost:.6f} for {normalized_model}")
         except Exception as e:
             logger.error(f"Failed to log API usage: {e}")
 
     def upload_file(self, file_path: str, display_name: Optional[str] = None) -> Dict[str, Any]:
         """Uploads a local file to Gemini Files API using resumable upload protocol.
+        Streams the file in chunks and resumes from the server's offset after failures.
         Returns file resource JSON.
         Docs: https://ai.google.dev/gemini-api/docs/vision#technical-details-image
         """
-        mime_type, _ = mimetypes.guess_type(file_path)
-        if not mime_type:
-            mime_type = "application/octet-stream"
-
-        file_size = os.path.getsize(file_path)
-        display = display_name or os.path.basename(file_path)
-
-        # Step 1: Initiate resumable upload
-        init_url = "https://generativelanguage.googleapis.com/upload/v1beta/files"
-        init_headers = {
-            "X-Goog-Upload-Protocol": "resumable",
-            "X-Goog-Upload-Command": "start",
-            "X-Goog-Upload-Header-Content-Length": str(file_size),
-            "X-Goog-Upload-Header-Content-Type": mime_type,
-            "Content-Type": "application/json",
-        }
-        init_body = {"file": {"display_name": display}}
+        result, _stats = gemini_uploader.upload(file_path, self._auth_params(), display_name)
+        return result
 
-        init_resp = requests.post(
-            init_url,
-            params=self._auth_params(),
-            headers=init_headers,
-            json=init_body,
-            timeout=60
-        )
-        init_resp.raise_for_status()
-
-        # Extract upload URL from response headers
-        upload_url = init_resp.headers.get("X-Goog-Upload-URL")
-        if not upload_url:
-            raise RuntimeError("No upload URL returned from Gemini Files API")
-
-        # Step 2: Upload the file data
-        with open(file_path, "rb") as f:
-            file_data = f.read()
-
-        upload_headers = {
-            "Content-Length": str(file_size),
-            "X-Goog-Upload-Offset": "0",
-            "X-Goog-Upload-Command": "upload, finalize",
-        }
-
-        upload_resp = requests.post(
-            upload_url,
-            headers=upload_headers,
-            data=file_data,
-            timeout=600
-        )
-        upload_resp.raise_for_status()
-
-        return upload_resp.json()
+    def upload_files(self, file_paths: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Uploads several local files in parallel with the current key.
+        Returns file resource JSON per path (None where the upload failed).
+        """
+        return [result for result, _stats in gemini_uploader.upload_many(file_paths, self._auth_params())]
 
     def wait_for_file_active(self, file_uri: str, timeout_sec: int = 180, poll_interval_sec: int = 2) -> Dict[str, Any]:
         """Polls the Files API until the uploaded file state is ACTIVE or timeout.
@@ -476,6 +433,15 @@ class GoogleAIService:
         logger.info(f"Extended cache TTL: {cache_name} -> {updated.get('expireTime')}")
         return updated
 
+    def extend_cache_with_key(self, api_key_index: int, cache_name: str, ttl_seconds: int) -> Optional[str]:
+        """``update_cache_ttl`` with the API key that owns the cache; returns the new expireTime."""
+        current_key = self.api_key
+        self.api_key = self.api_keys[api_key_index]
+        try:
+            return self.update_cache_ttl(cache_name, ttl_seconds).get('expireTime')
+        finally:
+            self.api_key = current_key
+
     def delete_cache(self, cache_name: str) -> None:
         """Delete a cache to free up resources.
         
@@ -513,11 +479,13 @@ class GoogleAIService:
 
     def _download_instagram_video(self, video_url: str) -> str:
         """Download Instagram video with audio using yt-dlp when available.
-        Returns a path to a local MP4 file. Falls back to HTTP stream if yt-dlp is unavailable.
+        Returns a path to a local MP4 file in the shared video cache (pinned for
+        ``VIDEO_CACHE_PIN_SECONDS``). Falls back to HTTP stream if yt-dlp is unavailable.
         """
+        return video_artifacts.fetch(video_url, self._fetch_instagram_video, variant="yt-dlp").path
+
+    def _fetch_instagram_video(self, video_url: str, out_path: str) -> None:
         # Preferred: yt_dlp Python module
-        tmp_dir = tempfile.gettempdir()
-        out_path = os.path.join(tmp_dir, f"ig_{uuid.uuid4().hex}.mp4")
         try:
             try:
                 import yt_dlp  # type: ignore
@@ -532,7 +500,7 @@ class GoogleAIService:
                 with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                     ydl.download([video_url])
                 if os.path.exists(out_path) and os.path.getsize(out_path) > 0:
-                    return out_path
+                    return
             except Exception as e:
                 logger.info(f"yt_dlp module path failed, trying subprocess: {e}")
 
@@ -550,19 +518,13 @@ class GoogleAIService:
                 ]
                 subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
                 if os.path.exists(out_path) and os.path.getsize(out_path) > 0:
-                    return out_path
+                    return
         except Exception as e:
             logger.warning(f"yt-dlp download failed: {e}")
 
         # Final fallback: simple HTTP stream (may miss audio depending on source)
         try:
-            with requests.get(video_url, stream=True, timeout=600) as r:
-                r.raise_for_status()
-                with open(out_path, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=1024 * 1024):
-                        if chunk:
-                            f.write(chunk)
-            return out_path
+            http_fetch(video_url, out_path)
         except Exception as e:
             logger.error(f"HTTP download fallback failed: {e}")
             raise
@@ -570,25 +532,11 @@ class GoogleAIService:
     def _download_facebook_http(self, video_url: str) -> str:
         """Download a video via HTTP streaming with sane headers.
         Works for Facebook Ad Library resolved mp4 URLs and generic HTTP mp4 links.
-        Returns path to a local MP4 file.
+        Returns path to a local MP4 file in the shared video cache (pinned for
+        ``VIDEO_CACHE_PIN_SECONDS``).
         """
-        tmp_dir = tempfile.gettempdir()
-        out_path = os.path.join(tmp_dir, f"fb_{uuid.uuid4().hex}.mp4")
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36",
-            "Accept": "video/mp4,application/octet-stream,*/*",
-            "Accept-Language": "en-US,en;q=0.9",
-        }
         try:
-            with requests.get(video_url, stream=True, timeout=600, headers=headers) as r:
-                r.raise_for_status()
-                with open(out_path, "wb") as f:
-                    for chunk in r.iter_content(chunk_size=1024 * 1024):
-                        if chunk:
-                            f.write(chunk)
-            if os.path.exists(out_path) and os.path.getsize(out_path) > 0:
-                return out_path
-            raise RuntimeError("Downloaded file is empty")
+            return video_artifacts.fetch(video_url).path
         except Exception as e:
             logger.error(f"HTTP download failed: {e}")
             raise
@@ -747,32 +695,27 @@ class GoogleAIService:
 
         # Optional overrides from AppSetting in DB so they can be edited from the Settings page
         try:
-            db = SessionLocal()
-            try:
-                setting = db.query(AppSetting).filter(AppSetting.key == "gemini_system_instruction").first()
-                if setting and setting.value:
-                    system_instruction = setting.value
+            stored_instruction = app_settings.get("gemini_system_instruction")
+            if stored_instruction:
+                system_instruction = stored_instruction
 
-                # Load selected AI model if configured (e.g. gemini-2.0-flash-001 or openrouter:...)
-                model_setting = db.query(AppSetting).filter(AppSetting.key == "ai_model").first()
-                if model_setting and model_setting.value:
-                    raw = model_setting.value
-                    try:
-                        if isinstance(raw, str):
-                            data = json.loads(raw)
-                        else:
-                            data = raw
-                        if isinstance(data, dict):
-                            val = data.get("model_name") or data.get("model") or data.get("value")
-                            if isinstance(val, str) and val.strip():
-                                selected_model = val.strip()
-                        elif isinstance(raw, str) and raw.strip():
-                            selected_model = raw.strip()
-                    except Exception:
-                        if isinstance(raw, str) and raw.strip():
-                            selected_model = raw.strip()
-            finally:
-                db.close()
+            # Load selected AI model if configured (e.g. gemini-2.0-flash-001 or openrouter:...)
+            raw = app_settings.get("ai_model")
+            if raw:
+                try:
+                    if isinstance(raw, str):
+                        data = json.loads(raw)
+                    else:
+                        data = raw
+                    if isinstance(data, dict):
+                        val = data.get("model_name") or data.get("model") or data.get("value")
+                        if isinstance(val, str) and val.strip():
+                            selected_model = val.strip()
+                    elif isinstance(raw, str) and raw.strip():
+                        selected_model = raw.strip()
+                except Exception:
+                    if isinstance(raw, str) and raw.strip():
+                        selected_model = raw.strip()
         except Exception as e:
             logger.warning(f"Failed to load AI settings override, using defaults: {e}")
         
@@ -782,133 +725,51 @@ class GoogleAIService:
 
         # Primary: Try direct Gemini API...
         
-        # Try to reuse an existing explicit cache or uploaded file for this video_url.
-        # Explicit caches (gemini_cache_name) provide significant cost savings.
-        # Files and caches are tied to a specific API key index.
+        # Model to use (from settings or default); explicit caches are bound to it
+        model_name = selected_model if selected_model and not selected_model.startswith("openrouter:") else "gemini-2.5-flash-lite"
+
+        # Reuse an uploaded file or explicit cache of the same creative (by URL, see
+        # cache_url, or content hash, see GeminiAssetRegistry). Files and caches are tied to the API
+        # key index that created them; caches also to the system instruction + model.
+        asset_registry = GeminiAssetRegistry()
+        asset_instruction = instruction_hash(system_instruction, model_name)
+        asset_url_key = cache_url(video_url) if video_url else None
+        content_sha256 = None
         cached_cache_name = None
-        if not file_path and not file_uri and video_url:
-            try:
-                db = SessionLocal()
-                try:
-                    from app.models.ad_analysis import AdAnalysis
-                    # Get the most recent analysis for this video
-                    row = (
-                        db.query(AdAnalysis)
-                        .filter(AdAnalysis.used_video_url == video_url, AdAnalysis.raw_ai_response != None)  # type: ignore[attr-defined]
-                        .order_by(AdAnalysis.created_at.desc())
-                        .first()
-                    )
-                    raw = None
-                    if row is not None:
-                        rv = row.raw_ai_response
-                        if isinstance(rv, dict):
-                            raw = rv
-                        elif isinstance(rv, str):
-                            try:
-                                raw = json.loads(rv)
-                            except Exception:
-                                raw = None
-                    
-                    if raw:
-                        # CHECK: value of generate_prompts vs cached content
-                        # Heuristic: If cache has "generation_prompts" with content, it was likely a "Heavy" run.
-                        # If cache has empty/missing prompts, it was likely a "Light" run (or failed).
-                        
-                        has_prompts = False
-                        if "generation_prompts" in raw and isinstance(raw["generation_prompts"], list) and len(raw["generation_prompts"]) > 0:
-                            has_prompts = True
-                            
-                        # Mismatched Mode Check:
-                        # 1. User wants NO prompts (False), but cache HAS prompts (Heavy) -> SKIP (don't pay for heavy context)
-                        # 2. User wants prompts (True), but cache HAS NO prompts (Light) -> SKIP (need prompts)
-                        
-                        mode_mismatch = False
-                        if not generate_prompts and has_prompts:
-                            logger.info("Skipping cached result: Cache is 'Heavy' (has prompts) but requested mode is 'Light'")
-                            mode_mismatch = True
-                        elif generate_prompts and not has_prompts:
-                            logger.info("Skipping cached result: Cache is 'Light' (no prompts) but requested mode is 'Heavy'")
-                            mode_mismatch = True
-                            
-                        if not mode_mismatch:
-                            # Prefer valid explicit cache over file URI
-                            cache_name = raw.get("gemini_cache_name")
-                            cached_index = raw.get("gemini_api_key_index")
-                            
-                            if (
-                                cache_name
-                                and isinstance(cached_index, int)
-                                and 0 <= cached_index < len(self.api_keys)
-                            ):
-                                # Validate that the cache is still valid
-                                self.current_key_index = cached_index
-                                self.api_key = self.api_keys[cached_index]
-                                if self.is_cache_valid(cache_name):
-                                    cached_cache_name = cache_name
-                                    logger.info(
-                                        f"Reusing valid explicit cache {cache_name} with API key index {cached_index}"
-                                    )
-                                else:
-                                    logger.info(f"Cache {cache_name} expired, will create new cache")
-                            
-                            # Fallback to file URI if explicit cache is not available BUT file is
-                            # NOTE: Reusing file URI is generally safe regarding "context" (it's just the file),
-                            # BUT we will form a NEW request with the NEW system instruction.
-                            # So reusing file_uri is FINE even if modes mismatch, because file_uri doesn't bind the system instruction.
-                            # ONLY `cached_cache_name` binds the instruction.
-                            
-                            # So, wait. If mode_mismatch is True, we MUST NOT use `cached_cache_name`.
-                            # But we CAN use `raw.get("gemini_file_uri")` because that's just the video file.
-                            # The logic above skipped the WHOLE block if mode_mismatch.
-                            # Let's refine: Only skip `cached_cache_name` if mismatch. File URI is reusable.
-                            pass
-
-                    # Re-evaluating fallback logic carefully:
-                    if raw:
-                        # Logic split:
-                        cache_name = raw.get("gemini_cache_name")
-                        cached_index = raw.get("gemini_api_key_index")
-                        cached_uri = raw.get("gemini_file_uri")
-                        
-                        has_prompts = False
-                        if "generation_prompts" in raw and isinstance(raw["generation_prompts"], list) and len(raw["generation_prompts"]) > 0:
-                            has_prompts = True
-                            
-                        # Only reuse EXPLICIT CACHE if modes match
-                        if not generate_prompts and has_prompts:
-                             cache_name = None # Invalidate explicit cache use
-                        elif generate_prompts and not has_prompts:
-                             cache_name = None # Invalidate explicit cache use
-
-                        # Attempt to reuse explicit cache if allowed
-                        if (
-                            cache_name
-                            and isinstance(cached_index, int)
-                            and 0 <= cached_index < len(self.api_keys)
-                        ):
-                             self.current_key_index = cached_index
-                             self.api_key = self.api_keys[cached_index]
-                             if self.is_cache_valid(cache_name):
-                                 cached_cache_name = cache_name
-                                 logger.info(f"Reusing valid explicit cache {cache_name}")
-                        
-                        # Fallback: If no valid explicit cache (or skipped due to mismatch), try to reuse FILE URI
-                        # This is safe because file uri is just the asset, we will apply the correct NEW system instruction.
-                        if not cached_cache_name:
-                             if (
-                                cached_uri
-                                and isinstance(cached_index, int)
-                                and 0 <= cached_index < len(self.api_keys)
-                            ):
-                                file_uri = cached_uri
-                                self.current_key_index = cached_index
-                                self.api_key = self.api_keys[cached_index]
-                                logger.info(f"Reusing cached Gemini file URI {file_uri}")
+        reused_asset = None
+
+        def _adopt_asset(asset: Dict[str, Any]) -> bool:
+            nonlocal cached_cache_name, file_uri, reused_asset
+            self._use_key(asset["api_key_index"])
+            if asset["cache_name"]:
+                if self.is_cache_valid(asset["cache_name"]):
+                    cached_cache_name = asset["cache_name"]
+                    logger.info(f"Reusing explicit cache {cached_cache_name} with API key index {self.current_key_index}")
+                else:
+                    asset_registry.forget_cache(asset["id"])
+            if not cached_cache_name and not asset["file_uri"]:
+                return False
+            file_uri = asset["file_uri"]
+            reused_asset = asset
+            if not cached_cache_name:
+                logger.info(f"Reusing uploaded Gemini file {file_uri} with API key index {self.current_key_index}")
+            asset_registry.touch(
+                asset["id"],
+                extend=self.extend_cache_with_key if cached_cache_name else None,
+                ttl_seconds=self._get_cache_ttl_seconds(),
+            )
+            return True
 
-                finally:
-                    db.close()
+        def _lookup_asset(**key) -> bool:
+            try:
+                asset = asset_registry.find(asset_instruction, len(self.api_keys), **key)
+                return bool(asset) and _adopt_asset(asset)
             except Exception as e:
-                logger.warning(f"Failed to lookup cached Gemini data for {video_url}: {e}")
+                logger.warning(f"Failed to look up Gemini assets: {e}")
+                return False
+
+        if not file_path and not file_uri and video_url:
+            _lookup_asset(url_key=asset_url_key)
 
         # Determine source handling based on URL
         enable_reuploads = file_path is not None
@@ -963,24 +824,11 @@ class GoogleAIService:
                                 logger.warning(f"Failed to resolve Ad Library page URL: {e}")
 
                     # At this point we expect video_url to be a direct mp4 or downloadable asset
-                    import tempfile, os
-                    tmp_dir = tempfile.gettempdir()
-                    import uuid as _uuid
-                    out_path = os.path.join(tmp_dir, f"fb_{_uuid.uuid4().hex}.mp4")
                     logger.info("Downloading Facebook video for upload...")
                     try:
-                        with requests.get(video_url, stream=True, timeout=600) as r:
-                            r.raise_for_status()
-                            with open(out_path, 'wb') as f:
-                                for chunk in r.iter_content(chunk_size=1024 * 1024):
-                                    if chunk:
-                                        f.write(chunk)
-                        if os.path.exists(out_path) and os.path.getsize(out_path) > 0:
-                            file_path = out_path
-                            enable_reuploads = True
-                            logger.info("✓ Downloaded Facebook video; will upload to Gemini")
-                        else:
-                            raise RuntimeError("Downloaded file is empty")
+                        file_path = video_artifacts.fetch(video_url).path
+                        enable_reuploads = True
+                        logger.info("✓ Downloaded Facebook video; will upload to Gemini")
                     except Exception as e:
                         logger.warning(f"Facebook download failed: {e}")
                         # As a fallback, allow URL-only if download fails
@@ -993,6 +841,17 @@ class GoogleAIService:
                 logger.info("Unknown video source; attempting Gemini with URL (no upload)")
                 url_only_gemini = True
 
+        # Same creative under another URL or ad: reuse its upload/cache instead of uploading again
+        if file_path and not image_path and not reused_asset:
+            try:
+                content_sha256 = file_sha256(file_path)
+            except OSError as e:
+                logger.warning(f"Failed to hash {file_path}: {e}")
+            if content_sha256 and _lookup_asset(content_sha256=content_sha256):
+                file_path = None
+        elif reused_asset:
+            content_sha256 = reused_asset["content_sha256"]
+
         # Handle Image Upload for Image-to-Video
         if image_path:
             try:
@@ -1076,13 +935,12 @@ class GoogleAIService:
         last_error = None
         current_file_uri = file_uri
         
-        # Determine model to use (from settings or default)
-        model_name = selected_model if selected_model and not selected_model.startswith("openrouter:") else "gemini-2.5-flash-lite"
-
-        # If we have a pre-existing file_uri and are not re-uploading or using URL-only
+        # If we have a pre-existing file_uri or cache and are not re-uploading or using URL-only
         # mode, reuse that single Gemini file with its bound API key (no key rotation).
-        reuse_existing_file = bool(file_uri and not enable_reuploads and not url_only_gemini)
+        reuse_existing_file = bool((file_uri or cached_cache_name) and not enable_reuploads and not url_only_gemini)
         max_keys = 1 if reuse_existing_file else len(self.api_keys)
+        if not reuse_existing_file:
+            self._pick_key()
 
         for key_attempt in range(max_keys):
             # Decide how to provide the media to Gemini for this key
@@ -1104,6 +962,17 @@ class GoogleAIService:
                         or f"https://generativelanguage.googleapis.com/v1beta/files/{upload_result.get('name', '').split('/')[-1]}"
                     )
                     logger.info(f"✓ Uploaded file with key #{self.current_key_index + 1}: {current_file_uri}")
+                    if content_sha256 and current_file_uri:
+                        try:
+                            asset_registry.record_upload(
+                                content_sha256,
+                                self.current_key_index,
+                                current_file_uri,
+                                parse_expiry((upload_result.get('file') or {}).get('expirationTime')),
+                                url_key=asset_url_key,
+                            )
+                        except Exception as e:
+                            logger.warning(f"Failed to record Gemini upload: {e}")
                     
                     # Wait for file to be active if we got a usable URI
                     try:
@@ -1136,7 +1005,7 @@ class GoogleAIService:
                     mime_type = None
 
             # Context caching - check if enabled in settings
-            cache_to_use = None
+            cache_to_use = cached_cache_name
             if self._is_cache_enabled() and not url_only_gemini and current_file_uri and not cache_to_use:
                 try:
                     ttl_seconds = self._get_cache_ttl_seconds()
@@ -1149,6 +1018,20 @@ class GoogleAIService:
                     )
                     cache_to_use = cache.get("name")
                     logger.info(f"✓ Created cache: {cache_to_use}")
+                    if content_sha256 and cache_to_use:
+                        try:
+                            asset_registry.record_cache(
+                                content_sha256,
+                                self.current_key_index,
+                                current_file_uri,
+                                asset_instruction,
+                                model_name,
+                                cache_to_use,
+                                parse_expiry(cache.get("expireTime")),
+                                url_key=asset_url_key,
+                            )
+                        except Exception as e:
+                            logger.warning(f"Failed to record Gemini cache: {e}")
                 except Exception as e:
                     logger.warning(f"Failed to create explicit cache, proceeding without: {e}")
             elif not self._is_cache_enabled():
@@ -1218,7 +1101,9 @@ class GoogleAIService:
             # Try current key multiple times with backoff for 503 errors
             for retry in range(max_retries_per_key):
                 try:
-                    resp = requests.post(url, params=self._auth_params(), json=payload, timeout=600)
+                    with self.key_scheduler.lease(self.current_key_index) as lease:
+                        resp = requests.post(url, params=self._auth_params(), json=payload, timeout=600)
+                        lease["status"] = resp.status_code
                     
                     # Success!
                     if resp.status_code < 400:
@@ -1773,8 +1658,7 @@ class GoogleAIService:
         if api_key_index < 0 or api_key_index >= len(self.api_keys):
             raise ValueError("Invalid gemini_api_key_index")
 
-        self.current_key_index = api_key_index
-        self.api_key = self.api_keys[api_key_index]
+        self._use_key(api_key_index)
 
         # If cache provided and valid, extend its TTL and use it
         use_cache = None
@@ -0,0 +1,235 @@
+import asyncio
+import concurrent.futures
+import logging
+import os
+import random
+import threading
+from typing import Any, AsyncIterator, Awaitable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+import orjson
+
+from app.core.config import settings
+from app.services.rate_limiter import TokenBucket, ad_library_bucket
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  (httpx only negotiates HTTP/2 when h2 is installed)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Statuses worth another attempt: throttling and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Facebook error codes for rate limiting / temporary blocks (GraphQL "errors" and top-level "error")
+THROTTLE_ERROR_CODES = {4, 17, 32, 613, 1675004, 1675007}
+# Anti-JSON-hijacking prefix Facebook sometimes puts in front of the body
+_JSON_PREFIX = b"for (;;);"
+
+
+class GraphQLFetchError(Exception):
+    """Raised when a request still fails after all retries (or fails in a way retrying can't fix)."""
+
+
+def is_throttled(payload: Any) -> bool:
+    """Whether a decoded response is Facebook telling us to slow down."""
+    if not isinstance(payload, dict):
+        return False
+    if payload.get("error") in THROTTLE_ERROR_CODES:
+        return True
+    for error in payload.get("errors") or []:
+        if not isinstance(error, dict):
+            continue
+        if error.get("code") in THROTTLE_ERROR_CODES:
+            return True
+        message = str(error.get("message", "")).lower()
+        if "rate limit" in message or "too many" in message:
+            return True
+    return False
+
+
+def _decode_document(raw: bytes) -> Any:
+    raw = raw.strip()
+    if raw.startswith(_JSON_PREFIX):
+        raw = raw[len(_JSON_PREFIX):]
+    return orjson.loads(raw) if raw else None
+
+
+async def decode_json_stream(chunks: AsyncIterator[bytes]) -> Any:
+    """
+    Decode a GraphQL response body while it arrives.
+
+    Deferred (``@defer``) queries answer with one JSON document per line; the first
+    one holds the page, so we return as soon as it is complete and the caller can
+    drop the rest of the stream. A single document split over several lines (pretty
+    printed) is buffered and decoded once the body ends.
+    """
+    buffer = bytearray()
+    scan_from = 0
+    line_mode = True
+    async for chunk in chunks:
+        buffer += chunk
+        while line_mode:
+            newline = buffer.find(b"\n", scan_from)
+            if newline == -1:
+                break
+            try:
+                document = _decode_document(bytes(buffer[:newline]))
+            except orjson.JSONDecodeError:
+                line_mode = False
+                break
+            del buffer[:newline + 1]
+            scan_from = 0
+            if document is not None:
+                return document
+        scan_from = len(buffer)
+    document = _decode_document(bytes(buffer))
+    if document is None:
+        raise GraphQLFetchError("Empty response body")
+    return document
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
+
+class GraphQLFetchEngine:
+    """
+    Shared, connection-pooled HTTP client for the Ad Library GraphQL endpoint.
+
+    One ``httpx.AsyncClient`` (keep-alive, HTTP/2 when ``h2`` is installed) lives on
+    a private event loop thread, so synchronous callers (Celery tasks, sync routes)
+    and coroutines share the same pool. In-flight requests are capped per host, every
+    attempt (retries included) takes a token from ``rate_limiter`` when one is set,
+    and throttled or failed requests are retried with jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        max_per_host: Optional[int] = None,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        backoff_base: float = 1.0,
+        backoff_cap: float = 60.0,
+        http2: bool = HTTP2_AVAILABLE,
+        rate_limiter: Optional[TokenBucket] = None,
+    ):
+        self.max_per_host = max_per_host or settings.FACEBOOK_GRAPHQL_MAX_CONCURRENCY
+        self.timeout = timeout or settings.FACEBOOK_GRAPHQL_TIMEOUT
+        self.max_retries = settings.FACEBOOK_GRAPHQL_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.http2 = http2
+        self.rate_limiter = rate_limiter
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pid: Optional[int] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            # A forked worker (Celery prefork) must not reuse the parent's loop thread or sockets
+            if self._loop is None or self._pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._client = None
+                self._host_slots = {}
+                self._pid = os.getpid()
+                threading.Thread(target=self._loop.run_forever, name="graphql-fetch", daemon=True).start()
+            return self._loop
+
+    def submit(self, coro: Awaitable) -> "concurrent.futures.Future":
+        """Schedule ``coro`` on the engine loop; returns a thread-safe future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def run(self, coro: Awaitable) -> Any:
+        """Run ``coro`` on the engine loop and wait for its result (for synchronous callers)."""
+        return self.submit(coro).result()
+
+    def close(self) -> None:
+        """Close pooled connections and stop the loop thread (the next request starts a new one)."""
+        with self._lock:
+            loop, client, pid = self._loop, self._client, self._pid
+            self._loop = self._client = None
+            self._host_slots = {}
+        if loop is None or pid != os.getpid():
+            return
+        if client is not None:
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=httpx.Timeout(self.timeout, connect=min(10.0, self.timeout)),
+                limits=httpx.Limits(
+                    max_connections=self.max_per_host * 4,
+                    max_keepalive_connections=self.max_per_host * 2,
+                    keepalive_expiry=60.0,
+                ),
+            )
+        return self._client
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Equal-jitter exponential delay before retry ``attempt`` (0-based), at least Retry-After."""
+        ceiling = min(self.backoff_cap, self.backoff_base * 2 ** attempt)
+        delay = ceiling / 2 + random.uniform(0, ceiling / 2)
+        return max(delay, retry_after or 0.0)
+
+    async def _post_once(self, url: str, headers: Dict[str, str], body: bytes) -> Tuple[int, Any, Optional[float]]:
+        async with self._get_client().stream("POST", url, headers=headers, content=body) as response:
+            if response.status_code >= 400:
+                return response.status_code, None, _retry_after(response)
+            return response.status_code, await decode_json_stream(response.aiter_bytes()), None
+
+    async def post(self, url: str, headers: Dict[str, str], data: str) -> Any:
+        """
+        POST a form-encoded GraphQL request and return the decoded JSON.
+
+        A throttling error payload that outlasts the retries is returned as is, so
+        callers keep reporting Facebook's own error message.
+        """
+        host = urlsplit(url).netloc
+        slot = self._host_slots.setdefault(host, asyncio.Semaphore(self.max_per_host))
+        body = data.encode()
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async()
+            try:
+                async with slot:
+                    status, payload, retry_after = await self._post_once(url, headers, body)
+            except httpx.TransportError as e:
+                status, payload, retry_after, reason = None, None, None, f"{type(e).__name__}: {e}"
+            except orjson.JSONDecodeError as e:
+                raise GraphQLFetchError(f"Invalid JSON from {host}: {e}") from e
+            else:
+                if status in RETRY_STATUSES:
+                    reason = f"HTTP {status}"
+                elif status >= 400:
+                    raise GraphQLFetchError(f"HTTP {status} from {host}")
+                elif is_throttled(payload):
+                    reason = "throttled"
+                else:
+                    return payload
+
+            if attempt >= self.max_retries:
+                if payload is not None:
+                    return payload
+                raise GraphQLFetchError(f"{reason} from {host} after {attempt + 1} attempts")
+            delay = self.backoff_delay(attempt, retry_after)
+            logger.warning(f"GraphQL request to {host} failed ({reason}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def post_sync(self, url: str, headers: Dict[str, str], data: str) -> Any:
+        return self.run(self.post(url, headers, data))
+
+
+graphql_engine = GraphQLFetchEngine(rate_limiter=ad_library_bucket)
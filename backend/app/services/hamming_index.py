@@ -0,0 +1,339 @@
+import logging
+import threading
+import time
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+
+# Redis counter bumped whenever an existing ad set's signature changes
+VERSION_KEY = "ad_set_index:version"
+
+# Popcount of every byte value; uint64 arrays are viewed as 8 bytes per hash
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+_UINT64_MASK = (1 << HASH_BITS) - 1
+
+
+def hex_to_uint64(signature: Optional[str]) -> Optional[int]:
+    """Parse a 64-bit perceptual hash hex string; None for fallback (non-hash) signatures."""
+    if not signature or len(signature) != 16:
+        return None
+    try:
+        return int(signature, 16)
+    except ValueError:
+        return None
+
+
+def uint64_to_int64(value: int) -> int:
+    """Reinterpret an unsigned 64-bit hash as the signed value Postgres BIGINT can hold."""
+    return value - (1 << HASH_BITS) if value >= (1 << (HASH_BITS - 1)) else value
+
+
+def int64_to_uint64(value: int) -> int:
+    """Inverse of ``uint64_to_int64``."""
+    return value & _UINT64_MASK
+
+
+def signature_to_int64(signature: Optional[str]) -> Optional[int]:
+    """Convert a hex ``content_signature`` to the signed ``signature_hash`` column value."""
+    value = hex_to_uint64(signature)
+    return uint64_to_int64(value) if value is not None else None
+
+
+def popcount64(values: np.ndarray) -> np.ndarray:
+    """Vectorized popcount over a uint64 array."""
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    return _POPCOUNT_TABLE[values.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.uint32)
+
+
+def hamming_distances(values: np.ndarray, query: int) -> np.ndarray:
+    """Hamming distance from ``query`` to every hash in ``values``."""
+    return popcount64(np.bitwise_xor(values, np.uint64(query)))
+
+
+def _flip_masks(width: int, radius: int) -> List[int]:
+    """All masks of ``width`` bits with at most ``radius`` bits set (probe offsets)."""
+    masks = [0]
+    for r in range(1, radius + 1):
+        for bits in combinations(range(width), r):
+            mask = 0
+            for b in bits:
+                mask |= 1 << b
+            masks.append(mask)
+    return masks
+
+
+class MultiIndexHammingIndex:
+    """
+    In-memory multi-index hashing structure for 64-bit perceptual hashes.
+
+    The hash is split into ``num_bands`` disjoint bit bands. By the pigeonhole
+    principle, two hashes within distance ``k`` agree to within ``k // num_bands``
+    bits on at least one band, so a query probes every band value within that
+    radius and verifies the candidates with a vectorized XOR/popcount over the
+    packed uint64 array.
+
+    Each band table is a sorted array of band values plus the matching slot
+    positions, so all probes of a band resolve with one ``searchsorted``. Slots
+    appended since the last compaction live in an unindexed tail that is
+    verified by brute force and folded into the tables once it grows.
+    """
+
+    # Re-sort the band tables once the unindexed tail reaches this many slots
+    COMPACT_THRESHOLD = 4096
+
+    def __init__(self, num_bands: int = 4):
+        if HASH_BITS % num_bands:
+            raise ValueError("num_bands must divide 64")
+        self.num_bands = num_bands
+        self.band_width = HASH_BITS // num_bands
+        self._band_mask = np.uint64((1 << self.band_width) - 1)
+        self._lock = threading.RLock()
+        self._probe_masks: Dict[int, np.ndarray] = {}
+        self.clear()
+
+    def clear(self) -> None:
+        """Drop every item."""
+        with self._lock:
+            self._hashes = np.zeros(1024, dtype=np.uint64)
+            self._ids = np.zeros(1024, dtype=np.int64)
+            self._alive = np.zeros(1024, dtype=bool)
+            self._size = 0
+            self._indexed_size = 0
+            self._positions: Dict[int, int] = {}  # item id -> slot
+            self._band_keys: List[np.ndarray] = [np.zeros(0, dtype=np.uint64) for _ in range(self.num_bands)]
+            self._band_slots: List[np.ndarray] = [np.zeros(0, dtype=np.int64) for _ in range(self.num_bands)]
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._positions
+
+    def _band_values(self, values: np.ndarray, band: int) -> np.ndarray:
+        return (values >> np.uint64(band * self.band_width)) & self._band_mask
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self._hashes)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        for name in ("_hashes", "_ids", "_alive"):
+            old = getattr(self, name)
+            new = np.zeros(new_capacity, dtype=old.dtype)
+            new[:capacity] = old
+            setattr(self, name, new)
+
+    def add(self, item_id: int, value: int) -> None:
+        """Insert or replace the hash for ``item_id``."""
+        self.add_many([(item_id, value)])
+
+    def add_many(self, items: Iterable[Tuple[int, int]]) -> None:
+        """Insert or replace many ``(item_id, hash)`` pairs."""
+        items = list(items)
+        if not items:
+            return
+        with self._lock:
+            pos = self._size
+            self._grow(pos + len(items))
+            for item_id, value in items:
+                old = self._positions.get(item_id)
+                if old is not None:
+                    self._alive[old] = False
+                self._hashes[pos] = np.uint64(int(value) & _UINT64_MASK)
+                self._ids[pos] = item_id
+                self._alive[pos] = True
+                self._positions[item_id] = pos
+                pos += 1
+            self._size = pos
+            if self._size - self._indexed_size >= self.COMPACT_THRESHOLD:
+                self.compact()
+
+    def remove(self, item_id: int) -> None:
+        """Tombstone ``item_id``; its slot is skipped by queries."""
+        with self._lock:
+            pos = self._positions.pop(item_id, None)
+            if pos is not None:
+                self._alive[pos] = False
+
+    def compact(self) -> None:
+        """Rebuild the band tables over every live slot."""
+        with self._lock:
+            slots = np.flatnonzero(self._alive[:self._size]).astype(np.int64)
+            values = self._hashes[slots]
+            for band in range(self.num_bands):
+                keys = self._band_values(values, band)
+                order = np.argsort(keys, kind="stable")
+                self._band_keys[band] = keys[order]
+                self._band_slots[band] = slots[order]
+            self._indexed_size = self._size
+
+    def _probes(self, radius: int) -> np.ndarray:
+        if radius not in self._probe_masks:
+            self._probe_masks[radius] = np.array(_flip_masks(self.band_width, radius), dtype=np.uint64)
+        return self._probe_masks[radius]
+
+    def _band_candidates(self, band: int, probes: np.ndarray) -> np.ndarray:
+        keys = self._band_keys[band]
+        if not len(keys):
+            return np.zeros(0, dtype=np.int64)
+        starts = np.searchsorted(keys, probes, side="left")
+        ends = np.searchsorted(keys, probes, side="right")
+        lengths = ends - starts
+        hit = lengths > 0
+        starts, lengths = starts[hit], lengths[hit]
+        if not len(starts):
+            return np.zeros(0, dtype=np.int64)
+        # Expand [start, end) ranges into one flat index array
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return self._band_slots[band][offsets + np.arange(lengths.sum())]
+
+    def query(self, value: int, max_distance: int, limit: Optional[int] = None) -> List[Tuple[int, int]]:
+        """Return ``(item_id, distance)`` for all items within ``max_distance``, nearest first."""
+        value = int(value) & _UINT64_MASK
+        query = np.array([value], dtype=np.uint64)
+        masks = self._probes(max_distance // self.num_bands)
+        with self._lock:
+            parts = [
+                self._band_candidates(band, self._band_values(query, band)[0] ^ masks)
+                for band in range(self.num_bands)
+            ]
+            parts.append(np.arange(self._indexed_size, self._size, dtype=np.int64))
+            slots = np.unique(np.concatenate(parts))
+            slots = slots[self._alive[slots]]
+            if not len(slots):
+                return []
+            distances = hamming_distances(self._hashes[slots], value)
+            keep = distances <= max_distance
+            slots, distances = slots[keep], distances[keep]
+            order = np.argsort(distances, kind="stable")
+            if limit is not None:
+                order = order[:limit]
+            return [(int(self._ids[slots[i]]), int(distances[i])) for i in order]
+
+
+class AdSetSignatureIndex(MultiIndexHammingIndex):
+    """
+    Process-wide Hamming index over ``ad_sets.signature_hash``.
+
+    Loaded lazily (or at worker startup via ``ensure_loaded``) and kept current
+    by ``_create_new_ad_set``/``refresh_content_signature``. Ad sets created by
+    other processes are picked up by ``refresh``, which only reads rows with an
+    id above the highest one already loaded. Re-hashes of existing ad sets bump
+    a version stamp in Redis; ``refresh`` compares it at most every
+    ``AD_SET_INDEX_CHECK_SECONDS`` and reloads everything when it moved, or when
+    the index is older than ``AD_SET_INDEX_MAX_AGE_SECONDS`` (deletes, edits
+    outside the ORM). Callers still verify candidates against the database.
+    """
+
+    def __init__(self, num_bands: int = 4, check_interval: float = None, max_age: float = None):
+        super().__init__(num_bands)
+        self.check_interval = settings.AD_SET_INDEX_CHECK_SECONDS if check_interval is None else check_interval
+        self.max_age = settings.AD_SET_INDEX_MAX_AGE_SECONDS if max_age is None else max_age
+        self._loaded = False
+        self._max_loaded_id = 0
+        self._version: Optional[int] = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._redis = None
+        self._redis_disabled_until = 0.0
+
+    def _client(self):
+        if time.monotonic() < self._redis_disabled_until:
+            return None
+        if self._redis is None:
+            try:
+                import redis
+                self._redis = redis.from_url(settings.REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+            except Exception as e:
+                self._redis_failed(e)
+        return self._redis
+
+    def _redis_failed(self, error: Exception) -> None:
+        logger.warning(f"AdSet signature index: Redis unavailable, relying on max age ({error})")
+        self._redis_disabled_until = time.monotonic() + 30.0
+
+    def _remote_version(self) -> Optional[int]:
+        client = self._client()
+        if client is None:
+            return None
+        try:
+            return int(client.get(VERSION_KEY) or 0)
+        except Exception as e:
+            self._redis_failed(e)
+            return None
+
+    def ensure_loaded(self, db: Session) -> None:
+        if not self._loaded:
+            self.refresh(db)
+
+    def refresh(self, db: Session) -> int:
+        """Load ad sets newer than the last refresh (all of them when stale); returns the number added."""
+        from app.models import AdSet
+
+        with self._lock:
+            now = time.monotonic()
+            if self._loaded and now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                version = self._remote_version()
+                if (version is not None and version != self._version) or now - self._loaded_at >= self.max_age:
+                    logger.info("AdSet signatures changed elsewhere; reloading the Hamming index")
+                    self.clear()
+                    self._max_loaded_id = 0
+                    self._loaded = False
+            if not self._loaded:
+                self._version = self._remote_version()
+                self._loaded_at = self._checked_at = now
+            rows = (
+                db.query(AdSet.id, AdSet.signature_hash)
+                .filter(AdSet.id > self._max_loaded_id, AdSet.signature_hash.isnot(None))
+                .order_by(AdSet.id)
+                .all()
+            )
+            self.add_many((ad_set_id, int64_to_uint64(signature_hash)) for ad_set_id, signature_hash in rows)
+            if rows:
+                self._max_loaded_id = max(self._max_loaded_id, rows[-1][0])
+            if not self._loaded:
+                logger.info(f"Loaded {len(self)} ad set signatures into Hamming index")
+            self._loaded = True
+            return len(rows)
+
+    def track(self, ad_set_id: int, signature: Optional[str], existing: bool = False) -> None:
+        """
+        Record a newly created or re-hashed ad set signature. Changes to ``existing``
+        ad sets also bump the version stamp, so other processes reload.
+        """
+        value = hex_to_uint64(signature)
+        with self._lock:
+            if value is None:
+                self.remove(ad_set_id)
+            else:
+                self.add(ad_set_id, value)
+        if existing:
+            self._publish()
+
+    def _publish(self) -> None:
+        client = self._client()
+        if client is None:
+            return
+        try:
+            version = int(client.incr(VERSION_KEY))
+        except Exception as e:
+            self._redis_failed(e)
+            return
+        with self._lock:
+            # Our own change: stay current unless another process bumped it too
+            if self._version is not None and version == self._version + 1:
+                self._version = version
+
+
+# Shared by the extraction service within a worker process
+ad_set_signature_index = AdSetSignatureIndex()
@@ -0,0 +1,283 @@
+import hashlib
+import logging
+import os
+import shutil
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.core.config import settings
+from app.services.video_artifact_cache import cache_url
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+# Connection failures worth resuming from the partial file
+RESUMABLE_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+EXTENSIONS_BY_CONTENT_TYPE = {
+    'image/jpeg': '.jpg',
+    'image/jpg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'video/mp4': '.mp4',
+    'video/quicktime': '.mov',
+    'video/x-msvideo': '.avi',
+    'video/webm': '.webm',
+}
+
+
+def guess_extension(url: str, content_type: str = None, content_sample: bytes = None) -> str:
+    """Determine file extension from URL, content type, or file content (magic bytes)"""
+    name = url.split('?')[0].split('/')[-1]
+    if '.' in name:
+        ext = '.' + name.split('.')[-1]
+        if ext.lower() in ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.mp4', '.mov', '.avi', '.webm']:
+            return ext
+    if content_type:
+        base_type = content_type.split(';')[0].strip().lower()
+        if base_type in EXTENSIONS_BY_CONTENT_TYPE:
+            return EXTENSIONS_BY_CONTENT_TYPE[base_type]
+    if content_sample:
+        if content_sample.startswith(b'\xff\xd8\xff'):
+            return '.jpg'
+        elif content_sample.startswith(b'\x89PNG'):
+            return '.png'
+        elif content_sample.startswith(b'GIF87a') or content_sample.startswith(b'GIF89a'):
+            return '.gif'
+        elif content_sample.startswith(b'RIFF') and b'WEBP' in content_sample[:12]:
+            return '.webp'
+        elif content_sample[4:12] in (b'ftypmp42', b'ftypisom'):
+            return '.mp4'
+    return '.jpg'
+
+
+class MediaDownloader:
+    """
+    Content-addressed, resumable media downloads.
+
+    Bodies stream to ``.partial/`` while their SHA-256 is computed; an interrupted
+    download resumes from the partial file with an HTTP ``Range`` request. Finished
+    files are stored once under ``.objects/<sha[:2]>/<sha><ext>`` and hard-linked
+    (copied where links are unsupported) into ``<competitor>/<images|videos>/``, so
+    the same creative behind rotated CDN URLs takes disk space once. ``.index/``
+    maps URLs (signed CDN URLs without their query, see ``cache_url``) to their
+    object, so a known URL is not fetched again.
+    """
+
+    def __init__(self, storage_path: str, max_workers: Optional[int] = None, timeout: Optional[float] = None, max_retries: int = 3):
+        self.storage_path = storage_path
+        self.max_workers = max_workers or settings.MEDIA_DOWNLOAD_WORKERS
+        self.timeout = timeout or settings.MEDIA_DOWNLOAD_TIMEOUT
+        self.max_retries = max_retries
+        self._local = threading.local()
+        # key -> [lock, threads holding or waiting for it]; dropped when the count reaches 0
+        self._url_locks: Dict[str, list] = {}
+        self._url_locks_guard = threading.Lock()
+
+    def _session(self) -> requests.Session:
+        # One pooled session per thread (requests.Session is not thread-safe)
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+        return session
+
+    @contextmanager
+    def _url_lock(self, key: str) -> Iterator[None]:
+        with self._url_locks_guard:
+            entry = self._url_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._url_locks_guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._url_locks[key]
+
+    @staticmethod
+    def url_key(url: str) -> str:
+        # Signed CDN URLs without their rotating query; other URLs in full
+        return hashlib.md5(cache_url(url).encode()).hexdigest()
+
+    def object_path(self, sha256: str, extension: str) -> str:
+        return os.path.join(self.storage_path, ".objects", sha256[:2], f"{sha256}{extension}")
+
+    def _index_path(self, key: str) -> str:
+        return os.path.join(self.storage_path, ".index", key)
+
+    def _lookup(self, key: str) -> Optional[Tuple[str, str]]:
+        try:
+            with open(self._index_path(key)) as f:
+                sha256, extension = f.read().split()
+        except (OSError, ValueError):
+            return None
+        return (sha256, extension) if os.path.exists(self.object_path(sha256, extension)) else None
+
+    def _remember(self, key: str, sha256: str, extension: str) -> None:
+        path = self._index_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}"
+        with open(tmp, "w") as f:
+            f.write(f"{sha256} {extension}")
+        os.replace(tmp, path)
+
+    def _fetch(self, url: str, part_path: str) -> Tuple[str, str]:
+        """Stream ``url`` into ``part_path`` (resuming it if present); returns (sha256, content type)."""
+        for attempt in range(self.max_retries + 1):
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            hasher = hashlib.sha256()
+            try:
+                headers = {"Range": f"bytes={offset}-"} if offset else {}
+                with self._session().get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    if response.status_code == 416:
+                        total = response.headers.get("Content-Range", "").rpartition("/")[2]
+                        if total.isdigit() and int(total) == offset:
+                            # The partial already holds the whole object
+                            with open(part_path, "rb") as existing:
+                                for block in iter(lambda: existing.read(CHUNK_SIZE), b""):
+                                    hasher.update(block)
+                            return hasher.hexdigest(), ""
+                        # The partial is stale (or the object changed): start over
+                        os.remove(part_path)
+                        continue
+                    response.raise_for_status()
+                    if offset and response.status_code == 206:
+                        with open(part_path, "rb") as existing:
+                            for block in iter(lambda: existing.read(CHUNK_SIZE), b""):
+                                hasher.update(block)
+                        mode = "ab"
+                        logger.info(f"Resuming download at byte {offset}: {url[:100]}")
+                    else:
+                        mode = "wb"
+                    with open(part_path, mode) as f:
+                        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                            if chunk:
+                                f.write(chunk)
+                                hasher.update(chunk)
+                    return hasher.hexdigest(), response.headers.get("content-type", "")
+            except RESUMABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                logger.warning(f"Download interrupted ({type(e).__name__}), resuming: {url[:100]}")
+        raise requests.HTTPError(f"Could not download {url[:100]}")
+
+    def _link(self, object_path: str, link_path: str) -> None:
+        if os.path.exists(link_path):
+            return
+        os.makedirs(os.path.dirname(link_path), exist_ok=True)
+        try:
+            os.link(object_path, link_path)
+        except FileExistsError:
+            pass
+        except OSError:
+            shutil.copyfile(object_path, link_path)
+
+    def download(self, url: str, media_type: str = 'image', competitor_folder: str = 'unknown') -> Optional[Dict]:
+        """
+        Store ``url`` and link it into ``competitor_folder``.
+
+        Returns ``local_path`` (relative to the storage root), ``original_url``,
+        ``file_size``, ``sha256`` and ``downloaded`` (False when the URL or its
+        content was already stored), or None if the download failed.
+        """
+        key = self.url_key(url)
+        media_folder = 'images' if media_type == 'image' else 'videos'
+        try:
+            with self._url_lock(key):
+                known = self._lookup(key)
+                downloaded = known is None
+                if known:
+                    sha256, extension = known
+                else:
+                    part_path = os.path.join(self.storage_path, ".partial", f"{key}.part")
+                    os.makedirs(os.path.dirname(part_path), exist_ok=True)
+                    logger.info(f"Downloading {media_type} from: {url[:100]}...")
+                    sha256, content_type = self._fetch(url, part_path)
+                    with open(part_path, "rb") as f:
+                        sample = f.read(16)
+                    extension = guess_extension(url, content_type, sample)
+                    object_path = self.object_path(sha256, extension)
+                    if os.path.exists(object_path):
+                        os.remove(part_path)
+                    else:
+                        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                        os.replace(part_path, object_path)
+                    self._remember(key, sha256, extension)
+
+            object_path = self.object_path(sha256, extension)
+            filename = f"{sha256}{extension}"
+            self._link(object_path, os.path.join(self.storage_path, competitor_folder, media_folder, filename))
+            return {
+                'local_path': os.path.join(competitor_folder, media_folder, filename),
+                'original_url': url,
+                'file_size': os.path.getsize(object_path),
+                'sha256': sha256,
+                'downloaded': downloaded,
+            }
+        except Exception as e:
+            logger.error(f"Failed to download {url[:100]}: {str(e)}")
+            return None
+
+    def download_many(
+        self,
+        jobs: List[Tuple[object, str, str, str]],
+        progress: Optional[Callable[[object, int, int], None]] = None,
+    ) -> List[Optional[Dict]]:
+        """
+        Download ``(owner, url, media_type, competitor_folder)`` jobs on a bounded pool.
+
+        Results come back in job order. ``progress(owner, done, total)`` is called as
+        each of an owner's (e.g. an ad's) files finishes.
+        """
+        totals: Dict[object, int] = defaultdict(int)
+        for owner, *_ in jobs:
+            totals[owner] += 1
+        done: Dict[object, int] = defaultdict(int)
+        done_lock = threading.Lock()
+
+        def run(job):
+            owner, url, media_type, competitor_folder = job
+            result = self.download(url, media_type, competitor_folder)
+            if progress:
+                with done_lock:
+                    done[owner] += 1
+                    finished = done[owner]
+                progress(owner, finished, totals[owner])
+            return result
+
+        if not jobs:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(jobs)), thread_name_prefix="media-download") as pool:
+            return list(pool.map(run, jobs))
+
+    def remove_link(self, local_path: str) -> int:
+        """
+        Delete a competitor-folder link; the stored object goes too once nothing links to it.
+
+        Returns the bytes freed on disk (0 while other links keep the object).
+        """
+        link_path = os.path.join(self.storage_path, local_path)
+        size = os.path.getsize(link_path)
+        os.remove(link_path)
+        filename = os.path.basename(local_path)
+        sha256, extension = os.path.splitext(filename)
+        object_path = self.object_path(sha256, extension)
+        if len(sha256) != 64 or not os.path.exists(object_path):
+            # Pre content-addressing file (named by URL hash)
+            return size
+        if os.stat(object_path).st_nlink <= 1:
+            os.remove(object_path)
+            return size
+        return 0
@@ -0,0 +1,250 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple, Any
+from urllib.parse import urlparse
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.database import SessionLocal
+from app.models.media_hash import MediaHash
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_media_url(url: Optional[str]) -> str:
+    """
+    Normalize a media URL for cache lookups and comparisons.
+
+    Facebook CDN URLs carry rotating signature query params (``oh``, ``oe``,
+    ``_nc_*``), so only ``netloc + path`` identifies the underlying file.
+    """
+    if not url:
+        return ""
+    parsed = urlparse(url)
+    return f"{parsed.netloc}{parsed.path}".lower()
+
+
+def image_hash_kind(hash_size: int = 8) -> str:
+    """Cache discriminator for ``average_hash`` image hashes."""
+    return f"image:ahash{hash_size}"
+
+
+def video_hash_kind(samples: int, hash_size: int = 8) -> str:
+    """Cache discriminator for sampled video frames (sample positions depend on ``samples``)."""
+    return f"video:ahash{hash_size}:s{samples}"
+
+
+class MediaHashCache:
+    """
+    Two-tier cache of perceptual hashes for remote media.
+
+    Tier 1 is an in-process LRU shared by every thread of the worker, tier 2 is
+    the ``media_hashes`` table shared by every worker and by ``group_ads.py``.
+    Values are lists of hex-encoded hashes so they survive JSON round-trips.
+    Negative results are never cached because CDN failures are usually transient.
+    """
+
+    # After a DB error, skip the persistent tier for this many seconds
+    DB_RETRY_INTERVAL = 60.0
+
+    def __init__(self, max_entries: int = 50000, persistent: bool = True):
+        self.max_entries = max_entries
+        self.persistent = persistent
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], List[str]]" = OrderedDict()
+        self._etag_index: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        # Entry key -> its ``_etag_index`` keys, so eviction does not scan the index
+        self._etag_keys: Dict[Tuple[str, str], Set[Tuple[str, str]]] = {}
+        self._db_disabled_until = 0.0
+        self._stats = {
+            "memory_hits": 0,
+            "db_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "db_errors": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def get(
+        self,
+        url: str,
+        hash_kind: str,
+        etag: Optional[str] = None,
+        content_length: Optional[Any] = None,
+        count_miss: bool = True,
+    ) -> Optional[List[str]]:
+        """
+        Return cached hex hashes for ``url`` or None on a miss.
+
+        Pass ``count_miss=False`` for a first probe that is retried with the
+        ETag/length once known, so one logical lookup counts as one miss.
+        """
+        url_key = normalize_media_url(url)
+        if not url_key:
+            return None
+
+        with self._lock:
+            hashes = self._memory_get(url_key, hash_kind, etag, content_length)
+            if hashes is not None:
+                self._stats["memory_hits"] += 1
+                return hashes
+
+        hashes = self._db_get(url_key, hash_kind, etag, content_length)
+        with self._lock:
+            if hashes is not None:
+                self._stats["db_hits"] += 1
+                self._memory_put(url_key, hash_kind, hashes, etag, content_length)
+            elif count_miss:
+                self._stats["misses"] += 1
+        return hashes
+
+    def put(
+        self,
+        url: str,
+        hash_kind: str,
+        hashes: List[str],
+        etag: Optional[str] = None,
+        content_length: Optional[Any] = None,
+    ) -> None:
+        """Store hex hashes for ``url`` in both tiers."""
+        url_key = normalize_media_url(url)
+        if not url_key or not hashes:
+            return
+
+        with self._lock:
+            self._memory_put(url_key, hash_kind, hashes, etag, content_length)
+            self._stats["stores"] += 1
+        self._db_put(url_key, hash_kind, hashes, etag, content_length)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current in-memory size."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._entries)
+        lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["db_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def clear_memory(self) -> None:
+        """Drop the in-process tier (the persistent tier is left untouched)."""
+        with self._lock:
+            self._entries.clear()
+            self._etag_index.clear()
+            self._etag_keys.clear()
+
+    # ------------------------------------------------------------------
+    # In-memory tier (callers hold self._lock)
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _etag_key(etag: Optional[str], content_length: Optional[Any]) -> Optional[str]:
+        if not etag:
+            return None
+        return f"{etag}|{content_length or ''}"
+
+    def _memory_get(self, url_key, hash_kind, etag, content_length) -> Optional[List[str]]:
+        key = (url_key, hash_kind)
+        if key not in self._entries:
+            digest = self._etag_key(etag, content_length)
+            key = self._etag_index.get((digest, hash_kind)) if digest else None
+            if key is None or key not in self._entries:
+                return None
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def _memory_put(self, url_key, hash_kind, hashes, etag, content_length) -> None:
+        key = (url_key, hash_kind)
+        self._entries[key] = list(hashes)
+        self._entries.move_to_end(key)
+        digest = self._etag_key(etag, content_length)
+        if digest:
+            self._etag_index[(digest, hash_kind)] = key
+            self._etag_keys.setdefault(key, set()).add((digest, hash_kind))
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            for index_key in self._etag_keys.pop(evicted, ()):
+                if self._etag_index.get(index_key) == evicted:  # Not re-pointed at a newer entry
+                    del self._etag_index[index_key]
+
+    # ------------------------------------------------------------------
+    # Persistent tier
+    # ------------------------------------------------------------------
+
+    def _db_available(self) -> bool:
+        return self.persistent and time.monotonic() >= self._db_disabled_until
+
+    def _db_failed(self, e: Exception) -> None:
+        self._db_disabled_until = time.monotonic() + self.DB_RETRY_INTERVAL
+        with self._lock:
+            self._stats["db_errors"] += 1
+        logger.warning(f"Media hash cache DB tier unavailable, using memory only for {self.DB_RETRY_INTERVAL:.0f}s: {e}")
+
+    def _db_get(self, url_key, hash_kind, etag, content_length) -> Optional[List[str]]:
+        if not self._db_available():
+            return None
+        db = SessionLocal()
+        try:
+            row = (
+                db.query(MediaHash)
+                .filter(MediaHash.url_key == url_key, MediaHash.hash_kind == hash_kind)
+                .first()
+            )
+            if row is None and etag:
+                query = db.query(MediaHash).filter(MediaHash.etag == etag, MediaHash.hash_kind == hash_kind)
+                if content_length:
+                    query = query.filter(MediaHash.content_length == int(content_length))
+                row = query.first()
+            if row is None:
+                return None
+            hashes = list(row.hashes or [])
+            db.query(MediaHash).filter(MediaHash.id == row.id).update(
+                {"hit_count": MediaHash.hit_count + 1, "last_used_at": func.now()},
+                synchronize_session=False,
+            )
+            db.commit()
+            return hashes or None
+        except Exception as e:
+            db.rollback()
+            self._db_failed(e)
+            return None
+        finally:
+            db.close()
+
+    def _db_put(self, url_key, hash_kind, hashes, etag, content_length) -> None:
+        if not self._db_available():
+            return
+        db = SessionLocal()
+        try:
+            values = {
+                "url_key": url_key,
+                "hash_kind": hash_kind,
+                "hashes": list(hashes),
+                "etag": etag,
+                "content_length": int(content_length) if content_length else None,
+            }
+            stmt = pg_insert(MediaHash).values(**values)
+            stmt = stmt.on_conflict_do_update(
+                constraint="uq_media_hashes_url_key_kind",
+                set_={
+                    "hashes": stmt.excluded.hashes,
+                    "etag": stmt.excluded.etag,
+                    "content_length": stmt.excluded.content_length,
+                },
+            )
+            db.execute(stmt)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self._db_failed(e)
+        finally:
+            db.close()
+
+
+# Process-wide instance shared by grouping, ad-set assignment and group_ads.py
+media_hash_cache = MediaHashCache()
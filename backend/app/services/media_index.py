@@ -0,0 +1,186 @@
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import exists
+from sqlalchemy.orm import Session
+
+from app.models import Ad, MediaFile, MediaFileRef
+
+logger = logging.getLogger(__name__)
+
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+MEDIA_FOLDERS = {'images': 'image', 'videos': 'video'}
+
+
+def _stat(storage_path: str, local_path: str) -> Optional[os.stat_result]:
+    try:
+        return os.stat(os.path.join(storage_path, local_path))
+    except OSError:
+        return None
+
+
+def _sha256_from_path(local_path: str) -> Optional[str]:
+    # Content-addressed files are named <sha256><ext>; older ones by URL md5
+    stem = os.path.splitext(os.path.basename(local_path))[0]
+    return stem if SHA256_RE.match(stem) else None
+
+
+class MediaIndex:
+    """
+    ``media_files``/``media_file_refs`` bookkeeping for saved media.
+
+    Saving, unsaving and deleting ad media keep the index in step with
+    ``Ad.raw_data['local_media']``, so cleanup finds unreferenced files with one
+    indexed query instead of scanning every ad per file. ``reconcile`` rebuilds
+    the index from disk and ``local_media`` after files were moved by hand or the
+    index was introduced on an existing storage folder. Callers commit.
+    """
+
+    def __init__(self, db: Session, storage_path: str):
+        self.db = db
+        self.storage_path = storage_path
+
+    def _upsert_files(self, files: Dict[str, str], sha_by_path: Optional[Dict[str, str]] = None) -> Dict[str, MediaFile]:
+        """Ensure a row per ``{local_path: media_type}`` that exists on disk; returns rows by path."""
+        if not files:
+            return {}
+        sha_by_path = sha_by_path or {}
+        rows = {
+            row.local_path: row
+            for row in self.db.query(MediaFile).filter(MediaFile.local_path.in_(list(files))).all()
+        }
+        for local_path, media_type in files.items():
+            st = _stat(self.storage_path, local_path)
+            if st is None:
+                continue
+            row = rows.get(local_path)
+            if row is None:
+                row = rows[local_path] = MediaFile(local_path=local_path, media_type=media_type)
+                self.db.add(row)
+            row.sha256 = sha_by_path.get(local_path) or row.sha256 or _sha256_from_path(local_path)
+            row.file_size = st.st_size
+            row.mtime = datetime.fromtimestamp(st.st_mtime, tz=timezone.utc)
+        self.db.flush()
+        return rows
+
+    def set_ad_files(self, ad_id: int, image_paths: List[str], video_paths: List[str], sha_by_path: Optional[Dict[str, str]] = None) -> None:
+        """Replace the files referenced by ``ad_id`` with its current local_media lists."""
+        files = {path: 'image' for path in image_paths}
+        files.update({path: 'video' for path in video_paths})
+        rows = self._upsert_files(files, sha_by_path)
+        self.db.query(MediaFileRef).filter(MediaFileRef.ad_id == ad_id).delete(synchronize_session=False)
+        self.db.add_all([
+            MediaFileRef(media_file_id=rows[path].id, ad_id=ad_id, role=role)
+            for path, role in files.items()
+            if path in rows
+        ])
+        self.db.flush()
+
+    def release_ad(self, ad_id: int) -> None:
+        """Drop every reference held by ``ad_id``."""
+        self.db.query(MediaFileRef).filter(MediaFileRef.ad_id == ad_id).delete(synchronize_session=False)
+        self.db.flush()
+
+    def referenced_paths(self, paths: Iterable[str]) -> Set[str]:
+        """The subset of ``paths`` that some ad still references."""
+        paths = list(paths)
+        if not paths:
+            return set()
+        rows = (
+            self.db.query(MediaFile.local_path)
+            .join(MediaFileRef, MediaFileRef.media_file_id == MediaFile.id)
+            .filter(MediaFile.local_path.in_(paths))
+            .distinct()
+            .all()
+        )
+        return {local_path for (local_path,) in rows}
+
+    def unreferenced(self, older_than: datetime, after_id: int = 0, limit: int = 500) -> List[MediaFile]:
+        """Files not modified since ``older_than`` that no ad references, in id order."""
+        return (
+            self.db.query(MediaFile)
+            .filter(
+                MediaFile.id > after_id,
+                MediaFile.mtime < older_than,
+                ~exists().where(MediaFileRef.media_file_id == MediaFile.id),
+            )
+            .order_by(MediaFile.id)
+            .limit(limit)
+            .all()
+        )
+
+    def forget(self, local_paths: Iterable[str]) -> None:
+        local_paths = list(local_paths)
+        if local_paths:
+            self.db.query(MediaFile).filter(MediaFile.local_path.in_(local_paths)).delete(synchronize_session=False)
+            self.db.flush()
+
+    def reconcile(self, batch_size: int = 1000) -> Dict[str, int]:
+        """
+        Rebuild the index: one row per file on disk, one ref per ``local_media`` entry.
+
+        Returns:
+            Dict with files_indexed, files_forgotten (rows whose file is gone),
+            refs and missing_refs (local_media paths with no file on disk)
+        """
+        stats = {'files_indexed': 0, 'files_forgotten': 0, 'refs': 0, 'missing_refs': 0}
+
+        on_disk: Dict[str, str] = {}
+        if os.path.isdir(self.storage_path):
+            for competitor_folder in os.listdir(self.storage_path):
+                # .objects/.index/.partial belong to the downloader
+                if competitor_folder.startswith('.'):
+                    continue
+                for media_folder, media_type in MEDIA_FOLDERS.items():
+                    folder = os.path.join(self.storage_path, competitor_folder, media_folder)
+                    if not os.path.isdir(folder):
+                        continue
+                    for filename in os.listdir(folder):
+                        if os.path.isfile(os.path.join(folder, filename)):
+                            on_disk[os.path.join(competitor_folder, media_folder, filename)] = media_type
+
+        gone = [
+            local_path for (local_path,) in self.db.query(MediaFile.local_path).all()
+            if local_path not in on_disk
+        ]
+        for start in range(0, len(gone), batch_size):
+            self.forget(gone[start:start + batch_size])
+        stats['files_forgotten'] = len(gone)
+
+        ids_by_path: Dict[str, int] = {}
+        paths = list(on_disk)
+        for start in range(0, len(paths), batch_size):
+            chunk = {path: on_disk[path] for path in paths[start:start + batch_size]}
+            ids_by_path.update({path: row.id for path, row in self._upsert_files(chunk).items()})
+        stats['files_indexed'] = len(ids_by_path)
+
+        self.db.query(MediaFileRef).delete(synchronize_session=False)
+        refs = []
+        ads = (
+            self.db.query(Ad.id, Ad.raw_data)
+            .filter(Ad.raw_data.op('->')('local_media').isnot(None))
+            .yield_per(batch_size)
+        )
+        for ad_id, raw_data in ads:
+            local_media = (raw_data or {}).get('local_media') or {}
+            for role, key in (('image', 'images'), ('video', 'videos')):
+                for local_path in set(local_media.get(key) or []):
+                    media_file_id = ids_by_path.get(local_path)
+                    if media_file_id is None:
+                        stats['missing_refs'] += 1
+                        continue
+                    refs.append({'media_file_id': media_file_id, 'ad_id': ad_id, 'role': role})
+        # Written after the scan so inserts don't interleave with the streamed read
+        for start in range(0, len(refs), batch_size):
+            self.db.bulk_insert_mappings(MediaFileRef, refs[start:start + batch_size])
+        stats['refs'] = len(refs)
+        self.db.flush()
+
+        logger.info(
+            f"Reconciled media index: {stats['files_indexed']} files, {stats['refs']} refs, "
+            f"{stats['files_forgotten']} stale rows dropped, {stats['missing_refs']} refs to missing files"
+        )
+        return stats
@@ -1,23 +1,43 @@
 import requests
 import json
 import logging
-from typing import Dict, Optional, List
+from typing import Callable, Dict, Optional, List, Set
 from sqlalchemy.orm import Session
 from app.models import Ad
+from app.services.ad_columns import primary_media_url
+from app.services.ad_card import refresh_ad_card
+from app.services.ad_search import search_columns
+from app.services.rate_limiter import TokenBucket
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 
+class RateLimitedSession(requests.Session):
+    """requests session that takes a token from ``bucket`` before every request"""
+    
+    def __init__(self, bucket: TokenBucket, timeout: float = None):
+        super().__init__()
+        self.bucket = bucket
+        self.timeout = timeout or settings.FACEBOOK_GRAPHQL_TIMEOUT
+    
+    def request(self, *args, **kwargs):
+        self.bucket.acquire()
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(*args, **kwargs)
+
+
 class MediaRefreshService:
     """Service to refresh media URLs from Facebook Ad Library"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, rate_limiter: Optional[TokenBucket] = None):
         self.db = db
+        self.rate_limiter = rate_limiter
         self.session = self._create_session()
     
     def _create_session(self) -> requests.Session:
         """Create a requests session with Facebook cookies and headers"""
-        session = requests.Session()
+        session = RateLimitedSession(self.rate_limiter) if self.rate_limiter else requests.Session()
         
         # Set headers - using same as scraper
         session.headers.update({
@@ -432,12 +452,75 @@ class MediaRefreshService:
     
     def _fetch_ad_by_page(self, ad_archive_id: str, page_id: str) -> Optional[Dict]:
         """Fetch ad by searching within a specific page"""
+        response_text = self._page_search(page_id)
+        if response_text is None:
+            return None
+        result = self._parse_facebook_response(response_text, ad_archive_id)
+        if not result:
+            logger.info(f"Page search: No matching ad found in response")
+        return result
+    
+    def fetch_page_ads(self, page_id: str, ad_archive_ids: Set[str], max_pages: int = 10) -> Dict[str, Dict]:
+        """Page through an advertiser's ads once, collecting the requested ones
+        
+        Args:
+            page_id: Facebook page ID of the advertiser
+            ad_archive_ids: Archive IDs to look for
+            max_pages: Result pages to read at most (30 ads each)
+            
+        Returns:
+            Ad data by archive ID for the ads that were found
+        """
+        import uuid
+        
+        found: Dict[str, Dict] = {}
+        cursor = None
+        session_id, collation_token = str(uuid.uuid4()), str(uuid.uuid4())
+        for _ in range(max_pages):
+            response_text = self._page_search(page_id, cursor, session_id, collation_token)
+            if response_text is None:
+                break
+            cursor = None
+            for data_obj in self._iter_response_objects(response_text):
+                search_conn = ((data_obj.get('data') or {}).get('ad_library_main') or {}).get('search_results_connection') or {}
+                for edge in search_conn.get('edges') or []:
+                    for ad_data in (edge.get('node') or {}).get('collated_results') or []:
+                        ad_id = ad_data.get('ad_archive_id')
+                        if ad_id in ad_archive_ids and ad_id not in found:
+                            found[ad_id] = ad_data
+                page_info = search_conn.get('page_info') or {}
+                if page_info.get('has_next_page'):
+                    cursor = page_info.get('end_cursor')
+            if len(found) == len(ad_archive_ids) or not cursor:
+                break
+        logger.info(f"Page {page_id}: found {len(found)}/{len(ad_archive_ids)} requested ads")
+        return found
+    
+    def _iter_response_objects(self, response_text: str):
+        """Yield the JSON objects of a GraphQL response (one document or one per line)"""
+        try:
+            yield json.loads(response_text)
+            return
+        except json.JSONDecodeError:
+            pass
+        for line in response_text.split('\n'):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+    
+    def _page_search(self, page_id: str, cursor: Optional[str] = None, session_id: str = None, collation_token: str = None) -> Optional[str]:
+        """Run one page of the advertiser's ad search; returns the response text or None"""
         try:
             import uuid
             import urllib.parse
             
-            session_id = str(uuid.uuid4())
-            collation_token = str(uuid.uuid4())
+            # Pages after the first reuse the search's session and collation tokens
+            session_id = session_id or str(uuid.uuid4())
+            collation_token = collation_token or str(uuid.uuid4())
             
             variables = {
                 "activeStatus": "ALL",
@@ -446,7 +529,7 @@ class MediaRefreshService:
                 "collationToken": collation_token,
                 "contentLanguages": [],
                 "countries": [],
-                "cursor": None,
+                "cursor": cursor,
                 "deeplinkAdID": None,
                 "excludedIDs": [],
                 "first": 30,
@@ -497,11 +580,8 @@ class MediaRefreshService:
                 logger.debug(f"Page search returned HTTP {response.status_code}")
                 return None
             
-            logger.info(f"Page search returned {len(response.text)} bytes, parsing...")
-            result = self._parse_facebook_response(response.text, ad_archive_id)
-            if not result:
-                logger.info(f"Page search: No matching ad found in response")
-            return result
+            logger.info(f"Page search returned {len(response.text)} bytes")
+            return response.text
             
         except Exception as e:
             logger.debug(f"Page search error: {e}")
@@ -610,6 +690,16 @@ class MediaRefreshService:
                     'error': f'Ad {ad_archive_id} not found in Facebook Ad Library. The ad may have been deleted or is no longer available.'
                 }
             
+            return self.apply_ad_data(ad, ad_data)
+        
+        except Exception as e:
+            logger.error(f"Error refreshing ad {ad_id}: {e}")
+            self.db.rollback()
+            return {'success': False, 'error': str(e)}
+    
+    def apply_ad_data(self, ad: Ad, ad_data: Dict) -> Dict:
+        """Write the media URLs of freshly fetched ``ad_data`` to ``ad`` and commit"""
+        try:
             # Extract URLs
             urls = self.extract_urls_from_ad_data(ad_data)
             
@@ -676,13 +766,17 @@ class MediaRefreshService:
             
             # Update the ad
             ad.creatives = new_creatives
+            ad.primary_media_url = primary_media_url(new_creatives)
+            for column, value in search_columns(ad.meta, new_creatives).items():
+                setattr(ad, column, value)
             ad.raw_data = ad_data  # Update raw data too
+            refresh_ad_card(ad)
             
             self.db.commit()
             
             new_media_url = media_list[0]['url'] if media_list else None
             
-            logger.info(f"Successfully refreshed media for ad {ad_id}")
+            logger.info(f"Successfully refreshed media for ad {ad.id}")
             
             return {
                 'success': True,
@@ -692,7 +786,7 @@ class MediaRefreshService:
             }
         
         except Exception as e:
-            logger.error(f"Error refreshing ad {ad_id}: {e}")
+            logger.error(f"Error refreshing ad {ad.id}: {e}")
             self.db.rollback()
             return {'success': False, 'error': str(e)}
     
@@ -756,26 +850,13 @@ class MediaRefreshService:
             logger.debug(f"Direct URL scraping error: {e}")
             return None
     
-    def refresh_multiple_ads(self, ad_ids: List[int]) -> Dict:
-        """Refresh media URLs for multiple ads"""
-        results = {
-            'total': len(ad_ids),
-            'successful': 0,
-            'failed': 0,
-            'details': []
-        }
+    def refresh_multiple_ads(self, ad_ids: List[int], progress_callback: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Refresh media URLs for multiple ads
         
-        for ad_id in ad_ids:
-            result = self.refresh_ad_media_from_facebook(ad_id)
-            
-            if result['success']:
-                results['successful'] += 1
-            else:
-                results['failed'] += 1
-            
-            results['details'].append({
-                'ad_id': ad_id,
-                **result
-            })
+        Ads are grouped by advertiser page so each page is searched once, with
+        per-ad lookups only for the ads the page search missed (see
+        ``BulkMediaRefresher``). ``progress_callback`` receives running counts.
+        """
+        from app.services.bulk_media_refresh import BulkMediaRefresher
         
-        return results
+        return BulkMediaRefresher(self).run(ad_ids, progress_callback)
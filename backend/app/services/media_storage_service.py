@@ -1,14 +1,19 @@
 import os
-import requests
 import hashlib
 import logging
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
 from app.models import Ad
+from app.services.media_downloader import MediaDownloader, guess_extension
+from app.services.media_index import MediaIndex
 
 logger = logging.getLogger(__name__)
 
+# (ad_id, files_done, files_total)
+ProgressCallback = Callable[[int, int, int], None]
+
 
 class MediaStorageService:
     """Service to download and save media files locally for permanent storage"""
@@ -21,6 +26,8 @@ class MediaStorageService:
             os.path.join(os.path.dirname(__file__), '../../media_storage')
         )
         self._ensure_storage_directories()
+        self.downloader = MediaDownloader(self.storage_path)
+        self.index = MediaIndex(db, self.storage_path)
     
     def _ensure_storage_directories(self):
         """Create storage directories if they don't exist"""
@@ -33,49 +40,7 @@ class MediaStorageService:
     
     def _get_file_extension(self, url: str, content_type: str = None, content_sample: bytes = None) -> str:
         """Determine file extension from URL, content type, or file content"""
-        # Try to get from URL first
-        if '.' in url.split('?')[0].split('/')[-1]:
-            ext = '.' + url.split('?')[0].split('/')[-1].split('.')[-1]
-            # Only return if it's a common extension
-            if ext.lower() in ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.mp4', '.mov', '.avi', '.webm']:
-                return ext
-        
-        # Try content type
-        if content_type:
-            ext_map = {
-                'image/jpeg': '.jpg',
-                'image/jpg': '.jpg',
-                'image/png': '.png',
-                'image/gif': '.gif',
-                'image/webp': '.webp',
-                'video/mp4': '.mp4',
-                'video/quicktime': '.mov',
-                'video/x-msvideo': '.avi',
-                'video/webm': '.webm',
-            }
-            if content_type.lower() in ext_map:
-                return ext_map[content_type.lower()]
-            # Handle content-type with parameters like "image/jpeg; charset=utf-8"
-            base_type = content_type.split(';')[0].strip().lower()
-            if base_type in ext_map:
-                return ext_map[base_type]
-        
-        # Try to detect from file content (magic bytes)
-        if content_sample:
-            # Check magic bytes (first few bytes of file)
-            if content_sample.startswith(b'\xff\xd8\xff'):
-                return '.jpg'
-            elif content_sample.startswith(b'\x89PNG'):
-                return '.png'
-            elif content_sample.startswith(b'GIF87a') or content_sample.startswith(b'GIF89a'):
-                return '.gif'
-            elif content_sample.startswith(b'RIFF') and b'WEBP' in content_sample[:12]:
-                return '.webp'
-            elif content_sample[4:12] == b'ftypmp42' or content_sample[4:12] == b'ftypisom':
-                return '.mp4'
-        
-        # Default fallback
-        return '.jpg'
+        return guess_extension(url, content_type, content_sample)
     
     def _sanitize_folder_name(self, name: str) -> str:
         """
@@ -101,71 +66,89 @@ class MediaStorageService:
         Returns:
             Dict with local_path and original_url, or None if failed
         """
-        try:
-            logger.info(f"Downloading {media_type} from: {url[:100]}...")
-            
-            # Download the file
-            response = requests.get(url, timeout=30, stream=True)
-            response.raise_for_status()
-            
-            # Get file hash
-            file_hash = self._get_file_hash(url)
-            content_type = response.headers.get('content-type', '')
-            
-            # Determine storage folder with competitor name
-            competitor_folder = self._sanitize_folder_name(competitor_name) if competitor_name else 'unknown'
-            media_folder = 'images' if media_type == 'image' else 'videos'
-            
-            # Create competitor folder structure: competitor_name/images or competitor_name/videos
-            full_folder = os.path.join(self.storage_path, competitor_folder, media_folder)
-            Path(full_folder).mkdir(parents=True, exist_ok=True)
-            
-            # Download first chunk to detect file type from content
-            first_chunk = None
-            file_content = b''
-            
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    file_content += chunk
-                    if first_chunk is None:
-                        first_chunk = chunk
-            
-            # Detect extension from content
-            extension = self._get_file_extension(url, content_type, first_chunk)
-            
-            filename = f"{file_hash}{extension}"
-            local_path = os.path.join(full_folder, filename)
-            
-            # Check if file already exists
-            if os.path.exists(local_path):
-                logger.info(f"File already exists: {filename}")
-                return {
-                    'local_path': os.path.join(competitor_folder, media_folder, filename),
-                    'original_url': url,
-                    'file_size': os.path.getsize(local_path)
-                }
-            
-            # Save the file
-            with open(local_path, 'wb') as f:
-                f.write(file_content)
-            
-            file_size = os.path.getsize(local_path)
-            logger.info(f"Saved {media_type} to {competitor_folder}/{media_folder}/{filename} ({file_size} bytes)")
+        competitor_folder = self._sanitize_folder_name(competitor_name) if competitor_name else 'unknown'
+        return self.downloader.download(url, media_type, competitor_folder)
+    
+    def download_files(self, files: List[Tuple[str, str]], competitor_name: str = None) -> List[Optional[Dict]]:
+        """
+        Download several ``(url, media_type)`` files in parallel
+        
+        Returns:
+            One ``download_and_save_file`` result per file, in order
+        """
+        competitor_folder = self._sanitize_folder_name(competitor_name) if competitor_name else 'unknown'
+        return self.downloader.download_many(
+            [(index, url, media_type, competitor_folder) for index, (url, media_type) in enumerate(files)]
+        )
+    
+    def _save_media_for_ads(self, ads: List[Ad], progress_callback: Optional[ProgressCallback] = None) -> Dict[int, Dict]:
+        """Download the media of all ``ads`` on one bounded pool and record local paths per ad"""
+        jobs = []
+        for ad in ads:
+            competitor_folder = self._sanitize_folder_name(ad.competitor.name) if ad.competitor else 'unknown'
+            ad_dict = ad.to_dict()
+            for url in ad_dict.get('main_image_urls', []) or []:
+                jobs.append((ad.id, url, 'image', competitor_folder))
+            for url in ad_dict.get('main_video_urls', []) or []:
+                jobs.append((ad.id, url, 'video', competitor_folder))
+        
+        results = {
+            ad.id: {
+                'images_saved': 0,
+                'videos_saved': 0,
+                'images_failed': 0,
+                'videos_failed': 0,
+                'local_image_paths': [],
+                'local_video_paths': []
+            }
+            for ad in ads
+        }
+        if not jobs:
+            return results
+        
+        logger.info(f"Downloading {len(jobs)} media files for {len(ads)} ads")
+        sha_by_path = {}
+        for (ad_id, _url, media_type, _folder), file_info in zip(jobs, self.downloader.download_many(jobs, progress_callback)):
+            result = results[ad_id]
+            kind = 'images' if media_type == 'image' else 'videos'
+            if file_info:
+                result[f'{kind}_saved'] += 1
+                result[f'local_{media_type}_paths'].append(file_info['local_path'])
+                sha_by_path[file_info['local_path']] = file_info['sha256']
+            else:
+                result[f'{kind}_failed'] += 1
+        
+        for ad in ads:
+            result = results[ad.id]
+            if not (result['local_image_paths'] or result['local_video_paths']):
+                continue
+            # Store local paths in raw_data
+            if not ad.raw_data:
+                ad.raw_data = {}
             
-            return {
-                'local_path': os.path.join(competitor_folder, media_folder, filename),
-                'original_url': url,
-                'file_size': file_size
+            ad.raw_data['local_media'] = {
+                'images': result['local_image_paths'],
+                'videos': result['local_video_paths'],
+                'saved_at': str(ad.updated_at)
             }
             
-        except Exception as e:
-            logger.error(f"Failed to download {url[:100]}: {str(e)}")
-            return None
+            # Mark the ad as having saved media
+            if not ad.meta:
+                ad.meta = {}
+            ad.meta['has_local_media'] = True
+            self.index.set_ad_files(ad.id, result['local_image_paths'], result['local_video_paths'], sha_by_path)
+        
+        self.db.commit()
+        return results
     
-    def save_ad_media(self, ad_id: int) -> Dict:
+    def save_ad_media(self, ad_id: int, progress_callback: Optional[ProgressCallback] = None) -> Dict:
         """
         Download and save all media for an ad
         
+        Args:
+            ad_id: ID of the ad
+            progress_callback: Called as ``(ad_id, files_done, files_total)`` after each file
+        
         Returns:
             Dict with results: {
                 'images_saved': int,
@@ -180,71 +163,18 @@ class MediaStorageService:
         if not ad:
             raise ValueError(f"Ad {ad_id} not found")
         
-        # Get competitor name for folder organization
-        competitor_name = ad.competitor.name if ad.competitor else 'unknown'
-        
-        result = {
-            'images_saved': 0,
-            'videos_saved': 0,
-            'images_failed': 0,
-            'videos_failed': 0,
-            'local_image_paths': [],
-            'local_video_paths': []
-        }
-        
-        # Get ad dict to extract media URLs
-        ad_dict = ad.to_dict()
-        
-        # Download images
-        image_urls = ad_dict.get('main_image_urls', [])
-        if image_urls:
-            logger.info(f"Downloading {len(image_urls)} images for ad {ad_id} (competitor: {competitor_name})")
-            for url in image_urls:
-                file_info = self.download_and_save_file(url, 'image', competitor_name)
-                if file_info:
-                    result['images_saved'] += 1
-                    result['local_image_paths'].append(file_info['local_path'])
-                else:
-                    result['images_failed'] += 1
-        
-        # Download videos
-        video_urls = ad_dict.get('main_video_urls', [])
-        if video_urls:
-            logger.info(f"Downloading {len(video_urls)} videos for ad {ad_id} (competitor: {competitor_name})")
-            for url in video_urls:
-                file_info = self.download_and_save_file(url, 'video', competitor_name)
-                if file_info:
-                    result['videos_saved'] += 1
-                    result['local_video_paths'].append(file_info['local_path'])
-                else:
-                    result['videos_failed'] += 1
-        
-        # Update ad with local paths
+        result = self._save_media_for_ads([ad], progress_callback)[ad.id]
         if result['local_image_paths'] or result['local_video_paths']:
-            # Store local paths in raw_data
-            if not ad.raw_data:
-                ad.raw_data = {}
-            
-            ad.raw_data['local_media'] = {
-                'images': result['local_image_paths'],
-                'videos': result['local_video_paths'],
-                'saved_at': str(ad.updated_at)
-            }
-            
-            # Mark the ad as having saved media
-            if not ad.meta:
-                ad.meta = {}
-            ad.meta['has_local_media'] = True
-            
-            self.db.commit()
             logger.info(f"Updated ad {ad_id} with local media paths")
-        
         return result
     
-    def save_adset_media(self, ad_set_id: int) -> Dict:
+    def save_adset_media(self, ad_set_id: int, progress_callback: Optional[ProgressCallback] = None) -> Dict:
         """
         Download and save all media for all ads in an ad set
         
+        Files of all ads download on one shared pool, so a set of single-image
+        ads is not fetched one file at a time.
+        
         Returns:
             Dict with aggregate results
         """
@@ -266,16 +196,18 @@ class MediaStorageService:
             'videos_failed': 0
         }
         
-        for ad in ads:
-            try:
-                result = self.save_ad_media(ad.id)
-                aggregate_result['ads_processed'] += 1
-                aggregate_result['images_saved'] += result['images_saved']
-                aggregate_result['videos_saved'] += result['videos_saved']
-                aggregate_result['images_failed'] += result['images_failed']
-                aggregate_result['videos_failed'] += result['videos_failed']
-            except Exception as e:
-                logger.error(f"Failed to save media for ad {ad.id}: {str(e)}")
+        try:
+            results = self._save_media_for_ads(ads, progress_callback)
+        except Exception as e:
+            logger.error(f"Failed to save media for ad set {ad_set_id}: {str(e)}")
+            return aggregate_result
+        
+        for result in results.values():
+            aggregate_result['ads_processed'] += 1
+            aggregate_result['images_saved'] += result['images_saved']
+            aggregate_result['videos_saved'] += result['videos_saved']
+            aggregate_result['images_failed'] += result['images_failed']
+            aggregate_result['videos_failed'] += result['videos_failed']
         
         return aggregate_result
     
@@ -295,79 +227,58 @@ class MediaStorageService:
         
         return f"{base_url}/api/v1/media/{local_path}"
     
-    def cleanup_old_media(self, days_old: int = 90) -> Dict:
+    def cleanup_old_media(self, days_old: int = 90, batch_size: int = 500, reconcile: bool = False) -> Dict:
         """
         Remove media files that are older than specified days and not referenced by any ads
         
+        Candidates come from the media index (one indexed query per batch), so
+        files saved before the index existed are only seen after ``reconcile``.
+        
         Args:
             days_old: Files older than this many days will be considered for cleanup
+            batch_size: Files unlinked per batch (one commit per batch)
+            reconcile: Rebuild the index from disk first
         
         Returns:
             Dict with cleanup statistics
         """
-        import time
-        from datetime import datetime, timedelta
-        
-        cutoff_time = time.time() - (days_old * 24 * 60 * 60)
-        
         stats = {
             'files_checked': 0,
             'files_removed': 0,
             'space_freed': 0
         }
         
-        # Get all files in storage (now organized by competitor)
-        if not os.path.exists(self.storage_path):
-            return stats
-        
-        # Iterate through competitor folders
-        for competitor_folder in os.listdir(self.storage_path):
-            competitor_path = os.path.join(self.storage_path, competitor_folder)
-            if not os.path.isdir(competitor_path):
-                continue
-            
-            # Check images and videos folders within competitor folder
-            for media_type in ['images', 'videos']:
-                media_folder_path = os.path.join(competitor_path, media_type)
-                if not os.path.exists(media_folder_path):
-                    continue
-                
-                for filename in os.listdir(media_folder_path):
-                    file_path = os.path.join(media_folder_path, filename)
-                    if not os.path.isfile(file_path):
-                        continue
-                    
-                    stats['files_checked'] += 1
-                    
-                    # Check file age
-                    if os.path.getmtime(file_path) < cutoff_time:
-                        # Check if file is still referenced
-                        relative_path = os.path.join(competitor_folder, media_type, filename)
-                        is_referenced = self._is_media_referenced(relative_path)
-                        
-                        if not is_referenced:
-                            file_size = os.path.getsize(file_path)
-                            os.remove(file_path)
-                            stats['files_removed'] += 1
-                            stats['space_freed'] += file_size
-                            logger.info(f"Removed unused media: {relative_path}")
+        if reconcile:
+            self.reconcile_media_index()
+        
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days_old)
+        last_id = 0
+        while True:
+            batch = self.index.unreferenced(cutoff, after_id=last_id, limit=batch_size)
+            if not batch:
+                break
+            last_id = batch[-1].id
+            removed = []
+            for media_file in batch:
+                stats['files_checked'] += 1
+                try:
+                    if os.path.exists(os.path.join(self.storage_path, media_file.local_path)):
+                        stats['space_freed'] += self.downloader.remove_link(media_file.local_path)
+                        stats['files_removed'] += 1
+                        logger.info(f"Removed unused media: {media_file.local_path}")
+                    removed.append(media_file.local_path)
+                except OSError as e:
+                    logger.error(f"Failed to remove {media_file.local_path}: {str(e)}")
+            self.index.forget(removed)
+            self.db.commit()
         
         return stats
     
-    def _is_media_referenced(self, local_path: str) -> bool:
-        """Check if a local media path is still referenced by any ad"""
-        # Search in raw_data for the local path
-        ads = self.db.query(Ad).filter(
-            Ad.raw_data.op('->')('local_media').isnot(None)
-        ).all()
-        
-        for ad in ads:
-            local_media = ad.raw_data.get('local_media', {})
-            all_paths = local_media.get('images', []) + local_media.get('videos', [])
-            if local_path in all_paths:
-                return True
-        
-        return False
+    def reconcile_media_index(self) -> Dict:
+        """Rebuild the media index from the files on disk and the ads' local_media"""
+        stats = self.index.reconcile()
+        self.db.commit()
+        return stats
     
     def delete_ad_media(self, ad_id: int) -> Dict:
         """
@@ -400,15 +311,21 @@ class MediaStorageService:
         image_paths = local_media.get('images', [])
         video_paths = local_media.get('videos', [])
         
+        # Files another ad still references stay on disk
+        self.index.release_ad(ad_id)
+        shared = self.index.referenced_paths(image_paths + video_paths)
+        
         # Delete images
         for rel_path in image_paths:
             try:
                 full_path = os.path.join(self.storage_path, rel_path)
-                if os.path.exists(full_path):
-                    file_size = os.path.getsize(full_path)
-                    os.remove(full_path)
+                if rel_path in shared:
+                    result['images_deleted'] += 1
+                    logger.info(f"Kept shared image: {rel_path}")
+                elif os.path.exists(full_path):
+                    # No other ad references this path; the stored object stays while other folders link it
+                    result['space_freed'] += self.downloader.remove_link(rel_path)
                     result['images_deleted'] += 1
-                    result['space_freed'] += file_size
                     logger.info(f"Deleted image: {rel_path}")
                 else:
                     logger.warning(f"Image file not found: {rel_path}")
@@ -421,11 +338,13 @@ class MediaStorageService:
         for rel_path in video_paths:
             try:
                 full_path = os.path.join(self.storage_path, rel_path)
-                if os.path.exists(full_path):
-                    file_size = os.path.getsize(full_path)
-                    os.remove(full_path)
+                if rel_path in shared:
+                    result['videos_deleted'] += 1
+                    logger.info(f"Kept shared video: {rel_path}")
+                elif os.path.exists(full_path):
+                    # No other ad references this path; the stored object stays while other folders link it
+                    result['space_freed'] += self.downloader.remove_link(rel_path)
                     result['videos_deleted'] += 1
-                    result['space_freed'] += file_size
                     logger.info(f"Deleted video: {rel_path}")
                 else:
                     logger.warning(f"Video file not found: {rel_path}")
@@ -439,6 +358,7 @@ class MediaStorageService:
             del ad.raw_data['local_media']
         if ad.meta and 'has_local_media' in ad.meta:
             ad.meta['has_local_media'] = False
+        self.index.forget(path for path in image_paths + video_paths if path not in shared)
         
         self.db.commit()
         
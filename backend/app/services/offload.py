@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+import anyio
+import anyio.to_thread
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LaneFullError(Exception):
+    """Raised when a lane already has ``max_waiting`` requests queued (mapped to 503)."""
+
+    def __init__(self, lane: str):
+        super().__init__(f"Too many '{lane}' requests in progress, try again shortly")
+        self.lane = lane
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class OffloadLane:
+    """
+    Bounded worker threads for blocking work (``requests``, PyAV, PIL, SQLAlchemy
+    sessions) called from ``async def`` routes.
+
+    ``await lane.run(fn, *args)`` runs ``fn`` on a thread so the event loop keeps
+    serving other requests. At most ``max_concurrency`` calls of a lane run at once;
+    up to ``max_waiting`` more queue for a slot, beyond that ``LaneFullError`` is
+    raised. Queue and run times of recent calls are kept for ``snapshot``.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_waiting: Optional[int] = None, window: int = 512):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_waiting = settings.OFFLOAD_MAX_WAITING if max_waiting is None else max_waiting
+        self._lock = threading.Lock()
+        # anyio limiters belong to one event loop (tests and scripts may run several)
+        self._limiters: "weakref.WeakKeyDictionary[Any, anyio.CapacityLimiter]" = weakref.WeakKeyDictionary()
+        self._timings: "deque[tuple]" = deque(maxlen=window)
+        self.waiting = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _limiter(self) -> anyio.CapacityLimiter:
+        loop = asyncio.get_running_loop()
+        limiter = self._limiters.get(loop)
+        if limiter is None:
+            limiter = self._limiters[loop] = anyio.CapacityLimiter(self.max_concurrency)
+        return limiter
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        limiter = self._limiter()
+        with self._lock:
+            if limiter.available_tokens == 0 and limiter.statistics().tasks_waiting >= self.max_waiting:
+                self.rejected += 1
+                raise LaneFullError(self.name)
+            self.waiting += 1
+        queued_at = time.monotonic()
+        started_at = None
+
+        def call() -> T:
+            nonlocal started_at
+            started_at = time.monotonic()
+            with self._lock:
+                self.waiting -= 1
+                self.in_flight += 1
+            return fn(*args, **kwargs)
+
+        ok = False
+        try:
+            result = await anyio.to_thread.run_sync(call, limiter=limiter)
+            ok = True
+            return result
+        finally:
+            finished_at = time.monotonic()
+            with self._lock:
+                if started_at is None:
+                    # Cancelled while still queued
+                    self.waiting -= 1
+                else:
+                    self.in_flight -= 1
+                    if ok:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+                    self._timings.append((started_at - queued_at, finished_at - started_at))
+            if started_at is not None and started_at - queued_at > 1.0:
+                logger.info(f"Offload lane '{self.name}': {fn.__name__} queued {started_at - queued_at:.2f}s for a thread")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = [wait for wait, _ in self._timings]
+            runs = [run for _, run in self._timings]
+            return {
+                "max_concurrency": self.max_concurrency,
+                "max_waiting": self.max_waiting,
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "wait_p50_seconds": round(_percentile(waits, 0.5), 4),
+                "wait_p99_seconds": round(_percentile(waits, 0.99), 4),
+                "run_p50_seconds": round(_percentile(runs, 0.5), 4),
+                "run_p99_seconds": round(_percentile(runs, 0.99), 4),
+            }
+
+
+# Ad Library searches, saves and downloads (GraphQL fetches, extraction, DB writes)
+ad_library_lane = OffloadLane("ad_library", settings.OFFLOAD_AD_LIBRARY_CONCURRENCY)
+# Media downloads, hashing and URL refreshes
+media_lane = OffloadLane("media", settings.OFFLOAD_MEDIA_CONCURRENCY)
+# Enqueueing scrape tasks in bulk (competitor lookups, broker round-trips)
+scrape_lane = OffloadLane("scrape", settings.OFFLOAD_SCRAPE_CONCURRENCY)
+
+LANES = {lane.name: lane for lane in (ad_library_lane, media_lane, scrape_lane)}
+
+
+def lane_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: lane.snapshot() for name, lane in LANES.items()}
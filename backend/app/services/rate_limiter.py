@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Refill-and-take in one round trip. Uses the Redis clock so every worker sees the
+# same bucket regardless of host clock skew. Returns the seconds to wait (0 = granted).
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= requested then
+  tokens = tokens - requested
+else
+  wait = (requested - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return tostring(wait)
+"""
+
+
+class TokenBucket:
+    """
+    Token bucket shared by every process through Redis.
+
+    ``rate`` tokens per second refill a bucket of ``capacity``; each request takes
+    one. When Redis is unreachable the bucket falls back to a per-process one with
+    the same rate, so a Redis outage slows nothing down beyond the local limit.
+    """
+
+    KEY_PREFIX = "ratelimit"
+    # After a Redis error, use the local bucket for this many seconds
+    REDIS_RETRY_INTERVAL = 30.0
+
+    def __init__(self, name: str, rate: float, capacity: float):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._redis = None
+        self._script = None
+        self._redis_disabled_until = 0.0
+
+    def _client(self):
+        if time.monotonic() < self._redis_disabled_until:
+            return None
+        if self._redis is None:
+            try:
+                import redis
+                self._redis = redis.from_url(settings.REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+                self._script = self._redis.register_script(_TAKE_SCRIPT)
+            except Exception as e:
+                self._redis_failed(e)
+        return self._redis
+
+    def _redis_failed(self, error: Exception) -> None:
+        logger.warning(f"Rate limiter '{self.name}': Redis unavailable, using a local bucket ({error})")
+        self._redis_disabled_until = time.monotonic() + self.REDIS_RETRY_INTERVAL
+
+    def _take_local(self, tokens: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def try_take(self, tokens: float = 1) -> float:
+        """Take ``tokens`` if available; otherwise return how long to wait before asking again."""
+        if self._client() is not None:
+            try:
+                return float(self._script(keys=[f"{self.KEY_PREFIX}:{self.name}"], args=[self.rate, self.capacity, tokens]))
+            except Exception as e:
+                self._redis_failed(e)
+        return self._take_local(tokens)
+
+    def acquire(self, tokens: float = 1, timeout: Optional[float] = None) -> bool:
+        """Block until ``tokens`` are taken; False if that would exceed ``timeout`` seconds."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_take(tokens)
+            if wait <= 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1) -> None:
+        """``acquire`` for coroutines: waits with ``asyncio.sleep`` instead of blocking the loop."""
+        while True:
+            wait = self.try_take(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+# Every Ad Library GraphQL request, from any worker, takes a token from this bucket
+ad_library_bucket = TokenBucket(
+    "facebook_ad_library",
+    rate=settings.FACEBOOK_GRAPHQL_RATE_PER_SECOND,
+    capacity=settings.FACEBOOK_GRAPHQL_BURST,
+)
@@ -0,0 +1,285 @@
+import functools
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+import orjson
+from pydantic import BaseModel
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database import SessionLocal
+from app.models import Ad, AdAnalysis, AdSet, Category, Competitor
+
+logger = logging.getLogger(__name__)
+
+# Invalidation tags: every cached response names the tags its data depends on,
+# and bumping a tag's version makes all of those entries unreachable at once
+TAG_ADS = "ads"                  # ads and ad sets (content, favorites, membership)
+TAG_ANALYSIS = "analysis"        # ad analyses and their scores
+TAG_COMPETITORS = "competitors"
+TAG_CATEGORIES = "categories"
+
+# ORM writes to these models bump the tag after commit (see _track_flush)
+_MODEL_TAGS = {
+    Ad: TAG_ADS,
+    AdSet: TAG_ADS,
+    AdAnalysis: TAG_ANALYSIS,
+    Competitor: TAG_COMPETITORS,
+    Category: TAG_CATEGORIES,
+}
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(payload: Any) -> bytes:
+    """orjson-encode a response payload (datetimes, Decimals and DTOs included)."""
+    return orjson.dumps(payload, default=_json_default)
+
+
+def params_digest(params: Dict[str, Any]) -> str:
+    """Digest of query params with None dropped and strings trimmed, independent of order."""
+    normalized = {
+        name: value.strip() if isinstance(value, str) else value
+        for name, value in params.items() if value is not None
+    }
+    return hashlib.sha1(dumps(dict(sorted(normalized.items())))).hexdigest()
+
+
+class ResponseCache:
+    """
+    Serialized API responses in Redis, with an in-process LRU when Redis is down.
+
+    Entries are stored as ``b"<created>\\n<json>"`` under keys that embed the
+    current versions of their tags. Tag versions are Redis counters (local
+    counters in fallback mode), so invalidation is one INCR and stale entries
+    simply age out. Tags invalidated while Redis is unreachable are bumped in
+    Redis once it is back, so no process keeps serving entries from before.
+    """
+
+    KEY_PREFIX = "respcache"
+    # After a Redis error, serve from the local tier for this many seconds
+    REDIS_RETRY_INTERVAL = 30.0
+
+    def __init__(self, max_local_entries: int = 1000):
+        self.max_local_entries = max_local_entries
+        self._lock = threading.Lock()
+        self._local: "OrderedDict[str, Tuple[float, float, bytes]]" = OrderedDict()
+        self._local_tags: Dict[str, int] = {}
+        self._local_locks: Dict[str, float] = {}
+        # Tags whose Redis INCR could not be sent; replayed when Redis is reachable again
+        self._pending_tags: Set[str] = set()
+        self._redis = None
+        self._redis_disabled_until = 0.0
+
+    def _client(self):
+        if time.monotonic() < self._redis_disabled_until:
+            return None
+        if self._redis is None:
+            try:
+                import redis
+                self._redis = redis.from_url(settings.REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+            except Exception as e:
+                self._redis_failed(e)
+                return None
+        if self._pending_tags and not self._replay_invalidations(self._redis):
+            return None
+        return self._redis
+
+    def _replay_invalidations(self, client) -> bool:
+        with self._lock:
+            pending, self._pending_tags = self._pending_tags, set()
+        try:
+            self._incr_tags(client, pending)
+        except Exception as e:
+            with self._lock:
+                self._pending_tags |= pending
+            self._redis_failed(e)
+            return False
+        logger.info(f"Response cache: Redis is back, replayed invalidation of {', '.join(sorted(pending))}")
+        return True
+
+    def _incr_tags(self, client, tags: Iterable[str]) -> None:
+        pipe = client.pipeline(transaction=False)
+        for tag in sorted(tags):
+            pipe.incr(f"{self.KEY_PREFIX}:tag:{tag}")
+        pipe.execute()
+
+    def _redis_failed(self, error: Exception) -> None:
+        logger.warning(f"Response cache: Redis unavailable, using in-memory fallback ({error})")
+        self._redis_disabled_until = time.monotonic() + self.REDIS_RETRY_INTERVAL
+
+    def tag_versions(self, tags: Iterable[str]) -> str:
+        """Current versions of ``tags`` as a key fragment (prefixed by the tier they come from)."""
+        tags = list(tags)
+        client = self._client()
+        if client is not None:
+            try:
+                versions = client.mget([f"{self.KEY_PREFIX}:tag:{tag}" for tag in tags])
+                return "r" + ".".join(str(int(v or 0)) for v in versions)
+            except Exception as e:
+                self._redis_failed(e)
+        with self._lock:
+            return "l" + ".".join(str(self._local_tags.get(tag, 0)) for tag in tags)
+
+    def invalidate(self, *tags: str) -> None:
+        with self._lock:
+            for tag in tags:
+                self._local_tags[tag] = self._local_tags.get(tag, 0) + 1
+        client = self._client()
+        if client is not None:
+            try:
+                self._incr_tags(client, tags)
+                return
+            except Exception as e:
+                self._redis_failed(e)
+        with self._lock:
+            self._pending_tags.update(tags)
+
+    def get(self, key: str) -> Optional[Tuple[float, bytes]]:
+        """``(created_at, body)`` or None."""
+        client = self._client()
+        if client is not None:
+            try:
+                raw = client.get(f"{self.KEY_PREFIX}:{key}")
+                if raw is None:
+                    return None
+                created, body = raw.split(b"\n", 1)
+                return float(created), body
+            except Exception as e:
+                self._redis_failed(e)
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires_at, created, body = entry
+            if expires_at <= time.time():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return created, body
+
+    def set(self, key: str, body: bytes, created: float, ttl: float) -> None:
+        client = self._client()
+        if client is not None:
+            try:
+                client.set(f"{self.KEY_PREFIX}:{key}", f"{created:.3f}\n".encode() + body, ex=max(1, int(ttl)))
+                return
+            except Exception as e:
+                self._redis_failed(e)
+        with self._lock:
+            self._local[key] = (created + ttl, created, body)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_local_entries:
+                self._local.popitem(last=False)
+
+    def try_lock(self, key: str, ttl: int = 30) -> bool:
+        """Claim the right to refresh ``key`` (one revalidation at a time per entry)."""
+        client = self._client()
+        if client is not None:
+            try:
+                return bool(client.set(f"{self.KEY_PREFIX}:lock:{key}", b"1", nx=True, ex=ttl))
+            except Exception as e:
+                self._redis_failed(e)
+        now = time.monotonic()
+        with self._lock:
+            if self._local_locks.get(key, 0) > now:
+                return False
+            self._local_locks = {k: v for k, v in self._local_locks.items() if v > now}
+            self._local_locks[key] = now + ttl
+            return True
+
+    def clear_local(self) -> None:
+        with self._lock:
+            self._local.clear()
+            self._local_locks.clear()
+
+
+response_cache = ResponseCache()
+
+
+def invalidate_tags(*tags: str) -> None:
+    """Invalidate every cached response depending on any of ``tags``."""
+    response_cache.invalidate(*tags)
+
+
+def cached_response(namespace: str, tags: Iterable[str], fresh_ttl: float = 30, stale_ttl: float = 300):
+    """
+    Read-through cache for a response loader ``loader(db, **params) -> payload``.
+
+    The wrapped function returns the JSON body as bytes. Within ``fresh_ttl`` the
+    cached body is served as is; for another ``stale_ttl`` seconds it is still
+    served while one background thread reloads it with its own session. Loaders
+    must take every input as a keyword param so it can be part of the key.
+    """
+    tags = tuple(tags)
+
+    def decorator(loader: Callable[..., Any]):
+        def revalidate(key: str, params: Dict[str, Any]) -> None:
+            db = SessionLocal()
+            try:
+                body = dumps(loader(db, **params))
+                response_cache.set(key, body, time.time(), fresh_ttl + stale_ttl)
+            except Exception as e:
+                logger.warning(f"Background refresh of {namespace} failed: {e}")
+            finally:
+                db.close()
+
+        @functools.wraps(loader)
+        def wrapper(db: Session, **params: Any) -> bytes:
+            key = f"{namespace}:{response_cache.tag_versions(tags)}:{params_digest(params)}"
+            entry = response_cache.get(key)
+            if entry is not None:
+                created, body = entry
+                if time.time() - created >= fresh_ttl and response_cache.try_lock(key):
+                    threading.Thread(target=revalidate, args=(key, params), daemon=True).start()
+                return body
+            body = dumps(loader(db, **params))
+            response_cache.set(key, body, time.time(), fresh_ttl + stale_ttl)
+            return body
+
+        wrapper.uncached = loader
+        return wrapper
+
+    return decorator
+
+
+# Commit hooks: ORM writes anywhere (API, Celery tasks) invalidate the tags of the
+# models they touched. Core statements (bulk upserts, query.delete) bypass the
+# flush and call invalidate_tags() themselves.
+def _track_flush(session: Session, flush_context, instances) -> None:
+    touched = session.info.setdefault("cache_tags", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        tag = _MODEL_TAGS.get(type(obj))
+        if tag:
+            touched.add(tag)
+
+
+def _invalidate_after_commit(session: Session) -> None:
+    touched = session.info.pop("cache_tags", None)
+    if touched:
+        invalidate_tags(*sorted(touched))
+
+
+def _forget_after_rollback(session: Session, previous_transaction) -> None:
+    # A failed savepoint (begin_nested) does not undo the outer transaction's writes
+    if not previous_transaction.nested:
+        session.info.pop("cache_tags", None)
+
+
+event.listen(Session, "before_flush", _track_flush)
+event.listen(Session, "after_commit", _invalidate_after_commit)
+event.listen(Session, "after_soft_rollback", _forget_after_rollback)
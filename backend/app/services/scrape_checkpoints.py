@@ -0,0 +1,172 @@
+import hashlib
+import math
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from app.models import Ad, ScrapeCheckpoint
+
+
+class AdIdBloomFilter:
+    """
+    Bloom filter over ad_archive_ids, stored as raw bytes on the checkpoint.
+
+    Sized for ``capacity`` ids at ``error_rate`` false positives; membership is a
+    hint only (no false negatives), callers confirm positives against ``ads``.
+    """
+
+    HASHES = 7
+
+    def __init__(self, capacity: int = 10_000, error_rate: float = 0.01, bits: Optional[bytes] = None):
+        if bits is not None:
+            self.bits = bytearray(bits)
+        else:
+            size = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+            self.bits = bytearray((size + 7) // 8)
+        self.size = len(self.bits) * 8
+
+    @property
+    def capacity(self) -> int:
+        """Ids the filter holds before its error rate passes ~1%."""
+        return int(self.size * (math.log(2) ** 2) / -math.log(0.01))
+
+    def _positions(self, ad_id: str):
+        digest = hashlib.blake2b(ad_id.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.HASHES))
+
+    def add(self, ad_id: str) -> None:
+        for position in self._positions(ad_id):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, ad_id: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(ad_id))
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.bits)
+
+
+def page_ad_archive_ids(response: Dict[str, Any]) -> List[str]:
+    """ad_archive_ids of every ad in a search page (edges and their collated results)."""
+    try:
+        edges = response["data"]["ad_library_main"]["search_results_connection"].get("edges") or []
+    except (KeyError, TypeError, AttributeError):
+        return []
+    ids = []
+    for edge in edges:
+        node = edge.get("node") if isinstance(edge, dict) else None
+        if not isinstance(node, dict):
+            continue
+        ads = node.get("collated_results", node)
+        for ad in ads if isinstance(ads, list) else [ads]:
+            if isinstance(ad, dict) and ad.get("ad_archive_id"):
+                ids.append(str(ad["ad_archive_id"]))
+    return ids
+
+
+def _page_max_start_date(response: Dict[str, Any]) -> Optional[date]:
+    latest = None
+    try:
+        edges = response["data"]["ad_library_main"]["search_results_connection"].get("edges") or []
+    except (KeyError, TypeError, AttributeError):
+        return None
+    for edge in edges:
+        node = edge.get("node") if isinstance(edge, dict) else None
+        ads = node.get("collated_results", node) if isinstance(node, dict) else []
+        for ad in ads if isinstance(ads, list) else [ads]:
+            ts = ad.get("start_date") if isinstance(ad, dict) else None
+            if isinstance(ts, (int, float)) and ts > 0:
+                started = datetime.fromtimestamp(ts, tz=timezone.utc).date()
+                latest = max(latest, started) if latest else started
+    return latest
+
+
+class CheckpointTracker:
+    """
+    Incremental-scrape state for one run of one (competitor, countries, active_status).
+
+    ``known_ids`` tells which ads of a page are already stored, so extraction can
+    take the cheap path for them and the scraper can stop on a page of known ads.
+    State lives on the tracker until ``save`` (extraction commits and rolls back
+    the same session mid-run), which writes it to the checkpoint row.
+    """
+
+    def __init__(self, db: Session, competitor_id: int, countries: Iterable[str], active_status: str):
+        self.db = db
+        self.competitor_id = competitor_id
+        self.country = ",".join(sorted(countries))
+        self.active_status = active_status.lower()
+        self.pages = 0
+        self.new_ads = 0
+
+        checkpoint = self._query().first()
+        self.last_cursor = checkpoint.last_cursor if checkpoint else None
+        self.max_start_date = checkpoint.max_start_date if checkpoint else None
+        self.seen_count = (checkpoint.seen_count or 0) if checkpoint else 0
+        bits = checkpoint.seen_filter if checkpoint else None
+        if bits and self.seen_count < AdIdBloomFilter(bits=bits).capacity:
+            self.filter = AdIdBloomFilter(bits=bits)
+        else:
+            self._seed_filter()
+        # Early stop needs ads stored before this run; pages of this run don't count
+        self.has_history = self.seen_count > 0
+
+    def _query(self):
+        return self.db.query(ScrapeCheckpoint).filter(
+            ScrapeCheckpoint.competitor_id == self.competitor_id,
+            ScrapeCheckpoint.country == self.country,
+            ScrapeCheckpoint.active_status == self.active_status,
+        )
+
+    def _seed_filter(self) -> None:
+        # First run or an overfull filter: (re)build from every stored ad of the competitor
+        stored = [row.ad_archive_id for row in self.db.query(Ad.ad_archive_id).filter(Ad.competitor_id == self.competitor_id)]
+        self.filter = AdIdBloomFilter(capacity=max(10_000, 2 * len(stored)))
+        for ad_id in stored:
+            self.filter.add(ad_id)
+        self.seen_count = len(stored)
+
+    def known_ids(self, ad_ids: Iterable[str]) -> Set[str]:
+        """Ids already stored; the filter rules out new ids without a query, positives are confirmed."""
+        candidates = {ad_id for ad_id in ad_ids if ad_id in self.filter}
+        if not candidates:
+            return set()
+        return {
+            row.ad_archive_id
+            for row in self.db.query(Ad.ad_archive_id).filter(Ad.ad_archive_id.in_(list(candidates)))
+        }
+
+    def observe_page(self, response: Dict[str, Any], ad_ids: List[str], known: Set[str]) -> None:
+        """Record a processed page: its ids join the filter, the cursor and max start date advance."""
+        self.pages += 1
+        for ad_id in set(ad_ids) - known:
+            if ad_id not in self.filter:
+                self.filter.add(ad_id)
+                self.seen_count += 1
+            self.new_ads += 1
+        started = _page_max_start_date(response)
+        if started and (self.max_start_date is None or started > self.max_start_date):
+            self.max_start_date = started
+        try:
+            page_info = response["data"]["ad_library_main"]["search_results_connection"].get("page_info") or {}
+            self.last_cursor = page_info.get("end_cursor") if page_info.get("has_next_page") else None
+        except (KeyError, TypeError, AttributeError):
+            pass
+
+    def save(self) -> None:
+        checkpoint = self._query().first()
+        if checkpoint is None:
+            checkpoint = ScrapeCheckpoint(
+                competitor_id=self.competitor_id, country=self.country, active_status=self.active_status
+            )
+            self.db.add(checkpoint)
+        checkpoint.seen_filter = self.filter.to_bytes()
+        checkpoint.seen_count = self.seen_count
+        checkpoint.max_start_date = self.max_start_date
+        checkpoint.last_cursor = self.last_cursor
+        checkpoint.last_run_at = datetime.now(timezone.utc)
+        checkpoint.last_run_pages = self.pages
+        checkpoint.last_run_new_ads = self.new_ads
+        self.db.commit()
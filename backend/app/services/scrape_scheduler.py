@@ -0,0 +1,77 @@
+import math
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.models import Competitor
+
+
+def scrape_priority(competitor: Competitor, now: Optional[datetime] = None) -> float:
+    """
+    Scheduling priority of a competitor (higher runs first).
+
+    Never-scraped competitors come first. Otherwise hours since the last scrape,
+    weighted up by how many new ads that scrape found (log-damped so one prolific
+    advertiser cannot starve the rest).
+    """
+    if competitor.last_scraped_at is None:
+        return math.inf
+    now = now or datetime.now(timezone.utc)
+    last = competitor.last_scraped_at
+    if last.tzinfo is None:
+        last = last.replace(tzinfo=timezone.utc)
+    hours = max(0.0, (now - last).total_seconds() / 3600)
+    return hours * (1 + math.log1p(competitor.last_scrape_yield or 0))
+
+
+def plan_scrape_jobs(competitors: Iterable[Competitor], countries: List[str], now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """One job per competitor x country, highest-priority competitors first (ties by id)."""
+    now = now or datetime.now(timezone.utc)
+    ordered = sorted(competitors, key=lambda c: (-scrape_priority(c, now), c.id))
+    return [{"competitor_id": c.id, "country": country} for c in ordered for country in countries]
+
+
+def aggregate_scrape_results(job_results: Iterable[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Fold per-(competitor, country) job results into the run summary.
+
+    Jobs return ``{"competitor_id", "country", "stats", ...}`` or the same keys with
+    ``"error"``. Stats are summed per competitor; a competitor counts as processed
+    when at least one of its countries succeeded.
+    """
+    by_competitor: Dict[int, Dict[str, Any]] = {}
+    errors = []
+    for job in job_results:
+        if not job:
+            continue
+        if job.get("error"):
+            errors.append({
+                "competitor_id": job.get("competitor_id"),
+                "competitor_name": job.get("competitor_name"),
+                "country": job.get("country"),
+                "error": job["error"],
+            })
+            continue
+        entry = by_competitor.setdefault(job["competitor_id"], {
+            "competitor_id": job["competitor_id"],
+            "competitor_name": job.get("competitor_name"),
+            "page_id": job.get("page_id"),
+            "stats": {},
+            "countries": [],
+            "processed_at": job.get("processed_at"),
+        })
+        for key, value in (job.get("stats") or {}).items():
+            if isinstance(value, (int, float)):
+                entry["stats"][key] = entry["stats"].get(key, 0) + value
+        entry["countries"].append(job.get("country"))
+        entry["processed_at"] = max(filter(None, (entry["processed_at"], job.get("processed_at"))), default=None)
+
+    competitors_results = list(by_competitor.values())
+    for entry in competitors_results:
+        entry["stats"]["new_ads_count"] = entry["stats"].get("created", 0)
+    return {
+        "competitors_processed": len(competitors_results),
+        "total_new_ads": sum(entry["stats"]["new_ads_count"] for entry in competitors_results),
+        "total_processed_ads": sum(entry["stats"].get("total_processed", 0) for entry in competitors_results),
+        "competitors_results": competitors_results,
+        "errors": errors,
+    }
@@ -0,0 +1,124 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List
+
+from app.core.config import settings
+from app.database import SessionLocal
+from app.models import ApiUsage
+from app.services.usage_rollups import apply_rollups
+
+logger = logging.getLogger(__name__)
+
+
+class UsageRecorder:
+    """
+    Buffers ``ApiUsage`` rows and writes them in batches from a background thread.
+
+    ``record`` only appends to an in-process queue, so model calls never wait on
+    the database. The writer flushes every ``USAGE_FLUSH_SECONDS`` (sooner once
+    ``USAGE_FLUSH_BATCH`` rows are waiting) with one insert per batch, and
+    updates the ``api_usage_rollups`` totals in the same transaction. Rows leave
+    the queue only after their batch commits: a failed flush puts them back and
+    is retried, and whatever is left is flushed at process exit. Past
+    ``USAGE_BUFFER_LIMIT`` queued rows (a long database outage) the oldest are
+    dropped with an error.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable = SessionLocal,
+        batch_size: int = None,
+        interval: float = None,
+        limit: int = None,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size or settings.USAGE_FLUSH_BATCH
+        self.interval = interval or settings.USAGE_FLUSH_SECONDS
+        self.limit = limit or settings.USAGE_BUFFER_LIMIT
+        self._queue: deque = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self) -> None:
+        # Queued rows belong to the parent (which writes them); locks may have been held mid-fork
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def _ensure_writer(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="usage-recorder", daemon=True)
+                self._thread.start()
+
+    def record(self, row: Dict[str, Any]) -> None:
+        """Queue one ``ApiUsage`` row (column -> value)."""
+        with self._lock:
+            self._queue.append(row)
+            dropped = len(self._queue) - self.limit
+            for _ in range(max(0, dropped)):
+                self._queue.popleft()
+            pending = len(self._queue)
+        if dropped > 0:
+            logger.error(f"Usage buffer full: dropped {dropped} oldest ApiUsage rows")
+        self._ensure_writer()
+        if pending >= self.batch_size:
+            self._wake.set()
+
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def _take(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+
+    def _put_back(self, rows: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._queue.extendleft(reversed(rows))
+
+    def flush(self) -> int:
+        """Write everything queued now; returns rows written. Stops at the first failed batch."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                rows = self._take()
+                if not rows:
+                    return written
+                try:
+                    db = self.session_factory()
+                    try:
+                        db.bulk_insert_mappings(ApiUsage, rows)
+                        apply_rollups(db, rows)
+                        db.commit()
+                    finally:
+                        db.close()
+                except Exception as e:
+                    self._put_back(rows)
+                    logger.warning(f"Failed to write {len(rows)} ApiUsage rows, will retry: {e}")
+                    return written
+                written += len(rows)
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Usage recorder flush failed: {e}")
+                time.sleep(self.interval)
+
+
+usage_recorder = UsageRecorder()
+atexit.register(usage_recorder.flush)
@@ -0,0 +1,132 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+
+from app.models import ApiUsage, ApiUsageRollup
+
+logger = logging.getLogger(__name__)
+
+# The single bucket of the "total" granularity
+TOTAL_BUCKET = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+SUMMED = ("requests", "prompt_tokens", "cached_tokens", "completion_tokens", "total_tokens", "estimated_cost_usd")
+
+
+def _buckets(created_at: datetime) -> List[Tuple[str, datetime]]:
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    created_at = created_at.astimezone(timezone.utc)
+    hour = created_at.replace(minute=0, second=0, microsecond=0)
+    return [("hour", hour), ("day", hour.replace(hour=0)), ("total", TOTAL_BUCKET)]
+
+
+def rollup_deltas(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fold raw ``ApiUsage`` rows (column -> value) into per-bucket increments."""
+    deltas: Dict[Tuple, Dict[str, Any]] = {}
+    now = datetime.now(timezone.utc)
+    for row in rows:
+        created_at = row.get("created_at") or now
+        for granularity, bucket_start in _buckets(created_at):
+            key = (
+                granularity,
+                bucket_start,
+                row["model_name"],
+                row["provider"],
+                -1 if row.get("api_key_index") is None else row["api_key_index"],
+                row.get("request_type") or "",
+            )
+            delta = deltas.get(key)
+            if delta is None:
+                delta = deltas[key] = {
+                    "granularity": key[0], "bucket_start": key[1], "model_name": key[2],
+                    "provider": key[3], "api_key_index": key[4], "request_type": key[5],
+                    **{column: 0 for column in SUMMED}, "last_used_at": created_at,
+                }
+            delta["requests"] += 1
+            for column in SUMMED[1:]:
+                delta[column] += row.get(column) or 0
+            delta["last_used_at"] = max(delta["last_used_at"], created_at)
+    return list(deltas.values())
+
+
+def _dialect_helpers(db):
+    """(insert construct with ON CONFLICT support, two-argument max) for the session's database."""
+    if db.get_bind().dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert, func.max
+    from sqlalchemy.dialects.postgresql import insert
+    return insert, func.greatest
+
+
+def apply_rollups(db, rows: Iterable[Dict[str, Any]]) -> int:
+    """
+    Add ``rows`` to their hour, day and all-time rollups (one upsert per bucket).
+    Runs in the caller's transaction, so raw rows and rollups commit together.
+    """
+    deltas = rollup_deltas(rows)
+    if not deltas:
+        return 0
+    insert, greatest = _dialect_helpers(db)
+    table = ApiUsageRollup.__table__
+    # Sorted so concurrent writers lock rollup rows in the same order
+    deltas.sort(key=lambda d: (d["granularity"], d["bucket_start"], d["model_name"], d["provider"], d["api_key_index"], d["request_type"]))
+    for delta in deltas:
+        stmt = insert(table).values(**delta)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["granularity", "bucket_start", "model_name", "provider", "api_key_index", "request_type"],
+            set_={
+                **{column: table.c[column] + stmt.excluded[column] for column in SUMMED},
+                "last_used_at": func.coalesce(greatest(table.c.last_used_at, stmt.excluded.last_used_at), stmt.excluded.last_used_at),
+            },
+        )
+        db.execute(stmt)
+    return len(deltas)
+
+
+def usage_totals(db, *group_by, provider: Optional[str] = None) -> List[Any]:
+    """All-time sums from the "total" rollups, grouped by the given ``ApiUsageRollup`` columns."""
+    query = (
+        db.query(
+            *group_by,
+            func.sum(ApiUsageRollup.requests).label("total_requests"),
+            func.sum(ApiUsageRollup.prompt_tokens).label("total_prompt_tokens"),
+            func.sum(ApiUsageRollup.cached_tokens).label("total_cached_tokens"),
+            func.sum(ApiUsageRollup.completion_tokens).label("total_completion_tokens"),
+            func.sum(ApiUsageRollup.total_tokens).label("total_tokens"),
+            func.sum(ApiUsageRollup.estimated_cost_usd).label("estimated_cost_usd"),
+            func.max(ApiUsageRollup.last_used_at).label("last_used"),
+        )
+        .filter(ApiUsageRollup.granularity == "total")
+    )
+    if provider is not None:
+        query = query.filter(ApiUsageRollup.provider == provider)
+    return query.group_by(*group_by).all()
+
+
+def compact_usage(db, raw_retention_days: int, hourly_retention_days: int, batch_size: int = 5000) -> Dict[str, int]:
+    """
+    Delete raw ``api_usage`` rows older than ``raw_retention_days`` and hourly
+    rollups older than ``hourly_retention_days`` (daily and all-time rollups are
+    kept; 0 disables either). Deletes in batches of ``batch_size``, committing each.
+    """
+    now = datetime.now(timezone.utc)
+    deleted = {"raw": 0, "hourly": 0}
+    targets = []
+    if raw_retention_days > 0:
+        targets.append(("raw", ApiUsage, ApiUsage.created_at < now - timedelta(days=raw_retention_days)))
+    if hourly_retention_days > 0:
+        targets.append(("hourly", ApiUsageRollup, (ApiUsageRollup.granularity == "hour")
+                        & (ApiUsageRollup.bucket_start < now - timedelta(days=hourly_retention_days))))
+    for name, model, condition in targets:
+        while True:
+            ids = [row_id for (row_id,) in db.query(model.id).filter(condition).limit(batch_size)]
+            if not ids:
+                break
+            db.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+            deleted[name] += len(ids)
+    if deleted["raw"] or deleted["hourly"]:
+        logger.info(f"Compacted api usage: {deleted['raw']} raw rows, {deleted['hourly']} hourly rollups")
+    return deleted
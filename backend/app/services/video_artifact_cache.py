@@ -0,0 +1,321 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from app.core.config import settings
+from app.services.gemini_assets import file_sha256
+from app.services.media_hash_cache import normalize_media_url
+
+logger = logging.getLogger(__name__)
+
+# (url, destination path) -> None; writes the artifact to the path or raises
+Fetch = Callable[[str, str], None]
+
+HTTP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36",
+    "Accept": "video/mp4,application/octet-stream,*/*",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+# CDNs whose signed URLs (rotating query params) all point at the same file
+SIGNED_CDN_HOSTS = ("fbcdn.net", "cdninstagram.com")
+# ISO media boxes an MP4/MOV file can start with, at bytes 4-8
+ISO_BOX_TYPES = (b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide")
+EBML_MAGIC = b"\x1a\x45\xdf\xa3"  # WebM / Matroska
+
+
+def cache_url(url: str) -> str:
+    """
+    The part of ``url`` that identifies the video: ``normalize_media_url`` for
+    signed fbcdn/cdninstagram URLs, the full URL elsewhere (Ad Library or watch
+    pages carry the ad or video id in the query string).
+    """
+    host = (urlparse(url).hostname or "").lower()
+    if any(host == cdn or host.endswith("." + cdn) for cdn in SIGNED_CDN_HOSTS):
+        return normalize_media_url(url)
+    return url
+
+
+def is_video_file(path: str) -> bool:
+    """Whether ``path`` starts like an MP4/MOV or WebM/Matroska file."""
+    with open(path, "rb") as f:
+        head = f.read(12)
+    return head[4:8] in ISO_BOX_TYPES or head.startswith(EBML_MAGIC)
+
+
+def http_fetch(url: str, path: str, timeout: float = 600, headers: Optional[Dict[str, str]] = None) -> None:
+    """Stream ``url`` into ``path``; raises on text responses (error or login pages)."""
+    with requests.get(url, stream=True, timeout=timeout, headers=headers or HTTP_HEADERS) as r:
+        r.raise_for_status()
+        content_type = r.headers.get("Content-Type", "").lower()
+        if content_type.startswith(("text/", "application/json")):
+            raise ValueError(f"Expected a video, got {content_type} from {url}")
+        with open(path, "wb") as f:
+            for chunk in r.iter_content(chunk_size=1024 * 1024):
+                if chunk:
+                    f.write(chunk)
+
+
+@dataclass
+class Artifact:
+    """A cached file. Pinned (safe from eviction) until ``release`` or its pin expires."""
+    path: str
+    sha256: str
+    size: int
+    pin_path: Optional[str] = None
+
+    def release(self) -> None:
+        if self.pin_path:
+            try:
+                os.remove(self.pin_path)
+            except FileNotFoundError:
+                pass
+            self.pin_path = None
+
+    def __enter__(self) -> "Artifact":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class VideoArtifactCache:
+    """
+    Disk-backed, size-bounded LRU cache of downloaded videos, shared by every
+    process on the host.
+
+    Files are stored once per content hash (``objects/<sha256><suffix>``). Each
+    URL (see ``cache_url``) plus a ``variant`` for downloads that produce
+    different bytes (e.g. yt-dlp merging audio in) points at one of them
+    (``urls/<key>.json``).
+    Lookups and downloads of one key hold an exclusive ``flock``, so concurrent
+    workers asking for the same video share a single download.
+
+    Hits bump the object's mtime, which is the LRU order. When the cache grows past
+    ``max_bytes`` the least recently used objects are deleted, except pinned ones:
+    every ``fetch`` pins its object (``pins/<sha256>.<id>``, mtime = pin expiry)
+    until ``Artifact.release`` or ``pin_seconds`` pass.
+    """
+
+    def __init__(self, root: str = None, max_bytes: int = None, pin_seconds: float = None):
+        self.root = root or settings.VIDEO_CACHE_DIR
+        self.max_bytes = settings.VIDEO_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.pin_seconds = settings.VIDEO_CACHE_PIN_SECONDS if pin_seconds is None else pin_seconds
+        self._ready = False
+
+    @staticmethod
+    def url_key(url: str, variant: str = "") -> str:
+        return hashlib.sha256(f"{variant}|{cache_url(url)}".encode()).hexdigest()
+
+    def _dir(self, name: str) -> str:
+        if not self._ready:
+            for sub in ("objects", "urls", "pins", "locks", "tmp"):
+                os.makedirs(os.path.join(self.root, sub), exist_ok=True)
+            self._ready = True
+        return os.path.join(self.root, name)
+
+    def _pinned(self, now: float, sha256: Optional[str] = None) -> set:
+        """Content hashes with an unexpired pin (only ``sha256``'s pins when given)."""
+        pinned = set()
+        for name in os.listdir(self._dir("pins")):
+            if sha256 is not None and not name.startswith(sha256 + "."):
+                continue
+            try:
+                if os.stat(os.path.join(self._dir("pins"), name)).st_mtime > now:
+                    pinned.add(name.split(".", 1)[0])
+            except FileNotFoundError:
+                pass
+        return pinned
+
+    def _lock_path(self, name: str) -> str:
+        return os.path.join(self._dir("locks"), f"{name}.lock")
+
+    @contextmanager
+    def _locked(self, name: str, blocking: bool = True) -> Iterator[bool]:
+        path = self._lock_path(name)
+        while True:
+            f = open(path, "a")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                f.close()
+                yield False
+                return
+            # Eviction may have removed the lock file while we waited: lock the current one
+            try:
+                if os.stat(path).st_ino == os.fstat(f.fileno()).st_ino:
+                    break
+            except FileNotFoundError:
+                pass
+            f.close()
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+            f.close()
+
+    def _pin(self, sha256: str, pin_seconds: Optional[float]) -> str:
+        name = f"{sha256}.{uuid.uuid4().hex}"
+        # Stamp the expiry before the pin appears, or eviction could take it for an expired one
+        tmp = os.path.join(self._dir("tmp"), f"{name}.pin")
+        with open(tmp, "w"):
+            pass
+        expires = time.time() + (self.pin_seconds if pin_seconds is None else pin_seconds)
+        os.utime(tmp, (expires, expires))
+        pin_path = os.path.join(self._dir("pins"), name)
+        os.replace(tmp, pin_path)
+        return pin_path
+
+    def _read_entry(self, key: str) -> Optional[Dict]:
+        try:
+            with open(os.path.join(self._dir("urls"), f"{key}.json")) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        path = os.path.join(self._dir("objects"), entry["sha256"] + entry.get("suffix", ""))
+        return {**entry, "path": path} if os.path.exists(path) else None
+
+    def _write_entry(self, key: str, entry: Dict) -> None:
+        tmp = os.path.join(self._dir("tmp"), f"{key}.{uuid.uuid4().hex}.json")
+        with open(tmp, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp, os.path.join(self._dir("urls"), f"{key}.json"))
+
+    def _hit(self, entry: Dict, pin_seconds: Optional[float]) -> Artifact:
+        # Pin before touching, so a concurrent eviction that already listed the object skips it
+        pin_path = self._pin(entry["sha256"], pin_seconds)
+        if not os.path.exists(entry["path"]):
+            os.remove(pin_path)
+            raise FileNotFoundError(entry["path"])
+        os.utime(entry["path"])
+        return Artifact(entry["path"], entry["sha256"], os.path.getsize(entry["path"]), pin_path)
+
+    def lookup(self, url: str, variant: str = "", pin_seconds: Optional[float] = None) -> Optional[Artifact]:
+        """The cached artifact for ``url`` (pinned), or None without downloading."""
+        entry = self._read_entry(self.url_key(url, variant))
+        if entry is None:
+            return None
+        try:
+            return self._hit(entry, pin_seconds)
+        except FileNotFoundError:
+            return None
+
+    def fetch(
+        self,
+        url: str,
+        fetch: Fetch = http_fetch,
+        variant: str = "",
+        suffix: str = ".mp4",
+        pin_seconds: Optional[float] = None,
+    ) -> Artifact:
+        """
+        The artifact for ``url``, downloading it with ``fetch(url, path)`` on a miss.
+        Concurrent callers for the same key wait for the first download. Downloads
+        that are not a video raise ``ValueError`` and are not cached.
+        """
+        key = self.url_key(url, variant)
+        with self._locked(key):
+            entry = self._read_entry(key)
+            if entry is not None:
+                try:
+                    return self._hit(entry, pin_seconds)
+                except FileNotFoundError:
+                    pass
+
+            tmp = os.path.join(self._dir("tmp"), f"{key}.{uuid.uuid4().hex}{suffix}")
+            try:
+                started = time.monotonic()
+                fetch(url, tmp)
+                size = os.path.getsize(tmp)
+                if size == 0:
+                    raise RuntimeError("Downloaded file is empty")
+                if not is_video_file(tmp):
+                    raise ValueError(f"Downloaded file is not a video: {url}")
+                sha256 = file_sha256(tmp)
+                pin_path = self._pin(sha256, pin_seconds)
+                path = os.path.join(self._dir("objects"), sha256 + suffix)
+                if os.path.exists(path):
+                    os.utime(path)  # Same bytes under another URL: keep one copy
+                else:
+                    os.replace(tmp, path)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            self._write_entry(key, {"sha256": sha256, "suffix": suffix, "url": cache_url(url), "variant": variant})
+            logger.info(f"Cached video {sha256[:12]} ({size / 1e6:.1f} MB in {time.monotonic() - started:.1f}s)")
+
+        self.evict()
+        return Artifact(path, sha256, size, pin_path)
+
+    def evict(self) -> int:
+        """Delete least recently used, unpinned objects until the cache fits ``max_bytes``; returns bytes freed."""
+        with self._locked("evict", blocking=False) as acquired:
+            if not acquired:
+                return 0  # Another process is already evicting
+            now = time.time()
+            for name in os.listdir(self._dir("pins")):
+                try:
+                    if os.stat(os.path.join(self._dir("pins"), name)).st_mtime <= now:
+                        os.remove(os.path.join(self._dir("pins"), name))
+                except FileNotFoundError:
+                    pass
+
+            pinned = self._pinned(now)
+            objects = []
+            for name in os.listdir(self._dir("objects")):
+                try:
+                    stat = os.stat(os.path.join(self._dir("objects"), name))
+                except FileNotFoundError:
+                    continue
+                objects.append((stat.st_mtime, stat.st_size, name))
+            total = sum(size for _, size, _ in objects)
+            freed = 0
+            for _, size, name in sorted(objects):
+                if total - freed <= self.max_bytes:
+                    break
+                sha256 = name.split(".", 1)[0]
+                # Re-check the victim: a reader may have pinned it since the listing
+                if sha256 in pinned or self._pinned(now, sha256):
+                    continue
+                try:
+                    os.remove(os.path.join(self._dir("objects"), name))
+                    freed += size
+                except FileNotFoundError:
+                    pass
+            if freed:
+                # URL entries of deleted objects are dropped lazily by _read_entry; prune them here too
+                for name in os.listdir(self._dir("urls")):
+                    if self._read_entry(name[: -len(".json")]) is None:
+                        try:
+                            os.remove(os.path.join(self._dir("urls"), name))
+                        except FileNotFoundError:
+                            pass
+                self._prune_locks()
+                logger.info(f"Evicted {freed / 1e6:.1f} MB from the video cache")
+            return freed
+
+    def _prune_locks(self) -> None:
+        """Remove lock files of keys without a URL entry (evicted or failed downloads), unless held."""
+        for name in os.listdir(self._dir("locks")):
+            key = name[: -len(".lock")]
+            if key == "evict" or os.path.exists(os.path.join(self._dir("urls"), f"{key}.json")):
+                continue
+            with self._locked(key, blocking=False) as acquired:
+                if acquired and not os.path.exists(os.path.join(self._dir("urls"), f"{key}.json")):
+                    try:
+                        os.remove(self._lock_path(key))
+                    except FileNotFoundError:
+                        pass
+
+
+video_artifacts = VideoArtifactCache()
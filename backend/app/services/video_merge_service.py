@@ -2,11 +2,12 @@ import os
 import logging
 import subprocess
 import tempfile
-import requests
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 from pathlib import Path
 
+from app.services.video_artifact_cache import http_fetch, video_artifacts
+
 logger = logging.getLogger(__name__)
 
 
@@ -39,25 +40,17 @@ class VideoMergeService:
         if len(video_urls) == 1:
             return {"success": False, "error": "Need at least 2 videos to merge"}
         
+        artifacts = []
         temp_files = []
         trimmed_files = []
         concat_file = None
         
         try:
-            # Download and optionally trim all videos
+            # Download (or reuse from the shared video cache) and optionally trim all videos
             logger.info(f"Downloading {len(video_urls)} videos for merging...")
             for idx, url in enumerate(video_urls):
-                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4')
-                temp_files.append(temp_file.name)
-                temp_file.close()
-                
-                # Download video
-                response = requests.get(url, stream=True, timeout=60)
-                response.raise_for_status()
-                
-                with open(temp_file.name, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
+                artifact = video_artifacts.fetch(url, lambda u, path: http_fetch(u, path, timeout=60))
+                artifacts.append(artifact)
                 
                 logger.info(f"Downloaded video {idx + 1}/{len(video_urls)}")
                 
@@ -70,10 +63,11 @@ class VideoMergeService:
                     if start_time > 0 or end_time:
                         trimmed_file = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4')
                         trimmed_files.append(trimmed_file.name)
+                        temp_files.append(trimmed_file.name)
                         trimmed_file.close()
                         
                         # Build ffmpeg trim command
-                        ffmpeg_cmd = ['ffmpeg', '-i', temp_file.name]
+                        ffmpeg_cmd = ['ffmpeg', '-i', artifact.path]
                         
                         if start_time > 0:
                             ffmpeg_cmd.extend(['-ss', str(start_time)])
@@ -95,13 +89,10 @@ class VideoMergeService:
                         if result.returncode != 0:
                             logger.error(f"FFmpeg trim error: {result.stderr}")
                             return {"success": False, "error": f"Failed to trim video {idx + 1}"}
-                        
-                        # Use trimmed file for concatenation
-                        temp_files[idx] = trimmed_file.name
                     else:
-                        trimmed_files.append(temp_file.name)
+                        trimmed_files.append(artifact.path)
                 else:
-                    trimmed_files.append(temp_file.name)
+                    trimmed_files.append(artifact.path)
             
             # Create concat file for ffmpeg using the final files (trimmed or original)
             concat_file = tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.txt')
@@ -172,7 +163,9 @@ class VideoMergeService:
             logger.error(f"Error merging videos: {str(e)}")
             return {"success": False, "error": str(e)}
         finally:
-            # Cleanup temp files
+            # Downloads stay in the video cache; unpin them and remove the trimmed copies
+            for artifact in artifacts:
+                artifact.release()
             for temp_file in temp_files:
                 try:
                     if os.path.exists(temp_file):
@@ -0,0 +1,120 @@
+import logging
+from typing import List
+
+from sqlalchemy import Text, cast, or_
+
+from app.celery_worker import celery_app
+from app.database import get_db
+from app.models import Ad
+from app.services.ad_card import refresh_ad_card
+from app.services.ad_columns import promoted_ad_columns
+from app.services.media_refresh_service import MediaRefreshService
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(bind=True, name="ads.backfill_promoted_columns")
+def backfill_promoted_ad_columns_task(self, batch_size: int = 1000, max_batches: int = None):
+    """
+    Fill the promoted ad columns (is_active, start/end_date, media_type, page_id,
+    cta_type, primary_media_url) from meta/creatives for rows written before them.
+
+    Walks ``ads.id`` in keyset order over rows with ``media_type IS NULL`` and
+    commits once per batch, so it can be stopped and re-run safely.
+    """
+    db = next(get_db())
+    try:
+        last_id = 0
+        updated = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            rows = (
+                db.query(Ad.id, Ad.meta, Ad.creatives)
+                .filter(Ad.id > last_id, Ad.media_type.is_(None))
+                .order_by(Ad.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            db.bulk_update_mappings(Ad, [
+                {"id": ad_id, **promoted_ad_columns(meta, creatives)}
+                for ad_id, meta, creatives in rows
+            ])
+            db.commit()
+            last_id = rows[-1].id
+            updated += len(rows)
+            batches += 1
+            self.update_state(state='PROGRESS', meta={"updated": updated, "last_id": last_id})
+
+        logger.info(f"Backfilled promoted columns for {updated} ads")
+        return {"updated": updated, "last_id": last_id}
+    except Exception as e:
+        logger.error(f"Error backfilling promoted ad columns: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, name="ads.backfill_cards")
+def backfill_ad_cards_task(self, batch_size: int = 500, rebuild_all: bool = False, max_batches: int = None):
+    """
+    Build the precomputed listing card (``ads.card``) for ads written before it
+    existed, or for every ad with ``rebuild_all`` after ``CARD_VERSION`` changes.
+
+    Keyset batches over ``ads.id``, one commit per batch; safe to stop and re-run.
+    """
+    db = next(get_db())
+    try:
+        last_id = 0
+        updated = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            query = db.query(Ad).filter(Ad.id > last_id)
+            if not rebuild_all:
+                # JSON 'null' too: cards cleared before the column stored None as SQL NULL
+                query = query.filter(or_(Ad.card.is_(None), cast(Ad.card, Text) == 'null'))
+            ads = query.order_by(Ad.id).limit(batch_size).all()
+            if not ads:
+                break
+            for ad in ads:
+                refresh_ad_card(ad)
+            db.commit()
+            last_id = ads[-1].id
+            updated += len(ads)
+            batches += 1
+            self.update_state(state='PROGRESS', meta={"updated": updated, "last_id": last_id})
+
+        logger.info(f"Built cards for {updated} ads")
+        return {"updated": updated, "last_id": last_id}
+    except Exception as e:
+        logger.error(f"Error backfilling ad cards: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, name="ads.refresh_media_bulk")
+def refresh_media_bulk_task(self, ad_ids: List[int]):
+    """
+    Refresh the media URLs of ``ad_ids`` from the Ad Library.
+
+    Progress (processed/successful/failed counts and a percentage) is published
+    as task state, so ``/tasks/{task_id}/status`` can be polled while it runs.
+    """
+    db = next(get_db())
+    try:
+        def report(progress):
+            self.update_state(state='PROGRESS', meta=progress)
+
+        result = MediaRefreshService(db).refresh_multiple_ads(ad_ids, progress_callback=report)
+        logger.info(f"Bulk media refresh: {result['successful']}/{result['total']} ads refreshed")
+        return result
+    except Exception as e:
+        logger.error(f"Error in bulk media refresh: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
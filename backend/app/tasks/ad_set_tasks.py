@@ -0,0 +1,29 @@
+import logging
+from typing import List
+
+from app.celery_worker import celery_app
+from app.database import get_db
+from app.services.enhanced_ad_extraction import EnhancedAdExtractionService
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(bind=True, name="ad_sets.refresh_signatures")
+def refresh_ad_set_signatures_task(self, ad_set_ids: List[int]):
+    """
+    Re-hash ``content_signature`` for AdSets whose best ad changed.
+
+    Deferred from ingestion so downloading and hashing the representative
+    media no longer blocks the request that added the variant.
+    """
+    db = next(get_db())
+    try:
+        service = EnhancedAdExtractionService(db)
+        refreshed = 0
+        for ad_set_id in ad_set_ids:
+            if service.refresh_content_signature(ad_set_id):
+                refreshed += 1
+        logger.info(f"Refreshed content_signature for {refreshed}/{len(ad_set_ids)} AdSets")
+        return {"requested": len(ad_set_ids), "refreshed": refreshed}
+    finally:
+        db.close()
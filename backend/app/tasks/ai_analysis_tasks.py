@@ -1,5 +1,6 @@
+import copy
 from celery import shared_task
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import logging
 from typing import Dict, Any, Optional
 from app.services.ai_service import get_ai_service
@@ -155,50 +156,161 @@ def ai_analysis_task(self, ad_id: int) -> Dict[str, Any]:
         if 'db' in locals():
             db.close()
 
-@shared_task
-def batch_ai_analysis_task(ad_id_list: list) -> Dict[str, Any]:
+@shared_task(bind=True)
+def batch_ai_analysis_task(
+    self,
+    ad_id_list: list = None,
+    competitor_id: int = None,
+    limit: int = None,
+    batch_id: str = None,
+) -> Dict[str, Any]:
     """
-    Batch AI analysis task for processing multiple ads at once.
-    
+    Analyze ads that have no current analysis, once per creative.
+
+    The first run selects the ads (``ad_id_list``, a competitor's, or all; ads
+    named in ``ad_id_list`` are re-analyzed even if they have an analysis),
+    collapses them by ad set and saved video content hash, and records the plan
+    in a ``TaskStatus`` row keyed by this task's id. Every run then collects
+    finished ``analyze_creative_group_task`` children, dispatches more up to
+    the Gemini key capacity, saves progress and re-schedules itself until the
+    batch is done, so no worker is held for the whole batch.
+
     Args:
-        ad_id_list: List of ad IDs to analyze
-        
+        ad_id_list: Restrict to these ad IDs (default: every unanalyzed ad)
+        competitor_id: Restrict to one competitor's ads
+        limit: Analyze at most this many creatives
+        batch_id: Set on follow-up runs: the batch's ``TaskStatus.task_id``
+
     Returns:
-        Dict with batch analysis results
+        Dict with the batch progress counters
     """
-    logger.info(f"Starting batch AI analysis for {len(ad_id_list)} ads")
-    
-    results = []
-    failed_ads = []
-    
-    # Import Celery app to get access to the task registry
-    from app.celery import celery
-    
-    for ad_id in ad_id_list:
+    from celery.result import AsyncResult
+    from sqlalchemy import func
+    from app.core.config import settings
+    from app.database import SessionLocal
+    from app.models.task_status import TaskStatus
+    from app.services.batch_analysis import advance_batch, key_capacity, plan_batch
+    from app.services.gemini_key_scheduler import GeminiKeyScheduler
+    from app.services.google_ai_service import GoogleAIService
+
+    db = SessionLocal()
+    try:
+        if batch_id is None:
+            batch_id = self.request.id
+            if ad_id_list is None:
+                # Unscoped runs (the beat entry) must not overlap a batch still in progress. A batch
+                # not updated for longer than a poll plus a task time limit lost its re-schedule
+                stale_before = datetime.now(timezone.utc) - timedelta(
+                    seconds=settings.BATCH_ANALYSIS_POLL_SECONDS + settings.CELERY_TASK_TIME_LIMIT
+                )
+                running = db.query(TaskStatus).filter(
+                    TaskStatus.status == 'running',
+                    func.coalesce(TaskStatus.updated_at, TaskStatus.created_at) >= stale_before,
+                ).all()
+                if any(isinstance(row.result, dict) and row.result.get('kind') == 'batch_analysis' for row in running):
+                    logger.info("A batch analysis is already running; skipping")
+                    return {"batch_id": batch_id, "status": "skipped", "reason": "batch already running"}
+            state = plan_batch(db, _extract_video_url_from_ad, ad_id_list, competitor_id, limit, reanalyze=ad_id_list is not None)
+            task_status = TaskStatus(task_id=batch_id, status='running', result=state)
+            db.add(task_status)
+            db.commit()
+            logger.info(
+                f"Batch analysis {batch_id}: {state['creatives']} creatives covering {state['total_ads']} ads "
+                f"({state['skipped_no_video']} ads without a video skipped)"
+            )
+        else:
+            task_status = db.query(TaskStatus).filter_by(task_id=batch_id).first()
+            if task_status is None:
+                raise ValueError(f"Batch {batch_id} not found")
+            # A deep copy: advance_batch mutates pending/running in place, and sharing them with the
+            # loaded value would make a dispatch-only run compare equal and skip the UPDATE
+            state = copy.deepcopy(task_status.result)
+
+        def dispatch(group):
+            return analyze_creative_group_task.delay(
+                group['representative_ad_id'], group['ad_ids'], reanalyze=state.get('reanalyze', False)
+            ).id
+
+        def poll(task_id):
+            child = AsyncResult(task_id)
+            if not child.ready():
+                return None
+            if child.successful():
+                return {"success": True, "result": child.result}
+            return {"success": False, "error": child.result}
+
         try:
-            # Dispatch individual analysis task using the Celery app
-            task_sig = celery.signature('app.tasks.ai_analysis_tasks.ai_analysis_task')
-            task = task_sig.delay(ad_id)
-            results.append({
-                "ad_id": ad_id,
-                "task_id": task.id,
-                "status": "dispatched"
-            })
+            scheduler = GeminiKeyScheduler(GoogleAIService().api_keys)
+            capacity = key_capacity(scheduler, settings.BATCH_ANALYSIS_PER_KEY_CONCURRENCY)
         except Exception as e:
-            logger.error(f"Failed to dispatch analysis for ad {ad_id}: {e}")
-            failed_ads.append({
-                "ad_id": ad_id,
-                "error": str(e)
-            })
-    
-    return {
-        "total_ads": len(ad_id_list),
-        "successful_dispatches": len(results),
-        "failed_dispatches": len(failed_ads),
-        "results": results,
-        "failures": failed_ads,
-        "timestamp": datetime.utcnow().isoformat()
-    }
+            logger.warning(f"Could not read Gemini key capacity, dispatching one creative at a time: {e}")
+            capacity = 1
+        state = advance_batch(state, dispatch, poll, capacity, stale_after=settings.CELERY_TASK_TIME_LIMIT + 300)
+
+        done = not state['pending'] and not state['running']
+        task_status.status = 'completed' if done else 'running'
+        task_status.result = state
+        task_status.updated_at = func.now()  # Even when nothing changed: the batch is alive
+        db.commit()
+
+        summary = {k: v for k, v in state.items() if k not in ('pending', 'running', 'failures')}
+        summary.update({"batch_id": batch_id, "in_flight": len(state['running']), "queued": len(state['pending'])})
+        if done:
+            logger.info(f"Batch analysis {batch_id} finished: {summary}")
+        else:
+            self.update_state(state='PROGRESS', meta=summary)
+            batch_ai_analysis_task.apply_async(kwargs={"batch_id": batch_id}, countdown=settings.BATCH_ANALYSIS_POLL_SECONDS)
+        return {**summary, "status": task_status.status, "timestamp": datetime.utcnow().isoformat()}
+    finally:
+        db.close()
+
+
+@shared_task(bind=True)
+def analyze_creative_group_task(self, representative_ad_id: int, ad_ids: list, generate_prompts: bool = True, reanalyze: bool = False) -> Dict[str, Any]:
+    """
+    Analyze one creative through its representative ad and fan the result out
+    to the group's other ads that still lack a current analysis (to all of them
+    with ``reanalyze``, which also skips reusing an existing analysis).
+    """
+    logger.info(f"Analyzing creative of ad {representative_ad_id} for {len(ad_ids)} ads (task: {self.request.id})")
+    from app.database import SessionLocal
+    from app.models import Ad
+    from app.models.ad_analysis import AdAnalysis
+    from app.services.google_ai_service import GoogleAIService
+
+    db = SessionLocal()
+    try:
+        ad = db.query(Ad).filter(Ad.id == representative_ad_id).first()
+        if not ad:
+            raise ValueError(f"Ad with ID {representative_ad_id} not found")
+
+        existing = db.query(AdAnalysis).filter(
+            AdAnalysis.ad_id == representative_ad_id,
+            AdAnalysis.is_current == 1
+        ).first()
+        if existing and existing.raw_ai_response and not reanalyze:
+            # Analyzed since the batch was planned: share that instead of calling Gemini again
+            analysis_result, video_url = existing.raw_ai_response, existing.used_video_url
+        else:
+            video_url = _extract_video_url_from_ad(ad)
+            if not video_url:
+                raise ValueError(f"No video URL found for ad {representative_ad_id}")
+            analysis_result = GoogleAIService().generate_transcript_and_analysis(
+                video_url=video_url,
+                generate_prompts=generate_prompts
+            )
+            _store_current_analysis(db, representative_ad_id, analysis_result, video_url)
+            db.commit()
+
+        applied = _apply_analysis_to_ads(
+            db, [ad_id for ad_id in ad_ids if ad_id != representative_ad_id], analysis_result, video_url, replace=reanalyze
+        )
+        return {
+            "representative_ad_id": representative_ad_id,
+            "applied_to_ads": [representative_ad_id] + applied,
+        }
+    finally:
+        db.close()
 
 @shared_task(bind=True)
 def analyze_ad_video_task(self, ad_id: int, video_url: str, custom_instruction: str = None, instagram_url: str = None, generate_prompts: bool = True) -> Dict[str, Any]:
@@ -217,13 +329,11 @@ def analyze_ad_video_task(self, ad_id: int, video_url: str, custom_instruction:
     task_id = self.request.id
     logger.info(f"Starting video analysis task {task_id} for ad {ad_id}")
     
-    import tempfile
-    import os
-    import requests as httpx
     import subprocess
     import time
     import json as _json
     from app.services.google_ai_service import GoogleAIService
+    from app.services.video_artifact_cache import http_fetch, video_artifacts
     from app.models.dto.ad_dto import AnalyzeVideoResponse
     
     try:
@@ -296,55 +406,48 @@ def analyze_ad_video_task(self, ad_id: int, video_url: str, custom_instruction:
             except Exception as e:
                 logger.warning(f"OpenRouter primary (custom) failed, will download and use Gemini fallback: {e}")
 
-        # Download video to temp file
-        tmp_path = None
+        # Download video into the shared video cache (reused by other analyses, merges and hashing)
+        artifact = None
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp:
-                tmp_path = tmp.name
-            
             # Check if it's an Instagram URL - use yt-dlp to get video with audio
             is_instagram = 'instagram.com' in video_url or 'cdninstagram.com' in video_url or 'fbcdn.net' in video_url
             logger.info(f"Is Instagram URL: {is_instagram}")
             if is_instagram:
                 logger.info(f"Detected Instagram URL, using yt-dlp to download with audio")
-                
-                # Use yt-dlp to download with audio merged in Gemini-compatible format
-                start_download = time.time()
-                # For Instagram, we need to explicitly merge video+audio since they're separate streams
-                cmd = [
-                    'yt-dlp',
-                    '-f', 'bestvideo+bestaudio/best',  # Merge best video + best audio
-                    '--merge-output-format', 'mp4',  # Output as MP4
-                    '--no-cache-dir',  # Don't use cache
-                    '--force-overwrites',  # Force fresh download
-                    '-o', tmp_path,
-                    '--no-playlist',
-                    '--verbose',  # Verbose output to see what's happening
-                    video_url if 'instagram.com/p/' in video_url else (instagram_url or video_url)
-                ]
-                logger.info(f"Starting yt-dlp download...")
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
-                download_time = time.time() - start_download
-                
-                if result.returncode != 0:
-                    logger.error(f"yt-dlp failed: {result.stderr}")
-                    # Fallback to direct download if yt-dlp fails
-                    logger.info("yt-dlp failed, falling back to direct download")
-                    response = httpx.get(video_url, stream=True, timeout=60)
-                    response.raise_for_status()
-                    with open(tmp_path, 'wb') as f:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            f.write(chunk)
-                else:
-                    logger.info(f"yt-dlp download successful in {download_time:.2f}s")
+
+                def fetch_with_audio(url, path):
+                    # Use yt-dlp to download with audio merged in Gemini-compatible format
+                    start_download = time.time()
+                    # For Instagram, we need to explicitly merge video+audio since they're separate streams
+                    cmd = [
+                        'yt-dlp',
+                        '-f', 'bestvideo+bestaudio/best',  # Merge best video + best audio
+                        '--merge-output-format', 'mp4',  # Output as MP4
+                        '--no-cache-dir',  # Don't use cache
+                        '--force-overwrites',  # Force fresh download
+                        '-o', path,
+                        '--no-playlist',
+                        '--verbose',  # Verbose output to see what's happening
+                        url if 'instagram.com/p/' in url else (instagram_url or url)
+                    ]
+                    logger.info(f"Starting yt-dlp download...")
+                    result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+                    download_time = time.time() - start_download
+
+                    if result.returncode != 0:
+                        logger.error(f"yt-dlp failed: {result.stderr}")
+                        # Fallback to direct download if yt-dlp fails
+                        logger.info("yt-dlp failed, falling back to direct download")
+                        http_fetch(url, path, timeout=60)
+                    else:
+                        logger.info(f"yt-dlp download successful in {download_time:.2f}s")
+
+                artifact = video_artifacts.fetch(video_url, fetch_with_audio, variant="yt-dlp")
             else:
                 # Direct download for non-Instagram URLs
                 logger.info(f"Downloading video from {video_url}")
-                response = httpx.get(video_url, stream=True, timeout=60)
-                response.raise_for_status()
-                with open(tmp_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
+                artifact = video_artifacts.fetch(video_url, lambda url, path: http_fetch(url, path, timeout=60))
+            tmp_path = artifact.path
             
             # Initialize AI service
             ai = GoogleAIService()
@@ -357,11 +460,8 @@ def analyze_ad_video_task(self, ad_id: int, video_url: str, custom_instruction:
                 generate_prompts=generate_prompts,
             )
             
-            # Clean up temp file
-            try:
-                os.unlink(tmp_path)
-            except Exception as e:
-                logger.warning(f"Failed to delete temp file {tmp_path}: {e}")
+            # The cached file stays for other tasks; only this task's pin is dropped
+            artifact.release()
                 
             # Persist analysis to AdAnalysis with versioning
             from app.database import SessionLocal
@@ -413,11 +513,8 @@ def analyze_ad_video_task(self, ad_id: int, video_url: str, custom_instruction:
             
         except Exception as e:
             logger.error(f"Error processing video: {str(e)}")
-            if tmp_path and os.path.exists(tmp_path):
-                try:
-                    os.unlink(tmp_path)
-                except:
-                    pass
+            if artifact:
+                artifact.release()
             raise e
             
     except Exception as exc:
@@ -506,44 +603,16 @@ def unified_analysis_task(
             custom_instruction=custom_instruction
         )
         
-        # Store analysis with versioning
-        current_analysis = db.query(AdAnalysis).filter(
-            AdAnalysis.ad_id == ad_id,
-            AdAnalysis.is_current == 1
-        ).first()
-        
-        if current_analysis:
-            # Archive current analysis
-            current_analysis.is_current = 0
-            version_number = current_analysis.version_number + 1
-            logger.info(f"Archived analysis version {current_analysis.version_number} for ad {ad_id}")
-        else:
-            version_number = 1
-        
         # Add custom instruction to analysis result if provided
         if custom_instruction:
             analysis_result['custom_instruction'] = custom_instruction
         
-        # Create new analysis record
-        new_analysis = AdAnalysis(
-            ad_id=ad_id,
-            raw_ai_response=analysis_result,
-            used_video_url=video_url,
-            is_current=1,
-            version_number=version_number,
-            summary=analysis_result.get('summary'),
-            hook_score=analysis_result.get('hook_score'),
-            overall_score=analysis_result.get('overall_score'),
-            target_audience=analysis_result.get('target_audience'),
-            content_themes=analysis_result.get('content_themes'),
-            analysis_version="unified_v1.0"
-        )
-        
-        db.add(new_analysis)
+        # Store analysis with versioning
+        new_analysis = _store_current_analysis(db, ad_id, analysis_result, video_url)
         db.commit()
         db.refresh(new_analysis)
         
-        logger.info(f"Created analysis version {version_number} for ad {ad_id}")
+        logger.info(f"Created analysis version {new_analysis.version_number} for ad {ad_id}")
         
         # Apply analysis to ad set if applicable
         if ad.ad_set_id:
@@ -768,53 +837,114 @@ def _extract_video_url_from_ad(ad) -> Optional[str]:
         return None
 
 
+def _store_current_analysis(db, ad_id: int, analysis_result: Dict[str, Any], video_url: str):
+    """Add ``analysis_result`` as the ad's current analysis, archiving the previous one."""
+    from app.models.ad_analysis import AdAnalysis
+
+    current_analysis = db.query(AdAnalysis).filter(
+        AdAnalysis.ad_id == ad_id,
+        AdAnalysis.is_current == 1
+    ).first()
+    if current_analysis:
+        current_analysis.is_current = 0
+        version_number = current_analysis.version_number + 1
+        logger.info(f"Archived analysis version {current_analysis.version_number} for ad {ad_id}")
+    else:
+        version_number = 1
+
+    new_analysis = AdAnalysis(
+        ad_id=ad_id,
+        raw_ai_response=analysis_result.copy(),  # Copy to avoid reference issues
+        used_video_url=video_url,
+        is_current=1,
+        version_number=version_number,
+        summary=analysis_result.get('summary'),
+        hook_score=analysis_result.get('hook_score'),
+        overall_score=analysis_result.get('overall_score'),
+        target_audience=analysis_result.get('target_audience'),
+        content_themes=analysis_result.get('content_themes'),
+        analysis_version="unified_v1.0"
+    )
+    db.add(new_analysis)
+    return new_analysis
+
+
+def _apply_analysis_to_ads(db, ad_ids: list, analysis_result: Dict[str, Any], video_url: str, replace: bool = False) -> list:
+    """
+    Store the same analysis for each of ``ad_ids`` that has no current analysis
+    (for all of them with ``replace``); returns those ids.
+    """
+    from app.models.ad_analysis import AdAnalysis
+
+    if not ad_ids:
+        return []
+    analyzed = set() if replace else {
+        ad_id for (ad_id,) in db.query(AdAnalysis.ad_id).filter(
+            AdAnalysis.ad_id.in_(ad_ids),
+            AdAnalysis.is_current == 1
+        )
+    }
+    applied = []
+    for ad_id in ad_ids:
+        if ad_id in analyzed:
+            continue  # Skip if already has analysis
+        try:
+            _store_current_analysis(db, ad_id, analysis_result, video_url)
+            applied.append(ad_id)
+        except Exception as e:
+            logger.error(f"Error applying analysis to ad {ad_id}: {str(e)}")
+    db.commit()
+    if applied:
+        logger.info(f"Applied shared analysis to {len(applied)} ads")
+    return applied
+
+
 def _apply_analysis_to_ad_set(db, ad_set_id: int, analysis_result: Dict[str, Any], video_url: str, exclude_ad_id: int = None):
     """Apply the same analysis to all ads in an ad set (for duplicates)."""
     try:
         from app.models import Ad
-        from app.models.ad_analysis import AdAnalysis
         
         # Get all ads in the ad set
-        query = db.query(Ad).filter(Ad.ad_set_id == ad_set_id)
+        query = db.query(Ad.id).filter(Ad.ad_set_id == ad_set_id)
         if exclude_ad_id:
             query = query.filter(Ad.id != exclude_ad_id)
         
-        ads_in_set = query.all()
-        
-        for ad in ads_in_set:
-            # Check if this ad already has current analysis
-            existing = db.query(AdAnalysis).filter(
-                AdAnalysis.ad_id == ad.id,
-                AdAnalysis.is_current == 1
-            ).first()
-            
-            if existing:
-                continue  # Skip if already has analysis
-            
-            # Store the same analysis for this ad
-            try:
-                new_analysis = AdAnalysis(
-                    ad_id=ad.id,
-                    raw_ai_response=analysis_result.copy(),  # Copy to avoid reference issues
-                    used_video_url=video_url,
-                    is_current=1,
-                    version_number=1,
-                    summary=analysis_result.get('summary'),
-                    hook_score=analysis_result.get('hook_score'),
-                    overall_score=analysis_result.get('overall_score'),
-                    target_audience=analysis_result.get('target_audience'),
-                    content_themes=analysis_result.get('content_themes'),
-                    analysis_version="unified_v1.0"
-                )
-                
-                db.add(new_analysis)
-                logger.info(f"Applied shared analysis to ad {ad.id} in set {ad_set_id}")
-                
-            except Exception as e:
-                logger.error(f"Error applying analysis to ad {ad.id}: {str(e)}")
-                continue
-        
-        db.commit()
+        _apply_analysis_to_ads(db, [ad_id for (ad_id,) in query], analysis_result, video_url)
         
     except Exception as e:
-        logger.error(f"Error applying analysis to ad set {ad_set_id}: {str(e)}")
\ No newline at end of file
+        logger.error(f"Error applying analysis to ad set {ad_set_id}: {str(e)}")
+
+@shared_task(bind=True)
+def extend_hot_gemini_caches_task(self) -> Dict[str, Any]:
+    """
+    Extend the TTL of explicit Gemini caches that are hit often and about to
+    expire, so analyses of duplicate creatives keep hitting them.
+    """
+    from app.services.gemini_assets import GeminiAssetRegistry
+    from app.services.google_ai_service import GoogleAIService
+
+    ai = GoogleAIService()
+    extended = GeminiAssetRegistry().extend_hot_caches(
+        ai.extend_cache_with_key,
+        ttl_seconds=ai._get_cache_ttl_seconds(),
+        key_count=len(ai.api_keys),
+    )
+    logger.info(f"Extended {extended} hot Gemini caches")
+    return {"extended": extended}
+
+
+@shared_task(bind=True)
+def compact_api_usage_task(self) -> Dict[str, Any]:
+    """
+    Drop raw ApiUsage rows and hourly usage rollups past their retention; the
+    dashboards read the daily and all-time rollups, which are kept.
+    """
+    from app.core.config import settings
+    from app.database import SessionLocal
+    from app.services.usage_rollups import compact_usage
+
+    db = SessionLocal()
+    try:
+        return compact_usage(db, settings.USAGE_RAW_RETENTION_DAYS, settings.USAGE_HOURLY_RETENTION_DAYS)
+    finally:
+        db.close()
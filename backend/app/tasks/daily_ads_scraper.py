@@ -1,18 +1,79 @@
-from celery import current_task
+from celery import chord, current_task
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
-from datetime import datetime, timedelta
+from sqlalchemy import and_
+from datetime import datetime, timezone
 import logging
 from typing import Dict, List, Optional
 
 from app.celery_worker import celery_app
 from app.database import get_db
 from app.models.competitor import Competitor
-from app.models.ad import Ad
 from app.services.facebook_ads_scraper import FacebookAdsScraperService, FacebookAdsScraperConfig
+from app.services.scrape_scheduler import aggregate_scrape_results, plan_scrape_jobs
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_COUNTRIES = ['AE', 'US', 'UK']
+
+
+def _competitor_scraper_config(
+    competitor: Competitor,
+    countries: Optional[List[str]],
+    max_pages: int,
+    delay_between_requests: int,
+    active_status: str,
+) -> FacebookAdsScraperConfig:
+    return FacebookAdsScraperConfig(
+        view_all_page_id=competitor.page_id,
+        countries=countries or DEFAULT_COUNTRIES,
+        max_pages=max_pages,
+        delay_between_requests=delay_between_requests,
+        search_type='page',
+        active_status=active_status,
+        ad_type='ALL',
+        media_type='all',
+        save_json=False
+    )
+
+
+def _schedule_competitor_scrapes(
+    task,
+    competitors: List[Competitor],
+    countries: Optional[List[str]],
+    max_pages_per_competitor: int,
+    delay_between_requests: int,
+    hours_lookback: int,
+    min_duration_days: Optional[int],
+    active_status: str,
+):
+    """
+    Replace ``task`` with a chord: one scrape job per competitor x country, in
+    priority order, and an aggregation callback that becomes ``task``'s result.
+
+    Jobs run on any free worker; the shared Ad Library token bucket in the fetch
+    engine keeps their combined request rate under Facebook's throttling limit.
+    """
+    jobs = plan_scrape_jobs(competitors, countries or DEFAULT_COUNTRIES)
+    logger.info(f"Scheduling {len(jobs)} scrape jobs for {len(competitors)} competitors")
+    header = [
+        scrape_competitor_country_task.s(
+            job["competitor_id"],
+            job["country"],
+            max_pages=max_pages_per_competitor,
+            delay_between_requests=delay_between_requests,
+            active_status=active_status,
+            min_duration_days=min_duration_days,
+        )
+        for job in jobs
+    ]
+    run_info = {
+        "task_id": task.request.id,
+        "start_time": datetime.utcnow().isoformat(),
+        "jobs_scheduled": len(jobs),
+        "hours_lookback": hours_lookback,
+    }
+    return task.replace(chord(header, aggregate_scrape_results_task.s(run_info)))
+
 
 @celery_app.task(bind=True, name="daily_ads_scraper.scrape_new_ads_daily")
 def scrape_new_ads_daily_task(
@@ -26,7 +87,10 @@ def scrape_new_ads_daily_task(
 ):
     """
     Daily task to scrape new ads from all active competitors.
-    
+
+    Fans out one job per competitor x country (see _schedule_competitor_scrapes);
+    the task id resolves to the aggregated results once every job has finished.
+
     Args:
         countries: List of country codes to search in
         max_pages_per_competitor: Maximum number of pages to scrape per competitor
@@ -58,118 +122,6 @@ def scrape_new_ads_daily_task(
             }
 
         logger.info(f"Found {len(active_competitors)} active competitors to process")
-
-        results = {
-            "task_id": task_id,
-            "start_time": datetime.utcnow().isoformat(),
-            "competitors_processed": 0,
-            "total_new_ads": 0,
-            "total_processed_ads": 0,
-            "competitors_results": [],
-            "errors": [],
-            "new_ad_archive_ids": []  # Collect all new ad archive IDs
-        }
-
-        # Process each competitor
-        for competitor in active_competitors:
-            try:
-                logger.info(f"Processing competitor: {competitor.name} (Page ID: {competitor.page_id})")
-
-                # Get the latest ad date for this competitor to filter for new ads only
-                latest_ad = db.query(Ad).filter(
-                    Ad.competitor_id == competitor.id
-                ).order_by(Ad.created_at.desc()).first()
-
-                # Calculate start date for new ads (either latest ad date or N hours ago)
-                if latest_ad:
-                    start_date = latest_ad.created_at
-                    logger.info(f"Latest ad for {competitor.name} was on {start_date}")
-                else:
-                    start_date = datetime.utcnow() - timedelta(hours=hours_lookback)
-                    logger.info(f"No previous ads for {competitor.name}, looking back {hours_lookback} hours")
-
-                # Create scraper configuration for this competitor
-                scraper = FacebookAdsScraperService(db, min_duration_days)
-                scraper_config = FacebookAdsScraperConfig(
-                    view_all_page_id=competitor.page_id,
-                    countries=countries or ['AE', 'US', 'UK'],  # Default countries
-                    max_pages=max_pages_per_competitor,
-                    delay_between_requests=delay_between_requests,
-                    search_type='page',
-                    active_status=active_status,
-                    ad_type='ALL',
-                    media_type='all',
-                    save_json=False
-                )
-
-                # Scrape ads for this competitor
-                all_ads_data, all_json_responses, enhanced_data, stats = scraper.scrape_ads(scraper_config)
-
-                # Filter for truly new ads based on creation date
-                if enhanced_data and 'campaigns' in enhanced_data:
-                    new_ads_count = 0
-                    for campaign in enhanced_data['campaigns']:
-                        for ad in campaign.get('ads', []):
-                            # Check if this ad is actually new
-                            ad_archive_id = ad.get('ad_archive_id')
-                            if ad_archive_id:
-                                existing_ad = db.query(Ad).filter(
-                                    Ad.ad_archive_id == ad_archive_id
-                                ).first()
-                                if not existing_ad:
-                                    new_ads_count += 1
-
-                    stats['new_ads_count'] = new_ads_count
-                else:
-                    stats['new_ads_count'] = 0
-
-                competitor_result = {
-                    "competitor_id": competitor.id,
-                    "competitor_name": competitor.name,
-                    "page_id": competitor.page_id,
-                    "stats": stats,
-                    "processed_at": datetime.utcnow().isoformat()
-                }
-
-                results["competitors_results"].append(competitor_result)
-                results["competitors_processed"] += 1
-                results["total_new_ads"] += stats.get('new_ads_count', 0)
-                results["total_processed_ads"] += stats.get('total_processed', 0)
-
-                logger.info(f"Completed {competitor.name}: {stats.get('new_ads_count', 0)} new ads found")
-
-            except Exception as e:
-                error_msg = f"Error processing competitor {competitor.name}: {str(e)}"
-                logger.error(error_msg)
-                results["errors"].append({
-                    "competitor_id": competitor.id,
-                    "competitor_name": competitor.name,
-                    "error": error_msg
-                })
-
-        # Finalize results
-        results["end_time"] = datetime.utcnow().isoformat()
-        results["status"] = "completed"
-        
-        # Format result to match frontend expectations (similar to single competitor scraping)
-        results["success"] = True
-        results["competitor_page_id"] = "multiple"
-        results["total_ads_scraped"] = results["total_processed_ads"]
-        results["completion_time"] = results["end_time"]
-        results["database_stats"] = {
-            "total_processed": results["total_processed_ads"],
-            "created": results["total_new_ads"],
-            "updated": 0,  # Can be calculated if needed
-            "errors": len(results["errors"]),
-            "competitors_created": 0,
-            "competitors_updated": results["competitors_processed"]
-        }
-        
-        logger.info(f"Daily ads scraping completed. Processed {results['competitors_processed']} competitors, "
-                   f"found {results['total_new_ads']} new ads total")
-
-        return results
-
     except Exception as e:
         logger.error(f"Error in daily ads scraping task: {str(e)}")
         return {
@@ -181,6 +133,11 @@ def scrape_new_ads_daily_task(
     finally:
         db.close()
 
+    return _schedule_competitor_scrapes(
+        self, active_competitors, countries, max_pages_per_competitor,
+        delay_between_requests, hours_lookback, min_duration_days, active_status
+    )
+
 
 @celery_app.task(bind=True, name="daily_ads_scraper.scrape_specific_competitors")
 def scrape_specific_competitors_task(
@@ -195,7 +152,9 @@ def scrape_specific_competitors_task(
 ):
     """
     Task to scrape new ads from specific competitors.
-    
+
+    Scheduled the same way as the daily task (one job per competitor x country).
+
     Args:
         competitor_ids: List of competitor IDs to scrape
         countries: List of country codes to search in
@@ -231,116 +190,6 @@ def scrape_specific_competitors_task(
             }
 
         logger.info(f"Found {len(competitors)} competitors to process")
-
-        results = {
-            "task_id": task_id,
-            "start_time": datetime.utcnow().isoformat(),
-            "competitors_processed": 0,
-            "total_new_ads": 0,
-            "total_processed_ads": 0,
-            "competitors_results": [],
-            "errors": []
-        }
-
-        # Process each competitor (using same logic as daily task)
-        for competitor in competitors:
-            try:
-                logger.info(f"Processing competitor: {competitor.name} (Page ID: {competitor.page_id})")
-
-                # Get the latest ad date for this competitor to filter for new ads only
-                latest_ad = db.query(Ad).filter(
-                    Ad.competitor_id == competitor.id
-                ).order_by(Ad.created_at.desc()).first()
-
-                # Calculate start date for new ads (either latest ad date or N hours ago)
-                if latest_ad:
-                    start_date = latest_ad.created_at
-                    logger.info(f"Latest ad for {competitor.name} was on {start_date}")
-                else:
-                    start_date = datetime.utcnow() - timedelta(hours=hours_lookback)
-                    logger.info(f"No previous ads for {competitor.name}, looking back {hours_lookback} hours")
-
-                # Create scraper configuration for this competitor
-                scraper = FacebookAdsScraperService(db, min_duration_days)
-                scraper_config = FacebookAdsScraperConfig(
-                    view_all_page_id=competitor.page_id,
-                    countries=countries or ['AE', 'US', 'UK'],
-                    max_pages=max_pages_per_competitor,
-                    delay_between_requests=delay_between_requests,
-                    search_type='page',
-                    active_status=active_status,
-                    ad_type='ALL',
-                    media_type='all',
-                    save_json=False
-                )
-
-                # Scrape ads for this competitor
-                all_ads_data, all_json_responses, enhanced_data, stats = scraper.scrape_ads(scraper_config)
-
-                # Filter for truly new ads based on creation date
-                if enhanced_data and 'campaigns' in enhanced_data:
-                    new_ads_count = 0
-                    for campaign in enhanced_data['campaigns']:
-                        for ad in campaign.get('ads', []):
-                            # Check if this ad is actually new
-                            ad_archive_id = ad.get('ad_archive_id')
-                            if ad_archive_id:
-                                existing_ad = db.query(Ad).filter(
-                                    Ad.ad_archive_id == ad_archive_id
-                                ).first()
-                                if not existing_ad:
-                                    new_ads_count += 1
-
-                    stats['new_ads_count'] = new_ads_count
-                else:
-                    stats['new_ads_count'] = 0
-
-                competitor_result = {
-                    "competitor_id": competitor.id,
-                    "competitor_name": competitor.name,
-                    "page_id": competitor.page_id,
-                    "stats": stats,
-                    "processed_at": datetime.utcnow().isoformat()
-                }
-
-                results["competitors_results"].append(competitor_result)
-                results["competitors_processed"] += 1
-                results["total_new_ads"] += stats.get('new_ads_count', 0)
-                results["total_processed_ads"] += stats.get('total_processed', 0)
-
-                logger.info(f"Completed {competitor.name}: {stats.get('new_ads_count', 0)} new ads found")
-
-            except Exception as e:
-                error_msg = f"Error processing competitor {competitor.name}: {str(e)}"
-                logger.error(error_msg)
-                results["errors"].append({
-                    "competitor_id": competitor.id,
-                    "competitor_name": competitor.name,
-                    "error": error_msg
-                })
-
-        # Finalize results
-        results["end_time"] = datetime.utcnow().isoformat()
-        results["status"] = "completed"
-        
-        # Format result to match frontend expectations
-        results["success"] = True
-        results["competitor_page_id"] = "multiple" if len(competitors) > 1 else competitors[0].page_id if competitors else "unknown"
-        results["total_ads_scraped"] = results["total_processed_ads"]
-        results["completion_time"] = results["end_time"]
-        results["database_stats"] = {
-            "total_processed": results["total_processed_ads"],
-            "created": results["total_new_ads"],
-            "updated": 0,
-            "errors": len(results["errors"]),
-            "competitors_created": 0,
-            "competitors_updated": results["competitors_processed"]
-        }
-        
-        logger.info(f"Specific competitors scraping completed. Processed {results['competitors_processed']} competitors")
-
-        return results
-
     except Exception as e:
         logger.error(f"Error in specific competitors scraping task: {str(e)}")
         return {
@@ -350,4 +199,108 @@ def scrape_specific_competitors_task(
             "end_time": datetime.utcnow().isoformat()
         }
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+    return _schedule_competitor_scrapes(
+        self, competitors, countries, max_pages_per_competitor,
+        delay_between_requests, hours_lookback, min_duration_days, active_status
+    )
+
+
+@celery_app.task(bind=True, name="daily_ads_scraper.scrape_competitor_country")
+def scrape_competitor_country_task(
+    self,
+    competitor_id: int,
+    country: str,
+    max_pages: int = 3,
+    delay_between_requests: int = 2,
+    active_status: str = "active",
+    min_duration_days: int = None
+) -> Dict:
+    """
+    Scrape one competitor in one country (a job of the scheduled chord).
+
+    Incremental: stops at the first page of already stored ads (see ScrapeCheckpoint).
+
+    Never raises: failures are returned as ``{"error": ...}`` so one bad job does
+    not cancel the chord callback for every other competitor.
+    """
+    db = next(get_db())
+    try:
+        competitor = db.query(Competitor).filter(Competitor.id == competitor_id).first()
+        if not competitor:
+            return {"competitor_id": competitor_id, "country": country, "error": "Competitor not found"}
+
+        logger.info(f"Processing competitor: {competitor.name} (Page ID: {competitor.page_id}) in {country}")
+        scraper = FacebookAdsScraperService(db, min_duration_days)
+        scraper_config = _competitor_scraper_config(
+            competitor, [country], max_pages, delay_between_requests, active_status
+        )
+        all_ads_data, all_json_responses, enhanced_data, stats = scraper.scrape_ads(scraper_config, incremental=True)
+
+        logger.info(f"Completed {competitor.name} in {country}: {stats.get('created', 0)} new ads found")
+        return {
+            "competitor_id": competitor.id,
+            "competitor_name": competitor.name,
+            "page_id": competitor.page_id,
+            "country": country,
+            "stats": stats,
+            "processed_at": datetime.utcnow().isoformat()
+        }
+    except Exception as e:
+        db.rollback()
+        error_msg = f"Error processing competitor {competitor_id} in {country}: {str(e)}"
+        logger.error(error_msg)
+        return {"competitor_id": competitor_id, "country": country, "error": error_msg}
+    finally:
+        db.close()
+
+
+def _record_scrape_outcomes(db: Session, competitors_results: List[Dict]) -> None:
+    """Store when each competitor was scraped and how many new ads it yielded (next run's priority)."""
+    now = datetime.now(timezone.utc)
+    yields = {entry["competitor_id"]: entry["stats"].get("new_ads_count", 0) for entry in competitors_results}
+    if not yields:
+        return
+    for competitor in db.query(Competitor).filter(Competitor.id.in_(yields)).all():
+        competitor.last_scraped_at = now
+        competitor.last_scrape_yield = yields[competitor.id]
+    db.commit()
+
+
+@celery_app.task(bind=True, name="daily_ads_scraper.aggregate_scrape_results")
+def aggregate_scrape_results_task(self, job_results: List[Dict], run_info: Dict) -> Dict:
+    """Chord callback: merge the job results into the run summary the frontend polls for."""
+    results = {**run_info, **aggregate_scrape_results(job_results)}
+
+    db = next(get_db())
+    try:
+        _record_scrape_outcomes(db, results["competitors_results"])
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Could not record competitor scrape outcomes: {e}")
+    finally:
+        db.close()
+
+    # Finalize results
+    results["end_time"] = datetime.utcnow().isoformat()
+    results["status"] = "completed"
+
+    # Format result to match frontend expectations (similar to single competitor scraping)
+    competitors_results = results["competitors_results"]
+    results["success"] = True
+    results["competitor_page_id"] = competitors_results[0]["page_id"] if len(competitors_results) == 1 else "multiple"
+    results["total_ads_scraped"] = results["total_processed_ads"]
+    results["completion_time"] = results["end_time"]
+    results["database_stats"] = {
+        "total_processed": results["total_processed_ads"],
+        "created": results["total_new_ads"],
+        "updated": sum(entry["stats"].get("updated", 0) for entry in competitors_results),
+        "errors": len(results["errors"]),
+        "competitors_created": 0,
+        "competitors_updated": results["competitors_processed"]
+    }
+
+    logger.info(f"Scheduled ads scraping completed. Processed {results['competitors_processed']} competitors, "
+               f"found {results['total_new_ads']} new ads total")
+    return results
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Build the full-text search columns (search_text / search_vector) for existing ads.
+
+Only ads without a search vector are processed unless --all is given.
+
+Usage:
+    python backfill_ad_search.py [--all] [--batch-size N]
+"""
+
+import argparse
+import time
+
+from app.database import SessionLocal
+from app.services.ad_search import backfill_search_columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--all", action="store_true", help="re-index every ad, not only missing ones")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    print("🔍 Backfilling ad search index")
+    print("-" * 50)
+    db = SessionLocal()
+    started = time.time()
+    try:
+        updated = backfill_search_columns(db, batch_size=args.batch_size, only_missing=not args.all)
+    finally:
+        db.close()
+    print(f"✅ Indexed {updated} ads in {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Load test: /ads latency while an Ad Library search is running.
+
+The synthetic run serves a small app with uvicorn: a cheap ``/ads`` route and a
+search route whose blocking work (a sleep standing in for the scraper, hashing
+and DB writes) runs either directly on the event loop or on an offload lane. It
+probes ``/ads`` during each search and prints p50/p99 per mode.
+
+The live run does the same against a running API: ``/api/v1/ads`` is probed
+while ``/api/v1/ads/library/search`` runs with the given keyword.
+
+Usage:
+    python benchmark_event_loop.py [search_seconds] [concurrent_searches]
+    python benchmark_event_loop.py --live http://localhost:8000 "real estate" [max_pages]
+"""
+
+import socket
+import statistics
+import sys
+import threading
+import time
+from typing import Callable, Dict, List
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+from app.services.offload import OffloadLane
+
+PROBE_INTERVAL = 0.02
+
+
+def build_app(search_seconds: float, lane: OffloadLane) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ads")
+    async def ads():
+        return {"data": [{"id": i} for i in range(20)]}
+
+    @app.post("/search/blocking")
+    async def search_blocking():
+        time.sleep(search_seconds)
+        return {"ok": True}
+
+    @app.post("/search/offloaded")
+    async def search_offloaded():
+        await lane.run(time.sleep, search_seconds)
+        return {"ok": True}
+
+    return app
+
+
+class BackgroundServer:
+    """uvicorn on a free local port, in a thread."""
+
+    def __init__(self, app: FastAPI):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self) -> "BackgroundServer":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join()
+
+
+def probe_while(probe: Callable[[], None], load: Callable[[], None], concurrent: int = 1) -> List[float]:
+    """Time ``probe`` repeatedly while ``concurrent`` copies of ``load`` run; returns latencies in seconds."""
+    workers = [threading.Thread(target=load) for _ in range(concurrent)]
+    for worker in workers:
+        worker.start()
+    latencies = []
+    while any(worker.is_alive() for worker in workers):
+        started = time.perf_counter()
+        probe()
+        latencies.append(time.perf_counter() - started)
+        time.sleep(PROBE_INTERVAL)
+    for worker in workers:
+        worker.join()
+    return latencies
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    return {
+        "probes": len(ordered),
+        "p50_ms": statistics.median(ordered) * 1000 if ordered else 0.0,
+        "p99_ms": ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))] * 1000 if ordered else 0.0,
+    }
+
+
+def run_synthetic(search_seconds: float = 1.0, concurrent: int = 2) -> Dict[str, Dict[str, float]]:
+    lane = OffloadLane("benchmark", max_concurrency=concurrent)
+    results = {}
+    with BackgroundServer(build_app(search_seconds, lane)) as server, httpx.Client(base_url=server.url, timeout=60) as client:
+        probe = lambda: client.get("/ads").raise_for_status()
+        results["idle"] = summarize(probe_while(probe, lambda: time.sleep(search_seconds)))
+        for mode in ("blocking", "offloaded"):
+            search = lambda mode=mode: httpx.post(f"{server.url}/search/{mode}", timeout=60).raise_for_status()
+            results[mode] = summarize(probe_while(probe, search, concurrent))
+    return results
+
+
+def run_live(base_url: str, query: str, max_pages: int = 3) -> Dict[str, Dict[str, float]]:
+    api = f"{base_url.rstrip('/')}/api/v1"
+    body = {"query_string": query, "countries": ["AE"], "max_pages": max_pages, "save_to_database": False}
+    with httpx.Client(timeout=300) as client:
+        probe = lambda: client.get(f"{api}/ads", params={"page": 1, "page_size": 20}).raise_for_status()
+        idle = summarize([_timed(probe) for _ in range(50)])
+        search = lambda: httpx.post(f"{api}/ads/library/search", json=body, timeout=300).raise_for_status()
+        during = summarize(probe_while(probe, search))
+    return {"idle": idle, "during_search": during}
+
+
+def _timed(call: Callable[[], None]) -> float:
+    started = time.perf_counter()
+    call()
+    time.sleep(PROBE_INTERVAL)
+    return time.perf_counter() - started - PROBE_INTERVAL
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--live":
+        base_url, query = sys.argv[2], sys.argv[3]
+        max_pages = int(sys.argv[4]) if len(sys.argv) > 4 else 3
+        print(f"🚀 Probing {base_url}/api/v1/ads while searching the Ad Library for '{query}'")
+        results = run_live(base_url, query, max_pages)
+    else:
+        search_seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+        concurrent = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+        print(f"🚀 Probing /ads during {concurrent} concurrent {search_seconds:.1f}s searches")
+        results = run_synthetic(search_seconds, concurrent)
+
+    for mode, summary in results.items():
+        print(f"📊 {mode:>14}: {summary['probes']:4d} probes, p50 {summary['p50_ms']:8.1f} ms, p99 {summary['p99_ms']:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the Ad Library GraphQL fetch engine.
+
+Serves synthetic Ad Library pages from a local stub server (with optional
+latency and throttling) and reports pages/sec for concurrent cursor chains.
+
+Usage:
+    python benchmark_graphql_fetch.py [chains] [pages_per_chain] [latency_ms] [max_per_host]
+"""
+
+import json
+import socket
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.services.facebook_ads_scraper import FacebookAdsScraperConfig, FacebookAdsScraperService
+from app.services.graphql_fetch_engine import GraphQLFetchEngine
+
+
+class StubAdLibraryServer:
+    """
+    Local stand-in for the Ad Library GraphQL endpoint.
+
+    Every search (``viewAllPageID``) has ``pages`` pages of ``first`` ads; the
+    cursor is the next page number. The first ``throttle_first`` requests get a
+    429 with ``Retry-After: 0``.
+    """
+
+    def __init__(self, pages: int = 5, latency: float = 0.0, throttle_first: int = 0):
+        self.pages = pages
+        self.latency = latency
+        self.throttle_first = throttle_first
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/api/graphql/"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Avoid Nagle/delayed-ACK stalls on the small header + body writes
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                form = urllib.parse.parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode())
+                variables = json.loads(form["variables"][0])
+                with stub._lock:
+                    stub.requests += 1
+                    throttled = stub.requests <= stub.throttle_first
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    if stub.latency:
+                        time.sleep(stub.latency)
+                    if throttled:
+                        self._send(429, b"", {"Retry-After": "0"})
+                    else:
+                        self._send(200, json.dumps(stub.page(variables)).encode(), {"Content-Type": "application/json"})
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def _send(self, status, body, headers):
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def page(self, variables):
+        page = int(variables.get("cursor") or 0)
+        search = variables.get("viewAllPageID")
+        edges = [
+            {"node": {"ad_archive_id": f"{search}-{page}-{i}", "collated_results": []}}
+            for i in range(variables.get("first") or 30)
+        ]
+        has_next = page + 1 < self.pages
+        return {"data": {"ad_library_main": {"search_results_connection": {
+            "edges": edges,
+            "page_info": {"has_next_page": has_next, "end_cursor": str(page + 1) if has_next else None},
+        }}}}
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def run_benchmark(server: StubAdLibraryServer, chains: int, max_per_host: int = 4):
+    """Fetch ``chains`` searches against ``server``; returns pages, seconds and pages/sec."""
+    engine = GraphQLFetchEngine(max_per_host=max_per_host, backoff_base=0.01)
+    scraper = FacebookAdsScraperService(None, engine=engine)
+    scraper.GRAPHQL_URL = server.url
+    configs = [
+        FacebookAdsScraperConfig(view_all_page_id=str(1000 + i), max_pages=None, delay_between_requests=0)
+        for i in range(chains)
+    ]
+    try:
+        started = time.perf_counter()
+        results = scraper.fetch_cursor_chains(configs)
+        seconds = time.perf_counter() - started
+    finally:
+        engine.close()
+    pages = sum(len(responses) for responses in results)
+    return {"pages": pages, "seconds": seconds, "pages_per_second": round(pages / seconds, 1)}
+
+
+def main():
+    args = [int(arg) for arg in sys.argv[1:]]
+    chains, pages, latency_ms, max_per_host = args + [20, 5, 50, 4][len(args):]
+
+    print("🔍 GraphQL fetch engine benchmark")
+    print(f"   {chains} chains x {pages} pages, {latency_ms}ms server latency, {max_per_host} per host")
+    print("-" * 50)
+    with StubAdLibraryServer(pages=pages, latency=latency_ms / 1000) as server:
+        result = run_benchmark(server, chains, max_per_host)
+    print(
+        f"{result['pages']:>6} pages | {result['seconds']:>7.3f}s | "
+        f"{result['pages_per_second']:>8} pages/s | max {server.max_in_flight} in flight"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the Hamming clustering engine used by ad grouping.
+
+Generates synthetic near-duplicate clusters of 64-bit perceptual hashes and
+reports recall and throughput at 10k and 100k ads (or the sizes given).
+
+Usage:
+    python benchmark_hash_clustering.py [size ...]
+"""
+
+import sys
+
+from app.services.hash_clustering import benchmark
+
+
+def main():
+    sizes = tuple(int(arg) for arg in sys.argv[1:]) or (10_000, 100_000)
+
+    print("🔍 Hamming clustering benchmark")
+    print("-" * 50)
+    for result in benchmark(sizes):
+        print(
+            f"{result['ads']:>8} ads | {result['seconds']:>7.3f}s | "
+            f"{result['ads_per_second']:>8} ads/s | recall {result['recall']:.4f} | "
+            f"{result['clusters']} clusters"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -19,6 +19,8 @@ import json
 import time
 from typing import List, Dict, Any, Set, Tuple, Union
 import concurrent.futures
+import imagehash
+import numpy as np
 from tqdm import tqdm
 
 # --- Import your existing comparison functions ---
@@ -30,11 +32,17 @@ except ImportError as e:
     print(f"Error: Could not import helper functions. Ensure '_download_and_hash' from 'image_comparator_streamed.py' and '_sample_hashes' from 'video_comparator_fast.py' are accessible. Details: {e}")
     exit(1)
 
+# Persistent hash store shared with the ingestion pipeline (memory-only if the DB is unreachable)
+from app.services.media_hash_cache import media_hash_cache, image_hash_kind, video_hash_kind
+from app.services.hamming_index import hex_to_uint64
+from app.services.hash_clustering import cluster_hashes, group_by_labels
+
 # --- Configuration ---
 IMAGE_HASH_CUTOFF = 5
 VIDEO_SIMILARITY_THRESHOLD = 0.90
 VIDEO_SAMPLES = 6
 MAX_WORKERS = 16  # Number of parallel downloads. Increase if your connection is fast.
+CLUSTER_HASH_DISTANCE = 8  # Candidate radius for the Hamming clustering engine (bits of 64)
 
 
 # This cache will be populated by the parallel pre-computation phase.
@@ -44,14 +52,26 @@ MEDIA_HASH_CACHE: Dict[str, Any] = {}
 def process_media_item(url: str, media_type: str) -> Tuple[str, Any]:
     """Worker function to process a single URL. Returns the URL and its hash."""
     if media_type == "image":
+        cached = media_hash_cache.get(url, image_hash_kind())
+        if cached:
+            return url, imagehash.hex_to_hash(cached[0])
         try:
-            return url, get_image_hash(url)
+            image_hash = get_image_hash(url)
+            media_hash_cache.put(url, image_hash_kind(), [str(image_hash)])
+            return url, image_hash
         except Exception:
             return url, None
     elif media_type == "video":
+        kind = video_hash_kind(VIDEO_SAMPLES)
+        cached = media_hash_cache.get(url, kind)
+        if cached:
+            return url, [imagehash.hex_to_hash(h) for h in cached]
         try:
             # Note: _sample_hashes returns a list of hashes
-            return url, get_video_hashes(url, samples=VIDEO_SAMPLES)
+            hashes = get_video_hashes(url, samples=VIDEO_SAMPLES)
+            if hashes:
+                media_hash_cache.put(url, kind, [str(h) for h in hashes])
+            return url, hashes
         except Exception:
             return url, None
     return url, None
@@ -112,13 +132,47 @@ def are_ads_similar_cached(ad1: Dict[str, Any], ad2: Dict[str, Any]) -> bool:
     return False
 
 
+def _primary_hash(ad: Dict[str, Any]) -> Any:
+    """The cached image hash that represents an ad: its image, or its video thumbnail."""
+    if ad.get("media_type") == "Image" and ad.get("media_url"):
+        return MEDIA_HASH_CACHE.get(ad["media_url"])
+    if ad.get("media_type") == "Video" and ad.get("main_image_urls"):
+        return MEDIA_HASH_CACHE.get(ad["main_image_urls"][0])
+    return None
+
+
 def group_ads_fast(ads: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
-    """Groups ads using the pre-computed cache."""
-    ad_sets: List[List[Dict[str, Any]]] = []
-    assigned_ad_ids: Set[int] = set()
+    """
+    Groups ads using the pre-computed cache.
 
+    Ads with a 64-bit primary hash are clustered by the shared Hamming engine
+    (band/multi-probe candidates, then ``are_ads_similar_cached`` on each pair).
+    Ads without one fall back to pairwise comparison among themselves.
+    """
     print("\n--- Phase 3: Grouping ads using cached hashes ---")
-    for ad1 in tqdm(ads, desc="Grouping Ads"):
+    hashed_ads: List[Dict[str, Any]] = []
+    hash_values: List[int] = []
+    unhashed_ads: List[Dict[str, Any]] = []
+    for ad in ads:
+        primary = _primary_hash(ad)
+        value = hex_to_uint64(str(primary)) if primary is not None else None
+        if value is None:
+            unhashed_ads.append(ad)
+        else:
+            hashed_ads.append(ad)
+            hash_values.append(value)
+
+    labels = cluster_hashes(
+        np.array(hash_values, dtype=np.uint64),
+        CLUSTER_HASH_DISTANCE,
+        verify=lambda i, j: are_ads_similar_cached(hashed_ads[i], hashed_ads[j]),
+    )
+    ad_sets: List[List[Dict[str, Any]]] = [
+        [hashed_ads[i] for i in members] for members in group_by_labels(labels).values()
+    ]
+
+    assigned_ad_ids: Set[int] = set()
+    for ad1 in tqdm(unhashed_ads, desc="Grouping Ads"):
         ad1_id = ad1['id']
         if ad1_id in assigned_ad_ids:
             continue
@@ -126,7 +180,7 @@ def group_ads_fast(ads: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
         new_set = [ad1]
         assigned_ad_ids.add(ad1_id)
 
-        for ad2 in ads:
+        for ad2 in unhashed_ads:
             ad2_id = ad2['id']
             if ad2_id in assigned_ad_ids or ad1_id == ad2_id:
                 continue
@@ -189,6 +243,7 @@ if __name__ == "__main__":
                 print(f"\n[Warning] Failed to process {original_type} URL: {original_url[:80]}...")
 
     print(f"Successfully hashed {len(MEDIA_HASH_CACHE)} of {len(urls_to_process)} items.")
+    print(f"Media hash cache: {media_hash_cache.get_stats()}")
 
     # --- Phase 3: Group ads using the now-complete cache ---
     final_ad_sets = group_ads_fast(ads_list)
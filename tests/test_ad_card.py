@@ -0,0 +1,83 @@
+import os
+import sys
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from app.models import Ad, Competitor
+from app.models.dto.ad_dto import AdResponseDTO
+from app.services.ad_card import CARD_VERSION, ad_card_payload, build_ad_card, refresh_ad_card
+
+NOW = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+
+def _ad(**columns):
+    ad = Ad(
+        id=5, ad_archive_id="123", competitor_id=1, ad_set_id=9, date_found=NOW,
+        created_at=NOW, updated_at=NOW, duration_days=12, is_favorite=False, **columns
+    )
+    ad.competitor = Competitor(id=1, name="Acme", page_id="p1", is_active=True)
+    return ad
+
+
+def test_card_flattens_creatives_and_validates_nested_fields():
+    ad = _ad(
+        meta={"is_active": True, "start_date": "2024-04-01", "page_name": "Acme"},
+        targeting={"locations": ["AE", "SA"]},
+        creatives=[{
+            "id": "c1", "headline": "Big sale", "body": "Everything half off",
+            "link": {"caption": "acme.com"}, "cta": {"text": "Shop now", "type": "SHOP_NOW"},
+            "media": [{"type": "Image", "url": "https://img/1.jpg"}, {"type": "Video", "url": "https://vid/1.mp4"}],
+        }],
+    )
+
+    card = build_ad_card(ad)
+
+    assert card["v"] == CARD_VERSION
+    assert card["ad_copy"] == "Big sale Everything half off acme.com"
+    assert card["media_type"] == "Image" and card["media_url"] == "https://img/1.jpg"
+    assert card["main_video_urls"] == ["https://vid/1.mp4"]
+    assert card["cta_type"] == "SHOP_NOW"
+    assert card["targeted_countries"] == ["AE", "SA"]
+    # Nested values are already DTO-shaped (unknown meta keys dropped)
+    assert "page_name" not in card["meta"]
+    assert card["creatives"][0]["media"][1] == {"url": "https://vid/1.mp4", "type": "Video"}
+
+
+def test_card_synthesizes_creative_from_legacy_snapshot():
+    ad = _ad(raw_data={"snapshot": {"title": "Old ad", "videos": [{"video_sd_url": "https://vid/sd.mp4"}]}})
+
+    card = build_ad_card(ad)
+
+    assert card["creatives"][0]["title"] == "Old ad"
+    assert card["main_video_urls"] == ["https://vid/sd.mp4"]
+
+
+def test_payload_uses_stored_card_and_validates_as_dto():
+    ad = _ad(meta={"is_active": False}, creatives=[])
+    refresh_ad_card(ad)
+    ad.card["main_title"] = "from stored card"
+    ad_set = SimpleNamespace(id=9, variant_count=3, created_at=NOW, first_seen_date=NOW, last_seen_date=NOW)
+
+    payload = ad_card_payload(ad, ad_set)
+    dto = AdResponseDTO.model_validate(payload)
+
+    assert payload["main_title"] == "from stored card"
+    assert dto.variant_count == 3
+    assert dto.page_name == "Acme"
+    assert dto.is_analyzed is False
+
+
+def test_stale_card_version_is_rebuilt_on_read():
+    ad = _ad(meta={}, creatives=[{"id": "c1", "headline": "Fresh"}])
+    ad.card = {"v": CARD_VERSION - 1, "main_title": "stale"}
+
+    assert ad_card_payload(ad)["main_title"] == "Fresh"
+
+
+def test_cleared_card_is_stored_as_sql_null():
+    from sqlalchemy.dialects import postgresql
+
+    # JSON 'null' would not match the backfill's card IS NULL filter
+    processor = Ad.__table__.c.card.type.bind_processor(postgresql.dialect())
+    assert processor(None) is None
@@ -0,0 +1,40 @@
+import os
+import sys
+from datetime import date
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from app.services.ad_columns import PROMOTED_AD_COLUMNS, detect_media_type, promoted_ad_columns
+
+
+def test_promoted_columns_from_meta_and_creatives():
+    meta = {
+        "is_active": True,
+        "start_date": "2024-03-01",
+        "end_date": None,
+        "page_id": 12345,
+        "snapshot": {"cards": [{}, {}]},
+    }
+    creatives = [
+        {"media": []},
+        {"cta": {"type": "LEARN_MORE"}, "media": [{"type": "Video", "url": "https://cdn.example.com/v.mp4"}]},
+    ]
+
+    columns = promoted_ad_columns(meta, creatives)
+
+    assert set(columns) == set(PROMOTED_AD_COLUMNS)
+    assert columns["is_active"] is True
+    assert columns["start_date"] == date(2024, 3, 1)
+    assert columns["end_date"] is None
+    assert columns["media_type"] == "carousel"
+    assert columns["page_id"] == "12345"
+    assert columns["cta_type"] == "LEARN_MORE"
+    assert columns["primary_media_url"] == "https://cdn.example.com/v.mp4"
+
+
+def test_media_type_falls_back_to_creatives_and_extractor_value_wins():
+    creatives = [{"media": [{"type": "Image", "url": "a.jpg"}]}]
+    assert detect_media_type({}, creatives) == "image"
+    assert detect_media_type({}, [{"headline": "Hi"}]) == "text"
+    assert detect_media_type(None, None) == "unknown"
+    assert promoted_ad_columns({}, creatives, media_type="video")["media_type"] == "video"
+    assert promoted_ad_columns(None, None)["is_active"] is False
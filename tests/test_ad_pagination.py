@@ -0,0 +1,88 @@
+import os
+import sys
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from app.models import AdSet
+from app.models.dto.ad_dto import AdFilterParams
+from app.services.ad_pagination import (
+    AdSetCountCache,
+    InvalidCursorError,
+    count_cache_key,
+    decode_cursor,
+    encode_cursor,
+    keyset_condition,
+)
+from app.services.ad_service import AdService
+from app.services.response_cache import TAG_ANALYSIS, invalidate_tags, response_cache
+
+
+def _ad_set(ad_set_id, created_at=None, hook_score=None):
+    analysis = SimpleNamespace(hook_score=hook_score) if hook_score is not None else None
+    best_ad = SimpleNamespace(created_at=created_at, analysis=analysis, duration_days=None)
+    return SimpleNamespace(id=ad_set_id, best_ad=best_ad, variant_count=3)
+
+
+def _sql(clause):
+    return str(clause.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_cursor_round_trips_datetimes_and_missing_scores():
+    created = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    cursor = encode_cursor("created_at", "desc", _ad_set(42, created_at=created))
+    assert decode_cursor(cursor, "created_at", "desc") == (created, 42)
+
+    cursor = encode_cursor("hook_score", "asc", _ad_set(7))
+    assert decode_cursor(cursor, "hook_score", "asc") == (-1, 7)
+
+
+def test_cursor_is_rejected_for_another_sort_or_garbage():
+    cursor = encode_cursor("variant_count", "desc", _ad_set(1))
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, "variant_count", "asc")
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("not-a-cursor", "variant_count", "desc")
+
+
+def test_keyset_condition_compares_sort_key_and_id():
+    cursor = encode_cursor("variant_count", "desc", _ad_set(9))
+    assert _sql(keyset_condition("variant_count", "desc", cursor)) == "(ad_sets.variant_count, ad_sets.id) < (3, 9)"
+    cursor = encode_cursor("variant_count", "asc", _ad_set(9))
+    assert "> (3, 9)" in _sql(keyset_condition("variant_count", "asc", cursor))
+
+
+def test_every_sort_ends_with_id_tie_break():
+    service = AdService(Session(create_engine("sqlite://")))
+    for sort_by in ("created_at", "duration_days", "hook_score", "overall_score", "variant_count", "bogus"):
+        query = service._apply_adset_sorting(service.db.query(AdSet), sort_by, "desc")
+        assert _sql(query.statement).rstrip().endswith("ad_sets.id DESC"), sort_by
+
+
+def test_count_key_ignores_paging_and_normalizes_filters():
+    base = count_cache_key(AdFilterParams(search="Summer  Sale", media_type="Video"))
+    assert count_cache_key(AdFilterParams(search="summer sale", media_type="video", page=4, cursor="x")) == base
+    assert count_cache_key(AdFilterParams(search="summer sale", is_active=True)) != base
+
+
+def test_count_cache_reuses_totals_until_invalidated(monkeypatch):
+    monkeypatch.setattr(response_cache, "_redis_disabled_until", float("inf"))
+    cache = AdSetCountCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return 10
+
+    assert cache.get_or_compute("k", compute) == 10
+    assert cache.get_or_compute("k", compute) == 10
+    assert len(calls) == 1
+    invalidate_tags(TAG_ANALYSIS)
+    cache.get_or_compute("k", compute)
+    assert len(calls) == 2
@@ -0,0 +1,38 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from sqlalchemy.dialects import postgresql
+
+from app.services.ad_search import build_tsquery, search_columns, search_condition, search_fields
+
+
+def test_build_tsquery_prefix_phrase_and_sanitizing():
+    assert build_tsquery("Dubai villa") == "dubai:* & villa:*"
+    assert build_tsquery('"sea view" apartment') == "(sea <-> view) & apartment:*"
+    # Operators and punctuation in user input never reach to_tsquery
+    assert build_tsquery("a&b | !c:*") == "a:* & b:* & c:*"
+    assert build_tsquery("شقة فاخرة") == "شقة:* & فاخرة:*"
+    assert build_tsquery("  ") is None
+    assert search_condition("!!") is None
+
+
+def test_search_fields_weights_copy_and_skips_urls():
+    meta = {"title": "Luxury Villas", "page_name": "Acme Homes", "body": {"text": "Book a viewing"}, "cta_type": "LEARN_MORE"}
+    creatives = [{
+        "headline": "Luxury Villas",
+        "body": "Sea view from every room",
+        "cta": {"text": "Learn more"},
+        "media": [{"type": "Image", "url": "https://cdn.example.com/a.jpg"}],
+    }]
+
+    fields = search_fields(meta, creatives)
+
+    assert fields["A"] == "Luxury Villas Acme Homes"
+    assert fields["B"] == "Book a viewing Sea view from every room"
+    assert "cdn.example.com" not in " ".join(fields.values())
+
+    columns = search_columns(meta, creatives)
+    assert columns["search_text"].startswith("Luxury Villas")
+    sql = str(columns["search_vector"].compile(dialect=postgresql.dialect()))
+    assert sql.count("setweight(") == 3
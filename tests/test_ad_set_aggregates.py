@@ -0,0 +1,76 @@
+import os
+import sys
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from app.services.ad_set_aggregates import apply_variant, recompute_ad_set
+
+
+class FakeSession:
+    """Serves db.get and the full-recompute query from an in-memory list of ads."""
+
+    def __init__(self, ads):
+        self.ads = ads
+        self.recomputes = 0
+
+    def get(self, model, ad_id):
+        return next((ad for ad in self.ads if ad.id == ad_id), None)
+
+    def query(self, model):
+        self.recomputes += 1
+        session = self
+
+        class _Query:
+            def filter(self, *args):
+                return self
+
+            def all(self):
+                return list(session.ads)
+
+        return _Query()
+
+
+def _ad(ad_id, start, end=None):
+    return SimpleNamespace(id=ad_id, meta={"start_date": start, "end_date": end, "is_active": end is None})
+
+
+def _ad_set():
+    return SimpleNamespace(
+        id=1, variant_count=0, best_ad_id=None,
+        first_seen_date=None, last_seen_date=None, updated_at=None,
+    )
+
+
+def test_incremental_updates_match_full_recompute():
+    ads = [_ad(1, "2024-03-01", "2024-03-10"), _ad(2, "2024-01-01", "2024-02-01"), _ad(3, "2024-05-01", "2024-05-02")]
+    db = FakeSession(ads)
+    ad_set = _ad_set()
+    for ad in ads:
+        apply_variant(db, ad_set, ad.id, ad.meta)
+
+    expected = _ad_set()
+    recompute_ad_set(expected, ads)
+    assert db.recomputes == 0
+    assert (ad_set.variant_count, ad_set.best_ad_id) == (3, 2)
+    assert (ad_set.variant_count, ad_set.best_ad_id) == (expected.variant_count, expected.best_ad_id)
+    assert ad_set.first_seen_date == expected.first_seen_date == datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert ad_set.last_seen_date == expected.last_seen_date == datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+
+def test_demoting_best_ad_triggers_full_recompute():
+    ads = [_ad(1, "2024-01-01", "2024-03-01"), _ad(2, "2024-01-15", "2024-02-01")]
+    db = FakeSession(ads)
+    ad_set = _ad_set()
+    for ad in ads:
+        apply_variant(db, ad_set, ad.id, ad.meta)
+    assert ad_set.best_ad_id == 1
+
+    old_meta = dict(ads[0].meta)
+    ads[0].meta = {"start_date": "2024-01-01", "end_date": "2024-01-02", "is_active": False}
+    changed = apply_variant(db, ad_set, 1, ads[0].meta, old_meta=old_meta, is_new=False)
+
+    assert changed
+    assert db.recomputes == 1
+    assert ad_set.best_ad_id == 2
+    assert ad_set.variant_count == 2
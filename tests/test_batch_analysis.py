@@ -0,0 +1,184 @@
+import os
+import sys
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from app.database import Base
+from app.models import AdSet, MediaFile, MediaFileRef
+from app.services.batch_analysis import advance_batch, group_creatives, key_capacity
+
+
+def _db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[AdSet.__table__, MediaFile.__table__, MediaFileRef.__table__])
+    return Session(engine)
+
+
+def _video(db, ad_id, sha256):
+    media_file = MediaFile(local_path=f"acme/videos/{ad_id}.mp4", sha256=sha256, media_type="video", mtime=datetime.now(timezone.utc))
+    db.add(media_file)
+    db.flush()
+    db.add(MediaFileRef(media_file_id=media_file.id, ad_id=ad_id, role="video"))
+
+
+def test_group_creatives_collapses_ad_sets_and_shared_videos():
+    db = _db()
+    db.add(AdSet(id=10, content_signature="sig", best_ad_id=2))
+    _video(db, 1, "a" * 64)
+    _video(db, 3, "a" * 64)  # Same bytes as ad 1, outside the set
+    _video(db, 4, "b" * 64)
+    _video(db, 5, "b" * 64)
+    db.commit()
+    ads = [
+        SimpleNamespace(id=1, ad_set_id=10),
+        SimpleNamespace(id=2, ad_set_id=10),
+        SimpleNamespace(id=3, ad_set_id=None),
+        SimpleNamespace(id=4, ad_set_id=None),
+        SimpleNamespace(id=5, ad_set_id=None),
+        SimpleNamespace(id=6, ad_set_id=None),
+        SimpleNamespace(id=7, ad_set_id=None),
+    ]
+
+    groups, skipped = group_creatives(db, ads, lambda ad: None if ad.id == 7 else f"https://cdn/{ad.id}.mp4")
+
+    assert groups == [
+        {"representative_ad_id": 2, "ad_ids": [1, 2, 3]},
+        {"representative_ad_id": 4, "ad_ids": [4, 5]},
+        {"representative_ad_id": 6, "ad_ids": [6]},
+    ]
+    assert skipped == [7]
+
+
+def test_advance_batch_keeps_capacity_in_flight_and_counts_fan_out():
+    state = {
+        "creatives": 4, "pending": [{"representative_ad_id": i, "ad_ids": [i, i + 100]} for i in range(4)],
+        "running": {}, "completed": 0, "failed": 0, "analyzed_ads": 0, "failures": [],
+    }
+    outcomes = {}
+    dispatched = []
+
+    def dispatch(group):
+        if group["representative_ad_id"] == 3:
+            raise RuntimeError("broker down")
+        dispatched.append(group["representative_ad_id"])
+        return f"t{group['representative_ad_id']}"
+
+    advance_batch(state, dispatch, outcomes.get, capacity=2, stale_after=3600)
+    assert dispatched == [0, 1] and set(state["running"]) == {"t0", "t1"}
+
+    # Nothing finished: no new dispatches
+    advance_batch(state, dispatch, outcomes.get, capacity=2, stale_after=3600)
+    assert dispatched == [0, 1]
+
+    outcomes["t0"] = {"success": True, "result": {"applied_to_ads": [0]}}  # Ad 100 got analyzed elsewhere
+    outcomes["t1"] = {"success": False, "error": "quota"}
+    advance_batch(state, dispatch, outcomes.get, capacity=2, stale_after=3600)
+    assert dispatched == [0, 1, 2] and list(state["running"]) == ["t2"]
+    assert (state["completed"], state["failed"], state["analyzed_ads"]) == (1, 2, 1)
+    assert [f["representative_ad_id"] for f in state["failures"]] == [1, 3]
+
+    # A child that never reports back is eventually written off
+    advance_batch(state, dispatch, outcomes.get, capacity=2, stale_after=-1)
+    assert not state["running"] and not state["pending"]
+    assert (state["completed"], state["failed"], state["progress"]) == (1, 3, 100)
+
+
+def test_key_capacity_counts_only_ready_keys():
+    scheduler = SimpleNamespace(snapshot=lambda: [{"available_in": 0}, {"available_in": 12.5}, {"available_in": 0}])
+    assert key_capacity(scheduler, per_key=3) == 6
+    assert key_capacity(SimpleNamespace(snapshot=lambda: [{"available_in": 5}]), per_key=3) == 1
+
+
+def test_batch_task_persists_dispatch_only_runs(monkeypatch):
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    import app.database
+    import app.services.batch_analysis
+    import app.services.gemini_key_scheduler
+    import app.services.google_ai_service
+    import celery.result
+    from app.models.task_status import TaskStatus
+    from app.tasks import ai_analysis_tasks
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine, tables=[TaskStatus.__table__])
+    monkeypatch.setattr(app.database, "SessionLocal", sessionmaker(bind=engine))
+    with Session(engine) as db:
+        db.add(TaskStatus(task_id="b1", status="running", result={
+            "kind": "batch_analysis", "total_ads": 3, "creatives": 3, "skipped_no_video": 0,
+            "pending": [{"representative_ad_id": i, "ad_ids": [i]} for i in range(3)],
+            "running": {}, "completed": 0, "failed": 0, "analyzed_ads": 0, "failures": [], "progress": 0,
+        }))
+        db.commit()
+
+    dispatched = []
+
+    def delay(representative_ad_id, ad_ids, reanalyze=False):
+        dispatched.append(representative_ad_id)
+        return SimpleNamespace(id=f"t{representative_ad_id}")
+
+    capacity = {"value": 1}
+    monkeypatch.setattr(ai_analysis_tasks.analyze_creative_group_task, "delay", delay)
+    monkeypatch.setattr(ai_analysis_tasks.batch_ai_analysis_task, "apply_async", lambda **kwargs: None)
+    monkeypatch.setattr(ai_analysis_tasks.batch_ai_analysis_task, "update_state", lambda **kwargs: None)
+    monkeypatch.setattr(celery.result, "AsyncResult", lambda task_id: SimpleNamespace(ready=lambda: False))
+    monkeypatch.setattr(app.services.google_ai_service, "GoogleAIService", lambda: SimpleNamespace(api_keys=["k"]))
+    monkeypatch.setattr(app.services.gemini_key_scheduler, "GeminiKeyScheduler", lambda keys: None)
+    monkeypatch.setattr(app.services.batch_analysis, "key_capacity", lambda scheduler, per_key: capacity["value"])
+
+    ai_analysis_tasks.batch_ai_analysis_task.run(batch_id="b1")
+    capacity["value"] = 2  # A key came off cooldown: only new dispatches, nothing finished
+    ai_analysis_tasks.batch_ai_analysis_task.run(batch_id="b1")
+    ai_analysis_tasks.batch_ai_analysis_task.run(batch_id="b1")
+
+    assert dispatched == [0, 1]
+    with Session(engine) as db:
+        state = db.query(TaskStatus).filter_by(task_id="b1").one().result
+    assert set(state["running"]) == {"t0", "t1"}
+    assert [group["representative_ad_id"] for group in state["pending"]] == [2]
+
+
+def test_stale_running_batch_does_not_block_the_beat_and_explicit_ids_reanalyze(monkeypatch):
+    from datetime import timedelta
+
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    import app.database
+    import app.services.batch_analysis
+    from app.models.task_status import TaskStatus
+    from app.tasks import ai_analysis_tasks
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine, tables=[TaskStatus.__table__])
+    monkeypatch.setattr(app.database, "SessionLocal", sessionmaker(bind=engine))
+    planned = []
+
+    def plan_batch(db, video_url_for, ad_ids=None, competitor_id=None, limit=None, reanalyze=False):
+        planned.append((ad_ids, reanalyze))
+        return {
+            "kind": "batch_analysis", "reanalyze": reanalyze, "total_ads": 0, "creatives": 0, "skipped_no_video": 0,
+            "pending": [], "running": {}, "completed": 0, "failed": 0, "analyzed_ads": 0, "failures": [], "progress": 100,
+        }
+
+    monkeypatch.setattr(app.services.batch_analysis, "plan_batch", plan_batch)
+    monkeypatch.setattr(app.services.batch_analysis, "key_capacity", lambda scheduler, per_key: 1)
+    batch = {"kind": "batch_analysis", "pending": [], "running": {}}
+    with Session(engine) as db:
+        db.add(TaskStatus(task_id="old", status="running", result=batch, updated_at=datetime.now(timezone.utc) - timedelta(days=1)))
+        db.commit()
+
+    assert ai_analysis_tasks.batch_ai_analysis_task.apply().result["status"] == "completed"
+    with Session(engine) as db:
+        db.add(TaskStatus(task_id="live", status="running", result=batch, updated_at=datetime.now(timezone.utc)))
+        db.commit()
+    assert ai_analysis_tasks.batch_ai_analysis_task.apply().result["status"] == "skipped"
+
+    # Explicit ids are re-analyzed even when a batch is running
+    ai_analysis_tasks.batch_ai_analysis_task.apply(args=[[1, 2]])
+    assert planned == [(None, False), ([1, 2], True)]
@@ -0,0 +1,136 @@
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from sqlalchemy.dialects import postgresql
+
+from app.models import Ad, AdSet, Competitor
+from app.services.enhanced_ad_extraction import EnhancedAdExtractionService
+
+
+class _Query:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def filter(self, *args):
+        return self
+
+    def execution_options(self, **kwargs):
+        return self
+
+    def all(self):
+        return self._rows
+
+
+class _Nested:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    """Records statements; answers the prefetch queries from canned rows."""
+
+    def __init__(self, competitors, existing_ads, ad_sets):
+        self.competitors = competitors
+        self.existing_ads = existing_ads
+        self.ad_sets = ad_sets
+        self.executed = []
+        self.commits = 0
+
+    def query(self, *entities):
+        first = entities[0]
+        if first is Competitor.id:
+            return _Query(self.competitors)
+        if first is Ad.ad_archive_id:
+            return _Query(self.existing_ads)
+        if first is AdSet:
+            return _Query(self.ad_sets)
+        return _Query([])
+
+    def begin_nested(self):
+        return _Nested()
+
+    def execute(self, stmt):
+        self.executed.append(stmt)
+        # Emulate RETURNING ad_archive_id, id with the archive id as primary key
+        params = stmt.compile(dialect=postgresql.dialect()).params
+        return [(v, int(v)) for k, v in params.items() if k.startswith("ad_archive_id_m")]
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+def _ad(ad_id, creatives=None):
+    return {
+        "ad_archive_id": ad_id,
+        "meta": {"start_date": "2024-01-01", "is_active": True},
+        "creatives": creatives,
+    }
+
+
+def _ad_set(ad_set_id, variant_count=0, best_ad_id=None):
+    return SimpleNamespace(
+        id=ad_set_id, variant_count=variant_count, best_ad_id=best_ad_id,
+        first_seen_date=None, last_seen_date=None, updated_at=None,
+    )
+
+
+def test_bulk_save_upserts_in_chunks_with_one_commit(monkeypatch):
+    queued = []
+    monkeypatch.setattr(
+        "app.services.enhanced_ad_extraction.schedule_signature_refresh", lambda ids: queued.extend(ids)
+    )
+    existing = SimpleNamespace(
+        ad_archive_id="2", ad_set_id=7, meta={"platforms": ["fb"]}, creatives=[{"id": "c"}],
+        targeting={"locations": ["AE"]}, lead_form={}, raw_data=None,
+    )
+    new_set, existing_set = _ad_set(9), _ad_set(7, variant_count=1, best_ad_id=2)
+    db = FakeSession([SimpleNamespace(id=1, name="Acme")], [existing], [new_set, existing_set])
+    service = EnhancedAdExtractionService(db)
+    service.BULK_UPSERT_CHUNK_SIZE = 2
+    service.find_or_create_ad_set_for_ad = lambda ad_data: new_set
+
+    stats = service.save_enhanced_ads_to_database({
+        "Acme": [_ad("1", [{"id": "x"}]), _ad("2"), _ad("3", [])],
+        "Unknown": [_ad("4")],
+    })
+
+    assert stats["new_ads_created"] == 2
+    assert stats["existing_ads_updated"] == 1
+    assert stats["competitors_processed"] == 2
+    assert stats["errors"] == 0
+    assert len(db.executed) == 2
+    assert db.commits == 1
+
+    sql = str(db.executed[0].compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (ad_archive_id) DO UPDATE" in sql
+    # The existing ad keeps its creatives and merges meta
+    row = db.executed[0].compile(dialect=postgresql.dialect()).params
+    assert row["meta_m1"]["platforms"] == ["fb"]
+    assert row["creatives_m1"] == [{"id": "c"}]
+    # Cards are built with the stored targeting, which the upsert keeps
+    assert row["card_m1"]["targeted_countries"] == ["AE"]
+    assert row["card_m0"]["creatives"][0]["id"] == "x"
+
+    # Aggregates were folded in incrementally and the new set's signature re-hash deferred
+    assert new_set.variant_count == 2
+    assert new_set.best_ad_id == 1
+    assert existing_set.variant_count == 1
+    assert queued == [9]
+
+
+def test_bulk_save_applies_duration_filter():
+    db = FakeSession([SimpleNamespace(id=1, name="Acme")], [], [])
+    service = EnhancedAdExtractionService(db, min_duration_days=100000)
+
+    stats = service.save_enhanced_ads_to_database({"Acme": [_ad("1")]})
+
+    assert stats["ads_filtered_by_duration"] == 1
+    assert db.executed == []
@@ -0,0 +1,82 @@
+import json
+import os
+import sys
+import threading
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from app.services.bulk_media_refresh import BulkMediaRefresher
+from app.services.media_refresh_service import MediaRefreshService
+
+
+def _page_response(ad_ids, end_cursor=None):
+    return json.dumps({
+        "data": {
+            "ad_library_main": {
+                "search_results_connection": {
+                    "edges": [{"node": {"collated_results": [{"ad_archive_id": ad_id}]}} for ad_id in ad_ids],
+                    "page_info": {"has_next_page": end_cursor is not None, "end_cursor": end_cursor},
+                }
+            }
+        }
+    })
+
+
+def test_fetch_page_ads_pages_until_all_requested_ads_are_found(monkeypatch):
+    pages = {None: _page_response(["1", "2"], "c1"), "c1": _page_response(["3", "4"], "c2"), "c2": _page_response(["5"])}
+    cursors = []
+
+    def page_search(self, page_id, cursor=None, session_id=None, collation_token=None):
+        cursors.append(cursor)
+        return pages[cursor]
+
+    monkeypatch.setattr(MediaRefreshService, "_page_search", page_search)
+
+    found = MediaRefreshService(None).fetch_page_ads("p1", {"2", "3"})
+
+    assert set(found) == {"2", "3"}
+    assert cursors == [None, "c1"]
+
+
+def test_bulk_refresh_searches_each_page_once_and_falls_back_for_misses(monkeypatch):
+    ads = [
+        SimpleNamespace(id=1, ad_archive_id="a1", page_id="p1", competitor=None),
+        SimpleNamespace(id=2, ad_archive_id="a2", page_id="p1", competitor=None),
+        SimpleNamespace(id=3, ad_archive_id="a3", page_id=None, competitor=SimpleNamespace(page_id="p2")),
+        SimpleNamespace(id=4, ad_archive_id="a4", page_id=None, competitor=None),
+    ]
+    page_calls, lookups = [], []
+    lock = threading.Lock()
+
+    def fetch_page_ads(self, page_id, ad_archive_ids, max_pages=10):
+        with lock:
+            page_calls.append((page_id, sorted(ad_archive_ids)))
+        return {ad_id: {"ad_archive_id": ad_id} for ad_id in ad_archive_ids if ad_id != "a2"}
+
+    def fetch_ad_from_facebook(self, ad_archive_id, page_id=None):
+        with lock:
+            lookups.append((ad_archive_id, page_id))
+        return {"ad_archive_id": ad_archive_id} if ad_archive_id == "a4" else None
+
+    monkeypatch.setattr(MediaRefreshService, "fetch_page_ads", fetch_page_ads)
+    monkeypatch.setattr(MediaRefreshService, "fetch_ad_from_facebook", fetch_ad_from_facebook)
+
+    db = MagicMock()
+    db.query.return_value.options.return_value.filter.return_value.all.return_value = ads
+    service = MediaRefreshService(db)
+    applied = []
+    service.apply_ad_data = lambda ad, ad_data: applied.append((threading.get_ident(), ad.id)) or {"success": True}
+    progress = []
+
+    result = BulkMediaRefresher(service, max_workers=3).run([1, 2, 3, 4, 9], progress.append)
+
+    assert sorted(page_calls) == [("p1", ["a1", "a2"]), ("p2", ["a3"])]
+    assert sorted(lookups) == [("a2", None), ("a4", None)]
+    assert (result["total"], result["successful"], result["failed"]) == (5, 3, 2)
+    assert (result["page_searches"], result["fallback_lookups"]) == (2, 2)
+    assert [detail["ad_id"] for detail in result["details"]] == [1, 2, 3, 4, 9]
+    assert result["details"][1]["success"] is False and result["details"][4]["error"] == "Ad not found"
+    # Database writes stay on the calling thread
+    assert {thread for thread, _ in applied} == {threading.get_ident()}
+    assert [p["processed"] for p in progress] == [1, 2, 3, 4, 5] and progress[-1]["progress"] == 100
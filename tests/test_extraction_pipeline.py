@@ -0,0 +1,147 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from app.services.extraction_pipeline import ExtractionPipeline
+
+
+def _page(number, per_page=2):
+    return {
+        "data": {
+            "ad_library_main": {
+                "search_results_connection": {
+                    "edges": [
+                        {"node": {"collated_results": [{"ad_archive_id": f"{number}-{i}", "page_name": "Brand"}]}}
+                        for i in range(per_page)
+                    ],
+                    "page_info": {"has_next_page": True, "end_cursor": str(number + 1)},
+                }
+            }
+        }
+    }
+
+
+class FakeExtractor:
+    def __init__(self, save_delay=0.0, fail_on_save=False):
+        self.save_delay = save_delay
+        self.fail_on_save = fail_on_save
+        self.saved = []
+        self.hashed = []
+        self.known_ids = []
+        self.lock = threading.Lock()
+
+    def transform_raw_data_to_enhanced_format(self, responses, known_ids=None):
+        self.known_ids.append(known_ids)
+        edges = responses[0]["data"]["ad_library_main"]["search_results_connection"]["edges"]
+        return {"Brand": [dict(edge["node"]["collated_results"][0]) for edge in edges]}
+
+    def _calculate_perceptual_hash_for_ad(self, ad):
+        with self.lock:
+            self.hashed.append(ad["ad_archive_id"])
+        return f"hash-{ad['ad_archive_id']}"
+
+    def save_enhanced_ads_to_database(self, enhanced_data, media_hashes=None):
+        if self.fail_on_save:
+            raise RuntimeError("database down")
+        time.sleep(self.save_delay)
+        ads = [ad["ad_archive_id"] for ad in enhanced_data["Brand"]]
+        self.saved.append((ads, dict(media_hashes or {})))
+        return {"total_ads_processed": len(ads), "new_ads_created": len(media_hashes or {}),
+                "existing_ads_updated": len(ads) - len(media_hashes or {}), "competitors_processed": 1}
+
+
+class FakeTracker:
+    def __init__(self, known_from_page):
+        self.known_from_page = known_from_page
+        self.has_history = True
+        self.observed = []
+
+    def known_ids(self, ad_ids):
+        return {ad_id for ad_id in ad_ids if int(ad_id.split("-")[0]) >= self.known_from_page}
+
+    def observe_page(self, response, ad_ids, known):
+        self.observed.append((ad_ids, known))
+
+
+def test_backpressure_keeps_pages_in_flight_bounded():
+    extractor = FakeExtractor(save_delay=0.01)
+    fetched = []
+
+    def pages():
+        for number in range(40):
+            fetched.append(number)
+            yield _page(number)
+
+    in_flight = []
+    save = extractor.save_enhanced_ads_to_database
+
+    def tracking_save(enhanced_data, media_hashes=None):
+        in_flight.append(len(fetched) - len(extractor.saved))
+        return save(enhanced_data, media_hashes)
+
+    extractor.save_enhanced_ads_to_database = tracking_save
+    stats = ExtractionPipeline(extractor, batch_size=2, hash_workers=2, queue_size=1).run(pages())
+
+    assert stats["total_processed"] == 80
+    assert len(extractor.saved) == 40
+    # One page per batch: every stage holds one and every queue buffers one
+    assert max(in_flight) <= 8
+    assert {"fetch", "parse", "hash", "upsert"} == set(stats["pipeline"])
+    assert stats["pipeline"]["fetch"]["items"] == 40
+    assert stats["pipeline"]["upsert"]["items"] == 40
+    assert stats["pipeline"]["fetch"]["blocked_seconds"] > 0
+
+
+def test_only_new_ads_are_hashed_and_hashes_reach_the_upsert():
+    extractor = FakeExtractor()
+    pipeline = ExtractionPipeline(
+        extractor, existing_ids=lambda ids: {ad_id for ad_id in ids if ad_id.endswith("-0")},
+        batch_size=4, hash_workers=2,
+    )
+
+    stats = pipeline.run(iter([_page(1), _page(2), {"errors": [{"message": "Rate limited"}]}]))
+
+    assert sorted(extractor.hashed) == ["1-1", "2-1"]
+    assert extractor.saved == [(["1-0", "1-1", "2-0", "2-1"], {"1-1": "hash-1-1", "2-1": "hash-2-1"})]
+    # Not incremental: existing ads still get the full extraction
+    assert extractor.known_ids == [None, None]
+    assert (stats["created"], stats["updated"], stats["errors"]) == (2, 2, 1)
+    # Counted without keep_responses, error pages included
+    assert stats["pages_scraped"] == 3 and pipeline.responses == []
+    assert pipeline.enhanced_data == {"Brand": [{"ad_archive_id": f"{n}-{i}", "page_name": "Brand"} for n in (1, 2) for i in (0, 1)]}
+
+
+def test_incremental_run_stops_fetching_at_a_page_of_known_ads():
+    extractor = FakeExtractor()
+    tracker = FakeTracker(known_from_page=3)
+    fetched = []
+
+    def pages():
+        for number in range(100):
+            fetched.append(number)
+            yield _page(number)
+
+    stats = ExtractionPipeline(extractor, tracker=tracker, batch_size=2, queue_size=1).run(pages())
+
+    assert stats["stopped_early"] is True
+    assert stats["known_ads"] == 2
+    assert len(tracker.observed) == 4
+    assert len(fetched) <= 8
+    assert [ads for ads, _ in extractor.saved] == [[f"{n}-0", f"{n}-1"] for n in range(4)]
+    assert extractor.known_ids[-1] == {"3-0", "3-1"}
+
+
+def test_stage_failure_is_raised_after_all_stages_stop():
+    extractor = FakeExtractor(fail_on_save=True)
+
+    def pages():
+        for number in range(1000):
+            yield _page(number)
+
+    with pytest.raises(RuntimeError, match="database down"):
+        ExtractionPipeline(extractor, batch_size=2, queue_size=1).run(pages())
+    assert not [t for t in threading.enumerate() if t.name.startswith("extraction-")]
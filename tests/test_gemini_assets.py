@@ -0,0 +1,85 @@
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from app.database import Base
+from app.models import GeminiAsset
+from app.services.gemini_assets import GeminiAssetRegistry, instruction_hash, parse_expiry
+from app.services.video_artifact_cache import cache_url
+
+SHA = "c" * 64
+
+
+def _registry():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[GeminiAsset.__table__])
+    return GeminiAssetRegistry(session_factory=sessionmaker(bind=engine))
+
+
+def test_find_prefers_matching_cache_then_any_live_file():
+    registry = _registry()
+    now = datetime.now(timezone.utc)
+    light, heavy = instruction_hash("light", "gemini-2.5-flash-lite"), instruction_hash("heavy", "gemini-2.5-flash-lite")
+
+    assert registry.find(light, key_count=2, url_key="video.xx.fbcdn.net/v/a.mp4") is None
+    registry.record_upload(SHA, 1, "files/abc", now + timedelta(hours=47), url_key="video.xx.fbcdn.net/v/a.mp4")
+
+    by_url = registry.find(light, key_count=2, url_key="video.xx.fbcdn.net/v/a.mp4")
+    assert (by_url["file_uri"], by_url["api_key_index"], by_url["cache_name"]) == ("files/abc", 1, None)
+    # The same bytes behind another URL are found by content
+    assert registry.find(light, key_count=2, content_sha256=SHA)["file_uri"] == "files/abc"
+    # Keys that are no longer configured are skipped
+    assert registry.find(light, key_count=1, content_sha256=SHA) is None
+
+    registry.record_cache(SHA, 1, "files/abc", light, "gemini-2.5-flash-lite", "cachedContents/light", now + timedelta(hours=20))
+    registry.record_cache(SHA, 1, "files/abc", heavy, "gemini-2.5-flash-lite", "cachedContents/heavy", now + timedelta(minutes=5))
+
+    assert registry.find(light, key_count=2, url_key="video.xx.fbcdn.net/v/a.mp4")["cache_name"] == "cachedContents/light"
+    # Expiring within the margin: fall back to the file
+    assert registry.find(heavy, key_count=2, content_sha256=SHA)["cache_name"] is None
+
+
+def test_touch_extends_hot_caches_close_to_expiry():
+    registry = _registry()
+    now = datetime.now(timezone.utc)
+    key = instruction_hash("light", "m")
+    registry.record_cache(SHA, 0, "files/abc", key, "m", "cachedContents/x", now + timedelta(hours=1))
+    asset = registry.find(key, key_count=1, content_sha256=SHA)
+    calls = []
+
+    def extend(api_key_index, cache_name, ttl_seconds):
+        calls.append((api_key_index, cache_name, ttl_seconds))
+        return (now + timedelta(seconds=ttl_seconds)).isoformat().replace("+00:00", "Z")
+
+    registry.touch(asset["id"], extend=extend, ttl_seconds=86400)
+    assert calls == []  # One hit is not hot yet
+    registry.touch(asset["id"], extend=extend, ttl_seconds=86400)
+    assert calls == [(0, "cachedContents/x", 86400)]
+
+    db = registry.session_factory()
+    row = db.query(GeminiAsset).one()
+    assert row.hit_count == 2
+    assert row.cache_expires_at.replace(tzinfo=timezone.utc) > now + timedelta(hours=23)
+    db.close()
+    # Now far from expiry: the periodic sweep leaves it alone
+    assert registry.extend_hot_caches(extend, 86400, key_count=1) == 0
+
+
+def test_parse_expiry_handles_nanoseconds():
+    parsed = parse_expiry("2026-10-18T09:30:00.123456789Z")
+    assert parsed == datetime(2026, 10, 18, 9, 30, 0, 123456, tzinfo=timezone.utc)
+    assert parse_expiry(None) is None
+
+
+def test_ad_library_pages_do_not_share_a_url_key():
+    registry = _registry()
+    now = datetime.now(timezone.utc)
+    light = instruction_hash("light", "gemini-2.5-flash-lite")
+    registry.record_upload(SHA, 0, "files/ad111", now + timedelta(hours=47), url_key=cache_url("https://www.facebook.com/ads/library/?id=111"))
+
+    assert registry.find(light, key_count=1, url_key=cache_url("https://www.facebook.com/ads/library/?id=222")) is None
+    assert registry.find(light, key_count=1, url_key=cache_url("https://www.facebook.com/ads/library/?id=111"))["file_uri"] == "files/ad111"
@@ -0,0 +1,97 @@
+import os
+import random
+import sys
+from collections import Counter
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from app.database import Base
+from app.models import ApiUsage
+from app.services.gemini_key_scheduler import GeminiKeyScheduler, _LocalStore
+
+
+def _scheduler(keys=("k0", "k1", "k2"), **kwargs):
+    kwargs.setdefault("session_factory", None)
+    return GeminiKeyScheduler(
+        list(keys), store=_LocalStore(), rpm=10, tpm=1000, cooldown_seconds=30,
+        max_wait_seconds=0, rng=random.Random(1), **kwargs
+    )
+
+
+def test_pick_spreads_load_and_skips_keys_on_cooldown():
+    scheduler = _scheduler()
+    assert len(Counter(scheduler.pick() for _ in range(60))) == 3
+
+    with scheduler.lease(0) as lease:
+        lease["status"] = 429
+    assert scheduler.snapshot()[0]["cooldown"] > 25
+    assert {scheduler.pick() for _ in range(30)} == {1, 2}
+    assert scheduler.pick(exclude={1, 2}) == 0  # Nothing else left: the soonest-free key
+    assert scheduler.pick(exclude={0, 1, 2}) is None
+
+    # Repeated 429s escalate the cooldown; a success resets it
+    with scheduler.lease(0) as lease:
+        lease["status"] = 429
+    assert scheduler.snapshot()[0]["cooldown"] > 55
+    with scheduler.lease(1) as lease:
+        lease["status"] = 200
+    assert scheduler.snapshot()[1]["cooldown"] == 0
+
+
+def test_budgets_and_inflight_steer_selection():
+    scheduler = _scheduler(keys=("k0", "k1"))
+    scheduler.record_tokens(0, 1000)
+    assert scheduler.snapshot()[0]["available_in"] > 0
+    assert {scheduler.pick() for _ in range(20)} == {1}
+
+    scheduler = _scheduler(keys=("k0", "k1"))
+    with scheduler.lease(0), scheduler.lease(0), scheduler.lease(0):
+        assert scheduler.snapshot()[0]["inflight"] == 3
+        picks = Counter(scheduler.pick() for _ in range(400))
+        assert picks[1] > 2.5 * picks[0]
+    assert scheduler.snapshot()[0]["inflight"] == 0
+    assert scheduler.snapshot()[0]["requests"] == 3
+
+
+def test_usage_rows_seed_missing_counters_once_per_minute(monkeypatch):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[ApiUsage.__table__])
+    session = sessionmaker(bind=engine)
+    db = session()
+    now = datetime.fromtimestamp((datetime.now(timezone.utc).timestamp() // 60) * 60 + 30, timezone.utc)
+    last_minute = datetime.fromtimestamp(now.timestamp() - 45, timezone.utc)
+    db.add_all([
+        ApiUsage(model_name="m", provider="gemini", api_key_index=1, total_tokens=400, created_at=now),
+        ApiUsage(model_name="m", provider="gemini", api_key_index=1, total_tokens=300, created_at=now),
+        ApiUsage(model_name="m", provider="gemini", api_key_index=1, total_tokens=900, created_at=last_minute),
+        ApiUsage(model_name="m", provider="openrouter", api_key_index=0, total_tokens=900, created_at=now),
+    ])
+    db.commit()
+    db.close()
+
+    monkeypatch.setattr(GeminiKeyScheduler, "_seeded_minute", None)
+    scheduler = _scheduler(keys=("k0", "k1"), session_factory=session)
+    scheduler.seed_from_usage(now.timestamp())
+    scheduler.seed_from_usage(now.timestamp())
+    stats = scheduler.snapshot(now.timestamp())
+    # Only this minute's rows: last minute's were already counted in last minute's window
+    assert (stats[1]["requests"], stats[1]["tokens"]) == (2, 700)
+    assert (stats[0]["requests"], stats[0]["tokens"]) == (0, 0)
+    # Another process in the same minute finds the marker and does not double-count
+    monkeypatch.setattr(GeminiKeyScheduler, "_seeded_minute", None)
+    other = GeminiKeyScheduler(["k0", "k1"], store=scheduler.store, session_factory=session)
+    other.seed_from_usage(now.timestamp())
+    assert other.snapshot(now.timestamp())[1]["tokens"] == 700
+
+    # Counters already kept live this minute are not added to
+    monkeypatch.setattr(GeminiKeyScheduler, "_seeded_minute", None)
+    live = _scheduler(keys=("k0", "k1"), session_factory=session)
+    minute = int(now.timestamp() // 60)
+    live.store.incr(live._key(1, f"rpm:{minute}"), 2, 120)
+    live.store.incr(live._key(1, f"tpm:{minute}"), 700, 120)
+    live.seed_from_usage(now.timestamp())
+    stats = live.snapshot(now.timestamp())
+    assert (stats[1]["requests"], stats[1]["tokens"]) == (2, 700)
@@ -0,0 +1,121 @@
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from app.services.gemini_upload import ResumableUploader
+
+
+class FakeFilesAPI:
+    """Just enough of the Files API resumable protocol, with scripted failures."""
+
+    def __init__(self, failures=(), query_failures=()):
+        self.failures = list(failures)  # per upload request: None, "partial" or "drop"
+        self.query_failures = list(query_failures)  # per query request: None or an HTTP status
+        self.queries = 0
+        self.sessions = {}
+        self.bodies = []
+        self.lock = threading.Lock()
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, headers=None, body=b""):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                command = self.headers.get("X-Goog-Upload-Command")
+                with api.lock:
+                    if command == "start":
+                        session_id = str(len(api.sessions))
+                        api.sessions[session_id] = {"data": b"", "size": int(self.headers["X-Goog-Upload-Header-Content-Length"])}
+                        return self._reply(200, {
+                            "X-Goog-Upload-URL": f"http://127.0.0.1:{api.port}/session/{session_id}",
+                            "X-Goog-Upload-Chunk-Granularity": "4",
+                        })
+                    session = api.sessions[self.path.rsplit("/", 1)[-1]]
+                    if command == "query":
+                        api.queries += 1
+                        query_failure = api.query_failures.pop(0) if api.query_failures else None
+                        if query_failure:
+                            return self._reply(query_failure)
+                        return self._reply(200, {"X-Goog-Upload-Status": "active", "X-Goog-Upload-Size-Received": str(len(session["data"]))})
+                    assert int(self.headers["X-Goog-Upload-Offset"]) == len(session["data"])
+                    api.bodies.append(len(body))
+                    failure = api.failures.pop(0) if api.failures else None
+                    if failure == "drop":
+                        self.close_connection = True
+                        self.connection.close()
+                        return
+                    if failure == "partial":
+                        session["data"] += body[: len(body) // 2]
+                        return self._reply(503)
+                    session["data"] += body
+                    if "finalize" in command:
+                        assert len(session["data"]) == session["size"]
+                        resource = {"file": {"uri": f"files/{len(api.sessions)}", "sizeBytes": str(session["size"])}}
+                        return self._reply(200, {"X-Goog-Upload-Status": "final"}, json.dumps(resource).encode())
+                    return self._reply(200, {"X-Goog-Upload-Status": "active"})
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def uploader(self, **kwargs):
+        return ResumableUploader(upload_url=f"http://127.0.0.1:{self.port}/upload", retry_delay=0, timeout=(5, 5), **kwargs)
+
+
+def _file(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(bytes(i % 251 for i in range(size)))
+    return str(path)
+
+
+def test_upload_streams_chunks_and_resumes_from_server_offset(tmp_path):
+    api = FakeFilesAPI(failures=[None, "partial", "drop"])
+    path = _file(tmp_path, "ad.mp4", 50)
+    try:
+        result, stats = api.uploader(chunk_size=10, max_retries=3).upload(path, {"key": "k"})
+    finally:
+        api.server.shutdown()
+
+    assert result["file"]["sizeBytes"] == "50"
+    assert api.sessions["0"]["data"] == open(path, "rb").read()
+    # Chunks are rounded down to the 4-byte granularity; nothing larger is ever sent
+    assert max(api.bodies) == 8
+    assert stats["retries"] == 2 and stats["bytes"] == 50
+
+
+def test_failed_query_is_retried_within_the_budget(tmp_path):
+    api = FakeFilesAPI(failures=["partial"], query_failures=[503])
+    path = _file(tmp_path, "ad.mp4", 20)
+    try:
+        result, stats = api.uploader(chunk_size=8, max_retries=2).upload(path, {"key": "k"})
+    finally:
+        api.server.shutdown()
+
+    assert result["file"]["sizeBytes"] == "20"
+    assert api.sessions["0"]["data"] == open(path, "rb").read()
+    assert api.queries == 2 and stats["retries"] == 2
+
+
+def test_upload_many_runs_in_parallel_and_reports_failures(tmp_path):
+    api = FakeFilesAPI()
+    paths = [_file(tmp_path, f"{i}.mp4", 30 + i) for i in range(3)] + [str(tmp_path / "missing.mp4")]
+    try:
+        results = api.uploader(chunk_size=16, max_workers=3).upload_many(paths, {"key": "k"})
+    finally:
+        api.server.shutdown()
+
+    assert [result["file"]["sizeBytes"] if result else None for result, _ in results] == ["30", "31", "32", None]
+    assert sorted(len(s["data"]) for s in api.sessions.values()) == [30, 31, 32]
@@ -0,0 +1,154 @@
+import asyncio
+import os
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from app.services.facebook_ads_scraper import FacebookAdsScraperConfig, FacebookAdsScraperService
+from app.services.graphql_fetch_engine import GraphQLFetchEngine, decode_json_stream, is_throttled
+from benchmark_graphql_fetch import StubAdLibraryServer, run_benchmark
+
+
+@pytest.fixture
+def stub_server():
+    """Local Ad Library stand-in: 3 pages per search, 10ms latency."""
+    with StubAdLibraryServer(pages=3, latency=0.01) as server:
+        yield server
+
+
+@pytest.fixture
+def engine():
+    engine = GraphQLFetchEngine(max_per_host=2, timeout=5, max_retries=3, backoff_base=0.01)
+    yield engine
+    engine.close()
+
+
+def _scraper(server, engine):
+    scraper = FacebookAdsScraperService(None, engine=engine)
+    scraper.GRAPHQL_URL = server.url
+    return scraper
+
+
+def _config(page_id, **kwargs):
+    kwargs.setdefault("max_pages", None)
+    kwargs.setdefault("delay_between_requests", 0)
+    return FacebookAdsScraperConfig(view_all_page_id=page_id, first=2, **kwargs)
+
+
+def _decode(*chunks):
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+    return asyncio.run(decode_json_stream(stream()))
+
+
+def test_decode_json_stream_handles_prefix_deferred_and_pretty_bodies():
+    assert _decode(b'for (;;);{"data": ', b'{"a": 1}}') == {"data": {"a": 1}}
+    # Deferred responses: the first document is returned without waiting for the rest
+    assert _decode(b'{"data": {"page": 1}}\r\n{"label": "x"', b', "data": {}}') == {"data": {"page": 1}}
+    assert _decode(b'{\n  "data": {\n', b'    "a": [1, 2]\n  }\n}\n') == {"data": {"a": [1, 2]}}
+
+
+def test_is_throttled_detects_rate_limit_payloads():
+    assert is_throttled({"errors": [{"code": 1675004, "message": "Rate limit exceeded"}]})
+    assert is_throttled({"error": 1675004, "errorSummary": "Too many requests"})
+    assert is_throttled({"errors": [{"message": "Too many calls, slow down"}]})
+    assert not is_throttled({"errors": [{"code": 1357004, "message": "Invalid parameter"}]})
+    assert not is_throttled({"data": {}})
+
+
+def test_backoff_delay_is_jittered_exponential_and_honors_retry_after():
+    engine = GraphQLFetchEngine(max_per_host=1, backoff_base=1.0, backoff_cap=8.0)
+    for attempt, ceiling in ((0, 1.0), (2, 4.0), (10, 8.0)):
+        delays = {engine.backoff_delay(attempt) for _ in range(50)}
+        assert all(ceiling / 2 <= d <= ceiling for d in delays)
+        assert len(delays) > 1
+    assert engine.backoff_delay(0, retry_after=5.0) == 5.0
+
+
+def test_cursor_chains_run_concurrently_but_each_chain_in_order(stub_server, engine):
+    scraper = _scraper(stub_server, engine)
+    configs = [_config(str(page_id)) for page_id in (101, 102, 103, 104)]
+
+    results = scraper.fetch_cursor_chains(configs)
+
+    assert [len(responses) for responses in results] == [3, 3, 3, 3]
+    for config, responses in zip(configs, results):
+        ids = [
+            edge["node"]["ad_archive_id"]
+            for response in responses
+            for edge in response["data"]["ad_library_main"]["search_results_connection"]["edges"]
+        ]
+        page_id = config.view_all_page_id
+        assert ids == [f"{page_id}-{page}-{i}" for page in range(3) for i in range(2)]
+        assert config.cursor is None  # callers' configs keep their starting cursor
+    assert stub_server.max_in_flight == 2  # concurrent, within the per-host limit
+
+
+def test_chain_respects_max_pages(stub_server, engine):
+    results = _scraper(stub_server, engine).fetch_cursor_chains([_config("7", max_pages=2)])
+    assert len(results[0]) == 2
+
+
+def test_throttled_requests_are_retried(engine):
+    with StubAdLibraryServer(pages=1, throttle_first=2) as server:
+        response = _scraper(server, engine).fetch_ads_page(_config("9"))
+    assert response["data"]["ad_library_main"]["search_results_connection"]["edges"]
+    assert server.requests == 3
+
+
+def test_fetch_returns_none_when_retries_run_out():
+    engine = GraphQLFetchEngine(max_per_host=1, timeout=5, max_retries=1, backoff_base=0.01)
+    try:
+        with StubAdLibraryServer(pages=1, throttle_first=5) as server:
+            assert _scraper(server, engine).fetch_ads_page(_config("9")) is None
+        assert server.requests == 2
+    finally:
+        engine.close()
+
+
+def test_scrape_ads_consumes_prefetched_pages(stub_server, engine, monkeypatch):
+    scraper = _scraper(stub_server, engine)
+    config = _config("55")
+    pages = scraper.fetch_cursor_chains([config])[0]
+    requests_made = stub_server.requests
+    seen = []
+
+    def transform(responses, known_ids=None):
+        seen.extend(responses)
+        return {"Advertiser": [edge["node"] for edge in responses[0]["data"]["ad_library_main"]["search_results_connection"]["edges"]]}
+
+    monkeypatch.setattr("app.services.facebook_ads_scraper.SessionLocal", MagicMock())
+    scraper.enhanced_extractor.transform_raw_data_to_enhanced_format = transform
+    scraper.enhanced_extractor.save_enhanced_ads_to_database = lambda ads, media_hashes=None: {
+        "total_ads_processed": sum(len(batch) for batch in ads.values())
+    }
+    _, all_json_responses, _, stats = scraper.scrape_ads(config, pages=pages)
+
+    assert stub_server.requests == requests_made
+    assert seen == pages
+    assert all_json_responses == []
+    assert stats["total_processed"] == 6
+
+
+def test_preview_pipeline_transforms_pages_as_they_arrive(stub_server, engine):
+    scraper = _scraper(stub_server, engine)
+    scraper.enhanced_extractor.transform_raw_data_to_enhanced_format = lambda responses: {
+        "Advertiser": [edge["node"] for edge in responses[0]["data"]["ad_library_main"]["search_results_connection"]["edges"]]
+    }
+
+    _, responses, enhanced, stats, next_cursor, has_next = scraper.scrape_ads_preview_only(_config("66", max_pages=3))
+
+    assert len(responses) == 3
+    assert len(enhanced["Advertiser"]) == 6
+    assert stats["total_processed"] == 6
+    assert (next_cursor, has_next) == (None, False)
+
+
+def test_benchmark_reports_pages_per_second():
+    with StubAdLibraryServer(pages=2) as server:
+        result = run_benchmark(server, chains=5, max_per_host=2)
+    assert result["pages"] == 10
+    assert result["pages_per_second"] > 0
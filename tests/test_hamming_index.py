@@ -0,0 +1,108 @@
+import os
+import sys
+import random
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from app.services.hamming_index import (
+    MultiIndexHammingIndex,
+    hamming_distances,
+    hex_to_uint64,
+    int64_to_uint64,
+    signature_to_int64,
+)
+
+
+def test_signature_round_trips_through_signed_bigint():
+    signed = signature_to_int64("ffffffffffffffff")
+    assert signed == -1
+    assert int64_to_uint64(signed) == hex_to_uint64("ffffffffffffffff")
+    # Fallback signatures (ad archive ids) are not hashes
+    assert signature_to_int64("1234567890") is None
+
+
+def test_query_matches_brute_force():
+    rng = random.Random(7)
+    index = MultiIndexHammingIndex(num_bands=4)
+    values = [rng.getrandbits(64) for _ in range(2000)]
+    # Plant near-duplicates whose differing bits are spread over every band
+    base = values[0]
+    for i, flips in enumerate([(0, 17, 33, 49), (1, 2, 20, 40, 60, 63), tuple(range(0, 64, 7))]):
+        v = base
+        for b in flips:
+            v ^= 1 << b
+        values.append(v)
+    for item_id, value in enumerate(values):
+        index.add(item_id, value)
+
+    packed = np.array(values, dtype=np.uint64)
+    for k in (0, 4, 6, 10):
+        expected = {i for i, d in enumerate(hamming_distances(packed, base)) if d <= k}
+        found = {item_id for item_id, _ in index.query(base, k)}
+        assert found == expected
+
+
+def test_remove_and_replace():
+    index = MultiIndexHammingIndex()
+    index.add(1, 0)
+    index.add(2, 0b111)
+    assert [i for i, _ in index.query(0, 3)] == [1, 2]
+    index.remove(1)
+    index.add(2, (1 << 64) - 1)
+    assert index.query(0, 3) == []
+    assert len(index) == 1
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def incr(self, key):
+        self.values[key] = int(self.values.get(key) or 0) + 1
+        return self.values[key]
+
+
+def test_ad_set_index_reloads_when_another_process_rehashes():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from app.database import Base
+    from app.models import AdSet
+    from app.services.hamming_index import AdSetSignatureIndex
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[AdSet.__table__])
+    db = Session(engine)
+    db.add_all([
+        AdSet(id=1, content_signature="0" * 16, signature_hash=0),
+        AdSet(id=2, content_signature="00000000000000ff", signature_hash=0xFF),
+    ])
+    db.commit()
+
+    redis = FakeRedis()
+    writer, reader = (AdSetSignatureIndex(check_interval=0, max_age=3600) for _ in range(2))
+    for index in (writer, reader):
+        index._redis = redis
+        index.ensure_loaded(db)
+
+    # The writer re-hashes ad set 1 far away
+    db.get(AdSet, 1).content_signature, db.get(AdSet, 1).signature_hash = "0fffffffffffff00", signature_to_int64("0fffffffffffff00")
+    db.commit()
+    writer.track(1, "0fffffffffffff00", existing=True)
+    assert writer._version == 1  # Its own bump does not force a reload
+
+    assert [i for i, _ in reader.query(0, 4)] == [1]  # Stale until the next refresh
+    reader.refresh(db)
+    assert reader.query(0, 4) == []
+    assert [i for i, _ in reader.query(hex_to_uint64("0fffffffffffff00"), 0)] == [1]
+
+    # Deletes outside the ORM are dropped once the index reaches its max age
+    db.query(AdSet).filter(AdSet.id == 2).delete()
+    db.commit()
+    reader.max_age = 0
+    reader.refresh(db)
+    assert 2 not in reader and 1 in reader
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from app.services.hash_clustering import (
+    band_pairs_within,
+    block_pairs_within,
+    cluster_hashes,
+    group_by_labels,
+)
+
+
+def _pair_set(result):
+    left, right, _ = result
+    return set(zip(left.tolist(), right.tolist()))
+
+
+def test_band_probing_matches_exhaustive_search():
+    rng = np.random.default_rng(3)
+    base = rng.integers(0, 2 ** 63, size=300, dtype=np.int64).astype(np.uint64)
+    # Variants that differ from their base in every 16-bit band
+    variants = base ^ np.uint64((1 << 3) | (1 << 19) | (1 << 35) | (1 << 51))
+    hashes = np.concatenate([base, variants])
+
+    for k in (4, 6, 8):
+        assert _pair_set(band_pairs_within(hashes, k)) == _pair_set(block_pairs_within(hashes, k))
+
+
+def test_cluster_merges_chains_and_respects_verify():
+    hashes = np.array([0b0, 0b1, 0b11, (1 << 64) - 1, 0b0], dtype=np.uint64)
+    groups = sorted(sorted(m) for m in group_by_labels(cluster_hashes(hashes, 1)).values())
+    assert groups == [[0, 1, 2, 4], [3]]
+
+    # Rejected edges are not merged; exact duplicates always are
+    labels = cluster_hashes(hashes, 1, verify=lambda i, j: False)
+    groups = sorted(sorted(m) for m in group_by_labels(labels).values())
+    assert groups == [[0, 4], [1], [2], [3]]
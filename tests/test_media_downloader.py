@@ -0,0 +1,145 @@
+import hashlib
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from app.services.media_downloader import MediaDownloader
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 64
+
+
+class MediaServer:
+    """Serves PNG bytes for any path, honouring ``Range``; records requests."""
+
+    def __init__(self, body: bytes = PNG, delay: float = 0.0):
+        self.body = body
+        self.delay = delay
+        self.requests = []
+        self.active = 0
+        self.peak = 0
+        lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with lock:
+                    server.requests.append((self.path, self.headers.get("Range")))
+                    server.active += 1
+                    server.peak = max(server.peak, server.active)
+                try:
+                    time.sleep(server.delay)
+                    start = 0
+                    if self.headers.get("Range"):
+                        start = int(self.headers["Range"].split("=")[1].rstrip("-"))
+                        if start >= len(server.body):
+                            self.send_response(416)
+                            self.send_header("Content-Range", f"bytes */{len(server.body)}")
+                            self.end_headers()
+                            return
+                        self.send_response(206)
+                    else:
+                        self.send_response(200)
+                    self.send_header("Content-Type", "image/png")
+                    self.send_header("Content-Length", str(len(server.body) - start))
+                    self.end_headers()
+                    self.wfile.write(server.body[start:])
+                finally:
+                    with lock:
+                        server.active -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def server():
+    srv = MediaServer()
+    yield srv
+    srv.close()
+
+
+def test_stores_by_content_hash_and_skips_known_urls(tmp_path, server):
+    downloader = MediaDownloader(str(tmp_path), max_workers=2)
+    sha256 = hashlib.sha256(PNG).hexdigest()
+
+    first = downloader.download(f"{server.url}/v/t39/a?oh=1&oe=2", "image", "acme")
+    assert first["sha256"] == sha256 and first["downloaded"]
+    assert first["local_path"] == os.path.join("acme", "images", f"{sha256}.png")
+    assert (tmp_path / first["local_path"]).read_bytes() == PNG
+
+    # A known URL is served from the index, no request
+    again = downloader.download(f"{server.url}/v/t39/a?oh=1&oe=2", "image", "acme")
+    assert not again["downloaded"] and again["local_path"] == first["local_path"]
+    assert len(server.requests) == 1
+    # Only signed CDN URLs drop their query; elsewhere it identifies the media
+    assert downloader.url_key("https://scontent.xx.fbcdn.net/v/t39/a.jpg?oh=1") == downloader.url_key("https://scontent.xx.fbcdn.net/v/t39/a.jpg?oh=3")
+    assert downloader.url_key(f"{server.url}/media?id=1") != downloader.url_key(f"{server.url}/media?id=2")
+
+    # Same bytes from another URL for another competitor: one object on disk
+    other = downloader.download(f"{server.url}/v/t39/b", "image", "globex")
+    assert other["sha256"] == sha256
+    assert os.stat(tmp_path / other["local_path"]).st_ino == os.stat(tmp_path / first["local_path"]).st_ino
+
+    # The object outlives the first link and goes with the last
+    assert downloader.remove_link(first["local_path"]) == 0
+    assert downloader.remove_link(other["local_path"]) == len(PNG)
+    assert not os.path.exists(downloader.object_path(sha256, ".png"))
+
+
+def test_resumes_partial_download_with_range(tmp_path, server):
+    downloader = MediaDownloader(str(tmp_path))
+    url = f"{server.url}/video.mp4"
+    part_path = tmp_path / ".partial" / f"{downloader.url_key(url)}.part"
+    part_path.parent.mkdir()
+    part_path.write_bytes(PNG[:1000])
+
+    info = downloader.download(url, "video", "acme")
+
+    assert server.requests == [("/video.mp4", "bytes=1000-")]
+    assert info["sha256"] == hashlib.sha256(PNG).hexdigest()
+    assert (tmp_path / info["local_path"]).read_bytes() == PNG
+    assert not part_path.exists()
+
+
+def test_complete_partial_is_kept_on_416(tmp_path, server):
+    downloader = MediaDownloader(str(tmp_path))
+    url = f"{server.url}/video.mp4"
+    part_path = tmp_path / ".partial" / f"{downloader.url_key(url)}.part"
+    part_path.parent.mkdir()
+    part_path.write_bytes(PNG)
+
+    info = downloader.download(url, "video", "acme")
+
+    assert server.requests == [("/video.mp4", f"bytes={len(PNG)}-")]
+    assert info["sha256"] == hashlib.sha256(PNG).hexdigest()
+    assert (tmp_path / info["local_path"]).read_bytes() == PNG
+
+
+def test_download_many_is_bounded_and_reports_progress(tmp_path):
+    server = MediaServer(delay=0.05)
+    try:
+        downloader = MediaDownloader(str(tmp_path), max_workers=3)
+        jobs = [(ad_id, f"{server.url}/img/{ad_id}-{n}.png", "image", "acme") for ad_id in (1, 2) for n in range(4)]
+        progress = []
+
+        results = downloader.download_many(jobs, progress=lambda ad_id, done, total: progress.append((ad_id, done, total)))
+    finally:
+        server.close()
+
+    assert all(results) and len(server.requests) == 8
+    assert server.peak == 3
+    assert sorted(progress) == [(ad_id, done, 4) for ad_id in (1, 2) for done in range(1, 5)]
+    assert downloader._url_locks == {}  # Per-URL locks do not outlive their downloads
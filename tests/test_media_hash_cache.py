@@ -0,0 +1,67 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from app.services.media_hash_cache import (
+    MediaHashCache,
+    normalize_media_url,
+    image_hash_kind,
+    video_hash_kind,
+)
+
+
+def test_normalize_media_url_drops_rotating_query_params():
+    url1 = "https://scontent.fdxb2-1.fna.fbcdn.net/v/t39/123_n.jpg?oh=abc&oe=1"
+    url2 = "https://SCONTENT.fdxb2-1.fna.fbcdn.net/v/t39/123_n.jpg?oh=xyz&oe=2"
+    assert normalize_media_url(url1) == normalize_media_url(url2)
+    assert normalize_media_url(None) == ""
+
+
+def test_memory_tier_hits_across_rotated_urls():
+    cache = MediaHashCache(persistent=False)
+    cache.put("https://cdn.example.com/a.jpg?sig=1", image_hash_kind(), ["ffff000000000000"])
+
+    assert cache.get("https://cdn.example.com/a.jpg?sig=2", image_hash_kind()) == ["ffff000000000000"]
+    # Different hash kinds never collide
+    assert cache.get("https://cdn.example.com/a.jpg?sig=2", video_hash_kind(6)) is None
+
+    stats = cache.get_stats()
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["stores"] == 1
+
+
+def test_etag_lookup_and_lru_eviction():
+    cache = MediaHashCache(max_entries=2, persistent=False)
+    kind = video_hash_kind(6)
+    cache.put("https://cdn.example.com/v1.mp4", kind, ["01", "02"], etag='"e1"', content_length="100")
+
+    # Same bytes served from another path resolve through the ETag index
+    assert cache.get("https://other.example.com/v9.mp4", kind, etag='"e1"', content_length="100") == ["01", "02"]
+
+    cache.put("https://cdn.example.com/v2.mp4", kind, ["03"])
+    cache.put("https://cdn.example.com/v3.mp4", kind, ["04"])
+    assert cache.get("https://cdn.example.com/v1.mp4", kind) is None
+    assert cache.get("https://other.example.com/v9.mp4", kind, etag='"e1"', content_length="100") is None
+    assert cache.get_stats()["memory_entries"] == 2
+
+
+def test_bare_then_etag_probe_counts_one_miss():
+    cache = MediaHashCache(persistent=False)
+    kind = image_hash_kind()
+    assert cache.get("https://cdn.example.com/a.jpg", kind, count_miss=False) is None
+    assert cache.get("https://cdn.example.com/a.jpg", kind, etag='"e"', content_length="10") is None
+    cache.put("https://cdn.example.com/a.jpg", kind, ["ff"], etag='"e"', content_length="10")
+    assert cache.get("https://cdn.example.com/a.jpg", kind, count_miss=False) == ["ff"]
+
+    stats = cache.get_stats()
+    assert (stats["memory_hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_eviction_keeps_etag_keys_repointed_at_newer_entries():
+    cache = MediaHashCache(max_entries=1, persistent=False)
+    kind = video_hash_kind(6)
+    cache.put("https://cdn.example.com/v1.mp4", kind, ["01"], etag='"e1"', content_length="100")
+    cache.put("https://cdn.example.com/v2.mp4", kind, ["02"], etag='"e1"', content_length="100")  # Evicts v1
+    assert cache.get("https://other.example.com/v9.mp4", kind, etag='"e1"', content_length="100") == ["02"]
+    assert cache._etag_keys.keys() == {(normalize_media_url("https://cdn.example.com/v2.mp4"), kind)}
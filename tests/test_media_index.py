@@ -0,0 +1,90 @@
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from app.database import Base
+from app.models import MediaFile, MediaFileRef
+from app.services.media_storage_service import MediaStorageService
+
+SHA_A = "a" * 64
+SHA_B = "b" * 64
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        # Only the columns the index reads (the real table needs Postgres types)
+        conn.execute(text("CREATE TABLE ads (id INTEGER PRIMARY KEY, raw_data JSON)"))
+    Base.metadata.create_all(engine, tables=[MediaFile.__table__, MediaFileRef.__table__])
+    with Session(engine) as session:
+        yield session
+
+
+def _write(storage, local_path, data=b"x" * 10, age_days=0):
+    path = storage / local_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    stamp = time.time() - age_days * 86400
+    os.utime(path, (stamp, stamp))
+    return local_path
+
+
+def test_cleanup_only_unlinks_old_unreferenced_files(tmp_path, db):
+    service = MediaStorageService(db, storage_path=str(tmp_path))
+    kept = _write(tmp_path, f"acme/images/{SHA_A}.jpg", age_days=200)
+    stale = _write(tmp_path, f"acme/videos/{SHA_B}.mp4", data=b"y" * 25, age_days=200)
+    fresh = _write(tmp_path, "acme/images/0123.jpg", age_days=1)
+
+    service.index.set_ad_files(1, [kept, fresh], [stale])
+    service.index.set_ad_files(1, [kept], [])
+    db.commit()
+    assert {ref.role for ref in db.query(MediaFileRef)} == {"image"}
+    assert db.query(MediaFile).filter_by(local_path=kept).one().sha256 == SHA_A
+
+    stats = service.cleanup_old_media(days_old=90, batch_size=1)
+
+    assert stats == {"files_checked": 1, "files_removed": 1, "space_freed": 25}
+    assert not (tmp_path / stale).exists()
+    assert (tmp_path / kept).exists() and (tmp_path / fresh).exists()
+    assert {row.local_path for row in db.query(MediaFile)} == {kept, fresh}
+
+
+def test_shared_files_outlive_one_ads_release(tmp_path, db):
+    service = MediaStorageService(db, storage_path=str(tmp_path))
+    shared = _write(tmp_path, f"acme/images/{SHA_A}.jpg")
+    service.index.set_ad_files(1, [shared], [])
+    service.index.set_ad_files(2, [shared], [])
+
+    service.index.release_ad(1)
+    assert service.index.referenced_paths([shared]) == {shared}
+    service.index.release_ad(2)
+    assert service.index.referenced_paths([shared]) == set()
+    cutoff = datetime.now(timezone.utc) + timedelta(days=1)
+    assert [row.local_path for row in service.index.unreferenced(cutoff)] == [shared]
+
+
+def test_reconcile_rebuilds_index_from_disk(tmp_path, db):
+    service = MediaStorageService(db, storage_path=str(tmp_path))
+    image = _write(tmp_path, f"acme/images/{SHA_A}.jpg")
+    video = _write(tmp_path, "globex/videos/legacy.mp4")
+    _write(tmp_path, f".objects/aa/{SHA_A}.jpg")
+    db.add(MediaFile(local_path="gone/images/old.jpg", media_type="image", file_size=1, mtime=datetime.now(timezone.utc)))
+    local_media = {"local_media": {"images": [image, "acme/images/missing.jpg"], "videos": [video]}}
+    db.execute(text("INSERT INTO ads (id, raw_data) VALUES (7, :raw), (8, :empty)"), {"raw": json.dumps(local_media), "empty": "{}"})
+    db.commit()
+
+    stats = service.reconcile_media_index()
+
+    assert stats == {"files_indexed": 2, "files_forgotten": 1, "refs": 2, "missing_refs": 1}
+    rows = {row.local_path: row for row in db.query(MediaFile)}
+    assert set(rows) == {image, video}
+    assert rows[image].sha256 == SHA_A and rows[video].sha256 is None
+    assert {(ref.ad_id, ref.role) for ref in db.query(MediaFileRef)} == {(7, "image"), (7, "video")}
@@ -0,0 +1,75 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from app.services.offload import LaneFullError, OffloadLane
+
+
+def test_lane_caps_concurrency_and_keeps_the_loop_responsive():
+    lane = OffloadLane("test", max_concurrency=2, max_waiting=10)
+    running, peak = 0, 0
+    lock = threading.Lock()
+
+    def blocking(value):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        return value * 2
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        tick_task = asyncio.create_task(ticker())
+        results = await asyncio.gather(*(lane.run(blocking, i) for i in range(6)))
+        tick_task.cancel()
+        return results, ticks
+
+    results, ticks = asyncio.run(main())
+
+    assert results == [0, 2, 4, 6, 8, 10]
+    assert peak == 2
+    # Three rounds of 50ms: the loop kept ticking the whole time
+    assert ticks >= 10
+    stats = lane.snapshot()
+    assert (stats["completed"], stats["in_flight"], stats["waiting"]) == (6, 0, 0)
+    assert stats["wait_p99_seconds"] >= 0.08
+    assert stats["run_p50_seconds"] >= 0.05
+
+
+def test_lane_rejects_when_queue_is_full_and_counts_failures():
+    lane = OffloadLane("test", max_concurrency=1, max_waiting=1)
+    release = threading.Event()
+
+    def fail():
+        raise ValueError("boom")
+
+    async def main():
+        # One call runs, one waits for the thread: the queue is full
+        held = [asyncio.create_task(lane.run(release.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(LaneFullError):
+            await lane.run(time.sleep, 0)
+        release.set()
+        await asyncio.gather(*held)
+        with pytest.raises(ValueError):
+            await lane.run(fail)
+
+    asyncio.run(main())
+
+    stats = lane.snapshot()
+    assert (stats["completed"], stats["failed"], stats["rejected"]) == (2, 1, 1)
@@ -0,0 +1,130 @@
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import orjson
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.models import Category
+from app.services import response_cache as rc
+
+
+@pytest.fixture(autouse=True)
+def memory_only(monkeypatch):
+    """Exercise the in-memory fallback tier; no Redis in tests."""
+    cache = rc.ResponseCache()
+    cache._redis_disabled_until = float("inf")
+    monkeypatch.setattr(rc, "response_cache", cache)
+    return cache
+
+
+def test_params_digest_ignores_order_none_and_whitespace():
+    assert rc.params_digest({"a": 1, "b": " x ", "c": None}) == rc.params_digest({"b": "x", "a": 1})
+    assert rc.params_digest({"a": 1}) != rc.params_digest({"a": 2})
+
+
+def test_cached_loader_serves_hits_and_invalidates_by_tag():
+    calls = []
+
+    @rc.cached_response("test:list", tags=(rc.TAG_ADS,))
+    def load(db, page):
+        calls.append(page)
+        return {"page": page, "at": datetime(2024, 1, 1, tzinfo=timezone.utc)}
+
+    body = load(None, page=1)
+    assert orjson.loads(body) == {"page": 1, "at": "2024-01-01T00:00:00+00:00"}
+    assert load(None, page=1) == body
+    assert calls == [1]
+
+    rc.invalidate_tags(rc.TAG_COMPETITORS)  # unrelated tag
+    load(None, page=1)
+    assert calls == [1]
+
+    rc.invalidate_tags(rc.TAG_ADS)
+    load(None, page=1)
+    assert calls == [1, 1]
+
+
+def test_stale_entry_is_served_while_refreshed_in_background(monkeypatch):
+    monkeypatch.setattr(rc, "SessionLocal", lambda: Session(create_engine("sqlite://")))
+    version = {"n": 1}
+
+    @rc.cached_response("test:stale", tags=(rc.TAG_ADS,), fresh_ttl=0.05, stale_ttl=60)
+    def load(db):
+        return version["n"]
+
+    assert load(None) == b"1"
+    version["n"] = 2
+    time.sleep(0.1)
+    assert load(None) == b"1"  # stale body, refresh kicked off
+    for _ in range(50):
+        if load(None) == b"2":
+            break
+        time.sleep(0.02)
+    assert load(None) == b"2"
+
+
+def test_orm_commit_bumps_tags_of_touched_models(memory_only):
+    engine = create_engine("sqlite://")
+    Category.__table__.create(engine)
+    before = memory_only.tag_versions([rc.TAG_CATEGORIES, rc.TAG_ADS])
+
+    with Session(engine) as db:
+        db.add(Category(name="Real estate"))
+        db.commit()
+
+    after = memory_only.tag_versions([rc.TAG_CATEGORIES, rc.TAG_ADS])
+    assert before == "l0.0" and after == "l1.0"
+
+
+class FlakyRedis:
+    """Tag counters only; every call raises while ``down``."""
+
+    def __init__(self):
+        self.down = False
+        self.counters = {}
+
+    def _check(self):
+        if self.down:
+            raise ConnectionError("Redis is down")
+
+    def mget(self, keys):
+        self._check()
+        return [self.counters.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        redis, ops = self, []
+
+        class Pipeline:
+            def incr(self, key):
+                ops.append(key)
+
+            def execute(self):
+                redis._check()
+                for key in ops:
+                    redis.counters[key] = redis.counters.get(key, 0) + 1
+
+        return Pipeline()
+
+
+def test_invalidations_during_an_outage_reach_redis_when_it_recovers():
+    cache = rc.ResponseCache()
+    cache._redis = FlakyRedis()
+    before = cache.tag_versions([rc.TAG_ADS, rc.TAG_COMPETITORS])
+
+    cache._redis.down = True
+    cache.invalidate(rc.TAG_ADS)
+    cache.invalidate(rc.TAG_ADS)  # Redis disabled now: queued without a call
+    assert cache._pending_tags == {rc.TAG_ADS}
+
+    cache._redis.down = False
+    cache._redis_disabled_until = 0.0
+    after = cache.tag_versions([rc.TAG_ADS, rc.TAG_COMPETITORS])
+    assert after.startswith("r") and after != before
+    assert cache._redis.counters == {f"{cache.KEY_PREFIX}:tag:{rc.TAG_ADS}": 1}
+    assert not cache._pending_tags
@@ -0,0 +1,89 @@
+import os
+import sys
+from datetime import date
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from app.services.enhanced_ad_extraction import EnhancedAdExtractionService
+from app.services.scrape_checkpoints import AdIdBloomFilter, CheckpointTracker, page_ad_archive_ids
+
+
+def _page(ads, has_next_page=True, end_cursor="c2"):
+    return {
+        "data": {
+            "ad_library_main": {
+                "search_results_connection": {
+                    "edges": [{"node": {"collated_results": [ad]}} for ad in ads],
+                    "page_info": {"has_next_page": has_next_page, "end_cursor": end_cursor},
+                }
+            }
+        }
+    }
+
+
+def _tracker(filter_ids, seen_count):
+    tracker = CheckpointTracker.__new__(CheckpointTracker)
+    tracker.filter = AdIdBloomFilter(capacity=100)
+    for ad_id in filter_ids:
+        tracker.filter.add(ad_id)
+    tracker.seen_count = seen_count
+    tracker.has_history = seen_count > 0
+    tracker.max_start_date = None
+    tracker.last_cursor = None
+    tracker.pages = tracker.new_ads = 0
+    return tracker
+
+
+def test_bloom_filter_round_trips_without_false_negatives():
+    bloom = AdIdBloomFilter(capacity=1000)
+    ids = [str(10_000_000 + i) for i in range(1000)]
+    for ad_id in ids:
+        bloom.add(ad_id)
+    restored = AdIdBloomFilter(bits=bloom.to_bytes())
+
+    assert all(ad_id in restored for ad_id in ids)
+    false_positives = sum(str(20_000_000 + i) in restored for i in range(10_000))
+    assert false_positives < 300
+    assert 900 <= restored.capacity <= 1100
+
+
+def test_tracker_confirms_filter_hits_and_observes_page():
+    tracker = _tracker(["1", "2"], seen_count=2)
+    rows = [MagicMock(ad_archive_id="1")]
+    tracker.db = MagicMock()
+    tracker.db.query.return_value.filter.return_value = rows
+
+    page = _page([
+        {"ad_archive_id": "1", "start_date": 1767225600},
+        {"ad_archive_id": "3", "start_date": 1767312000},
+    ])
+    ids = page_ad_archive_ids(page)
+    assert ids == ["1", "3"]
+
+    # "3" is not in the filter, so only "1" reaches the database
+    known = tracker.known_ids(ids)
+    assert known == {"1"}
+    candidates = tracker.db.query.return_value.filter.call_args[0][0].right.value
+    assert candidates == ["1"]
+
+    tracker.observe_page(page, ids, known)
+    assert "3" in tracker.filter
+    assert (tracker.seen_count, tracker.new_ads, tracker.pages) == (3, 1, 1)
+    assert tracker.max_start_date == date(2026, 1, 2)
+    assert tracker.last_cursor == "c2"
+
+
+def test_known_ads_take_the_meta_only_path():
+    service = EnhancedAdExtractionService(MagicMock())
+    known = {"ad_archive_id": "1", "page_id": "p", "page_name": "Brand", "is_active": True,
+             "start_date": 1767225600, "snapshot": {"cards": [{"body": "unused"}]}}
+    new = {"ad_archive_id": "2", "page_id": "p", "page_name": "Brand", "is_active": True,
+           "start_date": 1767225600, "snapshot": {"body": {"text": "Hello"}}}
+
+    enhanced = service.transform_raw_data_to_enhanced_format([_page([known, new])], known_ids={"1"})
+
+    by_id = {ad["ad_archive_id"]: ad for ad in enhanced["Brand"]}
+    assert by_id["1"]["known"] is True
+    assert by_id["1"]["meta"]["start_date"] == "2026-01-01"
+    assert "creatives" not in by_id["1"]
+    assert "known" not in by_id["2"]
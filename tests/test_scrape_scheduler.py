@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from app.models import Competitor
+from app.services.rate_limiter import TokenBucket
+from app.services.scrape_scheduler import aggregate_scrape_results, plan_scrape_jobs, scrape_priority
+
+NOW = datetime(2026, 1, 10, 12, 0, tzinfo=timezone.utc)
+
+
+def _competitor(id, hours_ago=None, last_yield=None):
+    return Competitor(
+        id=id,
+        name=f"C{id}",
+        page_id=str(id),
+        last_scraped_at=NOW - timedelta(hours=hours_ago) if hours_ago is not None else None,
+        last_scrape_yield=last_yield,
+    )
+
+
+def _local_bucket(rate, capacity):
+    bucket = TokenBucket("test", rate=rate, capacity=capacity)
+    bucket._redis_disabled_until = float("inf")
+    return bucket
+
+
+def test_priority_prefers_never_scraped_then_stale_and_productive():
+    never = _competitor(1)
+    stale = _competitor(2, hours_ago=48, last_yield=0)
+    fresh_productive = _competitor(3, hours_ago=24, last_yield=50)
+    fresh_idle = _competitor(4, hours_ago=24, last_yield=0)
+
+    assert scrape_priority(never, NOW) == float("inf")
+    assert scrape_priority(fresh_productive, NOW) > scrape_priority(fresh_idle, NOW)
+    # Naive timestamps are read as UTC
+    naive = Competitor(id=5, last_scraped_at=(NOW - timedelta(hours=2)).replace(tzinfo=None))
+    assert scrape_priority(naive, NOW) == 2.0
+
+    jobs = plan_scrape_jobs([fresh_idle, stale, never, fresh_productive], ["AE", "US"], now=NOW)
+    assert [job["competitor_id"] for job in jobs] == [1, 1, 3, 3, 2, 2, 4, 4]
+    assert [job["country"] for job in jobs[:2]] == ["AE", "US"]
+
+
+def test_aggregate_sums_countries_per_competitor_and_keeps_errors():
+    results = aggregate_scrape_results([
+        {"competitor_id": 1, "competitor_name": "C1", "page_id": "1", "country": "AE",
+         "stats": {"created": 3, "updated": 1, "total_processed": 4}, "processed_at": "2026-01-10T10:00:00"},
+        {"competitor_id": 1, "competitor_name": "C1", "page_id": "1", "country": "US",
+         "stats": {"created": 2, "updated": 0, "total_processed": 2}, "processed_at": "2026-01-10T11:00:00"},
+        {"competitor_id": 2, "country": "AE", "error": "boom"},
+        None,
+    ])
+
+    assert results["competitors_processed"] == 1
+    assert results["total_new_ads"] == 5
+    assert results["total_processed_ads"] == 6
+    entry = results["competitors_results"][0]
+    assert entry["countries"] == ["AE", "US"]
+    assert entry["stats"] == {"created": 5, "updated": 1, "total_processed": 6, "new_ads_count": 5}
+    assert entry["processed_at"] == "2026-01-10T11:00:00"
+    assert results["errors"] == [{"competitor_id": 2, "competitor_name": None, "country": "AE", "error": "boom"}]
+
+
+def test_token_bucket_allows_burst_then_paces():
+    bucket = _local_bucket(rate=10, capacity=3)
+    assert [bucket.try_take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = bucket.try_take()
+    assert 0 < wait <= 0.1
+
+    started = time.monotonic()
+    assert bucket.acquire()
+    assert time.monotonic() - started >= 0.05
+    assert not bucket.acquire(tokens=3, timeout=0.01)
@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from app.database import Base
+from app.models import ApiUsage, ApiUsageRollup, AppSetting
+from app.services.app_settings_cache import AppSettingsSnapshot
+from app.services.usage_recorder import UsageRecorder
+
+
+def _session_factory(*tables):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=[t.__table__ for t in tables])
+    return sessionmaker(bind=engine)
+
+
+def _row(i):
+    return {"model_name": "gemini-2.5-flash-lite", "provider": "gemini", "api_key_index": 0, "total_tokens": i, "request_type": "analysis"}
+
+
+def test_usage_rows_are_written_in_batches_and_kept_until_committed():
+    session_factory = _session_factory(ApiUsage, ApiUsageRollup)
+    healthy = [True]
+
+    def flaky_session():
+        if not healthy[0]:
+            raise RuntimeError("db down")
+        return session_factory()
+
+    recorder = UsageRecorder(session_factory=flaky_session, batch_size=3, interval=3600)
+    recorder._ensure_writer = lambda: None  # Flush by hand only
+    healthy[0] = False
+    for i in range(5):
+        recorder.record(_row(i))
+    assert recorder.flush() == 0
+    assert recorder.pending() == 5  # Nothing is lost while the database is down
+
+    healthy[0] = True
+    assert recorder.flush() == 5
+    db = session_factory()
+    assert sorted(row.total_tokens for row in db.query(ApiUsage)) == [0, 1, 2, 3, 4]
+    db.close()
+
+
+def test_writer_thread_flushes_once_a_batch_is_waiting():
+    session_factory = _session_factory(ApiUsage, ApiUsageRollup)
+    recorder = UsageRecorder(session_factory=session_factory, batch_size=2, interval=3600, limit=3)
+    recorder.record(_row(1))
+    recorder.record(_row(2))
+    deadline = time.time() + 5
+    while recorder.pending() and time.time() < deadline:
+        time.sleep(0.01)
+    db = session_factory()
+    assert db.query(ApiUsage).count() == 2
+    db.close()
+
+
+def test_settings_snapshot_reads_once_and_reloads_after_a_commit():
+    session_factory = _session_factory(AppSetting)
+    db = session_factory()
+    db.add(AppSetting(key="ai_model", value='{"model_name": "gemini-2.0-flash"}'))
+    db.commit()
+
+    queries = []
+    counting = lambda: queries.append(1) or session_factory()
+    snapshot = AppSettingsSnapshot(session_factory=counting, check_interval=3600, max_age=3600)
+    snapshot._client = lambda: None  # No Redis here: same-process invalidation only
+
+    assert snapshot.get("ai_model") == '{"model_name": "gemini-2.0-flash"}'
+    assert snapshot.get("missing", "default") == "default"
+    assert len(queries) == 1
+
+    import app.services.app_settings_cache as module
+    original, module.app_settings = module.app_settings, snapshot
+    try:
+        db.query(AppSetting).filter_by(key="ai_model").one().value = '{"model_name": "gemini-2.5-flash-lite"}'
+        db.commit()
+    finally:
+        module.app_settings = original
+    db.close()
+
+    assert snapshot.get("ai_model") == '{"model_name": "gemini-2.5-flash-lite"}'
+    assert len(queries) == 2
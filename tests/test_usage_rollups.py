@@ -0,0 +1,62 @@
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from app.database import Base
+from app.models import ApiUsage, ApiUsageRollup
+from app.services.usage_rollups import apply_rollups, compact_usage, usage_totals
+
+
+def _db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[ApiUsage.__table__, ApiUsageRollup.__table__])
+    return Session(engine)
+
+
+def _row(created_at, key=0, model="gemini-2.5-flash-lite", tokens=100, cost=0.01, request_type="analysis"):
+    return {
+        "model_name": model, "provider": "gemini", "api_key_index": key, "request_type": request_type,
+        "prompt_tokens": tokens, "completion_tokens": tokens // 2, "total_tokens": tokens + tokens // 2,
+        "estimated_cost_usd": cost, "created_at": created_at,
+    }
+
+
+def test_rollups_accumulate_across_batches_per_bucket():
+    db = _db()
+    t0 = datetime(2026, 3, 1, 10, 15, tzinfo=timezone.utc)
+    apply_rollups(db, [_row(t0), _row(t0 + timedelta(minutes=5), key=1), _row(t0, model="gemini-2.0-flash", request_type=None)])
+    apply_rollups(db, [_row(t0 + timedelta(hours=1), tokens=300, cost=0.03)])
+    db.commit()
+
+    hours = db.query(ApiUsageRollup).filter_by(granularity="hour", model_name="gemini-2.5-flash-lite", api_key_index=0).order_by(ApiUsageRollup.bucket_start).all()
+    assert [(r.requests, r.prompt_tokens) for r in hours] == [(1, 100), (1, 300)]
+    day = db.query(ApiUsageRollup).filter_by(granularity="day", model_name="gemini-2.5-flash-lite", api_key_index=0).one()
+    assert (day.requests, day.prompt_tokens, day.total_tokens) == (2, 400, 600)
+    assert db.query(ApiUsageRollup).filter_by(granularity="total", model_name="gemini-2.0-flash").one().request_type == ""
+
+    by_model = {row.model_name: row for row in usage_totals(db, ApiUsageRollup.model_name)}
+    assert by_model["gemini-2.5-flash-lite"].total_requests == 3
+    assert round(by_model["gemini-2.5-flash-lite"].estimated_cost_usd, 6) == 0.05
+    by_key = {row.api_key_index: row for row in usage_totals(db, ApiUsageRollup.api_key_index, provider="gemini")}
+    assert (by_key[0].total_requests, by_key[1].total_requests) == (3, 1)
+    assert by_key[0].last_used.replace(tzinfo=timezone.utc) == t0 + timedelta(hours=1)
+
+
+def test_compaction_keeps_daily_and_total_rollups():
+    db = _db()
+    old = datetime.now(timezone.utc) - timedelta(days=120)
+    recent = datetime.now(timezone.utc) - timedelta(days=1)
+    rows = [_row(old), _row(recent)]
+    db.bulk_insert_mappings(ApiUsage, rows)
+    apply_rollups(db, rows)
+    db.commit()
+
+    assert compact_usage(db, raw_retention_days=30, hourly_retention_days=90, batch_size=1) == {"raw": 1, "hourly": 1}
+    assert db.query(ApiUsage).count() == 1
+    assert db.query(ApiUsageRollup).filter_by(granularity="hour").count() == 1
+    assert db.query(ApiUsageRollup).filter_by(granularity="day").count() == 2
+    assert usage_totals(db, ApiUsageRollup.model_name)[0].total_requests == 2
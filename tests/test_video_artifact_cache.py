@@ -0,0 +1,85 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from app.services.video_artifact_cache import VideoArtifactCache
+
+
+def _mp4(body):
+    return b"\x00\x00\x00\x18ftypisom" + body
+
+
+def _writer(calls, payloads, delay=0.0):
+    def fetch(url, path):
+        calls.append(url)
+        time.sleep(delay)
+        with open(path, "wb") as f:
+            f.write(payloads[url.split("?")[0]])
+    return fetch
+
+
+def test_concurrent_fetches_share_one_download_and_dedupe_by_content(tmp_path):
+    cache = VideoArtifactCache(root=str(tmp_path), max_bytes=10_000)
+    calls = []
+    fetch = _writer(calls, {"https://cdn.fbcdn.net/v/a.mp4": _mp4(b"a" * 100), "https://cdn.fbcdn.net/v/copy.mp4": _mp4(b"a" * 100)}, delay=0.2)
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda i=i: results.append(cache.fetch(f"https://cdn.fbcdn.net/v/a.mp4?oh={i}", fetch)))
+        for i in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1  # Signed variants of one URL: a single download
+    assert len({artifact.path for artifact in results}) == 1
+
+    copy = cache.fetch("https://cdn.fbcdn.net/v/copy.mp4", fetch)
+    assert copy.path == results[0].path  # Same bytes under another URL are stored once
+    assert os.listdir(tmp_path / "objects") == [os.path.basename(copy.path)]
+    assert cache.lookup("https://cdn.fbcdn.net/v/a.mp4", variant="yt-dlp") is None
+
+
+def test_eviction_drops_least_recently_used_but_keeps_pinned(tmp_path):
+    cache = VideoArtifactCache(root=str(tmp_path), max_bytes=250)
+    calls = []
+    payloads = {f"https://cdn/{name}.mp4": _mp4(name.encode() * 88) for name in "abc"}
+    fetch = _writer(calls, payloads)
+
+    pinned = cache.fetch("https://cdn/a.mp4", fetch)  # Oldest, but still in use
+    cache.fetch("https://cdn/b.mp4", fetch).release()
+    os.utime(pinned.path, (1, 1))
+    os.utime(cache.lookup("https://cdn/b.mp4", pin_seconds=0).path, (2, 2))
+
+    cache.fetch("https://cdn/c.mp4", fetch).release()  # 300 bytes > 250: evict
+    assert cache.lookup("https://cdn/b.mp4") is None
+    assert os.path.exists(pinned.path)
+    # Evicted keys lose their lock file too
+    assert set(os.listdir(tmp_path / "locks")) == {
+        f"{cache.url_key(url)}.lock" for url in ("https://cdn/a.mp4", "https://cdn/c.mp4")
+    } | {"evict.lock"}
+
+    pinned.release()
+    cache.fetch("https://cdn/b.mp4", fetch).release()
+    assert calls == ["https://cdn/a.mp4", "https://cdn/b.mp4", "https://cdn/c.mp4", "https://cdn/b.mp4"]
+    assert cache.lookup("https://cdn/a.mp4") is None
+
+
+def test_only_signed_cdn_urls_drop_the_query_and_non_videos_are_not_cached(tmp_path):
+    cache = VideoArtifactCache(root=str(tmp_path), max_bytes=10_000)
+    assert cache.url_key("https://video.xx.fbcdn.net/v/A.mp4?oh=1") == cache.url_key("https://video.xx.fbcdn.net/v/a.mp4?oh=2")
+    assert cache.url_key("https://www.facebook.com/ads/library/?id=1") != cache.url_key("https://www.facebook.com/ads/library/?id=2")
+    assert cache.url_key("https://www.facebook.com/watch/?v=1") != cache.url_key("https://www.facebook.com/watch/?v=2")
+
+    calls = []
+    fetch = _writer(calls, {"https://www.facebook.com/watch/": b"<!DOCTYPE html><html>login</html>"})
+    with pytest.raises(ValueError):
+        cache.fetch("https://www.facebook.com/watch/?v=1", fetch)
+    assert cache.lookup("https://www.facebook.com/watch/?v=1") is None
+    assert os.listdir(tmp_path / "objects") == [] and os.listdir(tmp_path / "tmp") == []